@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+#==============================================================================
+# bench_bits.py
+#==============================================================================
+# Benchmark suite for the BitsN hot paths.
+#
+# Times construction, bit indexing and slicing, every operator, the
+# module functions and the conversion/formatting methods for narrow,
+# 64-bit and very wide values. Results can be written as JSON and
+# compared against a baseline written by an earlier run, flagging every
+# benchmark which got slower by more than a tolerance.
+#
+#   % python benchmarks/bench_bits.py
+#   % python benchmarks/bench_bits.py --output baseline.json
+#   % python benchmarks/bench_bits.py --baseline baseline.json
+#   % python benchmarks/bench_bits.py --filter add --widths 8 64
+#
+# The script exits with status 1 when comparing against a baseline finds
+# regressions, so it can gate upgrades in a CI job.
+#
+
+import argparse
+import json
+import os
+import platform
+import sys
+import timeit
+
+sys.path.insert( 0, os.path.join( os.path.dirname( __file__ ), '..', 'fixedbw' ) )
+
+from bits import Bits, concat, zext, sext, reduce_and, reduce_or, reduce_xor
+
+WIDTHS = [ 8, 64, 1024 ]
+
+#------------------------------------------------------------------------------
+# benchmarks
+#------------------------------------------------------------------------------
+
+def make_cases( nbits ):
+  '''Return a list of (name, func) pairs timing each hot path on values of
+  the given width. Operands are built once, outside of the timed calls.'''
+
+  cls   = Bits( nbits )
+  x     = cls( 0xa5a5a5a5a5a5a5a5 & cls._mask | 1 )
+  y     = cls( 0x3c3c3c3c3c3c3c3c & cls._mask | 1 )
+  big   = (1 << (nbits + 4)) - 3
+  half  = max( nbits / 2, 1 )
+  hval  = (1 << half) - 1
+  shamt = nbits / 3
+  wide  = 2 * nbits
+  mut   = cls( x )
+
+  def setitem_bit():
+    mut[0] = 1
+
+  def setitem_slice():
+    mut[0:half] = hval
+
+  return [
+    ( 'construct',       lambda: cls( 5 ) ),
+    ( 'construct_trunc', lambda: cls( big, trunc=True ) ),
+    ( 'getitem_bit',     lambda: x[ half ] ),
+    ( 'getitem_slice',   lambda: x[ 0:half ] ),
+    ( 'setitem_bit',     setitem_bit ),
+    ( 'setitem_slice',   setitem_slice ),
+    ( 'add',             lambda: x + y ),
+    ( 'add_int',         lambda: x + 3 ),
+    ( 'sub',             lambda: x - y ),
+    ( 'sub_int',         lambda: x - 3 ),
+    ( 'mul',             lambda: x * y ),
+    ( 'mul_int',         lambda: x * 3 ),
+    ( 'div',             lambda: x / y ),
+    ( 'mod',             lambda: x % y ),
+    ( 'invert',          lambda: ~x ),
+    ( 'and',             lambda: x & y ),
+    ( 'or',              lambda: x | y ),
+    ( 'xor',             lambda: x ^ y ),
+    ( 'and_int',         lambda: x & 0xff ),
+    ( 'lshift',          lambda: x << shamt ),
+    ( 'rshift',          lambda: x >> shamt ),
+    ( 'eq',              lambda: x == y ),
+    ( 'ne',              lambda: x != y ),
+    ( 'lt',              lambda: x < y ),
+    ( 'le',              lambda: x <= y ),
+    ( 'gt',              lambda: x > y ),
+    ( 'ge',              lambda: x >= y ),
+    ( 'eq_int',          lambda: x == 5 ),
+    ( 'concat',          lambda: concat( x, y ) ),
+    ( 'zext',            lambda: zext( x, wide ) ),
+    ( 'sext',            lambda: sext( x, wide ) ),
+    ( 'reduce_and',      lambda: reduce_and( x ) ),
+    ( 'reduce_or',       lambda: reduce_or( x ) ),
+    ( 'reduce_xor',      lambda: reduce_xor( x ) ),
+    ( 'int',             lambda: x.int() ),
+    ( 'uint',            lambda: x.uint() ),
+    ( 'bin',             lambda: x.bin() ),
+    ( 'oct',             lambda: x.oct() ),
+    ( 'hex',             lambda: x.hex() ),
+    ( 'str',             lambda: str( x ) ),
+  ]
+
+#------------------------------------------------------------------------------
+# timing
+#------------------------------------------------------------------------------
+
+def time_ns( func, min_time, repeat ):
+  '''Return the best time per call of func in nanoseconds, calling it
+  enough times per repetition to run for at least min_time seconds.'''
+
+  number = 1
+  while True:
+    elapsed = timeit.timeit( func, number=number )
+    if elapsed >= min_time / 10:
+      break
+    number *= 10
+
+  number = max( int( number * min_time / max( elapsed, 1e-9 ) / 10 ) * 10, 1 )
+  return min( timeit.repeat( func, repeat=repeat, number=number ) ) / number * 1e9
+
+def run( widths, pattern, min_time, repeat ):
+  'Return a dict mapping "name/nbits" to nanoseconds per call.'
+  results = {}
+  for nbits in widths:
+    for name, func in make_cases( nbits ):
+      key = '{}/{}'.format( name, nbits )
+      if pattern and pattern not in key:
+        continue
+      results[ key ] = time_ns( func, min_time, repeat )
+      print '{:<24} {:>12.0f} ns'.format( key, results[ key ] )
+      sys.stdout.flush()
+  return results
+
+#------------------------------------------------------------------------------
+# baseline comparison
+#------------------------------------------------------------------------------
+
+def compare( results, baseline, tolerance ):
+  '''Print the change of every benchmark against the baseline and return
+  the list of keys which got slower by more than tolerance.'''
+
+  regressions = []
+
+  print
+  print '{:<24} {:>12} {:>12} {:>8}'.format(
+    'benchmark', 'baseline ns', 'current ns', 'change' )
+
+  for key in sorted( results ):
+    if key not in baseline:
+      continue
+    old, new = baseline[ key ], results[ key ]
+    change   = (new - old) / old
+    flag     = ''
+    if change > tolerance:
+      regressions.append( key )
+      flag = '  REGRESSION'
+    print '{:<24} {:>12.0f} {:>12.0f} {:>+7.0f}%{}'.format(
+      key, old, new, 100 * change, flag )
+
+  print
+  if regressions:
+    print '{} benchmark(s) regressed by more than {:.0f}%'.format(
+      len( regressions ), 100 * tolerance )
+  else:
+    print 'No regressions beyond {:.0f}%'.format( 100 * tolerance )
+
+  return regressions
+
+#------------------------------------------------------------------------------
+# main
+#------------------------------------------------------------------------------
+
+def main( argv ):
+
+  p = argparse.ArgumentParser( description=__doc__ and __doc__.strip() )
+  p.add_argument( '--widths', type=int, nargs='+', default=WIDTHS,
+                  help='bitwidths to benchmark (default: %(default)s)' )
+  p.add_argument( '--filter', default='',
+                  help='only run benchmarks whose name/width contains this' )
+  p.add_argument( '--min-time', type=float, default=0.05,
+                  help='seconds per timing repetition (default: %(default)s)' )
+  p.add_argument( '--repeat', type=int, default=3,
+                  help='timing repetitions, best is kept (default: %(default)s)' )
+  p.add_argument( '--output', metavar='JSON',
+                  help='write the results to this file' )
+  p.add_argument( '--baseline', metavar='JSON',
+                  help='compare the results against this file' )
+  p.add_argument( '--tolerance', type=float, default=0.15,
+                  help='relative slowdown counted as a regression '
+                       '(default: %(default)s)' )
+  args = p.parse_args( argv )
+
+  results = run( args.widths, args.filter, args.min_time, args.repeat )
+
+  if args.output:
+    with open( args.output, 'w' ) as f:
+      json.dump( {
+        'python'  : platform.python_version(),
+        'platform': platform.platform(),
+        'unit'    : 'ns',
+        'results' : results,
+      }, f, indent=2, sort_keys=True )
+
+  if args.baseline:
+    with open( args.baseline ) as f:
+      baseline = json.load( f )[ 'results' ]
+    if compare( results, baseline, args.tolerance ):
+      return 1
+
+  return 0
+
+if __name__ == '__main__':
+  sys.exit( main( sys.argv[1:] ) )
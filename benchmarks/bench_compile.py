@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+#==============================================================================
+# bench_compile.py
+#==============================================================================
+# Compare a model written with Bits operators against its compiled version.
+#
+# codegen.compile() traces a function over Bits values once and emits an
+# equivalent function over raw ints. This script times both versions of
+# a small datapath model on the same arguments.
+#
+#   % python benchmarks/bench_compile.py
+#
+
+import os
+import sys
+import timeit
+
+sys.path.insert( 0, os.path.join( os.path.dirname( __file__ ), '..', 'fixedbw' ) )
+
+from bits    import Bits, concat, reduce_xor
+from codegen import compile
+
+#------------------------------------------------------------------------------
+# model
+#------------------------------------------------------------------------------
+
+def datapath( a, b, c ):
+  'A multiply-add with a parity bit and a swapped-halves output.'
+  prod   = a * b
+  acc    = prod + c
+  parity = reduce_xor( acc[0:16] )
+  swap   = concat( acc[0:8], acc[8:16] )
+  return acc[0:16], parity, swap ^ (c >> 3), acc > c
+
+#------------------------------------------------------------------------------
+# timing
+#------------------------------------------------------------------------------
+
+def time_ns( func, number ):
+  'Return the best time per call of func in nanoseconds.'
+  return min( timeit.repeat( func, repeat=3, number=number ) ) / number * 1e9
+
+def bench( number ):
+
+  compiled = compile( datapath, [ 8, 8, 16 ] )
+  args     = ( Bits(8)(0xa5), Bits(8)(0x3c), Bits(16)(0x1234) )
+
+  # Sanity check that both versions agree
+  for x, y in zip( datapath( *args ), compiled( *args ) ):
+    assert x.nbits == y.nbits and x.uint() == y.uint()
+
+  t_bits     = time_ns( lambda: datapath( *args ), number )
+  t_compiled = time_ns( lambda: compiled( *args ), number )
+  t_raw      = time_ns( lambda: compiled.raw( 0xa5, 0x3c, 0x1234 ), number )
+
+  print '{:>10} {:>10}'.format( 'version', 'ns/call' )
+  print '{:>10} {:>10.0f}'.format( 'bits', t_bits )
+  print '{:>10} {:>10.0f} ({:.1f}x)'.format( 'compiled', t_compiled,
+                                            t_bits / t_compiled )
+  print '{:>10} {:>10.0f} ({:.1f}x)'.format( 'raw', t_raw, t_bits / t_raw )
+
+if __name__ == '__main__':
+  bench( int( sys.argv[1] ) if len( sys.argv ) > 1 else 20000 )
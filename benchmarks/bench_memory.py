@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+#==============================================================================
+# bench_memory.py
+#==============================================================================
+# Report the per-instance memory footprint of BitsN objects.
+#
+# BitsN instances used to keep their payload in a per-instance __dict__.
+# They are now slot-based. This script compares both layouts for common
+# widths: the "dict" column measures an object laid out the old way (an
+# instance with a __dict__ holding _uint), the "slots" column measures a
+# real Bits(nbits) instance. The integer payload itself is reported
+# separately since it is the same in both layouts.
+#
+#   % python benchmarks/bench_memory.py
+#
+
+import os
+import sys
+
+sys.path.insert( 0, os.path.join( os.path.dirname( __file__ ), '..', 'fixedbw' ) )
+
+from bits import Bits
+
+WIDTHS = [ 1, 4, 8, 16, 32, 64, 128, 256 ]
+
+#------------------------------------------------------------------------------
+# sizes
+#------------------------------------------------------------------------------
+
+def dict_size( nbits, value ):
+  'Bytes used by an instance which stores _uint in its __dict__.'
+  cls = type( 'Bits{}'.format( nbits ), (object,), {} )
+  obj = cls()
+  obj._uint = value
+  return sys.getsizeof( obj ) + sys.getsizeof( obj.__dict__ )
+
+def slots_size( nbits, value ):
+  'Bytes used by a slot-based Bits(nbits) instance.'
+  obj = Bits( nbits )( value )
+  assert not hasattr( obj, '__dict__' )
+  return sys.getsizeof( obj )
+
+#------------------------------------------------------------------------------
+# main
+#------------------------------------------------------------------------------
+
+def main():
+
+  print '{:>6} {:>10} {:>10} {:>12} {:>8}'.format(
+    'nbits', 'dict (B)', 'slots (B)', 'payload (B)', 'saved' )
+
+  for nbits in WIDTHS:
+
+    # Use the largest value of each width; small ints are shared by the
+    # interpreter, so their payload usually costs nothing per instance
+    value   = (1 << nbits) - 1
+    payload = sys.getsizeof( value )
+    before  = dict_size( nbits, value )
+    after   = slots_size( nbits, value )
+
+    print '{:>6} {:>10} {:>10} {:>12} {:>7.0f}%'.format(
+      nbits, before, after, payload,
+      100.0 * (before - after) / (before + payload) )
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+#==============================================================================
+# bench_operands.py
+#==============================================================================
+# Compare operand dispatch in the BitsN operators against the previous
+# try/except implementation.
+#
+# BitsN operators used to handle int operands by letting other.nbits raise
+# an AttributeError and catching it with a bare except. They now dispatch
+# on the operand type. This script times both implementations on the
+# same Bits objects, for Bits-with-Bits and Bits-with-int operands.
+#
+#   % python benchmarks/bench_operands.py
+#
+
+import operator
+import os
+import sys
+import timeit
+
+sys.path.insert( 0, os.path.join( os.path.dirname( __file__ ), '..', 'fixedbw' ) )
+
+from bits import Bits
+
+#------------------------------------------------------------------------------
+# try/except implementations
+#------------------------------------------------------------------------------
+# These are the operator bodies from before type-based dispatch, kept here
+# as the baseline.
+
+def legacy_add( self, other ):
+  try:    return Bits(max(self.nbits, other.nbits) + 1)(self._uint + other._uint)
+  except: return Bits(self.nbits)                      (self._uint + other, trunc=True)
+
+def legacy_sub( self, other ):
+  try:    return Bits(max(self.nbits, other.nbits) + 1)(self._uint - other._uint )
+  except: return Bits(self.nbits)                      (self._uint - other, trunc=True)
+
+def legacy_mul( self, other ):
+  try:    return Bits(self.nbits + other.nbits)(self._uint * other._uint)
+  except: return Bits(self.nbits + self .nbits)(self._uint * other, trunc=True)
+
+def legacy_and( self, other ):
+  assert other >= 0
+  try:    return Bits(max(self.nbits, other.nbits))(self._uint & other._uint)
+  except: return Bits(self.nbits                  )(self._uint & other, trunc=True)
+
+def legacy_or( self, other ):
+  assert other >= 0
+  try:    return Bits(max( self.nbits, other.nbits))(self._uint | other._uint)
+  except: return Bits(self.nbits                   )(self._uint | other, trunc=True)
+
+OPS = [
+  ( 'add', operator.add,  legacy_add ),
+  ( 'sub', operator.sub,  legacy_sub ),
+  ( 'mul', operator.mul,  legacy_mul ),
+  ( 'and', operator.and_, legacy_and ),
+  ( 'or',  operator.or_,  legacy_or  ),
+]
+
+#------------------------------------------------------------------------------
+# timing
+#------------------------------------------------------------------------------
+
+def time_ns( func, number ):
+  'Return the best time per call of func in nanoseconds.'
+  return min( timeit.repeat( func, repeat=3, number=number ) ) / number * 1e9
+
+def bench( number ):
+
+  x = Bits(16)(0x1234)
+  y = Bits(16)(0x0101)
+  operands = [ ( 'bits', y ), ( 'int', 0x0101 ) ]
+
+  print '{:>4} {:>5} {:>14} {:>12} {:>8}'.format(
+    'op', 'other', 'try/except ns', 'dispatch ns', 'speedup' )
+
+  for name, op, legacy in OPS:
+    for kind, other in operands:
+
+      # Sanity check that both implementations agree
+
+      old, new = legacy( x, other ), op( x, other )
+      assert old.nbits == new.nbits and old.uint() == new.uint()
+
+      t_old = time_ns( lambda: legacy( x, other ), number )
+      t_new = time_ns( lambda: op( x, other ), number )
+
+      print '{:>4} {:>5} {:>14.0f} {:>12.0f} {:>7.1f}x'.format(
+        name, kind, t_old, t_new, t_old / t_new )
+
+if __name__ == '__main__':
+  bench( int( sys.argv[1] ) if len( sys.argv ) > 1 else 100000 )
@@ -0,0 +1,179 @@
+#==============================================================================
+# batch.py
+#==============================================================================
+# Evaluate a model over a large set of stimulus in a pool of processes.
+#
+# The stimulus is split into chunks which are sent to worker processes
+# and evaluated there, and the results come back in stimulus order. Bits,
+# SBits and FixedPoint values cross process boundaries as their integer
+# payloads: each chunk is encoded as runs of items sharing a signature
+# (the types of their values), followed by the payloads of the items in
+# the run, so a chunk of uniform stimulus pickles as one small signature
+# and a list of tuples of ints.
+
+import collections
+import multiprocessing
+
+import bits
+import fixedpoint
+import sbits
+from bits       import Bits, BitsN
+from fixedpoint import FixedPoint, FixedPointN
+from sbits      import SBits, SBitsN
+
+#------------------------------------------------------------------------------
+# run_batch
+#------------------------------------------------------------------------------
+def run_batch( function, stimulus, processes = None, chunk_size = 1024 ):
+  '''Return [ function( *args ) for args in stimulus ], evaluated in a
+  pool of processes.
+
+  function must be a module-level function (so that it can be pickled)
+  whose arguments and results are Bits, SBits or FixedPoint objects,
+  ints, other picklable values, or tuples of them. Each item of stimulus
+  is a tuple of arguments, or a single argument. Bits values arrive as
+  Bits(nbits) objects, whatever subclass of BitsN they were created as.
+
+  processes defaults to the number of CPUs; processes = 1 evaluates the
+  stimulus in the calling process. Workers are forked from the calling
+  process, so they inherit modes such as enable_unchecked().
+
+  > def alu( op, a, b ):
+  >   ...
+  > results = run_batch( alu, ( ( op, a, b ) for op, a, b in vectors ),
+  >                      chunk_size = 4096 )
+  '''
+  return list( imap_batch( function, stimulus, processes, chunk_size ) )
+
+#------------------------------------------------------------------------------
+# imap_batch
+#------------------------------------------------------------------------------
+def imap_batch( function, stimulus, processes = None, chunk_size = 1024 ):
+  '''Version of run_batch() which yields results in order as they become
+  available. The stimulus is consumed lazily, with at most two chunks per
+  process in flight, so it may be a generator of any length.'''
+
+  chunk_size = int( chunk_size )
+  if chunk_size < 1:
+    raise ValueError( 'chunk_size must be positive (got {})'
+                      .format( chunk_size ) )
+
+  if processes is None:
+    processes = multiprocessing.cpu_count()
+
+  if processes == 1:
+    for item in stimulus:
+      yield function( *_arguments( item ) )
+    return
+
+  pool = multiprocessing.Pool( processes )
+  try:
+    pending = collections.deque()
+    for chunk in _chunks( stimulus, chunk_size ):
+      pending.append( pool.apply_async( _run_chunk,
+                                        ( function, _encode( chunk ) ) ) )
+      if len( pending ) >= 2 * processes:
+        for result in _decode( pending.popleft().get() ):
+          yield result
+    while pending:
+      for result in _decode( pending.popleft().get() ):
+        yield result
+    pool.close()
+  finally:
+    pool.terminate()
+    pool.join()
+
+#------------------------------------------------------------------------------
+# worker
+#------------------------------------------------------------------------------
+
+def _run_chunk( function, runs ):
+  'Evaluate function over an encoded chunk of stimulus in a worker.'
+  return _encode( [ function( *args ) for args in _decode( runs ) ] )
+
+#------------------------------------------------------------------------------
+# encoding
+#------------------------------------------------------------------------------
+# The signature of a value is its width for Bits values, ( 'sbits',
+# nbits ) for SBits values, ( 'fixed', I, F, quant, overflow ) for
+# FixedPoint values, ( 'tuple', signatures... ) for tuples and None for
+# anything else. Its payload is its unsigned, signed or raw value, a tuple
+# of payloads, or the value itself.
+
+def _arguments( item ):
+  return item if isinstance( item, tuple ) else ( item, )
+
+def _chunks( stimulus, chunk_size ):
+  'Yield lists of at most chunk_size argument tuples.'
+  chunk = []
+  for item in stimulus:
+    chunk.append( _arguments( item ) )
+    if len( chunk ) == chunk_size:
+      yield chunk
+      chunk = []
+  if chunk:
+    yield chunk
+
+def _signature( value ):
+  if isinstance( value, BitsN ):
+    return value.nbits
+  if isinstance( value, SBitsN ):
+    return ( 'sbits', value.nbits )
+  if isinstance( value, FixedPointN ):
+    return ( 'fixed', value.I, value.F, value.quant, value.overflow )
+  if isinstance( value, tuple ):
+    return ( 'tuple', ) + tuple( _signature( v ) for v in value )
+  return None
+
+def _payload( value, signature ):
+  if signature is None:
+    return value
+  if isinstance( signature, tuple ):
+    kind = signature[0]
+    if kind == 'sbits':
+      return value._int
+    if kind == 'fixed':
+      return value._raw
+    return tuple( _payload( v, s ) for v, s in zip( value, signature[1:] ) )
+  return value._uint
+
+def _decoder( signature ):
+  'Return a function which rebuilds a value of a signature from its payload.'
+  if signature is None:
+    return lambda payload: payload
+  if isinstance( signature, tuple ):
+    kind = signature[0]
+    if kind == 'sbits':
+      cls = SBits( signature[1] )
+      return lambda payload: sbits._new_sbits( cls, payload )
+    if kind == 'fixed':
+      cls = FixedPoint( *signature[1:] )
+      return lambda payload: fixedpoint._new_fixed( cls, payload )
+    decoders = [ _decoder( s ) for s in signature[1:] ]
+    return lambda payload: tuple( decode( p ) for decode, p
+                                  in zip( decoders, payload ) )
+  cls = Bits( signature )
+  return lambda payload: bits._new_bits( cls, payload )
+
+def _encode( values ):
+  'Return a list of ( signature, payloads ) runs for a list of values.'
+  runs = []
+  last = object()
+  for value in values:
+    signature = _signature( value )
+    if signature != last:
+      payloads = []
+      runs.append( ( signature, payloads ) )
+      last = signature
+    payloads.append( _payload( value, signature ) )
+  return runs
+
+def _decode( runs ):
+  'Return the list of values encoded by _encode().'
+  values = []
+  for signature, payloads in runs:
+    if signature is None:
+      values.extend( payloads )
+    else:
+      values.extend( map( _decoder( signature ), payloads ) )
+  return values
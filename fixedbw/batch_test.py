@@ -0,0 +1,114 @@
+#=======================================================================
+# batch_test.py
+#=======================================================================
+# Tests for the process-pool batch runner.
+
+import pickle
+
+import pytest
+
+import batch
+from bits       import Bits
+from bitstruct  import BitStruct
+from fixedpoint import FixedPoint
+from sbits      import SBits
+from batch      import run_batch, imap_batch
+
+def alu( op, a, b ):
+  'A small model with Bits arguments and results.'
+  if op == 0:
+    return a + b
+  if op == 1:
+    return ( a & b, a[0:4] )
+  return int( a > b )
+
+def stimulus( n ):
+  return [ ( i % 3, Bits(16)( i * 37 & 0xffff ), Bits(16)( i * 91 & 0xffff ) )
+           for i in xrange( n ) ]
+
+def mac( acc, x, y ):
+  'A model with signed and fixed-point arguments and results.'
+  return acc + x * y, FixedPoint( 2, 6 )( float( y ) / 4 )
+
+def fails( x ):
+  if x == 7:
+    raise ValueError( 'bad stimulus' )
+  return x
+
+#-----------------------------------------------------------------------
+# test_run_batch
+#-----------------------------------------------------------------------
+@pytest.mark.parametrize( 'processes', [ 1, 3 ] )
+def test_run_batch( processes ):
+
+  vectors  = stimulus( 200 )
+  expected = [ alu( *v ) for v in vectors ]
+  results  = run_batch( alu, vectors, processes=processes, chunk_size=7 )
+
+  assert results == expected
+  assert [ type( r ) for r in results[:3] ] == \
+         [ Bits(17), tuple, int ]
+  assert type( results[1][1] ) is Bits(4)
+
+  # Generators of single arguments, consumed lazily
+
+  squares = imap_batch( abs, ( -i for i in xrange( 50 ) ),
+                        processes=processes, chunk_size=4 )
+  assert list( squares ) == range( 50 )
+  assert run_batch( abs, [], processes=processes ) == []
+
+#-----------------------------------------------------------------------
+# test_signed_and_fixed
+#-----------------------------------------------------------------------
+def test_signed_and_fixed():
+
+  vectors  = [ ( SBits(16)( i * 37 - 3000 ), SBits(8)( i - 50 ), -i % 7 )
+               for i in xrange( 100 ) ]
+  expected = [ mac( *v ) for v in vectors ]
+  results  = run_batch( mac, vectors, processes=2, chunk_size=9 )
+
+  assert results == expected
+  assert [ ( type( a ), type( b ) ) for a, b in results ] == \
+         [ ( type( a ), type( b ) ) for a, b in expected ]
+
+  assert run_batch( abs, [ SBits(8)( -3 ) ], processes=2 ) == [ 3 ]
+
+  Q    = FixedPoint( 4, 4, 'rnd', 'sat' )
+  runs = batch._encode( [ SBits(8)( -3 ), Q( -1.5 ) ] )
+  assert runs == [ ( ( 'sbits', 8 ), [ -3 ] ),
+                   ( ( 'fixed', 4, 4, 'rnd', 'sat' ), [ -24 ] ) ]
+  decoded = batch._decode( runs )
+  assert type( decoded[1] ) is Q
+  assert decoded[0] == -3 and decoded[1] == -1.5
+
+#-----------------------------------------------------------------------
+# test_errors
+#-----------------------------------------------------------------------
+def test_errors():
+
+  with pytest.raises( ValueError ):
+    run_batch( fails, range( 20 ), processes=2, chunk_size=3 )
+  with pytest.raises( ValueError ):
+    run_batch( abs, [ 1 ], chunk_size=0 )
+
+#-----------------------------------------------------------------------
+# test_encoding
+#-----------------------------------------------------------------------
+def test_encoding():
+
+  Pair   = BitStruct( 'Pair', [ ( 'a', 4 ), ( 'b', 4 ) ] )
+  values = [ ( Bits(8)( 1 ), 2 ), ( Bits(8)( 3 ), 4 ), Bits(4)( 5 ),
+             Pair( 0x12 ), None, ( Bits(8)( 6 ), 7 ) ]
+  runs   = batch._encode( values )
+
+  # Consecutive values with the same signature share a run, and only
+  # their integer payloads are pickled
+
+  assert runs == [ ( ( 'tuple', 8, None ), [ ( 1, 2 ), ( 3, 4 ) ] ),
+                   ( 4, [ 5 ] ), ( 8, [ 0x12 ] ), ( None, [ None ] ),
+                   ( ( 'tuple', 8, None ), [ ( 6, 7 ) ] ) ]
+  assert 'Bits' not in pickle.dumps( runs, 2 )
+
+  decoded = batch._decode( runs )
+  assert decoded == values
+  assert type( decoded[3] ) is Bits(8)
@@ -2,9 +2,12 @@
 # bits.py
 #==============================================================================
 
-import copy
+import binascii
+import contextlib
 import math
+import numbers
 import operator
+import struct
 
 #------------------------------------------------------------------------------
 # Bits
@@ -39,29 +42,73 @@ class Bits( type ):
       new_class = type( 'Bits{}'.format( nbits ),  # class name
                         (BitsN,),                  # base class
                                                    # class dictionary
-                        {'nbits'  : nbits,
+                        {'__slots__': (),
+                         'nbits'  : nbits,
                          '_max'   : (2**nbits) - 1,
                          '_min'   : -2**(nbits - 1) if nbits > 1 else 0,
                          '_mask'  : (1 << nbits) - 1,
                          '_hchars': ((nbits - 1) / 4) + 1,
                          '_ochars': ((nbits - 1) / 2) + 1,
+                         # result types of binary ops, keyed by other.nbits
+                         '_add_types'    : _ResultTypes( nbits, _add_nbits ),
+                         '_mul_types'    : _ResultTypes( nbits, _mul_nbits ),
+                         '_mod_types'    : _ResultTypes( nbits, min ),
+                         '_bitwise_types': _ResultTypes( nbits, max ),
                         } )
       Bits.__cache__[ nbits ] = new_class
+      if nbits <= _intern_max_nbits:
+        _intern_class( new_class )
       return new_class
 
+#------------------------------------------------------------------------------
+# _ResultTypes
+#------------------------------------------------------------------------------
+class _ResultTypes( dict ):
+  '''Table mapping other.nbits to the BitsN class returned by a binary
+  operator. Each BitsN class gets one table per bitwidth rule when the
+  Bits() factory creates it; entries are filled in on first use so that
+  hot operators only pay for a single dict lookup.'''
+
+  def __init__( self, nbits, rule ):
+    self.nbits = nbits
+    self.rule  = rule
+
+  def __missing__( self, other_nbits ):
+    result_type = Bits( self.rule( self.nbits, other_nbits ) )
+    self[ other_nbits ] = result_type
+    return result_type
+
+def _add_nbits( nbits, other_nbits ):
+  return max( nbits, other_nbits ) + 1
+
+def _mul_nbits( nbits, other_nbits ):
+  return nbits + other_nbits
+
 #------------------------------------------------------------------------------
 # BitsN
 #------------------------------------------------------------------------------
 class BitsN( object ):
   'Base class for templated Bits objects.'
 
+  # Instances only store their unsigned integer payload. BitsN classes
+  # created by the Bits() factory declare empty __slots__ so that they
+  # do not add a per-instance __dict__ back in.
+  __slots__ = ( '_uint', )
+
   # Class attributes initialized by Bits() factory
-  nbits   = None
-  _max    = None
-  _min    = None
-  _mask   = None
-  _hchars = None
-  _ochars = None
+  nbits          = None
+  _max           = None
+  _min           = None
+  _mask          = None
+  _hchars        = None
+  _ochars        = None
+  _add_types     = None
+  _mul_types     = None
+  _mod_types     = None
+  _bitwise_types = None
+
+  # Table of shared instances indexed by value, set by enable_interning()
+  _interned      = None
 
   #----------------------------------------------------------------------------
   # initializer
@@ -85,11 +132,7 @@ class BitsN( object ):
     value = int( value )
 
     if not trunc and not (self._min <= value <= self._max):
-      raise ValueError(
-        'Value is too big to be represented with Bits({})!\n'
-        '({} bits are needed to represent value = {} in two\'s complement.)'
-        .format( self.nbits, _get_nbits(value), value )
-      )
+      raise _value_error( self.nbits, value )
 
     # Convert negative values into unsigned ints and store them
 
@@ -129,11 +172,10 @@ class BitsN( object ):
   #----------------------------------------------------------------------------
   def int( self ):
     'Return the signed integer representation of the bits.'
-    if self[ self.nbits - 1]:
-      twos_complement = ~self + 1
-      return -twos_complement._uint
-    else:
-      return self._uint
+    # Subtract 2**nbits when the sign bit is set, without creating any
+    # intermediate Bits objects
+    uint = self._uint
+    return uint - ((uint >> (self.nbits - 1)) << self.nbits)
 
   #----------------------------------------------------------------------------
   # bit_length
@@ -143,6 +185,14 @@ class BitsN( object ):
     (Simplifies the implementation of get_nbits()).'''
     return self._uint.bit_length()
 
+  #----------------------------------------------------------------------------
+  # __reduce__
+  #----------------------------------------------------------------------------
+  def __reduce__( self ):
+    '''Pickle as the width and the unsigned value, so that unpickling goes
+    through Bits( nbits ) instead of looking up the BitsN class by name.'''
+    return _unpickle_bits, ( self.nbits, self._uint )
+
   #----------------------------------------------------------------------------
   # print methods
   #----------------------------------------------------------------------------
@@ -195,7 +245,7 @@ class BitsN( object ):
 
       # Open-ended range ( [:] ), return a copy of self
       if start is None and stop is None:
-        return copy.copy( self )
+        return _new_bits( self.__class__, self._uint )
 
       # Open-ended range on left ( [:N] )
       elif start is None:
@@ -234,7 +284,7 @@ class BitsN( object ):
 
       # Create a new Bits object containing the bit value and return it
       value = (self._uint & (1 << addr)) >> addr
-      return Bits(1)(value)
+      return _new_bits( _Bits1, value )
 
   #----------------------------------------------------------------------------
   # __setitem__
@@ -260,11 +310,7 @@ class BitsN( object ):
       # Open-ended range ( [:] )
       if start is None and stop is None:
         if not (self._min <= value <= self._max):
-          raise ValueError(
-            'Value is too big to be represented with Bits({})!\n'
-            '({} bits are needed to represent value = {} in two\'s complement.)'
-            .format( self.nbits, _get_nbits(value), value )
-          )
+          raise _value_error( self.nbits, value )
         self._uint = value
         return
 
@@ -289,11 +335,8 @@ class BitsN( object ):
       # This exception fires if the value you are trying to store is
       # wider than the bitwidth of the slice you are writing to!
       if not (nbits >= _get_nbits( value )):
-        raise ValueError(
-          'Value is too big to fit in slice [{}:{}] ({} bits)!\n'
-          '({} bits are needed to represent value = {} in two\'s complement.)'
-          .format( start, stop, nbits, _get_nbits(value), value )
-        )
+        raise _value_error( nbits, value, 'fit in slice [{}:{}] ({} bits)'
+                                          .format( start, stop, nbits ) )
 
       # Clear the bits we want to set
       ones  = (1 << nbits) - 1
@@ -312,11 +355,7 @@ class BitsN( object ):
         raise IndexError('Bits index [{}] out of range [0 - {})'
                          .format(addr, self.nbits) )
       if not (0 <= value <= 1):
-        raise ValueError(
-          'Value is too big to fit in 1 bit!\n'
-          '({} bits are needed to represent value = {} in two\'s complement.)'
-          .format( _get_nbits(value), value )
-        )
+        raise _value_error( 1, value, 'fit in 1 bit' )
 
       # Clear the bits we want to set
       mask = ~(1 << addr)
@@ -333,39 +372,71 @@ class BitsN( object ):
   #
   #   http://www1.pldworld.com/@xilinx/html/technote/TOOL/MANUAL/21i_doc/data/fndtn/ver/ver4_4.htm
 
+  # Operators dispatch on the type of the other operand. Bits operands
+  # take the widths of both operands into account, while unsized ints
+  # (and other integer types such as NumPy scalars) are truncated to fit.
+  # Any other operand returns NotImplemented so that Python can try its
+  # reflected operator (e.g. BitsArray.__radd__).
+  #
+  # Results of Bits-with-Bits operations provably fit in the result type,
+  # and results with unsized ints are truncated with the class mask, so
+  # both skip the range checks in __init__ via _new_bits().
+
   def __invert__( self ):
     'result.nbits = self.nbits'
-    return Bits(self.nbits)( ~self._uint, trunc=True )
+    return _new_bits( self.__class__, ~self._uint & self._mask )
 
   def __add__( self, other ):
     'result.nbits = max( self.nbits, other.nbits ) + 1'
-    try:    return Bits(max(self.nbits, other.nbits) + 1)(self._uint + other._uint)
-    except: return Bits(self.nbits)                      (self._uint + other, trunc=True)
+    if isinstance( other, BitsN ):
+      return _new_bits( self._add_types[ other.nbits ], self._uint + other._uint )
+    if not isinstance( other, _int_types ):
+      other = _index( other )
+      if other is None: return NotImplemented
+    return _new_bits( self.__class__, (self._uint + other) & self._mask )
 
   def __sub__( self, other ):
     'result.nbits = max( self.nbits, other.nbits ) + 1'
-    try:    return Bits(max(self.nbits, other.nbits) + 1)(self._uint - other._uint )
-    except: return Bits(self.nbits)                      (self._uint - other, trunc=True)
+    if isinstance( other, BitsN ):
+      result_type = self._add_types[ other.nbits ]
+      return _new_bits( result_type,
+                        (self._uint - other._uint) & result_type._mask )
+    if not isinstance( other, _int_types ):
+      other = _index( other )
+      if other is None: return NotImplemented
+    return _new_bits( self.__class__, (self._uint - other) & self._mask )
 
   def __mul__( self, other ):
     'result.nbits = self.nbits + other.nbits'
-    try:    return Bits(self.nbits + other.nbits)(self._uint * other._uint)
-    except: return Bits(self.nbits + self .nbits)(self._uint * other, trunc=True)
+    if isinstance( other, BitsN ):
+      return _new_bits( self._mul_types[ other.nbits ], self._uint * other._uint )
+    if not isinstance( other, _int_types ):
+      other = _index( other )
+      if other is None: return NotImplemented
+    result_type = self._mul_types[ self.nbits ]
+    return _new_bits( result_type, (self._uint * other) & result_type._mask )
 
   def __div__(self, other):
     'result.nbits = self.nbits'
-    try:    return Bits(self.nbits)(self._uint / other._uint)
-    except: return Bits(self.nbits)(self._uint / other, trunc=True)
+    if isinstance( other, BitsN ):
+      return _new_bits( self.__class__, self._uint / other._uint )
+    if not isinstance( other, _int_types ):
+      other = _index( other )
+      if other is None: return NotImplemented
+    return _new_bits( self.__class__, (self._uint / other) & self._mask )
 
   def __floordiv__(self, other):
     'result.nbits = self.nbits'
-    try:    return Bits(self.nbits)(self._uint / other._uint)
-    except: return Bits(self.nbits)(self._uint / other, trunc=True)
+    return self.__div__( other )
 
   def __mod__(self, other):
     'result.nbits = min( self.nbits, other.nbits )'
-    try:    return Bits(min(self.nbits, other.nbits))(self._uint % other._uint)
-    except: return Bits(self.nbits)                  (self._uint % other, trunc=True)
+    if isinstance( other, BitsN ):
+      return _new_bits( self._mod_types[ other.nbits ], self._uint % other._uint )
+    if not isinstance( other, _int_types ):
+      other = _index( other )
+      if other is None: return NotImplemented
+    return _new_bits( self.__class__, (self._uint % other) & self._mask )
 
   def __divmod__(self, other):
     raise NotImplemented('Divmod is currently not supported')
@@ -377,7 +448,10 @@ class BitsN( object ):
     return self.__add__( other )
 
   def __rsub__( self, other ):
-    return Bits(self.nbits)(other - self._uint, trunc=True)
+    if not isinstance( other, _int_types ):
+      other = _index( other )
+      if other is None: return NotImplemented
+    return _new_bits( self.__class__, (other - self._uint) & self._mask )
 
   def __rmul__( self, other ):
     return self.__mul__( other )
@@ -396,12 +470,16 @@ class BitsN( object ):
   #----------------------------------------------------------------------------
 
   def __lshift__( self, other ):
+    other = _shift_operand( other )
+    if other is None: return NotImplemented
     # Optimization to return 0 if shift amount is greater than self.nbits
-    if int( other ) >= self.nbits: return Bits( self.nbits )( 0 )
-    return Bits( self.nbits )( self._uint << int( other ), trunc=True )
+    if other >= self.nbits: return _new_bits( self.__class__, 0 )
+    return _new_bits( self.__class__, (self._uint << other) & self._mask )
 
   def __rshift__( self, other ):
-    return Bits( self.nbits )( self._uint >> int( other ) )
+    other = _shift_operand( other )
+    if other is None: return NotImplemented
+    return _new_bits( self.__class__, self._uint >> other )
 
   # TODO: Not implementing reflective operators because its not clear
   #       how to determine width of other object in case of lshift
@@ -418,21 +496,36 @@ class BitsN( object ):
 
   def __and__( self, other ):
     'result.nbits = max( self.nbits, other.nbits )'
+    if isinstance( other, BitsN ):
+      return _new_bits( self._bitwise_types[ other.nbits ],
+                        self._uint & other._uint )
+    if not isinstance( other, _int_types ):
+      other = _index( other )
+      if other is None: return NotImplemented
     assert other >= 0
-    try:    return Bits(max(self.nbits, other.nbits))(self._uint & other._uint)
-    except: return Bits(self.nbits                  )(self._uint & other, trunc=True)
+    return _new_bits( self.__class__, self._uint & other & self._mask )
 
   def __xor__( self, other ):
     'result.nbits = max( self.nbits, other.nbits )'
+    if isinstance( other, BitsN ):
+      return _new_bits( self._bitwise_types[ other.nbits ],
+                        self._uint ^ other._uint )
+    if not isinstance( other, _int_types ):
+      other = _index( other )
+      if other is None: return NotImplemented
     assert other >= 0
-    try:    return Bits(max( self.nbits, other.nbits))(self._uint ^ other._uint)
-    except: return Bits(self.nbits                   )(self._uint ^ other, trunc=True)
+    return _new_bits( self.__class__, (self._uint ^ other) & self._mask )
 
   def __or__( self, other ):
     'result.nbits = max( self.nbits, other.nbits )'
+    if isinstance( other, BitsN ):
+      return _new_bits( self._bitwise_types[ other.nbits ],
+                        self._uint | other._uint )
+    if not isinstance( other, _int_types ):
+      other = _index( other )
+      if other is None: return NotImplemented
     assert other >= 0
-    try:    return Bits(max( self.nbits, other.nbits))(self._uint | other._uint)
-    except: return Bits(self.nbits                   )(self._uint | other, trunc=True)
+    return _new_bits( self.__class__, (self._uint | other) & self._mask )
 
   def __rand__( self, other ):
     return self.__and__( other )
@@ -443,6 +536,143 @@ class BitsN( object ):
   def __ror__( self, other ):
     return self.__or__( other )
 
+  #----------------------------------------------------------------------------
+  # in-place operators
+  #----------------------------------------------------------------------------
+  # Augmented assignments (acc += x, reg <<= 1) keep the width of self and
+  # wrap around, updating _uint without allocating a new object. Bits
+  # operands contribute their payload and unsized ints are wrapped like
+  # the other operand of the out-of-place operators.
+  #
+  # This differs from acc = acc + x, which binds a new and possibly wider
+  # value: acc += x keeps the width of acc, and every other reference to
+  # the same object (an alias, a list element) sees the new value.
+  #
+  # Interned instances are shared and must not change, so for interned
+  # widths the operators return the shared instance holding the result
+  # instead, which augmented assignment then binds in place of self.
+
+  def __iadd__( self, other ):
+    'result.nbits = self.nbits'
+    other = _inplace_operand( other )
+    if other is None: return NotImplemented
+    uint = (self._uint + other) & self._mask
+    if self._interned is not None: return _new_bits( self.__class__, uint )
+    self._uint = uint
+    return self
+
+  def __isub__( self, other ):
+    'result.nbits = self.nbits'
+    other = _inplace_operand( other )
+    if other is None: return NotImplemented
+    uint = (self._uint - other) & self._mask
+    if self._interned is not None: return _new_bits( self.__class__, uint )
+    self._uint = uint
+    return self
+
+  def __imul__( self, other ):
+    'result.nbits = self.nbits'
+    other = _inplace_operand( other )
+    if other is None: return NotImplemented
+    uint = (self._uint * other) & self._mask
+    if self._interned is not None: return _new_bits( self.__class__, uint )
+    self._uint = uint
+    return self
+
+  def __idiv__( self, other ):
+    'result.nbits = self.nbits'
+    other = _inplace_operand( other )
+    if other is None: return NotImplemented
+    uint = (self._uint // other) & self._mask
+    if self._interned is not None: return _new_bits( self.__class__, uint )
+    self._uint = uint
+    return self
+
+  def __ifloordiv__( self, other ):
+    'result.nbits = self.nbits'
+    return self.__idiv__( other )
+
+  def __imod__( self, other ):
+    'result.nbits = self.nbits'
+    other = _inplace_operand( other )
+    if other is None: return NotImplemented
+    uint = (self._uint % other) & self._mask
+    if self._interned is not None: return _new_bits( self.__class__, uint )
+    self._uint = uint
+    return self
+
+  def __ilshift__( self, other ):
+    'result.nbits = self.nbits'
+    other = _shift_operand( other )
+    if other is None: return NotImplemented
+    uint = (self._uint << other) & self._mask if other < self.nbits else 0
+    if self._interned is not None: return _new_bits( self.__class__, uint )
+    self._uint = uint
+    return self
+
+  def __irshift__( self, other ):
+    'result.nbits = self.nbits'
+    other = _shift_operand( other )
+    if other is None: return NotImplemented
+    uint = self._uint >> other
+    if self._interned is not None: return _new_bits( self.__class__, uint )
+    self._uint = uint
+    return self
+
+  def __iand__( self, other ):
+    'result.nbits = self.nbits'
+    other = _inplace_operand( other )
+    if other is None: return NotImplemented
+    uint = self._uint & other & self._mask
+    if self._interned is not None: return _new_bits( self.__class__, uint )
+    self._uint = uint
+    return self
+
+  def __ixor__( self, other ):
+    'result.nbits = self.nbits'
+    other = _inplace_operand( other )
+    if other is None: return NotImplemented
+    uint = (self._uint ^ other) & self._mask
+    if self._interned is not None: return _new_bits( self.__class__, uint )
+    self._uint = uint
+    return self
+
+  def __ior__( self, other ):
+    'result.nbits = self.nbits'
+    other = _inplace_operand( other )
+    if other is None: return NotImplemented
+    uint = (self._uint | other) & self._mask
+    if self._interned is not None: return _new_bits( self.__class__, uint )
+    self._uint = uint
+    return self
+
+  #----------------------------------------------------------------------------
+  # explicit updates
+  #----------------------------------------------------------------------------
+  # Unlike augmented assignment, these always modify self, so that every
+  # reference to a register object sees the new value. They raise a
+  # TypeError for interned instances.
+
+  def set_value( self, value, trunc = False ):
+    '''Set the value in place, checked like the constructor: if trunc =
+    True, truncate excessively large values to fit into nbits.'''
+    if self._interned is not None:
+      raise _immutable_error( self.nbits )
+    value = int( value )
+    if not trunc and not (self._min <= value <= self._max):
+      raise _value_error( self.nbits, value )
+    self._uint = value & self._mask
+
+  def add_into( self, other ):
+    'Add a Bits object or an int into self in place, wrapping around.'
+    if self._interned is not None:
+      raise _immutable_error( self.nbits )
+    value = _inplace_operand( other )
+    if value is None:
+      raise TypeError( 'Cannot add {} into Bits({})'
+                       .format( type( other ).__name__, self.nbits ) )
+    self._uint = (self._uint + value) & self._mask
+
   #----------------------------------------------------------------------------
   # comparison operators
   #----------------------------------------------------------------------------
@@ -456,34 +686,40 @@ class BitsN( object ):
   def __eq__( self, other ):
     'result.nbits = 1'
     if other is None: return False
-    assert other >= 0
-    return Bits(1)(self._uint == other)
+    other = _compare_operand( other )
+    if other is None: return NotImplemented
+    return _new_bits( _Bits1, int( self._uint == other ) )
 
   def __ne__( self, other ):
     'result.nbits = 1'
     if other is None: return True
-    assert other >= 0
-    return Bits(1)(self._uint != other)
+    other = _compare_operand( other )
+    if other is None: return NotImplemented
+    return _new_bits( _Bits1, int( self._uint != other ) )
 
   def __lt__( self, other ):
     'result.nbits = 1'
-    assert other >= 0
-    return Bits(1)(self._uint <  other)
+    other = _compare_operand( other )
+    if other is None: return NotImplemented
+    return _new_bits( _Bits1, int( self._uint < other ) )
 
   def __le__( self, other ):
     'result.nbits = 1'
-    assert other >= 0
-    return Bits(1)(self._uint <= other)
+    other = _compare_operand( other )
+    if other is None: return NotImplemented
+    return _new_bits( _Bits1, int( self._uint <= other ) )
 
   def __gt__( self, other ):
     'result.nbits = 1'
-    assert other >= 0
-    return Bits(1)(self._uint >  other)
+    other = _compare_operand( other )
+    if other is None: return NotImplemented
+    return _new_bits( _Bits1, int( self._uint > other ) )
 
   def __ge__( self, other ):
     'result.nbits = 1'
-    assert other >= 0
-    return Bits(1)(self._uint >= other)
+    other = _compare_operand( other )
+    if other is None: return NotImplemented
+    return _new_bits( _Bits1, int( self._uint >= other ) )
 
   #----------------------------------------------------------------------------
   # zero/sign extension
@@ -495,7 +731,72 @@ class BitsN( object ):
 
   def _sext( self, new_width ):
     'Sign extension'
-    return Bits(new_width)(self.int())
+    uint = self._uint
+    return Bits(new_width)(uint - ((uint >> (self.nbits - 1)) << self.nbits))
+
+#------------------------------------------------------------------------------
+# _index
+#------------------------------------------------------------------------------
+# Builtin integer types handled by the fast paths of the BitsN operators.
+
+_int_types = ( int, long )
+
+def _index( value ):
+  '''Return value as an int if it is some other integer type (e.g. a NumPy
+  integer scalar), or None if it is not an integer.'''
+  if isinstance( value, BitsN ) or not hasattr( type( value ), '__index__' ):
+    return None
+  return operator.index( value )
+
+def _compare_operand( other ):
+  '''Return the unsigned value to compare a Bits object against, other
+  itself for non-integer numbers such as floats, which are compared by
+  value, or None if other is not a number.'''
+  if isinstance( other, BitsN ):
+    return other._uint
+  if not isinstance( other, _int_types ):
+    index = _index( other )
+    other = _real_operand( other ) if index is None else index
+    if other is None: return None
+  assert other >= 0
+  return other
+
+def _real_operand( other ):
+  'Return other if it is a non-integer number, or None.'
+  return other if isinstance( other, numbers.Real ) else None
+
+def _inplace_operand( other ):
+  '''Return the value to combine with a Bits object in place, or None if
+  other is not a Bits object or an integer.'''
+  if isinstance( other, BitsN ):
+    return other._uint
+  if isinstance( other, _int_types ):
+    return other
+  return _index( other )
+
+def _shift_operand( other ):
+  'Return a shift amount as an int, or None if other is not an integer.'
+  if isinstance( other, BitsN ):
+    return other._uint
+  if isinstance( other, _int_types ):
+    return other
+  return _index( other )
+
+#------------------------------------------------------------------------------
+# _new_bits
+#------------------------------------------------------------------------------
+def _new_bits_fresh( cls, uint ):
+  'Return a new cls instance holding uint, which must already fit in cls.'
+  bits = object.__new__( cls )
+  bits._uint = uint
+  return bits
+
+# Rebound to _new_bits_interned by enable_interning()
+_new_bits = _new_bits_fresh
+
+def _unpickle_bits( nbits, uint ):
+  'Rebuild a Bits object pickled by BitsN.__reduce__().'
+  return _new_bits( Bits( nbits ), uint )
 
 #------------------------------------------------------------------------------
 # nbits
@@ -515,67 +816,450 @@ def clog2( value ):
 #------------------------------------------------------------------------------
 # concat
 #------------------------------------------------------------------------------
+# The functions below also accept symbolic values such as the expressions
+# built by expr.py, which implement them through _concat(), _zext(),
+# _sext() and _reduce() methods.
+
 def concat( *bits_objects  ):
   'Return the concatenation all Bits parameters as a new Bits object.'
 
-  # Calculate total new bitwidth
-  nbits = sum( [ x.nbits for x in bits_objects ] )
+  # Shift each value into place in a single pass over the payloads; the
+  # parts always fit in the result, so no slice or range checks are needed
+  nbits = 0
+  uint  = 0
+  for bits in bits_objects:
+    if not isinstance( bits, BitsN ):
+      return bits._concat( bits_objects )
+    uint   = (uint << bits.nbits) | bits._uint
+    nbits += bits.nbits
 
-  # Create new Bits and add each bits from bits_list to it
-  concat_bits = Bits(nbits)(0)
+  try:
+    result_type = Bits.__cache__[ nbits ]
+  except KeyError:
+    result_type = Bits( nbits )
 
-  begin = 0
-  for bits in reversed( bits_objects ):
-    concat_bits[ begin : begin+bits.nbits ] = bits
-    begin += bits.nbits
-
-  return concat_bits
+  return _new_bits( result_type, uint )
 
 #------------------------------------------------------------------------------
 # zext
 #------------------------------------------------------------------------------
 def zext( bits, new_width ):
   'Return a zero-extended verion of the provided Bits object.'
-  return Bits(new_width)(bits.uint())
+  return bits._zext( new_width )
 
 #------------------------------------------------------------------------------
 # sext
 #------------------------------------------------------------------------------
 def sext( bits, new_width ):
   'Return a sign-extended verion of the provided Bits object.'
-  return Bits(new_width)(bits.int())
+  return bits._sext( new_width )
 
 #------------------------------------------------------------------------------
 # reduce_and
 #------------------------------------------------------------------------------
+# Reductions work directly on the integer payload instead of extracting
+# every bit as a Bits(1), so they cost the same for any width.
+
 def reduce_and( bits ):
   'Return a Bits1 with anded value of each individual bit in Bits.'
-  return Bits(1)(
-    reduce(operator.and_, (bits[x] for x in xrange(bits.nbits)) )
-  )
+  if not isinstance( bits, BitsN ):
+    return bits._reduce( operator.and_ )
+  return _new_bits( _Bits1, int( bits._uint == bits._mask ) )
 
 #------------------------------------------------------------------------------
 # reduce_or
 #------------------------------------------------------------------------------
 def reduce_or( bits ):
   'Return a Bits1 with the or-ed value of each individual bit in Bits.'
-  return Bits(1)(
-    reduce(operator.or_, (bits[x] for x in xrange(bits.nbits)) )
-  )
+  if not isinstance( bits, BitsN ):
+    return bits._reduce( operator.or_ )
+  return _new_bits( _Bits1, int( bits._uint != 0 ) )
 
 #------------------------------------------------------------------------------
 # reduce_xor
 #------------------------------------------------------------------------------
 def reduce_xor( bits ):
   'Return a Bits1 with the xored value of each individual bit in Bits.'
+  if not isinstance( bits, BitsN ):
+    return bits._reduce( operator.xor )
+  return _new_bits( _Bits1, bin( bits._uint ).count( '1' ) & 1 )
+
+#------------------------------------------------------------------------------
+# to_bytes
+#------------------------------------------------------------------------------
+# Each value takes ceil(nbits/8) big-endian bytes. Widths of 1, 2, 4 and 8
+# bytes are packed by struct, and other widths by formatting every value
+# as hex digits in one string operation.
 
-  # verilog iterates through MSB to LSB, so we must reverse iteration
-  bits_iterator = reversed(xrange(bits.nbits))
+_STRUCT_CODES = { 1: 'B', 2: 'H', 4: 'I', 8: 'Q' }
 
-  return Bits(1)(
-    reduce(operator.xor, (bits[x] for x in bits_iterator))
-  )
+def to_bytes( values, nbits = None ):
+  '''Return a sequence of Bits objects of the same width packed into a
+  byte string, each value as ceil(nbits/8) big-endian bytes. nbits
+  defaults to the width of the first value.
 
+  > data = to_bytes( results )          # Bits(32) values, 4 bytes each
+  > results = from_bytes( data, 32 )
+  '''
+  values = list( values )
+  if not values:
+    return ''
+  if nbits is None:
+    nbits = values[0].nbits
+
+  for cls in set( map( type, values ) ):
+    if not issubclass( cls, BitsN ):
+      raise TypeError( 'Cannot pack {} values into bytes'
+                       .format( cls.__name__ ) )
+    if cls.nbits != nbits:
+      raise ValueError( 'Cannot pack Bits({}) values as Bits({})'
+                        .format( cls.nbits, nbits ) )
+
+  uints  = map( operator.attrgetter( '_uint' ), values )
+  nbytes = ((nbits - 1) / 8) + 1
+  code   = _STRUCT_CODES.get( nbytes )
+  if code:
+    return struct.pack( '>{}{}'.format( len( uints ), code ), *uints )
+  text = ( '%0{}x'.format( 2 * nbytes ) * len( uints ) ) % tuple( uints )
+  return binascii.unhexlify( text )
+
+#------------------------------------------------------------------------------
+# from_bytes
+#------------------------------------------------------------------------------
+def from_bytes( data, nbits ):
+  '''Return the list of Bits(nbits) values packed into a byte string by
+  to_bytes().'''
+
+  cls    = Bits( nbits )
+  nbytes = ((cls.nbits - 1) / 8) + 1
+  if len( data ) % nbytes:
+    raise ValueError( '{} bytes do not hold a whole number of Bits({}) values'
+                      .format( len( data ), nbits ) )
+
+  count = len( data ) / nbytes
+  code  = _STRUCT_CODES.get( nbytes )
+  if code:
+    uints = struct.unpack( '>{}{}'.format( count, code ), data )
+  else:
+    text   = binascii.hexlify( data )
+    digits = 2 * nbytes
+    uints  = [ int( text[ i : i + digits ], 16 )
+               for i in xrange( 0, len( text ), digits ) ]
+
+  if uints and max( uints ) > cls._mask:
+    raise _value_error( cls.nbits, max( uints ) )
+  new_bits = _new_bits
+  return [ new_bits( cls, uint ) for uint in uints ]
+
+#------------------------------------------------------------------------------
+# enable_interning
+#------------------------------------------------------------------------------
+def enable_interning( max_nbits = 8 ):
+  '''Share immutable instances for every value of widths up to max_nbits.
+
+  While interning is enabled, constructing a Bits(N) value with N <=
+  max_nbits, and every operator result of such a width (including the
+  Bits(1) results of comparisons and single-bit indexing), returns an
+  instance from a table preallocated per width instead of allocating a
+  new object. Interned instances are immutable: writing to them with
+  __setitem__, set_value() or add_into() raises a TypeError, and
+  augmented assignments (x += 1) rebind x to another interned instance.
+
+  > enable_interning()
+  > Bits(1)(1) is (Bits(4)(3) == 3)    # True
+  '''
+
+  global _intern_max_nbits, _new_bits
+
+  disable_interning()
+
+  _intern_max_nbits = int( max_nbits )
+  _new_bits         = _new_bits_interned
+
+  for nbits, cls in Bits.__cache__.items():
+    if nbits <= _intern_max_nbits:
+      _intern_class( cls )
+
+#------------------------------------------------------------------------------
+# disable_interning
+#------------------------------------------------------------------------------
+def disable_interning():
+  '''Go back to allocating a new, mutable instance for every value.
+  Previously interned instances remain shared.'''
+
+  global _intern_max_nbits, _new_bits
+
+  for cls in Bits.__cache__.values():
+    if cls._interned is not None:
+      for name in ( '_interned', '__init__', '__setitem__',
+                    '__copy__', '__deepcopy__' ):
+        delattr( cls, name )
+      # Deleting __new__ would leave the type calling object.__new__ with
+      # the constructor arguments, which Python 2 warns about
+      cls.__new__ = staticmethod( _plain_new )
+
+  _intern_max_nbits = -1
+  _new_bits         = _new_bits_fresh
+
+#------------------------------------------------------------------------------
+# interning_stats
+#------------------------------------------------------------------------------
+def interning_stats():
+  '''Return a dict with the interning configuration and the number of
+  allocations avoided by returning interned instances.'''
+  return {
+    'enabled'  : _intern_max_nbits >= 0,
+    'max_nbits': max( _intern_max_nbits, 0 ),
+    'instances': sum( len( cls._interned ) for cls in Bits.__cache__.values()
+                      if cls._interned is not None ),
+    'avoided'  : _intern_avoided,
+  }
+
+#------------------------------------------------------------------------------
+# reset_interning_stats
+#------------------------------------------------------------------------------
+def reset_interning_stats():
+  'Reset the count of allocations avoided by interning.'
+  global _intern_avoided
+  _intern_avoided = 0
+
+#------------------------------------------------------------------------------
+# interning internals
+#------------------------------------------------------------------------------
+# Interning patches __new__, __init__ and __setitem__ on the BitsN classes
+# of small widths, and rebinds _new_bits, so that it costs nothing while
+# disabled and nothing for wider classes while enabled.
+
+_intern_max_nbits = -1
+_intern_avoided   = 0
+
+def _intern_class( cls ):
+  'Preallocate the table of shared instances for a BitsN class.'
+  cls._interned     = tuple( _new_bits_fresh( cls, value )
+                             for value in xrange( cls._mask + 1 ) )
+  cls.__new__       = staticmethod( _interned_new_unchecked if _unchecked
+                                    else _interned_new )
+  cls.__init__      = _interned_init
+  cls.__setitem__   = _interned_setitem
+  cls.__copy__      = _interned_copy
+  cls.__deepcopy__  = _interned_deepcopy
+
+def _interned_new( cls, value = 0, trunc = False ):
+  'Return the shared instance for value, checking it like __init__ does.'
+  global _intern_avoided
+  value = int( value )
+  if not trunc and not (cls._min <= value <= cls._max):
+    raise _value_error( cls.nbits, value )
+  _intern_avoided += 1
+  return cls._interned[ value & cls._mask ]
+
+def _plain_new( cls, value = 0, trunc = False ):
+  return object.__new__( cls )
+
+def _interned_init( self, value = 0, trunc = False ):
+  pass
+
+def _interned_setitem( self, addr, value ):
+  raise _immutable_error( self.nbits )
+
+def _immutable_error( nbits ):
+  'Return the error raised when modifying an interned instance.'
+  return TypeError( 'Bits({}) values are immutable while interning is enabled'
+                    .format( nbits ) )
+
+def _interned_copy( self ):
+  return self
+
+def _interned_deepcopy( self, memo ):
+  return self
+
+def _new_bits_interned( cls, uint ):
+  'Version of _new_bits which returns shared instances when available.'
+  global _intern_avoided
+  table = cls._interned
+  if table is None:
+    return _new_bits_fresh( cls, uint )
+  _intern_avoided += 1
+  return table[ uint ]
+
+#------------------------------------------------------------------------------
+# enable_unchecked
+#------------------------------------------------------------------------------
+def enable_unchecked():
+  '''Skip range and index validation for the whole process.
+
+  Once a model passes its checked regression, it can be rerun with the
+  constructor, bit slicing and the operators replaced by versions which
+  skip every range check, error message and assertion. Values are still
+  truncated to their width, so results stay well-formed; out-of-range
+  values and indices silently wrap instead of raising.
+
+  > enable_unchecked()
+  > run_simulation()
+  > disable_unchecked()
+  '''
+
+  global _unchecked, _compare_operand
+
+  if _unchecked:
+    return
+  _unchecked = True
+
+  for name, method in _UNCHECKED_METHODS.items():
+    setattr( BitsN, name, method )
+  _compare_operand = _compare_operand_unchecked
+
+  for cls in Bits.__cache__.values():
+    if cls._interned is not None:
+      cls.__new__ = staticmethod( _interned_new_unchecked )
+
+#------------------------------------------------------------------------------
+# disable_unchecked
+#------------------------------------------------------------------------------
+def disable_unchecked():
+  'Go back to the default, checked implementations.'
+
+  global _unchecked, _compare_operand
+
+  if not _unchecked:
+    return
+  _unchecked = False
+
+  for name, method in _CHECKED_METHODS.items():
+    setattr( BitsN, name, method )
+  _compare_operand = _compare_operand_checked
+
+  for cls in Bits.__cache__.values():
+    if cls._interned is not None:
+      cls.__new__ = staticmethod( _interned_new )
+
+#------------------------------------------------------------------------------
+# unchecked
+#------------------------------------------------------------------------------
+@contextlib.contextmanager
+def unchecked():
+  '''Context manager which skips validation inside a with block, and
+  restores the previous mode on leaving it.
+
+  > with unchecked():
+  >   run_simulation()
+  '''
+  previous = _unchecked
+  enable_unchecked()
+  try:
+    yield
+  finally:
+    if not previous:
+      disable_unchecked()
+
+#------------------------------------------------------------------------------
+# unchecked internals
+#------------------------------------------------------------------------------
+# Like interning, the unchecked mode swaps methods on BitsN and rebinds a
+# module global rather than testing a flag, so the checked mode costs
+# nothing extra.
+
+_unchecked = False
+
+def _unchecked_init( self, value = 0, trunc = False ):
+  self._uint = int( value ) & self._mask
+
+def _unchecked_getitem( self, addr ):
+  if isinstance( addr, slice ):
+    if addr.start is None and addr.stop is None:
+      return _new_bits( self.__class__, self._uint )
+    start = 0 if addr.start is None else int( addr.start )
+    stop  = self.nbits if addr.stop is None else int( addr.stop )
+    try:
+      cls = Bits.__cache__[ stop - start ]
+    except KeyError:
+      cls = Bits( stop - start )
+    return _new_bits( cls, (self._uint >> start) & cls._mask )
+  return _new_bits( _Bits1, (self._uint >> int( addr )) & 1 )
+
+def _unchecked_setitem( self, addr, value ):
+  value = int( value )
+  if isinstance( addr, slice ):
+    start = 0 if addr.start is None else int( addr.start )
+    stop  = self.nbits if addr.stop is None else int( addr.stop )
+    ones  = ((1 << (stop - start)) - 1) << start
+  else:
+    start = int( addr )
+    ones  = 1 << start
+  self._uint = ((self._uint & ~ones) | ((value << start) & ones)) & self._mask
+
+def _unchecked_and( self, other ):
+  if isinstance( other, BitsN ):
+    return _new_bits( self._bitwise_types[ other.nbits ],
+                      self._uint & other._uint )
+  if not isinstance( other, _int_types ):
+    other = _index( other )
+    if other is None: return NotImplemented
+  return _new_bits( self.__class__, self._uint & other & self._mask )
+
+def _unchecked_xor( self, other ):
+  if isinstance( other, BitsN ):
+    return _new_bits( self._bitwise_types[ other.nbits ],
+                      self._uint ^ other._uint )
+  if not isinstance( other, _int_types ):
+    other = _index( other )
+    if other is None: return NotImplemented
+  return _new_bits( self.__class__, (self._uint ^ other) & self._mask )
+
+def _unchecked_or( self, other ):
+  if isinstance( other, BitsN ):
+    return _new_bits( self._bitwise_types[ other.nbits ],
+                      self._uint | other._uint )
+  if not isinstance( other, _int_types ):
+    other = _index( other )
+    if other is None: return NotImplemented
+  return _new_bits( self.__class__, (self._uint | other) & self._mask )
+
+def _compare_operand_unchecked( other ):
+  '''Version of _compare_operand which does not assert that other is
+  non-negative.'''
+  if isinstance( other, BitsN ):
+    return other._uint
+  if isinstance( other, _int_types ):
+    return other
+  index = _index( other )
+  return _real_operand( other ) if index is None else index
+
+def _interned_new_unchecked( cls, value = 0, trunc = False ):
+  'Version of _interned_new which does not check the range of value.'
+  global _intern_avoided
+  _intern_avoided += 1
+  return cls._interned[ int( value ) & cls._mask ]
+
+_UNCHECKED_METHODS = {
+  '__init__'   : _unchecked_init,
+  '__getitem__': _unchecked_getitem,
+  '__setitem__': _unchecked_setitem,
+  '__and__'    : _unchecked_and,
+  '__xor__'    : _unchecked_xor,
+  '__or__'     : _unchecked_or,
+}
+
+_CHECKED_METHODS = dict( ( name, BitsN.__dict__[ name ] )
+                         for name in _UNCHECKED_METHODS )
+
+_compare_operand_checked = _compare_operand
+
+#------------------------------------------------------------------------------
+# _value_error
+#------------------------------------------------------------------------------
+# Every range check raises through here, which instrument.py counts.
+
+def _value_error( nbits, value, target = None ):
+  '''Return the error raised when value does not fit in Bits(nbits), or in
+  the nbits bits described by target.'''
+  if target is None:
+    target = 'be represented with Bits({})'.format( nbits )
+  return ValueError(
+    'Value is too big to {}!\n'
+    '({} bits are needed to represent value = {} in two\'s complement.)'
+    .format( target, _get_nbits(value), value )
+  )
 
 #------------------------------------------------------------------------------
 # _get_nbits
@@ -586,3 +1270,10 @@ def _get_nbits( N ):
     return N.bit_length()
   else:
     return N.bit_length() + 1
+
+#------------------------------------------------------------------------------
+# _Bits1
+#------------------------------------------------------------------------------
+# Result type of comparisons and single-bit indexing
+
+_Bits1 = Bits(1)
@@ -0,0 +1,1211 @@
+#==============================================================================
+# bits_array.py
+#==============================================================================
+# NumPy-backed arrays of fixed-bitwidth values.
+
+import operator
+
+import numpy as np
+
+from bits import Bits, BitsN, _get_nbits, _real_operand, _shift_operand
+
+# Widths up to _WORD_NBITS are stored one NumPy word per element. Wider
+# values are split into little-endian 64-bit limbs along a trailing axis.
+
+_WORD_NBITS = 64
+_LIMB_NBITS = 64
+_LIMB_MASK  = (1 << _LIMB_NBITS) - 1
+
+#------------------------------------------------------------------------------
+# BitsArray
+#------------------------------------------------------------------------------
+class BitsArray( object ):
+  '''An array of values which all share a single Bits(nbits) width.
+
+  Values of up to 64 bits are stored in the narrowest NumPy unsigned
+  integer dtype which can hold nbits bits; wider values are stored as
+  WideBitsArrays. Operators apply to every element at once and follow
+  the same bitwidth rules as the corresponding BitsN operators.
+
+  > a = BitsArray( 16, 1000 )                     # 1000 x 16'd0
+  > b = BitsArray.from_values( 16, range(1000) )  # 16'd0 ... 16'd999
+  > c = a + b                                     # 17-bit sums
+  > d = b[0:4]                                    # low nibble of each
+  > e = b.element( 3 )                            # Bits( 16, 0x0003 )
+  > f = BitsArray( 128, 1000 )                    # a WideBitsArray
+
+  Bit slicing with [] reads and writes the same bits of every element;
+  use element() and set_element() to access individual values.
+  '''
+
+  # Stop NumPy from broadcasting its own ufuncs over BitsArray operands,
+  # so that expressions like np.uint8(1) + a use our reflected operators,
+  # which take NumPy integer scalars like plain ints.
+  __array_ufunc__ = None
+
+  # Arrays are mutable, so they cannot be hashed
+  __hash__ = None
+
+  #----------------------------------------------------------------------------
+  # constructors
+  #----------------------------------------------------------------------------
+  def __new__( cls, nbits, *args, **kwargs ):
+    'Return a WideBitsArray for widths which do not fit in a machine word.'
+    if cls is BitsArray and int( nbits ) > _WORD_NBITS:
+      cls = WideBitsArray
+    return object.__new__( cls )
+
+  def __init__( self, nbits, shape, value = 0, trunc = False ):
+    '''Create an array of the given shape with every element set to value.
+
+    If trunc = True, truncate excessively large values to fit into
+    nbits. If trunc = False (default), throw an error if the value is
+    too big to fit.'''
+
+    self._set_nbits( nbits )
+
+    value = int( value )
+
+    if not trunc and not (self._min <= value <= self._max):
+      raise ValueError(
+        'Value is too big to be represented with Bits({})!\n'
+        '({} bits are needed to represent value = {} in two\'s complement.)'
+        .format( self.nbits, _get_nbits(value), value )
+      )
+
+    self._data = self._fill( shape, value & self._mask )
+
+  @classmethod
+  def from_values( cls, nbits, values, trunc = False ):
+    '''Create an array from a (nested) sequence of ints or Bits objects,
+    or from a NumPy integer array.'''
+
+    nbits = int( nbits )
+    data, lo, hi = _convert( values, nbits, check = not trunc )
+
+    if not trunc and lo is not None:
+      _min = -2**(nbits - 1) if nbits > 1 else 0
+      _max = (2**nbits) - 1
+      if not (_min <= lo and hi <= _max):
+        value = lo if lo < _min else hi
+        raise ValueError(
+          'Value is too big to be represented with Bits({})!\n'
+          '({} bits are needed to represent value = {} in two\'s complement.)'
+          .format( nbits, _get_nbits(value), value )
+        )
+
+    return _wrap( nbits, data )
+
+  def _set_nbits( self, nbits ):
+    'Initialize the width attributes shared with BitsN.'
+    nbits = int( nbits )
+    if nbits < 1:
+      raise ValueError( 'BitsArray width must be positive (got {})'
+                        .format( nbits ) )
+    self.nbits = nbits
+    self._max  = (2**nbits) - 1
+    self._min  = -2**(nbits - 1) if nbits > 1 else 0
+    self._mask = (1 << nbits) - 1
+
+  def _fill( self, shape, uint ):
+    'Return storage of the given shape with every element set to uint.'
+    dtype = _dtype( self.nbits )
+    return np.full( shape, dtype( uint ), dtype=dtype )
+
+  #----------------------------------------------------------------------------
+  # array properties
+  #----------------------------------------------------------------------------
+
+  @property
+  def shape( self ):
+    return self._data.shape
+
+  @property
+  def size( self ):
+    return self._data.size
+
+  def __len__( self ):
+    return len( self._data )
+
+  def __iter__( self ):
+    for i in xrange( len( self ) ):
+      yield self.element( i )
+
+  def __copy__( self ):
+    return _wrap( self.nbits, self._data.copy() )
+
+  def copy( self ):
+    'Return a copy of the array.'
+    return self.__copy__()
+
+  #----------------------------------------------------------------------------
+  # element access
+  #----------------------------------------------------------------------------
+
+  def element( self, idx ):
+    '''Return a single element as a BitsN object, or a BitsArray view if
+    idx selects more than one element.'''
+    value = self._data[ idx ]
+    if isinstance( value, np.ndarray ):
+      return _wrap( self.nbits, value )
+    return Bits( self.nbits )( int( value ) )
+
+  def set_element( self, idx, value ):
+    'Write one or more elements using NumPy indexing.'
+    data, lo, hi = _convert( value, self.nbits, check = True )
+    if lo is not None and not (self._min <= lo and hi <= self._max):
+      value = lo if lo < self._min else hi
+      raise ValueError(
+        'Value is too big to be represented with Bits({})!\n'
+        '({} bits are needed to represent value = {} in two\'s complement.)'
+        .format( self.nbits, _get_nbits(value), value )
+      )
+    self._data[ idx ] = data
+
+  #----------------------------------------------------------------------------
+  # type conversion
+  #----------------------------------------------------------------------------
+
+  def uint( self ):
+    'Return the unsigned integer representation as a NumPy array.'
+    return self._data.copy()
+
+  def int( self ):
+    'Return the signed integer representation as an int64 NumPy array.'
+    data = self._data.astype( np.uint64 )
+    sign = np.uint64( 1 << (self.nbits - 1) )
+    return ((data ^ sign) - sign).view( np.int64 )
+
+  def tolist( self ):
+    'Return the elements as a (nested) list of BitsN objects.'
+    return _to_bits( Bits( self.nbits ), self._data.tolist() )
+
+  def any( self ):
+    'Return True if any element is non-zero.'
+    return bool( self._data.any() )
+
+  def all( self ):
+    'Return True if every element is non-zero.'
+    return bool( self._data.all() )
+
+  def __nonzero__( self ):
+    raise ValueError( 'The truth value of a BitsArray is ambiguous. '
+                      'Use a.any() or a.all()' )
+
+  def _objects( self ):
+    'Return the values as an object array of Python ints.'
+    return _as_objects( self.nbits, self._data )
+
+  def _limbs( self, nlimbs ):
+    'Return the values as an array of nlimbs 64-bit limbs.'
+    return _as_limbs( self.nbits, self._data, nlimbs )
+
+  #----------------------------------------------------------------------------
+  # print methods
+  #----------------------------------------------------------------------------
+
+  def __repr__( self ):
+    hchars = ((self.nbits - 1) / 4) + 1
+    fmt    = lambda v: '0x{:0{}x}'.format( int( v ), hchars )
+    return 'BitsArray( {}, {} )'.format( self.nbits,
+      np.array2string( self.uint(), separator=', ', formatter={'all': fmt} ) )
+
+  #----------------------------------------------------------------------------
+  # __getitem__
+  #----------------------------------------------------------------------------
+  def __getitem__( self, addr ):
+    'Read a subset of bits from every element using slice notation.'
+
+    # Handle slices
+    if isinstance( addr, slice ):
+
+      bounds = self._slice_bounds( addr )
+
+      # Open-ended range ( [:] ), return a copy of self
+      if bounds is None:
+        return self.copy()
+
+      start, stop = bounds
+      return self._extract( start, stop - start )
+
+    # Handle integers
+    else:
+
+      addr = int( addr )
+
+      # Verify the index is sane
+      if not (0 <= addr < self.nbits):
+        raise IndexError('Bits index [{}] out of range [0 - {})'
+                         .format(addr, self.nbits) )
+
+      return self._extract( addr, 1 )
+
+  #----------------------------------------------------------------------------
+  # __setitem__
+  #----------------------------------------------------------------------------
+  def __setitem__( self, addr, value ):
+    'Write a subset of bits of every element using slice notation.'
+
+    # Handle slices
+    if isinstance( addr, slice ):
+
+      bounds = self._slice_bounds( addr )
+
+      # Open-ended range ( [:] )
+      if bounds is None:
+        self.set_element( Ellipsis, value )
+        return
+
+      start, stop = bounds
+      nbits = stop - start
+      data, lo, hi = _convert( value, nbits, check = True )
+
+      # This exception fires if the value you are trying to store is
+      # wider than the bitwidth of the slice you are writing to!
+      if lo is not None:
+        for v in (lo, hi):
+          if not (nbits >= _get_nbits( v )):
+            raise ValueError(
+              'Value is too big to fit in slice [{}:{}] ({} bits)!\n'
+              '({} bits are needed to represent value = {} in two\'s '
+              'complement.)'.format( start, stop, nbits, _get_nbits(v), v )
+            )
+
+      self._write( start, nbits, data )
+
+    # Handle integers
+    else:
+
+      addr = int( addr )
+
+      # Verify the index and values are sane
+      if not (0 <= addr < self.nbits):
+        raise IndexError('Bits index [{}] out of range [0 - {})'
+                         .format(addr, self.nbits) )
+
+      data, lo, hi = _convert( value, 1, check = True )
+      if lo is not None:
+        for v in (lo, hi):
+          if not (0 <= v <= 1):
+            raise ValueError(
+              'Value is too big to fit in 1 bit!\n'
+              '({} bits are needed to represent value = {} in two\'s '
+              'complement.)'.format( _get_nbits(v), v )
+            )
+
+      self._write( addr, 1, data )
+
+  def _slice_bounds( self, addr ):
+    '''Return the (start, stop) bit range selected by a slice, or None
+    for an open-ended [:] range.'''
+
+    # Parse address range
+    start = addr.start
+    stop  = addr.stop
+    if addr.step:
+      raise IndexError(
+        'Bits slicing using steps [start:stop:step] is not supported'
+      )
+
+    # Open-ended range ( [:] )
+    if start is None and stop is None:
+      return None
+
+    # Open-ended range on left ( [:N] )
+    elif start is None:
+      start = 0
+
+    # Open-ended range on right ( [N:] )
+    elif stop is None:
+      stop = self.nbits
+
+    stop  = int( stop  )
+    start = int( start )
+
+    # Verify our ranges are sane
+    if not (start < stop):
+      raise IndexError('Bits slicing start index is not less than stop index'
+                       '[start={}:stop={}]'.format(start, stop) )
+    if not (0 <= start < stop <= self.nbits):
+      raise IndexError('Bits slice indices [{}:{}] out of range [0 - {}]'
+                       .format(start, stop, self.nbits) )
+
+    return start, stop
+
+  def _extract( self, start, nbits ):
+    'Return bits [start:start+nbits] of every element.'
+    return _result( nbits, _shr( self._data, start ) )
+
+  def _write( self, start, nbits, data ):
+    'Overwrite bits [start:start+nbits] of every element with data.'
+    dtype = self._data.dtype.type
+    ones  = (1 << nbits) - 1
+    self._data &= dtype( ~(ones << start) & self._mask )
+    self._data |= _shl( data.astype( dtype ), start )
+
+  #----------------------------------------------------------------------------
+  # operand helpers
+  #----------------------------------------------------------------------------
+
+  def _operand( self, other ):
+    '''Split an operand into (nbits, value). Sized operands (BitsArray and
+    BitsN) return their width and payload; unsized ints return None for
+    the width. Unsupported operands return (None, None).'''
+    if isinstance( other, BitsArray ):
+      return other.nbits, other._data
+    if isinstance( other, BitsN ):
+      return other.nbits, other._uint
+    if isinstance( other, (int, long) ):
+      return None, other
+    if isinstance( other, np.integer ):
+      return None, int( other )
+    return None, None
+
+  def _arith( self, other, op, limb_op, sized_nbits, unsized_nbits ):
+    '''Apply a modular arithmetic op (+, -, *). The result width is
+    sized_nbits( self.nbits, other.nbits ) for sized operands, or
+    unsized_nbits for plain ints, which are truncated to fit. Results
+    wider than a machine word use limb_op on 64-bit limbs, or Python
+    ints if limb_op is None.'''
+
+    nbits, value = self._operand( other )
+
+    if nbits is None:
+      if value is None:
+        return NotImplemented
+      width = unsized_nbits
+      value = value & ((1 << width) - 1)
+    else:
+      width = sized_nbits( self.nbits, nbits )
+
+    if width <= _WORD_NBITS:
+      dtype = _dtype( width )
+      return _result( width, op( self._data.astype( dtype ),
+                                 _cast( value, dtype ) ) )
+
+    if limb_op is None:
+      return _from_objects( width, op( self._objects(),
+                                       _as_objects( nbits, value ) ) )
+
+    nlimbs = _nlimbs( width )
+    return _limbs_result( width, limb_op( self._limbs( nlimbs ),
+                                          _as_limbs( nbits, value, nlimbs ) ) )
+
+  def _divide( self, other, op, sized_nbits ):
+    '''Apply an integer division op (/, %). The result width is
+    sized_nbits( self.nbits, other.nbits ) for sized operands, or
+    self.nbits for plain ints.'''
+
+    nbits, value = self._operand( other )
+
+    if nbits is None:
+      if value is None:
+        return NotImplemented
+      if value == 0:
+        raise ZeroDivisionError( 'integer division or modulo by zero' )
+
+      # Wide arrays and divisors outside the range of our dtype are rare,
+      # so fall back on Python integer semantics for them
+      if self.nbits > _WORD_NBITS or not (0 < value <= self._mask):
+        return _from_objects( self.nbits, op( self._objects(), value ) )
+
+      return _result( self.nbits,
+                      op( self._data, self._data.dtype.type( value ) ) )
+
+    width = sized_nbits( self.nbits, nbits )
+
+    if max( self.nbits, nbits ) > _WORD_NBITS:
+      divisor = _as_objects( nbits, value )
+      if np.any( divisor == 0 ):
+        raise ZeroDivisionError( 'integer division or modulo by zero' )
+      return _from_objects( width, op( self._objects(), divisor ) )
+
+    dtype   = _dtype( max( self.nbits, nbits ) )
+    divisor = _cast( value, dtype )
+    if not np.all( divisor ):
+      raise ZeroDivisionError( 'integer division or modulo by zero' )
+
+    return _result( width, op( self._data.astype( dtype ), divisor ) )
+
+  def _bitwise( self, other, op ):
+    '''Apply a bitwise op (&, |, ^). The result width is the max of the
+    operand widths, or self.nbits for plain ints.'''
+
+    nbits, value = self._operand( other )
+
+    if nbits is None:
+      if value is None:
+        return NotImplemented
+      assert value >= 0
+      width = self.nbits
+      value = value & self._mask
+    else:
+      width = max( self.nbits, nbits )
+
+    if width <= _WORD_NBITS:
+      dtype = _dtype( width )
+      return _result( width, op( self._data.astype( dtype ),
+                                 _cast( value, dtype ) ) )
+
+    nlimbs = _nlimbs( width )
+    return _limbs_result( width, op( self._limbs( nlimbs ),
+                                     _as_limbs( nbits, value, nlimbs ) ) )
+
+  def _shift( self, other, op, limb_op ):
+    '''Shift every element by an int, BitsN or per-element BitsArray
+    amount. The result width is self.nbits.'''
+
+    if isinstance( other, BitsArray ):
+
+      # Any amount of nbits or more shifts out every bit
+      if other.nbits > _WORD_NBITS:
+        amount = np.minimum( other._objects(), self.nbits ).astype( np.uint64 )
+      else:
+        amount = np.minimum( other._data, self.nbits )
+
+      if self.nbits > _WORD_NBITS:
+        return _from_objects( self.nbits,
+                              op( self._objects(), amount.astype( object ) ) )
+
+      clamped = np.minimum( amount, self.nbits - 1 ).astype( self._data.dtype )
+      return _result( self.nbits, np.where( amount >= self.nbits, 0,
+                                            op( self._data, clamped ) ) )
+
+    amount = _shift_operand( other )
+    if amount is None:
+      return NotImplemented
+    if amount < 0:
+      raise ValueError( 'negative shift count' )
+
+    # Optimization to return 0 if shift amount is greater than self.nbits
+    if amount >= self.nbits:
+      return _wrap( self.nbits, np.zeros_like( self._data ) )
+
+    if self.nbits > _WORD_NBITS:
+      return _limbs_result( self.nbits, limb_op( self._data, amount ) )
+    return _result( self.nbits,
+                    op( self._data, self._data.dtype.type( amount ) ) )
+
+  #----------------------------------------------------------------------------
+  # arithmetic operators
+  #----------------------------------------------------------------------------
+
+  def __invert__( self ):
+    'result.nbits = self.nbits'
+    return _result( self.nbits, ~self._data )
+
+  def __add__( self, other ):
+    'result.nbits = max( self.nbits, other.nbits ) + 1'
+    return self._arith( other, operator.add, _limb_add,
+                        lambda a, b: max( a, b ) + 1, self.nbits )
+
+  def __sub__( self, other ):
+    'result.nbits = max( self.nbits, other.nbits ) + 1'
+    return self._arith( other, operator.sub, _limb_sub,
+                        lambda a, b: max( a, b ) + 1, self.nbits )
+
+  def __mul__( self, other ):
+    'result.nbits = self.nbits + other.nbits'
+    return self._arith( other, operator.mul, None,
+                        operator.add, 2 * self.nbits )
+
+  def __div__( self, other ):
+    'result.nbits = self.nbits'
+    return self._divide( other, operator.floordiv, lambda a, b: a )
+
+  def __floordiv__( self, other ):
+    'result.nbits = self.nbits'
+    return self._divide( other, operator.floordiv, lambda a, b: a )
+
+  def __mod__( self, other ):
+    'result.nbits = min( self.nbits, other.nbits )'
+    return self._divide( other, operator.mod, min )
+
+  def __radd__( self, other ):
+    return self.__add__( other )
+
+  def __rsub__( self, other ):
+    return self._arith( other, lambda a, b: b - a,
+                        lambda a, b: _limb_sub( b, a ),
+                        lambda a, b: max( a, b ) + 1, self.nbits )
+
+  def __rmul__( self, other ):
+    return self.__mul__( other )
+
+  def __rdiv__( self, other ):
+    if not isinstance( other, BitsN ):
+      raise TypeError( 'Unspecified width of left operator.' )
+    return _from_bits( other, self.shape ).__div__( self )
+
+  def __rfloordiv__( self, other ):
+    return self.__rdiv__( other )
+
+  def __rmod__( self, other ):
+    if not isinstance( other, BitsN ):
+      raise TypeError( 'Unspecified width of left operator.' )
+    return _from_bits( other, self.shape ).__mod__( self )
+
+  #----------------------------------------------------------------------------
+  # shift operators
+  #----------------------------------------------------------------------------
+
+  def __lshift__( self, other ):
+    'result.nbits = self.nbits'
+    return self._shift( other, operator.lshift, _limb_shl )
+
+  def __rshift__( self, other ):
+    'result.nbits = self.nbits'
+    return self._shift( other, operator.rshift, _limb_shr )
+
+  def __rlshift__( self, other ):
+    if not isinstance( other, BitsN ):
+      raise TypeError( 'Unspecified width of left operator.' )
+    return _from_bits( other, self.shape ).__lshift__( self )
+
+  def __rrshift__( self, other ):
+    if not isinstance( other, BitsN ):
+      raise TypeError( 'Unspecified width of left operator.' )
+    return _from_bits( other, self.shape ).__rshift__( self )
+
+  #----------------------------------------------------------------------------
+  # bitwise operators
+  #----------------------------------------------------------------------------
+
+  def __and__( self, other ):
+    'result.nbits = max( self.nbits, other.nbits )'
+    return self._bitwise( other, operator.and_ )
+
+  def __xor__( self, other ):
+    'result.nbits = max( self.nbits, other.nbits )'
+    return self._bitwise( other, operator.xor )
+
+  def __or__( self, other ):
+    'result.nbits = max( self.nbits, other.nbits )'
+    return self._bitwise( other, operator.or_ )
+
+  def __rand__( self, other ):
+    return self.__and__( other )
+
+  def __rxor__( self, other ):
+    return self.__xor__( other )
+
+  def __ror__( self, other ):
+    return self.__or__( other )
+
+  #----------------------------------------------------------------------------
+  # comparison operators
+  #----------------------------------------------------------------------------
+
+  def _compare( self, other, op ):
+    'Compare every element against other, returning a BitsArray(1).'
+
+    nbits, value = self._operand( other )
+
+    if nbits is None:
+      if value is None:
+        value = _real_operand( other )
+        if value is None:
+          return NotImplemented
+        assert value >= 0
+
+        # Compare non-integer numbers such as floats by value, as BitsN
+        # does. Doubles hold up to 53-bit values exactly; wider elements
+        # are compared as Python ints.
+        if self.nbits <= 53:
+          result = op( self._data.astype( np.float64 ), value )
+        else:
+          result = op( self._objects(), value ).astype( bool )
+        return _wrap( 1, np.asarray( result, dtype=np.uint8 ) )
+
+      assert value >= 0
+
+      # Every element is smaller than an int which does not fit in nbits
+      if value > self._mask:
+        return _wrap( 1, np.full( self.shape, op( 0, 1 ), dtype=np.uint8 ) )
+
+      width = self.nbits
+    else:
+      width = max( self.nbits, nbits )
+
+    if width <= _WORD_NBITS:
+      dtype  = _dtype( width )
+      result = op( self._data.astype( dtype ), _cast( value, dtype ) )
+
+    # Compare wide values from the most significant limb down, and map the
+    # ordering onto op by comparing -1/0/+1 against zero
+    else:
+      nlimbs  = _nlimbs( width )
+      lt, eq  = _limb_compare( self._limbs( nlimbs ),
+                               _as_limbs( nbits, value, nlimbs ) )
+      order   = np.where( lt, -1, np.where( eq, 0, 1 ) ).astype( np.int8 )
+      result  = op( order, np.int8( 0 ) )
+
+    return _wrap( 1, np.asarray( result, dtype=np.uint8 ) )
+
+  def __eq__( self, other ):
+    'result.nbits = 1'
+    if other is None: return False
+    return self._compare( other, operator.eq )
+
+  def __ne__( self, other ):
+    'result.nbits = 1'
+    if other is None: return True
+    return self._compare( other, operator.ne )
+
+  def __lt__( self, other ):
+    'result.nbits = 1'
+    return self._compare( other, operator.lt )
+
+  def __le__( self, other ):
+    'result.nbits = 1'
+    return self._compare( other, operator.le )
+
+  def __gt__( self, other ):
+    'result.nbits = 1'
+    return self._compare( other, operator.gt )
+
+  def __ge__( self, other ):
+    'result.nbits = 1'
+    return self._compare( other, operator.ge )
+
+#------------------------------------------------------------------------------
+# WideBitsArray
+#------------------------------------------------------------------------------
+class WideBitsArray( BitsArray ):
+  '''A BitsArray for widths beyond 64 bits.
+
+  Each element is stored as little-endian 64-bit limbs along a trailing
+  axis of the NumPy buffer, so a 1000 x Bits(128) array is backed by a
+  (1000, 2) uint64 buffer. Addition and subtraction propagate carries
+  across limbs, and bitwise ops, shifts, slicing, comparisons and the
+  concat/zext/sext/reduce functions all work limb by limb. Multiplication
+  and division fall back on Python ints.
+
+  WideBitsArrays are created by BitsArray(...) whenever nbits > 64.
+  '''
+
+  def _fill( self, shape, uint ):
+    if not isinstance( shape, tuple ):
+      shape = tuple( shape ) if hasattr( shape, '__iter__' ) else (shape,)
+    nlimbs = _nlimbs( self.nbits )
+    data   = np.empty( shape + (nlimbs,), dtype=np.uint64 )
+    data[...] = _int_limbs( uint, nlimbs )
+    return data
+
+  #----------------------------------------------------------------------------
+  # array properties
+  #----------------------------------------------------------------------------
+
+  @property
+  def shape( self ):
+    return self._data.shape[:-1]
+
+  @property
+  def size( self ):
+    return self._data.size / self._data.shape[-1]
+
+  def __len__( self ):
+    if self._data.ndim < 2:
+      raise TypeError( 'len() of unsized object' )
+    return len( self._data )
+
+  #----------------------------------------------------------------------------
+  # element access
+  #----------------------------------------------------------------------------
+
+  def element( self, idx ):
+    '''Return a single element as a BitsN object, or a BitsArray view if
+    idx selects more than one element.'''
+    value = self._data[ idx ]
+    if value.ndim > 1:
+      return _wrap( self.nbits, value )
+    return Bits( self.nbits )( _as_objects( self.nbits, value )[()] )
+
+  #----------------------------------------------------------------------------
+  # type conversion
+  #----------------------------------------------------------------------------
+
+  def uint( self ):
+    'Return the unsigned integer representation as an object NumPy array.'
+    return self._objects()
+
+  def int( self ):
+    'Return the signed integer representation as an object NumPy array.'
+    uint = self._objects()
+    return uint - ((uint >> (self.nbits - 1)) << self.nbits)
+
+  def tolist( self ):
+    'Return the elements as a (nested) list of BitsN objects.'
+    return _to_bits( Bits( self.nbits ), self._objects().tolist() )
+
+  def any( self ):
+    'Return True if any element is non-zero.'
+    return bool( self._data.any() )
+
+  def all( self ):
+    'Return True if every element is non-zero.'
+    return bool( self._data.any( axis=-1 ).all() )
+
+  #----------------------------------------------------------------------------
+  # bit access
+  #----------------------------------------------------------------------------
+
+  def _extract( self, start, nbits ):
+    'Return bits [start:start+nbits] of every element.'
+    first = start / _LIMB_NBITS
+    last  = (start + nbits - 1) / _LIMB_NBITS
+    limbs = self._data[ ..., first : last + 2 ]
+    return _limbs_result( nbits, _limb_shr( limbs, start % _LIMB_NBITS ) )
+
+  def _write( self, start, nbits, data ):
+    'Overwrite bits [start:start+nbits] of every element with data.'
+    nlimbs = self._data.shape[-1]
+    ones   = _int_limbs( ((1 << nbits) - 1) << start, nlimbs )
+    self._data &= ~ones
+    self._data |= _limb_shl( _as_limbs( nbits, data, nlimbs ), start )
+
+  #----------------------------------------------------------------------------
+  # arithmetic operators
+  #----------------------------------------------------------------------------
+
+  def __invert__( self ):
+    'result.nbits = self.nbits'
+    return _limbs_result( self.nbits, ~self._data )
+
+#------------------------------------------------------------------------------
+# concat
+#------------------------------------------------------------------------------
+def concat( *arrays ):
+  '''Return the concatenation of all BitsArray (or BitsN) parameters as a
+  new BitsArray. Shapes are broadcast against each other.'''
+
+  # Calculate total new bitwidth
+  nbits  = sum( [ x.nbits for x in arrays ] )
+  nlimbs = _nlimbs( nbits )
+
+  # Shift each value into place and or them together
+  data  = None
+  begin = 0
+  for x in reversed( arrays ):
+    width, value = _payload( x )
+    if nbits <= _WORD_NBITS:
+      dtype = _dtype( nbits )
+      piece = _cast( value, dtype ) << dtype( begin )
+    else:
+      piece = _limb_shl( _as_limbs( width, value, nlimbs ), begin )
+    data   = piece if data is None else data | piece
+    begin += width
+
+  return _wrap( nbits, np.asarray( data ) )
+
+#------------------------------------------------------------------------------
+# concat_columns
+#------------------------------------------------------------------------------
+def concat_columns( widths, columns, trunc = False ):
+  '''Pack columns of field values into a BitsArray of words, the first
+  column in the most significant bits. widths gives the bitwidth of each
+  field, and each column is a sequence or NumPy array of ints (or Bits)
+  holding that field for every word, checked against its width unless
+  trunc = True.
+
+  > opcode = [ 0x13, 0x33, 0x13 ]
+  > rd     = [ 1, 2, 3 ]
+  > imm    = [ 5, 0, -1 ]
+  > words  = concat_columns( [ 7, 5, 12 ], [ opcode, rd, imm ] )
+  '''
+  if len( widths ) != len( columns ):
+    raise ValueError( 'Got {} widths for {} columns'
+                      .format( len( widths ), len( columns ) ) )
+  return concat( *[ BitsArray.from_values( nbits, values, trunc )
+                    for nbits, values in zip( widths, columns ) ] )
+
+#------------------------------------------------------------------------------
+# zext
+#------------------------------------------------------------------------------
+def zext( array, new_width ):
+  'Return a zero-extended version of the provided BitsArray.'
+  new_width = int( new_width )
+  if new_width < array.nbits:
+    return BitsArray.from_values( new_width, array.uint() )
+  return _wrap( new_width, _as_storage( array.nbits, array._data, new_width ) )
+
+#------------------------------------------------------------------------------
+# sext
+#------------------------------------------------------------------------------
+def sext( array, new_width ):
+  'Return a sign-extended version of the provided BitsArray.'
+
+  new_width = int( new_width )
+  if new_width < array.nbits:
+    return BitsArray.from_values( new_width, array.int() )
+
+  sign = array[ array.nbits - 1 ]._data
+  ext  = ((1 << new_width) - 1) ^ array._mask
+  data = _as_storage( array.nbits, array._data, new_width )
+
+  if new_width <= _WORD_NBITS:
+    dtype = _dtype( new_width )
+    data |= sign.astype( dtype ) * dtype( ext )
+  else:
+    data |= _int_limbs( ext, data.shape[-1] ) * sign[ ..., None ]
+
+  return _wrap( new_width, data )
+
+#------------------------------------------------------------------------------
+# reduce_and
+#------------------------------------------------------------------------------
+# With segment = None the reductions return a BitsArray(1) reducing all
+# the bits of each element. Otherwise each element is split into
+# segments of that many bits, and the result has one bit per segment,
+# with bit i reducing bits [i*segment : (i+1)*segment] of the element:
+#
+#   > reduce_xor( a, segment=8 )    # parity of each byte of each element
+
+def reduce_and( array, segment = None ):
+  'Return a BitsArray with the anded value of the bits of each element.'
+  if segment is not None:
+    return _segmented( array, segment, reduce_and )
+  if array.nbits <= _WORD_NBITS:
+    result = array._data == array._data.dtype.type( array._mask )
+  else:
+    mask   = _int_limbs( array._mask, array._data.shape[-1] )
+    result = np.all( array._data == mask, axis=-1 )
+  return _wrap( 1, np.asarray( result, dtype=np.uint8 ) )
+
+#------------------------------------------------------------------------------
+# reduce_or
+#------------------------------------------------------------------------------
+def reduce_or( array, segment = None ):
+  'Return a BitsArray with the or-ed value of the bits of each element.'
+  if segment is not None:
+    return _segmented( array, segment, reduce_or )
+  if array.nbits <= _WORD_NBITS:
+    result = array._data != 0
+  else:
+    result = np.any( array._data, axis=-1 )
+  return _wrap( 1, np.asarray( result, dtype=np.uint8 ) )
+
+#------------------------------------------------------------------------------
+# reduce_xor
+#------------------------------------------------------------------------------
+def reduce_xor( array, segment = None ):
+  'Return a BitsArray with the xored value of the bits of each element.'
+  if segment is not None:
+    return _segmented( array, segment, reduce_xor )
+  data = array._data
+  if array.nbits > _WORD_NBITS:
+    data = np.bitwise_xor.reduce( data, axis=-1 )
+  return _wrap( 1, np.asarray( _parity( data ), dtype=np.uint8 ) )
+
+#------------------------------------------------------------------------------
+# _segmented
+#------------------------------------------------------------------------------
+def _segmented( array, segment, reduce_fn ):
+  'Apply reduce_fn to each segment of bits and pack the results.'
+
+  segment = int( segment )
+  if segment < 1 or array.nbits % segment:
+    raise ValueError( 'Cannot split Bits({}) into segments of {} bits'
+                      .format( array.nbits, segment ) )
+
+  nsegments = array.nbits / segment
+  bits      = [ reduce_fn( array[ i*segment : (i+1)*segment ] )
+                for i in reversed( xrange( nsegments ) ) ]
+  return concat( *bits )
+
+#------------------------------------------------------------------------------
+# _dtype
+#------------------------------------------------------------------------------
+def _dtype( nbits ):
+  'Return the narrowest unsigned NumPy dtype which holds nbits bits.'
+  if   nbits <=  8: return np.uint8
+  elif nbits <= 16: return np.uint16
+  elif nbits <= 32: return np.uint32
+  elif nbits <= 64: return np.uint64
+  raise ValueError( 'No machine word holds Bits({})'.format( nbits ) )
+
+#------------------------------------------------------------------------------
+# _nlimbs
+#------------------------------------------------------------------------------
+def _nlimbs( nbits ):
+  'Return the number of 64-bit limbs needed to hold nbits bits.'
+  return (nbits + _LIMB_NBITS - 1) / _LIMB_NBITS
+
+#------------------------------------------------------------------------------
+# _wrap
+#------------------------------------------------------------------------------
+def _wrap( nbits, data ):
+  '''Return a BitsArray around data, which must already fit in nbits and
+  be in the storage format for nbits.'''
+  cls   = WideBitsArray if nbits > _WORD_NBITS else BitsArray
+  array = object.__new__( cls )
+  array._set_nbits( nbits )
+  array._data = data
+  return array
+
+#------------------------------------------------------------------------------
+# _result
+#------------------------------------------------------------------------------
+def _result( nbits, data ):
+  'Return a BitsArray holding word data truncated to nbits.'
+  dtype = _dtype( nbits )
+  data  = np.asarray( data ).astype( dtype ) & dtype( (1 << nbits) - 1 )
+  return _wrap( nbits, np.asarray( data ) )
+
+#------------------------------------------------------------------------------
+# _limbs_result
+#------------------------------------------------------------------------------
+def _limbs_result( nbits, limbs ):
+  'Return a BitsArray holding limb data truncated to nbits.'
+  if nbits <= _WORD_NBITS:
+    return _result( nbits, limbs[ ..., 0 ] )
+  nlimbs = _nlimbs( nbits )
+  data   = np.array( limbs[ ..., :nlimbs ], dtype=np.uint64 )
+  data[ ..., -1 ] &= np.uint64( _LIMB_MASK >> (nlimbs * _LIMB_NBITS - nbits) )
+  return _wrap( nbits, data )
+
+#------------------------------------------------------------------------------
+# _from_objects
+#------------------------------------------------------------------------------
+def _from_objects( nbits, values ):
+  'Return a BitsArray from an object array of Python ints, truncating.'
+  data, lo, hi = _convert( values, nbits, check = False )
+  return _wrap( nbits, data )
+
+#------------------------------------------------------------------------------
+# _from_bits
+#------------------------------------------------------------------------------
+def _from_bits( bits, shape ):
+  'Broadcast a single BitsN value into a BitsArray of the given shape.'
+  return BitsArray( bits.nbits, shape, bits.uint() )
+
+#------------------------------------------------------------------------------
+# _payload
+#------------------------------------------------------------------------------
+def _payload( x ):
+  'Return (nbits, value) for a BitsArray or a BitsN.'
+  if isinstance( x, BitsArray ):
+    return x.nbits, x._data
+  if isinstance( x, BitsN ):
+    return x.nbits, x._uint
+  raise TypeError( 'Expected a BitsArray or Bits object, got {}'
+                   .format( type( x ).__name__ ) )
+
+#------------------------------------------------------------------------------
+# _convert
+#------------------------------------------------------------------------------
+def _convert( values, nbits, check ):
+  '''Convert values into the storage format for nbits, truncating to
+  nbits. Returns (data, lo, hi) where lo/hi are the smallest and largest
+  values seen as Python ints, or None if check is False, there are no
+  values, or the values provably fit.'''
+
+  mask = (1 << nbits) - 1
+  lo = hi = None
+
+  if isinstance( values, BitsArray ):
+    if values.nbits <= nbits:
+      return _as_storage( values.nbits, values._data, nbits ), None, None
+    values = values.uint()
+
+  # NumPy integer arrays are converted without leaving NumPy
+  if isinstance( values, np.ndarray ) and values.dtype.kind in 'uib':
+    if check and values.size:
+      lo, hi = int( values.min() ), int( values.max() )
+    if nbits <= _WORD_NBITS:
+      dtype = _dtype( nbits )
+      return values.astype( dtype ) & dtype( mask ), lo, hi
+    nlimbs = _nlimbs( nbits )
+    data   = np.zeros( values.shape + (nlimbs,), dtype=np.uint64 )
+    data[ ..., 0 ] = values.astype( np.uint64 )
+    if values.dtype.kind == 'i':
+      data[ ..., 1: ] = np.where( values < 0, np.uint64( _LIMB_MASK ),
+                                  np.uint64( 0 ) )[ ..., None ]
+    return _limbs_result( nbits, data )._data, lo, hi
+
+  # Python ints, Bits objects and (nested) sequences of them
+  if isinstance( values, np.ndarray ):
+    objects = values
+  else:
+    if hasattr( values, '__iter__' ) and not isinstance( values, (list, tuple) ):
+      values = list( values )
+    objects = np.array( values, dtype=object )
+  ints = [ int( v ) for v in objects.flat ]
+  if check and ints:
+    lo, hi = min( ints ), max( ints )
+  if nbits <= _WORD_NBITS:
+    data = np.array( [ v & mask for v in ints ], dtype=_dtype( nbits ) )
+    return data.reshape( objects.shape ), lo, hi
+  masked = np.array( [ v & mask for v in ints ], dtype=object )
+  return _objects_to_limbs( masked.reshape( objects.shape ), nbits ), lo, hi
+
+#------------------------------------------------------------------------------
+# _cast
+#------------------------------------------------------------------------------
+def _cast( value, dtype ):
+  'Cast an array or a non-negative Python int to the given dtype.'
+  if isinstance( value, np.ndarray ):
+    return value.astype( dtype )
+  return dtype( value )
+
+#------------------------------------------------------------------------------
+# _as_storage
+#------------------------------------------------------------------------------
+def _as_storage( nbits, value, new_nbits ):
+  'Return a copy of nbits storage in the storage format for new_nbits.'
+  if new_nbits <= _WORD_NBITS:
+    return value.astype( _dtype( new_nbits ) )
+  return np.array( _as_limbs( nbits, value, _nlimbs( new_nbits ) ) )
+
+#------------------------------------------------------------------------------
+# _as_limbs
+#------------------------------------------------------------------------------
+def _as_limbs( nbits, value, nlimbs ):
+  '''Return nlimbs little-endian 64-bit limbs for a Python int or for an
+  nbits storage array. Arrays which already have at least nlimbs limbs
+  are returned as views.'''
+
+  if not isinstance( value, np.ndarray ):
+    return _int_limbs( value, nlimbs )
+
+  if nbits <= _WORD_NBITS:
+    limbs = np.zeros( value.shape + (nlimbs,), dtype=np.uint64 )
+    limbs[ ..., 0 ] = value
+    return limbs
+
+  if value.shape[-1] >= nlimbs:
+    return value[ ..., :nlimbs ]
+
+  limbs = np.zeros( value.shape[:-1] + (nlimbs,), dtype=np.uint64 )
+  limbs[ ..., :value.shape[-1] ] = value
+  return limbs
+
+#------------------------------------------------------------------------------
+# _as_objects
+#------------------------------------------------------------------------------
+def _as_objects( nbits, value ):
+  'Return a Python int or an nbits storage array as Python ints.'
+
+  if not isinstance( value, np.ndarray ):
+    return value
+
+  if nbits <= _WORD_NBITS:
+    return value.astype( object )
+
+  objects = value[ ..., 0 ].astype( object )
+  for i in xrange( 1, value.shape[-1] ):
+    objects = objects | (value[ ..., i ].astype( object ) << (_LIMB_NBITS * i))
+  return np.asarray( objects, dtype=object )
+
+#------------------------------------------------------------------------------
+# _int_limbs
+#------------------------------------------------------------------------------
+def _int_limbs( value, nlimbs ):
+  'Split a non-negative Python int into nlimbs 64-bit limbs.'
+  return np.array( [ (value >> (_LIMB_NBITS * i)) & _LIMB_MASK
+                     for i in xrange( nlimbs ) ], dtype=np.uint64 )
+
+#------------------------------------------------------------------------------
+# _objects_to_limbs
+#------------------------------------------------------------------------------
+def _objects_to_limbs( objects, nbits ):
+  'Split an object array of non-negative Python ints into 64-bit limbs.'
+  nlimbs = _nlimbs( nbits )
+  limbs  = np.empty( objects.shape + (nlimbs,), dtype=np.uint64 )
+  for i in xrange( nlimbs ):
+    limbs[ ..., i ] = (objects >> (_LIMB_NBITS * i)) & _LIMB_MASK
+  return limbs
+
+#------------------------------------------------------------------------------
+# limb arithmetic
+#------------------------------------------------------------------------------
+# All limb functions take uint64 arrays with limbs along the last axis
+# and return a new array with the same number of limbs. Carries out of
+# the most significant limb are dropped.
+
+def _limb_add( a, b ):
+  'Add two limb arrays, propagating carries from the least significant limb.'
+  a, b  = np.broadcast_arrays( a, b )
+  out   = np.empty( a.shape, dtype=np.uint64 )
+  carry = np.zeros( a.shape[:-1], dtype=np.uint64 )
+  for i in xrange( a.shape[-1] ):
+    s = a[ ..., i ] + b[ ..., i ]
+    t = s + carry
+    carry = ((s < a[ ..., i ]) | (t < s)).astype( np.uint64 )
+    out[ ..., i ] = t
+  return out
+
+def _limb_sub( a, b ):
+  'Subtract two limb arrays, propagating borrows.'
+  a, b   = np.broadcast_arrays( a, b )
+  out    = np.empty( a.shape, dtype=np.uint64 )
+  borrow = np.zeros( a.shape[:-1], dtype=np.uint64 )
+  for i in xrange( a.shape[-1] ):
+    d = a[ ..., i ] - b[ ..., i ]
+    t = d - borrow
+    borrow = ((a[ ..., i ] < b[ ..., i ]) | (d < borrow)).astype( np.uint64 )
+    out[ ..., i ] = t
+  return out
+
+def _limb_shl( a, amount ):
+  'Shift a limb array left by a non-negative int amount.'
+  nlimbs      = a.shape[-1]
+  words, bits = divmod( amount, _LIMB_NBITS )
+  out = np.zeros( a.shape, dtype=np.uint64 )
+  for i in xrange( words, nlimbs ):
+    out[ ..., i ] = a[ ..., i - words ] << np.uint64( bits )
+    if bits and i - words > 0:
+      out[ ..., i ] |= a[ ..., i - words - 1 ] >> np.uint64( _LIMB_NBITS - bits )
+  return out
+
+def _limb_shr( a, amount ):
+  'Shift a limb array right by a non-negative int amount.'
+  nlimbs      = a.shape[-1]
+  words, bits = divmod( amount, _LIMB_NBITS )
+  out = np.zeros( a.shape, dtype=np.uint64 )
+  for i in xrange( nlimbs - words ):
+    out[ ..., i ] = a[ ..., i + words ] >> np.uint64( bits )
+    if bits and i + words + 1 < nlimbs:
+      out[ ..., i ] |= a[ ..., i + words + 1 ] << np.uint64( _LIMB_NBITS - bits )
+  return out
+
+def _limb_compare( a, b ):
+  'Return boolean arrays (a < b, a == b) for two limb arrays.'
+  a, b = np.broadcast_arrays( a, b )
+  lt   = np.zeros( a.shape[:-1], dtype=bool )
+  eq   = np.ones ( a.shape[:-1], dtype=bool )
+  for i in reversed( xrange( a.shape[-1] ) ):
+    lt |= eq & (a[ ..., i ] < b[ ..., i ])
+    eq &= a[ ..., i ] == b[ ..., i ]
+  return lt, eq
+
+#------------------------------------------------------------------------------
+# _parity
+#------------------------------------------------------------------------------
+def _parity( data ):
+  'Return the parity of the set bits in each word of an unsigned array.'
+  data = data.astype( np.uint64 )
+  for shift in (32, 16, 8, 4, 2, 1):
+    data = data ^ (data >> np.uint64( shift ))
+  return data & np.uint64( 1 )
+
+#------------------------------------------------------------------------------
+# _shl / _shr
+#------------------------------------------------------------------------------
+# NumPy refuses to shift unsigned arrays by plain Python ints, so the
+# shift amount must be given the dtype of the array.
+
+def _shl( data, amount ):
+  return data << data.dtype.type( amount )
+
+def _shr( data, amount ):
+  return data >> data.dtype.type( amount )
+
+#------------------------------------------------------------------------------
+# _to_bits
+#------------------------------------------------------------------------------
+def _to_bits( cls, values ):
+  'Convert a (nested) list of ints into a (nested) list of cls objects.'
+  if isinstance( values, list ):
+    return [ _to_bits( cls, v ) for v in values ]
+  return cls( values )
@@ -0,0 +1,651 @@
+#=======================================================================
+# bits_array_test.py
+#=======================================================================
+# Tests for the BitsArray class.
+
+import random
+
+import pytest
+
+np = pytest.importorskip( 'numpy' )
+
+from bits       import Bits
+from bits       import concat     as bits_concat
+from bits       import zext       as bits_zext
+from bits       import sext       as bits_sext
+from bits       import reduce_and as bits_reduce_and
+from bits       import reduce_or  as bits_reduce_or
+from bits       import reduce_xor as bits_reduce_xor
+from bits_array import (
+  BitsArray,
+  WideBitsArray,
+  concat,
+  concat_columns,
+  zext,
+  sext,
+  reduce_and,
+  reduce_or,
+  reduce_xor,
+)
+
+#-----------------------------------------------------------------------
+# helpers
+#-----------------------------------------------------------------------
+
+def random_values( nbits, n, seed=0 ):
+  rng = random.Random( seed )
+  return [ rng.randint( 0, 2**nbits - 1 ) for _ in xrange( n ) ]
+
+def check_array( array, expected ):
+  'Check a BitsArray matches a list of BitsN objects bit for bit.'
+  assert len( array ) == len( expected )
+  for x, y in zip( array.tolist(), expected ):
+    assert x.nbits == y.nbits
+    assert x.uint() == y.uint()
+
+#-----------------------------------------------------------------------
+# test_constructor
+#-----------------------------------------------------------------------
+def test_constructor():
+
+  a = BitsArray( 4, 3 )
+  assert a.nbits == 4
+  assert a.shape == (3,)
+  assert a.uint().tolist() == [ 0, 0, 0 ]
+
+  a = BitsArray( 4, (2,2), -2 )
+  assert a.uint().tolist() == [ [ 14, 14 ], [ 14, 14 ] ]
+
+  with pytest.raises( ValueError ):
+    BitsArray( 4, 3, 16 )
+  with pytest.raises( ValueError ):
+    BitsArray( 4, 3, -9 )
+
+  assert BitsArray( 4, 3, 16, trunc=True ).uint().tolist() == [ 0, 0, 0 ]
+
+#-----------------------------------------------------------------------
+# test_from_values
+#-----------------------------------------------------------------------
+def test_from_values():
+
+  a = BitsArray.from_values( 4, [ 2, 15, -1, Bits(4)(-8) ] )
+  assert a.uint().tolist() == [ 2, 15, 15, 8 ]
+  assert a.int().tolist()  == [ 2, -1, -1, -8 ]
+
+  b = BitsArray.from_values( 8, np.array( [ -1, 255, 3 ] ) )
+  assert b.uint().tolist() == [ 255, 255, 3 ]
+
+  c = BitsArray.from_values( 64, [ 2**64 - 1, 2**63 ] )
+  assert c.uint().tolist() == [ 2**64 - 1, 2**63 ]
+  assert c.int().tolist()  == [ -1, -2**63 ]
+
+  with pytest.raises( ValueError ):
+    BitsArray.from_values( 4, [ 1, 16 ] )
+  with pytest.raises( ValueError ):
+    BitsArray.from_values( 4, np.array( [ -9, 1 ] ) )
+
+  d = BitsArray.from_values( 4, [ 1, 16, 17 ], trunc=True )
+  assert d.uint().tolist() == [ 1, 0, 1 ]
+
+#-----------------------------------------------------------------------
+# test_element
+#-----------------------------------------------------------------------
+def test_element():
+
+  a = BitsArray.from_values( 8, [ 1, 2, 3, 4 ] )
+  assert isinstance( a.element( 1 ), Bits(8) )
+  assert a.element( 1 ) == 2
+  assert a.element( slice( 1, 3 ) ).uint().tolist() == [ 2, 3 ]
+
+  a.set_element( 0, Bits(8)(0xff) )
+  a.set_element( 1, -1 )
+  assert a.uint().tolist() == [ 255, 255, 3, 4 ]
+
+  with pytest.raises( ValueError ):
+    a.set_element( 2, 256 )
+
+  assert [ x.uint() for x in a ] == [ 255, 255, 3, 4 ]
+
+#-----------------------------------------------------------------------
+# test_get_slice
+#-----------------------------------------------------------------------
+def test_get_slice():
+
+  values = random_values( 16, 100 )
+  a = BitsArray.from_values( 16, values )
+  x = [ Bits(16)( v ) for v in values ]
+
+  check_array( a[:],    [ v[:]    for v in x ] )
+  check_array( a[3],    [ v[3]    for v in x ] )
+  check_array( a[15],   [ v[15]   for v in x ] )
+  check_array( a[0:4],  [ v[0:4]  for v in x ] )
+  check_array( a[5:16], [ v[5:16] for v in x ] )
+  check_array( a[8:],   [ v[8:]   for v in x ] )
+  check_array( a[:8],   [ v[:8]   for v in x ] )
+
+  with pytest.raises( IndexError ):
+    a[16]
+  with pytest.raises( IndexError ):
+    a[-1]
+  with pytest.raises( IndexError ):
+    a[2:1]
+  with pytest.raises( IndexError ):
+    a[1:17]
+  with pytest.raises( IndexError ):
+    a[::2]
+
+#-----------------------------------------------------------------------
+# test_set_slice
+#-----------------------------------------------------------------------
+def test_set_slice():
+
+  a = BitsArray.from_values( 4, [ 0b1100, 0b0000 ] )
+  a[:] = 0b0010
+  assert a.uint().tolist() == [ 0b0010, 0b0010 ]
+  a[2:4] = 0b11
+  assert a.uint().tolist() == [ 0b1110, 0b1110 ]
+  a[0] = 1
+  assert a.uint().tolist() == [ 0b1111, 0b1111 ]
+  a[1:3] = BitsArray.from_values( 2, [ 0b10, 0b01 ] )
+  assert a.uint().tolist() == [ 0b1101, 0b1011 ]
+  a[3] = np.array( [ 0, 1 ] )
+  assert a.uint().tolist() == [ 0b0101, 0b1011 ]
+  a[1:] = -1
+  assert a.uint().tolist() == [ 0b1111, 0b1111 ]
+
+  with pytest.raises( ValueError ):
+    a[1:3] = 0b110
+  with pytest.raises( ValueError ):
+    a[1:3] = np.array( [ 1, 4 ] )
+  with pytest.raises( ValueError ):
+    a[0] = 2
+  with pytest.raises( ValueError ):
+    a[0] = -1
+  with pytest.raises( ValueError ):
+    a[:] = 0b10000
+  with pytest.raises( IndexError ):
+    a[4] = 1
+  with pytest.raises( IndexError ):
+    a[1:5] = 1
+
+#-----------------------------------------------------------------------
+# test_arith
+#-----------------------------------------------------------------------
+@pytest.mark.parametrize( 'nbits, mbits', [
+  (1, 1), (4, 4), (8, 3), (16, 16), (15, 17), (31, 32), (32, 32),
+])
+def test_arith( nbits, mbits ):
+
+  xs = random_values( nbits, 50, seed=1 )
+  ys = random_values( mbits, 50, seed=2 )
+  ys = [ y or 1 for y in ys ]
+  a  = BitsArray.from_values( nbits, xs )
+  b  = BitsArray.from_values( mbits, ys )
+  x  = [ Bits(nbits)( v ) for v in xs ]
+  y  = [ Bits(mbits)( v ) for v in ys ]
+
+  check_array( a + b,  [ i + j  for i, j in zip( x, y ) ] )
+  check_array( a - b,  [ i - j  for i, j in zip( x, y ) ] )
+  check_array( a * b,  [ i * j  for i, j in zip( x, y ) ] )
+  check_array( a / b,  [ i / j  for i, j in zip( x, y ) ] )
+  check_array( a // b, [ i // j for i, j in zip( x, y ) ] )
+  check_array( a % b,  [ i % j  for i, j in zip( x, y ) ] )
+  check_array( ~a,     [ ~i     for i in x ] )
+
+  for c in [ 1, 3, 2**nbits - 1, 2**nbits + 5 ]:
+    check_array( a + c, [ i + c for i in x ] )
+    check_array( c + a, [ c + i for i in x ] )
+    check_array( a - c, [ i - c for i in x ] )
+    check_array( c - a, [ c - i for i in x ] )
+    check_array( a * c, [ i * c for i in x ] )
+    check_array( c * a, [ c * i for i in x ] )
+    check_array( a / c, [ i / c for i in x ] )
+    check_array( a % c, [ i % c for i in x ] )
+
+  check_array( a + y[0], [ i + y[0] for i in x ] )
+  check_array( a * y[0], [ i * y[0] for i in x ] )
+
+#-----------------------------------------------------------------------
+# test_bits_left_operand
+#-----------------------------------------------------------------------
+def test_bits_left_operand():
+
+  xs = random_values( 8, 20, seed=21 )
+  ys = [ v or 1 for v in random_values( 12, 20, seed=22 ) ]
+  a  = BitsArray.from_values( 8, xs )
+  b  = BitsArray.from_values( 12, ys )
+  y  = [ Bits(12)( v ) for v in ys ]
+  c  = Bits(12)(0xabc)
+
+  # BitsN operators defer to the reflected BitsArray operators
+
+  check_array( c + a, [ c + i for i in a.tolist() ] )
+  check_array( c - a, [ c - i for i in a.tolist() ] )
+  check_array( c * a, [ c * i for i in a.tolist() ] )
+  check_array( c & a, [ c & i for i in a.tolist() ] )
+  check_array( c / b, [ c / j for j in y ] )
+  check_array( c % b, [ c % j for j in y ] )
+  check_array( c < a, [ c < i for i in a.tolist() ] )
+  check_array( c == b, [ c == j for j in y ] )
+
+  assert np.uint8( 3 ) + Bits(8)(4) == 7
+  assert Bits(8)(4) + np.uint8( 3 ) == 7
+
+  # NumPy integer scalars behave like ints on either side
+
+  check_array( np.uint8( 3 ) + a, [ i + 3 for i in a.tolist() ] )
+  check_array( a + np.uint8( 3 ), [ i + 3 for i in a.tolist() ] )
+  check_array( a * np.int64( 5 ), [ i * 5 for i in a.tolist() ] )
+  check_array( a << np.int32( 2 ), [ i << 2 for i in a.tolist() ] )
+  check_array( a < np.uint16( 100 ), [ i < 100 for i in a.tolist() ] )
+  check_array( np.uint16( 100 ) < a, [ 100 < i for i in a.tolist() ] )
+
+#-----------------------------------------------------------------------
+# test_add_widths
+#-----------------------------------------------------------------------
+def test_add_widths():
+
+  a = BitsArray( 16, 10, 0xffff )
+  b = BitsArray( 16, 10, 0xffff )
+  assert (a + b).nbits == 17
+  assert (a + b).uint().tolist() == [ 0x1fffe ] * 10
+  assert (a + 1).nbits == 16
+  assert (a + 1).uint().tolist() == [ 0 ] * 10
+  assert (a * b).nbits == 32
+  assert (a % BitsArray( 4, 10, 7 )).nbits == 4
+
+  # Results wider than a machine word switch to limb storage
+  c = BitsArray( 64, 10, 2**64 - 1 ) + BitsArray( 64, 10, 1 )
+  assert isinstance( c, WideBitsArray )
+  assert c.nbits == 65
+  assert c.uint().tolist() == [ 2**64 ] * 10
+
+#-----------------------------------------------------------------------
+# test_divide_by_zero
+#-----------------------------------------------------------------------
+def test_divide_by_zero():
+
+  a = BitsArray.from_values( 8, [ 1, 2 ] )
+  with pytest.raises( ZeroDivisionError ):
+    a / 0
+  with pytest.raises( ZeroDivisionError ):
+    a % BitsArray.from_values( 8, [ 1, 0 ] )
+
+#-----------------------------------------------------------------------
+# test_bitwise
+#-----------------------------------------------------------------------
+@pytest.mark.parametrize( 'nbits, mbits', [
+  (1, 1), (8, 8), (8, 3), (16, 33), (64, 64),
+])
+def test_bitwise( nbits, mbits ):
+
+  xs = random_values( nbits, 50, seed=3 )
+  ys = random_values( mbits, 50, seed=4 )
+  a  = BitsArray.from_values( nbits, xs )
+  b  = BitsArray.from_values( mbits, ys )
+  x  = [ Bits(nbits)( v ) for v in xs ]
+  y  = [ Bits(mbits)( v ) for v in ys ]
+
+  check_array( a & b, [ i & j for i, j in zip( x, y ) ] )
+  check_array( a | b, [ i | j for i, j in zip( x, y ) ] )
+  check_array( a ^ b, [ i ^ j for i, j in zip( x, y ) ] )
+  check_array( ~a,    [ ~i    for i in x ] )
+
+  for c in [ 0, 1, 0b1010, 2**nbits - 1 ]:
+    check_array( a & c, [ i & c for i in x ] )
+    check_array( c & a, [ c & i for i in x ] )
+    check_array( a | c, [ i | c for i in x ] )
+    check_array( a ^ c, [ i ^ c for i in x ] )
+
+  with pytest.raises( AssertionError ):
+    a & -1
+
+#-----------------------------------------------------------------------
+# test_shift
+#-----------------------------------------------------------------------
+@pytest.mark.parametrize( 'nbits', [ 1, 8, 13, 32, 64 ] )
+def test_shift( nbits ):
+
+  xs = random_values( nbits, 50, seed=5 )
+  a  = BitsArray.from_values( nbits, xs )
+  x  = [ Bits(nbits)( v ) for v in xs ]
+
+  for s in [ 0, 1, nbits - 1, nbits, nbits + 3 ]:
+    check_array( a << s, [ i << s for i in x ] )
+    check_array( a >> s, [ i >> s for i in x ] )
+    check_array( a << Bits(8)( s ), [ i << s for i in x ] )
+
+  amounts = random_values( 7, 50, seed=6 )
+  s = BitsArray.from_values( 7, amounts )
+  check_array( a << s, [ i << j for i, j in zip( x, amounts ) ] )
+  check_array( a >> s, [ i >> j for i, j in zip( x, amounts ) ] )
+
+  # Shift amounts must be integers
+
+  with pytest.raises( TypeError ):
+    a << 2.0
+  with pytest.raises( TypeError ):
+    a >> 1.5
+
+#-----------------------------------------------------------------------
+# test_compare
+#-----------------------------------------------------------------------
+@pytest.mark.parametrize( 'nbits, mbits', [ (1, 1), (4, 8), (64, 64) ] )
+def test_compare( nbits, mbits ):
+
+  xs = random_values( nbits, 50, seed=7 )
+  ys = random_values( mbits, 50, seed=8 )
+  ys[:10] = [ v & (2**min(nbits, mbits) - 1) for v in xs[:10] ]
+  a  = BitsArray.from_values( nbits, xs )
+  b  = BitsArray.from_values( mbits, ys )
+  x  = [ Bits(nbits)( v ) for v in xs ]
+
+  check_array( a == b, [ Bits(1)( i == j ) for i, j in zip( x, ys ) ] )
+  check_array( a != b, [ Bits(1)( i != j ) for i, j in zip( x, ys ) ] )
+  check_array( a <  b, [ Bits(1)( i <  j ) for i, j in zip( x, ys ) ] )
+  check_array( a <= b, [ Bits(1)( i <= j ) for i, j in zip( x, ys ) ] )
+  check_array( a >  b, [ Bits(1)( i >  j ) for i, j in zip( x, ys ) ] )
+  check_array( a >= b, [ Bits(1)( i >= j ) for i, j in zip( x, ys ) ] )
+
+  for c in [ 0, 1, 2**nbits - 1, 2**nbits, 2**70 ]:
+    check_array( a == c, [ Bits(1)( i == c ) for i in x ] )
+    check_array( a <  c, [ Bits(1)( i <  c ) for i in x ] )
+    check_array( a >= c, [ Bits(1)( i >= c ) for i in x ] )
+
+  # Floats are compared by value, like BitsN
+
+  for c in [ 0.0, float( xs[0] ), xs[1] + 0.5, 2.0**nbits ]:
+    check_array( a == c, [ i == c for i in x ] )
+    check_array( a != c, [ i != c for i in x ] )
+    check_array( a <  c, [ i <  c for i in x ] )
+    check_array( c >  a, [ i <  c for i in x ] )
+
+  assert not a == None
+  assert a != None
+
+  with pytest.raises( AssertionError ):
+    a < -1
+  with pytest.raises( ValueError ):
+    bool( a == b )
+
+#-----------------------------------------------------------------------
+# test_repr
+#-----------------------------------------------------------------------
+def test_repr():
+
+  a = BitsArray.from_values( 12, [ 1, 0xabc ] )
+  assert repr( a ) == 'BitsArray( 12, [0x001, 0xabc] )'
+
+#-----------------------------------------------------------------------
+# test_wide_constructor
+#-----------------------------------------------------------------------
+def test_wide_constructor():
+
+  a = BitsArray( 128, 3, -1 )
+  assert isinstance( a, WideBitsArray )
+  assert a.shape == (3,)
+  assert len( a ) == 3
+  assert a.uint().tolist() == [ 2**128 - 1 ] * 3
+  assert a.int().tolist()  == [ -1 ] * 3
+
+  with pytest.raises( ValueError ):
+    BitsArray( 128, 3, 2**128 )
+
+  b = BitsArray.from_values( 100, [ 2**99, -2, Bits(100)(7) ] )
+  assert isinstance( b, WideBitsArray )
+  assert b.uint().tolist() == [ 2**99, 2**100 - 2, 7 ]
+
+  c = BitsArray.from_values( 130, np.array( [ -1, 5 ] ) )
+  assert c.uint().tolist() == [ 2**130 - 1, 5 ]
+
+  assert isinstance( b.element( 0 ), Bits(100) )
+  assert b.element( 0 ) == 2**99
+  b.set_element( 1, 2**100 - 1 )
+  assert b.element( 1 ) == 2**100 - 1
+  assert repr( BitsArray.from_values( 68, [ 1 ] ) ) == \
+    'BitsArray( 68, [0x00000000000000001] )'
+
+#-----------------------------------------------------------------------
+# test_wide_slice
+#-----------------------------------------------------------------------
+@pytest.mark.parametrize( 'nbits', [ 65, 128, 200 ] )
+def test_wide_slice( nbits ):
+
+  values = random_values( nbits, 20, seed=9 )
+  a = BitsArray.from_values( nbits, values )
+  x = [ Bits(nbits)( v ) for v in values ]
+
+  for start, stop in [ (0, 1), (0, 64), (60, 70), (63, 65), (1, nbits),
+                       (nbits - 64, nbits), (5, nbits - 3), (64, 128) ]:
+    if stop > nbits:
+      continue
+    check_array( a[start:stop], [ v[start:stop] for v in x ] )
+
+  check_array( a[nbits - 1], [ v[nbits - 1] for v in x ] )
+
+  for start, stop in [ (0, 3), (62, 65), (nbits - 64, nbits - 1) ]:
+    b = a.copy()
+    y = [ v[:] for v in x ]
+    new = random_values( stop - start, 20, seed=start )
+    b[start:stop] = BitsArray.from_values( stop - start, new )
+    for v, n in zip( y, new ):
+      v[start:stop] = n
+    check_array( b, y )
+
+  b = a.copy()
+  b[nbits - 2] = 1
+  assert all( v[nbits - 2] == 1 for v in b.tolist() )
+
+#-----------------------------------------------------------------------
+# test_wide_arith
+#-----------------------------------------------------------------------
+@pytest.mark.parametrize( 'nbits, mbits', [
+  (64, 64), (65, 65), (128, 128), (128, 8), (8, 128), (512, 300),
+  (256, 256),
+])
+def test_wide_arith( nbits, mbits ):
+
+  xs = random_values( nbits, 30, seed=10 )
+  ys = random_values( mbits, 30, seed=11 )
+  xs[:3] = [ 2**nbits - 1, 0, 2**(nbits - 1) ]
+  ys[:3] = [ 1, 2**mbits - 1, 2**(mbits - 1) ]
+  a  = BitsArray.from_values( nbits, xs )
+  b  = BitsArray.from_values( mbits, ys )
+  x  = [ Bits(nbits)( v ) for v in xs ]
+  y  = [ Bits(mbits)( v ) for v in ys ]
+
+  check_array( a + b, [ i + j for i, j in zip( x, y ) ] )
+  check_array( a - b, [ i - j for i, j in zip( x, y ) ] )
+  check_array( b - a, [ j - i for i, j in zip( x, y ) ] )
+  check_array( a * b, [ i * j for i, j in zip( x, y ) ] )
+  check_array( a / b, [ i / j for i, j in zip( x, y ) ] )
+  check_array( a % b, [ i % j for i, j in zip( x, y ) ] )
+  check_array( a & b, [ i & j for i, j in zip( x, y ) ] )
+  check_array( a | b, [ i | j for i, j in zip( x, y ) ] )
+  check_array( a ^ b, [ i ^ j for i, j in zip( x, y ) ] )
+  check_array( ~a,    [ ~i    for i in x ] )
+
+  for c in [ 1, 2**64 - 1, 2**64, 2**nbits - 1 ]:
+    check_array( a + c, [ i + c for i in x ] )
+    check_array( a - c, [ i - c for i in x ] )
+    check_array( c - a, [ c - i for i in x ] )
+    check_array( a & c, [ i & c for i in x ] )
+    check_array( a | c, [ i | c for i in x ] )
+    check_array( a / c, [ i / c for i in x ] )
+
+#-----------------------------------------------------------------------
+# test_wide_shift
+#-----------------------------------------------------------------------
+@pytest.mark.parametrize( 'nbits', [ 65, 128, 200, 512 ] )
+def test_wide_shift( nbits ):
+
+  xs = random_values( nbits, 20, seed=12 )
+  a  = BitsArray.from_values( nbits, xs )
+  x  = [ Bits(nbits)( v ) for v in xs ]
+
+  for s in [ 0, 1, 63, 64, 65, 127, nbits - 1, nbits, nbits + 1 ]:
+    check_array( a << s, [ i << s for i in x ] )
+    check_array( a >> s, [ i >> s for i in x ] )
+
+  amounts = random_values( 10, 20, seed=13 )
+  s = BitsArray.from_values( 10, amounts )
+  check_array( a << s, [ i << j for i, j in zip( x, amounts ) ] )
+  check_array( a >> s, [ i >> j for i, j in zip( x, amounts ) ] )
+
+#-----------------------------------------------------------------------
+# test_wide_compare
+#-----------------------------------------------------------------------
+@pytest.mark.parametrize( 'nbits, mbits', [ (128, 128), (65, 200) ] )
+def test_wide_compare( nbits, mbits ):
+
+  xs = random_values( nbits, 30, seed=14 )
+  ys = random_values( mbits, 30, seed=15 )
+  ys[:10] = xs[:10]
+  ys[10]  = xs[10] ^ 1
+  ys[11]  = xs[11] ^ 2**(nbits - 1)
+  a  = BitsArray.from_values( nbits, xs )
+  b  = BitsArray.from_values( mbits, ys )
+  x  = [ Bits(nbits)( v ) for v in xs ]
+
+  check_array( a == b, [ Bits(1)( i == j ) for i, j in zip( x, ys ) ] )
+  check_array( a != b, [ Bits(1)( i != j ) for i, j in zip( x, ys ) ] )
+  check_array( a <  b, [ Bits(1)( i <  j ) for i, j in zip( x, ys ) ] )
+  check_array( a <= b, [ Bits(1)( i <= j ) for i, j in zip( x, ys ) ] )
+  check_array( a >  b, [ Bits(1)( i >  j ) for i, j in zip( x, ys ) ] )
+  check_array( a >= b, [ Bits(1)( i >= j ) for i, j in zip( x, ys ) ] )
+
+  for c in [ 0, xs[0], 2**nbits ]:
+    check_array( a == c, [ Bits(1)( i == c ) for i in x ] )
+    check_array( a <  c, [ Bits(1)( i <  c ) for i in x ] )
+
+  for c in [ float( xs[0] ), 2.0**(nbits - 1) + 0.5 ]:
+    check_array( a == c, [ i == c for i in x ] )
+    check_array( a <= c, [ i <= c for i in x ] )
+
+#-----------------------------------------------------------------------
+# test_concat
+#-----------------------------------------------------------------------
+def test_concat():
+
+  xs = random_values( 60, 20, seed=16 )
+  ys = random_values( 8,  20, seed=17 )
+  zs = random_values( 70, 20, seed=18 )
+  a  = BitsArray.from_values( 60, xs )
+  b  = BitsArray.from_values( 8,  ys )
+  c  = BitsArray.from_values( 70, zs )
+  x  = [ Bits(60)( v ) for v in xs ]
+  y  = [ Bits(8 )( v ) for v in ys ]
+  z  = [ Bits(70)( v ) for v in zs ]
+
+  check_array( concat( b, b ), [ bits_concat( j, j ) for j in y ] )
+  check_array( concat( a, b ), [ bits_concat( i, j ) for i, j in zip( x, y ) ] )
+  check_array( concat( c, a, b ),
+               [ bits_concat( k, i, j ) for i, j, k in zip( x, y, z ) ] )
+  check_array( concat( b, Bits(4)(0xa), c ),
+               [ bits_concat( j, Bits(4)(0xa), k ) for j, k in zip( y, z ) ] )
+
+#-----------------------------------------------------------------------
+# test_concat_columns
+#-----------------------------------------------------------------------
+@pytest.mark.parametrize( 'widths', [ [ 7, 5, 12 ], [ 3, 61 ], [ 40, 40, 1 ] ] )
+def test_concat_columns( widths ):
+
+  columns = [ random_values( n, 25, seed=n ) for n in widths ]
+  columns[0][1] = -1
+
+  words = concat_columns( widths, columns )
+  check_array( words, [ bits_concat( *[ Bits( n )( v )
+                                        for n, v in zip( widths, row ) ] )
+                        for row in zip( *columns ) ] )
+
+  numpy_columns = [ np.array( c[1:], dtype=np.int64 ) if n < 64 else c[1:]
+                    for n, c in zip( widths, columns ) ]
+  assert concat_columns( widths, numpy_columns ).tolist() == \
+         words.tolist()[1:]
+
+  with pytest.raises( ValueError ):
+    concat_columns( widths, columns[:-1] )
+
+  columns[-1][0] = 2**widths[-1]
+  with pytest.raises( ValueError ):
+    concat_columns( widths, columns )
+  assert concat_columns( widths, columns, trunc=True ).element( 0 ) == \
+         bits_concat( *[ Bits( n )( c[0], trunc=True )
+                         for n, c in zip( widths, columns ) ] )
+
+#-----------------------------------------------------------------------
+# test_extend
+#-----------------------------------------------------------------------
+@pytest.mark.parametrize( 'nbits, new_width', [
+  (4, 8), (8, 64), (64, 65), (60, 200), (100, 300), (128, 128),
+])
+def test_extend( nbits, new_width ):
+
+  xs = random_values( nbits, 20, seed=19 )
+  xs[:2] = [ 2**nbits - 1, 2**(nbits - 1) ]
+  a  = BitsArray.from_values( nbits, xs )
+  x  = [ Bits(nbits)( v ) for v in xs ]
+
+  check_array( zext( a, new_width ), [ bits_zext( i, new_width ) for i in x ] )
+  check_array( sext( a, new_width ), [ bits_sext( i, new_width ) for i in x ] )
+
+  # Extended copies must not alias the original
+  b = zext( a, new_width )
+  b[0] = 0
+  assert a.element( 0 )[0] == 1
+
+#-----------------------------------------------------------------------
+# test_shrink
+#-----------------------------------------------------------------------
+def test_shrink():
+
+  a = BitsArray.from_values( 100, [ 3, 2**100 - 2 ] )
+  assert sext( a, 4 ).uint().tolist() == [ 3, 14 ]
+  with pytest.raises( ValueError ):
+    zext( a, 4 )
+
+  b = BitsArray.from_values( 100, [ 3, 15 ] )
+  assert zext( b, 4 ).uint().tolist() == [ 3, 15 ]
+  with pytest.raises( ValueError ):
+    sext( b + 1, 4 )
+
+#-----------------------------------------------------------------------
+# test_reduce
+#-----------------------------------------------------------------------
+@pytest.mark.parametrize( 'nbits', [ 1, 2, 7, 32, 64, 65, 128, 300 ] )
+def test_reduce( nbits ):
+
+  xs = random_values( nbits, 30, seed=20 )
+  xs[:3] = [ 0, 2**nbits - 1, 2**(nbits - 1) ]
+  a  = BitsArray.from_values( nbits, xs )
+  x  = [ Bits(nbits)( v ) for v in xs ]
+
+  check_array( reduce_and( a ), [ bits_reduce_and( i ) for i in x ] )
+  check_array( reduce_or ( a ), [ bits_reduce_or ( i ) for i in x ] )
+  check_array( reduce_xor( a ), [ bits_reduce_xor( i ) for i in x ] )
+
+#-----------------------------------------------------------------------
+# test_reduce_segmented
+#-----------------------------------------------------------------------
+@pytest.mark.parametrize( 'nbits, segment', [ (8, 1), (16, 4), (64, 8),
+                                              (128, 8), (192, 64) ] )
+def test_reduce_segmented( nbits, segment ):
+
+  xs = random_values( nbits, 30, seed=23 )
+  xs[:2] = [ 0, 2**nbits - 1 ]
+  a  = BitsArray.from_values( nbits, xs )
+  x  = [ Bits(nbits)( v ) for v in xs ]
+
+  def segmented( fn, value ):
+    return bits_concat( *[ fn( value[ i:i+segment ] )
+                           for i in reversed( range( 0, nbits, segment ) ) ] )
+
+  for fn, bits_fn in [ ( reduce_and, bits_reduce_and ),
+                       ( reduce_or,  bits_reduce_or  ),
+                       ( reduce_xor, bits_reduce_xor ) ]:
+    check_array( fn( a, segment ), [ segmented( bits_fn, i ) for i in x ] )
+
+  with pytest.raises( ValueError ):
+    reduce_xor( a, segment=nbits + 1 )
+  with pytest.raises( ValueError ):
+    reduce_xor( a, segment=0 )
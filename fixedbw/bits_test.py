@@ -15,6 +15,15 @@ from bits import (
   reduce_and,
   reduce_or,
   reduce_xor,
+  enable_interning,
+  disable_interning,
+  interning_stats,
+  reset_interning_stats,
+  enable_unchecked,
+  disable_unchecked,
+  unchecked,
+  to_bytes,
+  from_bytes,
 )
 
 #-----------------------------------------------------------------------
@@ -93,6 +102,24 @@ def test_bad_constructor():
   with pytest.raises( TypeError ):
     x = BitsN(5)
 
+#-----------------------------------------------------------------------
+# test_slots
+#-----------------------------------------------------------------------
+def test_slots():
+
+  import copy
+
+  # Instances carry only their integer payload, without a __dict__
+
+  x = Bits(8)(5)
+  assert not hasattr( x, '__dict__' )
+  with pytest.raises( AttributeError ):
+    x.foo = 1
+
+  y = copy.copy( x )
+  assert y == 5 and y is not x
+  assert x[:] == 5 and x[:] is not x
+
 #-----------------------------------------------------------------------
 # test_constructor_bounds_checking
 #-----------------------------------------------------------------------
@@ -390,6 +417,33 @@ def test_compare_neg_assert():
   assert x <  Bits(4)(-1)
   assert x <= Bits(4)(-1)
 
+#-----------------------------------------------------------------------
+# test_compare_float
+#-----------------------------------------------------------------------
+def test_compare_float():
+
+  import fractions
+
+  # Non-integer numbers are compared by value against the unsigned value
+
+  x = Bits(4)(10)
+  assert ( x <  3.0 ) == 0 and ( 3.0 <  x ) == 1
+  assert ( x >  9.5 ) == 1 and ( x > 10.5 ) == 0
+  assert ( x <= 10.0 ) == 1 and ( x >= 10.5 ) == 0
+  assert ( x == 10.0 ) == 1 and ( x == 10.5 ) == 0
+  assert ( x != 10.0 ) == 0 and ( 10.5 != x ) == 1
+  assert ( Bits(4)(3) == 3.0 ) == 1
+  assert ( x < fractions.Fraction( 21, 2 ) ) == 1
+  assert type( x < 3.0 ) is Bits(1)
+
+  with pytest.raises( AssertionError ):
+    x > -1.0
+
+  with unchecked():
+    assert ( x <  3.0 ) == 0
+    assert ( x == 10.0 ) == 1
+    assert ( x > -1.0 ) == 1
+
 #-----------------------------------------------------------------------
 # test_compare_uint_neg
 #-----------------------------------------------------------------------
@@ -552,6 +606,64 @@ def test_sub():
   assert 7 - x ==  0b0010 and (7 - x).nbits == 4
   assert 9 - x ==  0b0100 and (9 - x).nbits == 4
 
+#-----------------------------------------------------------------------
+# test_result_types
+#-----------------------------------------------------------------------
+def test_result_types():
+
+  x = Bits(4)(0xf)
+  y = Bits(8)(0xff)
+
+  # Result classes are the same cached classes the factory returns
+
+  assert type( x + y ) is Bits(9)
+  assert type( x - y ) is Bits(9)
+  assert type( x * y ) is Bits(12)
+  assert type( x % y ) is Bits(4)
+  assert type( x & y ) is Bits(8)
+  assert type( x / y ) is Bits(4)
+  assert type( x + 1 ) is Bits(4)
+  assert type( x * 2 ) is Bits(8)
+  assert type( ~x    ) is Bits(4)
+
+  assert Bits(4)._add_types[ 8 ] is Bits(9)
+  assert Bits(4)._mul_types[ 8 ] is Bits(12)
+
+  # Results are still truncated to the result width
+
+  assert x - y == 0b100010000
+  assert x + 1 == 0
+  assert x * 0x100 == 0
+  assert 1 - x == 2
+
+#-----------------------------------------------------------------------
+# test_operand_types
+#-----------------------------------------------------------------------
+def test_operand_types():
+
+  x = Bits(8)(0x0f)
+
+  # Other integer types are treated like unsized ints
+
+  assert x + True == 0x10 and (x + True).nbits == 8
+  assert x + 2L   == 0x11 and (x + 2L  ).nbits == 8
+
+  # Non-integer operands are rejected rather than silently truncated
+
+  with pytest.raises( TypeError ):
+    x + 1.5
+  with pytest.raises( TypeError ):
+    x & 'a'
+  with pytest.raises( TypeError ):
+    1.5 - x
+
+  # Errors from the Bits-with-Bits path are no longer swallowed
+
+  with pytest.raises( ZeroDivisionError ):
+    x / Bits(8)(0)
+  with pytest.raises( ZeroDivisionError ):
+    x % Bits(8)(0)
+
 #-----------------------------------------------------------------------
 # test_lshift
 #-----------------------------------------------------------------------
@@ -902,3 +1014,277 @@ def test_reduce_xor():
   assert reduce_xor( Bits(3)(0b110) ) == 0
   assert reduce_xor( Bits(3)(0b000) ) == 0
 
+
+#-----------------------------------------------------------------------
+# test_interning
+#-----------------------------------------------------------------------
+def test_interning():
+
+  enable_interning( max_nbits = 4 )
+  try:
+
+    reset_interning_stats()
+
+    # Small widths share one instance per value, wider ones do not
+
+    assert Bits(4)(3) is Bits(4)(3)
+    assert Bits(4)(-1) is Bits(4)(15)
+    assert Bits(4)(19, trunc=True) is Bits(4)(3)
+    assert Bits(8)(3) is not Bits(8)(3)
+
+    # Operator results, comparisons and bit indexing are interned
+
+    x = Bits(4)(0b1010)
+    assert (x == 10) is Bits(1)(1)
+    assert (x <  10) is Bits(1)(0)
+    assert x[1] is Bits(1)(1)
+    assert (x & 0b0110) is Bits(4)(0b0010)
+    assert x[:] is x
+
+    # Interned values are still checked and are immutable
+
+    with pytest.raises( ValueError ):
+      Bits(4)(16)
+    with pytest.raises( TypeError ):
+      x[0] = 1
+    assert x == 0b1010
+
+    # Classes created while interning is enabled are interned too
+
+    assert Bits(3)(5) is Bits(3)(5)
+
+    stats = interning_stats()
+    assert stats['enabled']
+    assert stats['max_nbits'] == 4
+    assert stats['avoided'] > 0
+
+  finally:
+    disable_interning()
+
+  assert Bits(4)(3) is not Bits(4)(3)
+  assert not interning_stats()['enabled']
+
+  y = Bits(4)(0)
+  y[0] = 1
+  assert y == 1
+
+#-----------------------------------------------------------------------
+# test_inplace
+#-----------------------------------------------------------------------
+def test_inplace():
+
+  acc = Bits(8)( 250 )
+  ref = acc
+  acc += Bits(4)( 7 )
+  assert acc is ref and type( acc ) is Bits(8) and acc == 1
+  acc -= 2
+  assert acc is ref and acc == 255
+  acc *= Bits(16)( 3 )
+  assert acc == 253
+  acc /= 10
+  assert acc == 25
+  acc //= Bits(2)( 2 )
+  assert acc == 12
+  acc %= 5
+  assert acc == 2
+
+  reg = Bits(4)( 0b1001 )
+  ref = reg
+  reg <<= 1
+  assert reg is ref and reg == 0b0010
+  reg <<= 4
+  assert reg == 0
+  reg |= 0b0110
+  reg &= Bits(4)( 0b1100 )
+  reg ^= 0b1111
+  assert reg is ref and reg == 0b1011
+  reg >>= Bits(2)( 2 )
+  assert reg == 0b10
+
+  with pytest.raises( TypeError ):
+    reg += 1.5
+
+  # Explicit updates are visible through every reference
+
+  regs = [ Bits(8)( 0 ) ] * 2
+  regs[0].set_value( 0x7f )
+  regs[1].add_into( Bits(8)( 0x82 ) )
+  assert regs[0] == 1
+  regs[0].set_value( -1 )
+  assert regs[1] == 0xff
+  regs[0].set_value( 0x1ff, trunc=True )
+  assert regs[1] == 0xff
+
+  with pytest.raises( ValueError ):
+    regs[0].set_value( 0x100 )
+  with pytest.raises( TypeError ):
+    regs[0].add_into( 'x' )
+
+#-----------------------------------------------------------------------
+# test_inplace_interned
+#-----------------------------------------------------------------------
+def test_inplace_interned():
+
+  enable_interning( max_nbits = 4 )
+  try:
+
+    # Interned values never change; augmented assignment rebinds instead
+
+    x = Bits(4)( 3 )
+    y = x
+    x += 14
+    assert x == 1 and y == 3
+    assert x is Bits(4)( 1 )
+    x <<= 2
+    assert x is Bits(4)( 4 )
+
+    with pytest.raises( TypeError ):
+      y.set_value( 5 )
+    with pytest.raises( TypeError ):
+      y.add_into( 1 )
+    assert y == 3
+
+    # Wider classes are still updated in place
+
+    z = Bits(8)( 3 )
+    w = z
+    z += 1
+    assert z is w and w == 4
+
+  finally:
+    disable_interning()
+
+#-----------------------------------------------------------------------
+# test_unchecked
+#-----------------------------------------------------------------------
+def test_unchecked():
+
+  with unchecked():
+
+    # Out-of-range values wrap instead of raising
+
+    assert Bits(4)( 0x1f ) == 0xf
+    assert Bits(4)( -1 ) == 0xf
+    x = Bits(8)( 0 )
+    x[0:4] = 0x1f
+    assert x == 0x0f
+    x[7] = 3
+    assert x == 0x8f
+    x[:] = 0x123
+    assert x == 0x23
+    assert x & -1 == 0x23 and x | -256 == 0x23 and x ^ -1 == 0xdc
+    assert not ( x < -1 )
+
+    # Results are unchanged for valid operations
+
+    assert x[0:4] == 3 and type( x[0:4] ) is Bits(4)
+    assert x[1] == 1 and x[2] == 0
+    assert x[:] == x and x[:] is not x
+    assert x[4:] == 2 and x[:4] == 3
+    assert ( x < Bits(8)( 0x24 ) ) == 1
+
+    # Nested blocks keep the mode until the outermost one exits
+
+    with unchecked():
+      pass
+    assert Bits(4)( 0x1f ) == 0xf
+
+  with pytest.raises( ValueError ):
+    Bits(4)( 0x1f )
+  with pytest.raises( ValueError ):
+    Bits(8)( 0 )[0:4] = 0x1f
+  with pytest.raises( IndexError ):
+    Bits(8)( 0 )[8]
+  with pytest.raises( AssertionError ):
+    Bits(8)( 0 ) < -1
+
+#-----------------------------------------------------------------------
+# test_unchecked_interned
+#-----------------------------------------------------------------------
+def test_unchecked_interned():
+
+  enable_interning( max_nbits = 4 )
+  try:
+    enable_unchecked()
+    assert Bits(4)( 0x13 ) is Bits(4)( 3 )
+    assert Bits(3)( -1 ) is Bits(3)( 7 )
+    with pytest.raises( TypeError ):
+      Bits(4)( 1 )[0] = 0
+    disable_unchecked()
+    with pytest.raises( ValueError ):
+      Bits(4)( 0x13 )
+  finally:
+    disable_unchecked()
+    disable_interning()
+
+#-----------------------------------------------------------------------
+# test_reduce_wide
+#-----------------------------------------------------------------------
+def test_reduce_wide():
+
+  ones = Bits(1024)( 2**1024 - 1 )
+  assert reduce_and( ones ) == 1
+  assert reduce_or( ones ) == 1
+  assert reduce_xor( ones ) == 0
+
+  one = Bits(1024)( 2**1000 )
+  assert reduce_and( one ) == 0
+  assert reduce_or( one ) == 1
+  assert reduce_xor( one ) == 1
+  assert reduce_or( Bits(1024)( 0 ) ) == 0
+
+  assert reduce_xor( one ).nbits == 1
+
+#-----------------------------------------------------------------------
+# test_pickle
+#-----------------------------------------------------------------------
+def test_pickle():
+
+  import pickle
+
+  for protocol in range( pickle.HIGHEST_PROTOCOL + 1 ):
+    for x in [ Bits(1)( 1 ), Bits(17)( 0x1abcd ), Bits(200)( 2**199 + 5 ) ]:
+      data = pickle.dumps( x, protocol )
+      y    = pickle.loads( data )
+      assert type( y ) is type( x ) and y == x
+      assert 'Bits17' not in data
+
+  # Interned widths unpickle to the shared instances
+
+  enable_interning( 4 )
+  try:
+    x = Bits(4)( 9 )
+    assert pickle.loads( pickle.dumps( x, 2 ) ) is x
+  finally:
+    disable_interning()
+
+#-----------------------------------------------------------------------
+# test_bytes
+#-----------------------------------------------------------------------
+def test_bytes():
+
+  for nbits in [ 1, 8, 12, 16, 24, 32, 40, 64, 100 ]:
+    values = [ Bits( nbits )( v, trunc=True )
+               for v in [ 0, 1, 2**nbits - 1, 0x123456789abcdef0123456789 ] ]
+    data   = to_bytes( values )
+    assert len( data ) == 4 * ( ( nbits + 7 ) // 8 )
+    result = from_bytes( data, nbits )
+    assert result == values
+    assert all( type( r ) is Bits( nbits ) for r in result )
+
+  assert to_bytes( [ Bits(16)( 0x1234 ), Bits(16)( 0xabcd ) ] ) == \
+         '\x12\x34\xab\xcd'
+  assert to_bytes( [ Bits(12)( 0xabc ) ] ) == '\x0a\xbc'
+  assert to_bytes( ( Bits(8)( i ) for i in range( 3 ) ) ) == '\x00\x01\x02'
+  assert to_bytes( [] ) == '' and from_bytes( '', 8 ) == []
+
+  with pytest.raises( ValueError ):
+    to_bytes( [ Bits(8)( 1 ), Bits(9)( 1 ) ] )
+  with pytest.raises( ValueError ):
+    to_bytes( [ Bits(8)( 1 ) ], 16 )
+  with pytest.raises( TypeError ):
+    to_bytes( [ Bits(8)( 1 ), 2 ] )
+  with pytest.raises( ValueError ):
+    from_bytes( '\x00\x01\x02', 16 )
+  with pytest.raises( ValueError ):
+    from_bytes( '\x10', 4 )
@@ -0,0 +1,481 @@
+#==============================================================================
+# bitslice.py
+#==============================================================================
+# Bit-sliced evaluation of many independent fixed-bitwidth values.
+
+import operator
+
+from bits import Bits, BitsN, _add_nbits, _get_nbits, _real_operand
+
+#------------------------------------------------------------------------------
+# SlicedBits
+#------------------------------------------------------------------------------
+class SlicedBits( object ):
+  '''nlanes independent Bits(nbits) values stored in bit-sliced form.
+
+  Bit i of every lane is packed into a single Python int, the plane for
+  bit position i, with lane k in bit k of the plane. Bitwise operators
+  therefore evaluate one bit position of all lanes with a single Python
+  int operation, and arithmetic and comparisons are evaluated as gate
+  networks over the planes. Results follow the same bitwidth rules as
+  the corresponding BitsN operators.
+
+  > a = SlicedBits.from_values( 4, [ 1, 2, 3, 4 ] )  # four lanes
+  > b = a + 5                                        # 4-bit sums
+  > c = a < b                                        # SlicedBits(1)
+  > d = reduce_xor( a )                              # parity of each lane
+  > e = b.to_values()                                # [ Bits( 4, 0x6 ), ...
+
+  Operands are other SlicedBits with the same number of lanes, or BitsN
+  objects and ints, which are broadcast to every lane.
+  '''
+
+  __slots__ = ( 'nbits', 'nlanes', '_planes', '_lanes', '_mask' )
+
+  # Sliced values are mutable, so they cannot be hashed
+  __hash__ = None
+
+  #----------------------------------------------------------------------------
+  # constructors
+  #----------------------------------------------------------------------------
+  def __init__( self, nbits, nlanes, value = 0, trunc = False ):
+    '''Create nlanes lanes which all hold value.
+
+    If trunc = True, truncate excessively large values to fit into
+    nbits. If trunc = False (default), throw an error if the value is
+    too big to fit.'''
+
+    self._set_shape( nbits, nlanes )
+    uint = _check( self.nbits, int( value ), trunc )
+    self._planes = _broadcast( self.nbits, uint, self._lanes )
+
+  @classmethod
+  def from_values( cls, nbits, values, trunc = False ):
+    'Create one lane per element of a sequence of ints or Bits objects.'
+
+    nbits  = int( nbits )
+    values = [ _check( nbits, int( v ), trunc ) for v in values ]
+
+    # Transpose the lanes into planes through their binary strings: row k
+    # holds lane k, and column i of the rows becomes plane i
+    rows   = [ bin( v )[2:].zfill( nbits ) for v in reversed( values ) ]
+    planes = [ int( ''.join( col ), 2 ) for col in zip( *rows ) ]
+    planes.reverse()
+
+    return _wrap( nbits, len( values ), planes or [ 0 ] * nbits )
+
+  def _set_shape( self, nbits, nlanes ):
+    'Initialize the width and lane attributes.'
+    nbits = int( nbits )
+    if nbits < 1:
+      raise ValueError( 'SlicedBits width must be positive (got {})'
+                        .format( nbits ) )
+    self.nbits  = nbits
+    self.nlanes = int( nlanes )
+    self._lanes = (1 << self.nlanes) - 1
+    self._mask  = (1 << nbits) - 1
+
+  #----------------------------------------------------------------------------
+  # lane access
+  #----------------------------------------------------------------------------
+
+  def __len__( self ):
+    return self.nlanes
+
+  def lane( self, k ):
+    'Return the value of lane k as a Bits object.'
+    if not (0 <= k < self.nlanes):
+      raise IndexError( 'lane {} out of range for {} lanes'
+                        .format( k, self.nlanes ) )
+    uint = 0
+    for i, plane in enumerate( self._planes ):
+      uint |= ((plane >> k) & 1) << i
+    return Bits( self.nbits )( uint )
+
+  def uint( self ):
+    'Return the unsigned integer value of each lane as a list.'
+    if self.nlanes == 0:
+      return []
+    rows   = [ bin( p )[2:].zfill( self.nlanes )
+               for p in reversed( self._planes ) ]
+    values = [ int( ''.join( col ), 2 ) for col in zip( *rows ) ]
+    values.reverse()
+    return values
+
+  def to_values( self ):
+    'Return the value of each lane as a list of Bits objects.'
+    cls = Bits( self.nbits )
+    return [ cls( v ) for v in self.uint() ]
+
+  def planes( self ):
+    'Return a copy of the list of planes, least significant bit first.'
+    return list( self._planes )
+
+  def __nonzero__( self ):
+    raise ValueError( 'The truth value of a SlicedBits is ambiguous; '
+                      'use reduce_or() or compare lanes explicitly' )
+
+  def __repr__( self ):
+    hchars = ((self.nbits - 1) / 4) + 1
+    return 'SlicedBits( {}, [{}] )'.format( self.nbits,
+      ', '.join( '0x{:0{}x}'.format( v, hchars ) for v in self.uint() ) )
+
+  #----------------------------------------------------------------------------
+  # bit slicing
+  #----------------------------------------------------------------------------
+  # Slicing selects whole planes, so it costs nothing per lane.
+
+  def __getitem__( self, addr ):
+
+    if isinstance( addr, slice ):
+      start, stop = addr.start, addr.stop
+      if start is None: start = 0
+      if stop  is None: stop  = self.nbits
+      if addr.step is not None:
+        raise IndexError(
+          'Bits slicing using steps [start:stop:step] is not supported'
+        )
+      if not (0 <= start < stop <= self.nbits):
+        raise IndexError( 'Bits slice indices [{}:{}] out of range [0 - {}]'
+                          .format( start, stop, self.nbits ) )
+      return _wrap( stop - start, self.nlanes, self._planes[ start:stop ] )
+
+    addr = int( addr )
+    if not (0 <= addr < self.nbits):
+      raise IndexError( 'Bits index {} out of range [0 - {})'
+                        .format( addr, self.nbits ) )
+    return _wrap( 1, self.nlanes, [ self._planes[ addr ] ] )
+
+  def __setitem__( self, addr, value ):
+
+    if isinstance( addr, slice ):
+      start = 0          if addr.start is None else addr.start
+      stop  = self.nbits if addr.stop  is None else addr.stop
+    else:
+      start = int( addr )
+      stop  = start + 1
+
+    if not (0 <= start < stop <= self.nbits):
+      raise IndexError( 'Bits slice indices [{}:{}] out of range [0 - {}]'
+                        .format( start, stop, self.nbits ) )
+
+    width = stop - start
+    planes = self._operand_planes( value, width )
+    if planes is None:
+      raise TypeError( 'Cannot assign {!r} to a SlicedBits slice'
+                       .format( value ) )
+    if len( planes ) > width:
+      raise ValueError( 'Value does not fit in slice [{}:{}]'
+                        .format( start, stop ) )
+
+    self._planes[ start:stop ] = _extend( planes, width )
+
+  #----------------------------------------------------------------------------
+  # operand helpers
+  #----------------------------------------------------------------------------
+
+  def _operand( self, other ):
+    '''Split an operand into (nbits, planes). Unsized ints return None for
+    the width and planes of their own bit length. Unsupported operands
+    return (None, None).'''
+    if isinstance( other, SlicedBits ):
+      if other.nlanes != self.nlanes:
+        raise ValueError( 'SlicedBits lane counts differ ({} and {})'
+                          .format( self.nlanes, other.nlanes ) )
+      return other.nbits, other._planes
+    if isinstance( other, BitsN ):
+      return other.nbits, _broadcast( other.nbits, other._uint, self._lanes )
+    if isinstance( other, (int, long) ):
+      # Negative ints wrap into the width of self, like BitsN operands
+      if other < 0:
+        other &= (1 << self.nbits) - 1
+      return None, _broadcast( other.bit_length(), other, self._lanes )
+    return None, None
+
+  def _operand_planes( self, value, width ):
+    'Return the planes for an assigned value, or None if unsupported.'
+    if isinstance( value, (int, long) ):
+      return _broadcast( width, _check( width, value, False ), self._lanes )
+    return self._operand( value )[1]
+
+  def _binary( self, other, sized_nbits ):
+    '''Return (width, a, b) with the planes of both operands extended to
+    width, or None for unsupported operands. The width is
+    sized_nbits( self.nbits, other.nbits ) for sized operands, or
+    self.nbits for unsized ints, which are truncated to fit.'''
+
+    nbits, planes = self._operand( other )
+    if planes is None:
+      return None
+
+    width = self.nbits if nbits is None else sized_nbits( self.nbits, nbits )
+    return ( width, _extend( self._planes, width ),
+                    _extend( planes[:width], width ) )
+
+  #----------------------------------------------------------------------------
+  # arithmetic operators
+  #----------------------------------------------------------------------------
+
+  def __invert__( self ):
+    'result.nbits = self.nbits'
+    lanes = self._lanes
+    return _wrap( self.nbits, self.nlanes, [ p ^ lanes for p in self._planes ] )
+
+  def __add__( self, other ):
+    'result.nbits = max(self.nbits, other.nbits) + 1, or self.nbits for ints'
+    operands = self._binary( other, _add_nbits )
+    if operands is None:
+      return NotImplemented
+    width, a, b = operands
+    return _wrap( width, self.nlanes, _ripple_add( a, b, 0 )[0] )
+
+  def __radd__( self, other ):
+    return self.__add__( other )
+
+  def __sub__( self, other ):
+    'result.nbits = max(self.nbits, other.nbits) + 1, or self.nbits for ints'
+    operands = self._binary( other, _add_nbits )
+    if operands is None:
+      return NotImplemented
+    width, a, b = operands
+    return _wrap( width, self.nlanes, _ripple_sub( a, b, self._lanes )[0] )
+
+  def __rsub__( self, other ):
+    operands = self._binary( other, _add_nbits )
+    if operands is None:
+      return NotImplemented
+    width, a, b = operands
+    return _wrap( width, self.nlanes, _ripple_sub( b, a, self._lanes )[0] )
+
+  #----------------------------------------------------------------------------
+  # shift operators
+  #----------------------------------------------------------------------------
+  # Shifting by a constant only moves planes around.
+
+  def __lshift__( self, other ):
+    'result.nbits = self.nbits'
+    if not isinstance( other, (int, long, BitsN) ):
+      return NotImplemented
+    n = min( _shift_amount( other ), self.nbits )
+    return _wrap( self.nbits, self.nlanes,
+                  [ 0 ] * n + self._planes[ :self.nbits - n ] )
+
+  def __rshift__( self, other ):
+    'result.nbits = self.nbits'
+    if not isinstance( other, (int, long, BitsN) ):
+      return NotImplemented
+    n = min( _shift_amount( other ), self.nbits )
+    return _wrap( self.nbits, self.nlanes, self._planes[ n: ] + [ 0 ] * n )
+
+  #----------------------------------------------------------------------------
+  # bitwise operators
+  #----------------------------------------------------------------------------
+
+  def _bitwise( self, other, op ):
+    '''Apply a bitwise op (&, |, ^) plane by plane. The result width is
+    the max of the operand widths, or self.nbits for plain ints.'''
+    operands = self._binary( other, max )
+    if operands is None:
+      return NotImplemented
+    width, a, b = operands
+    return _wrap( width, self.nlanes, map( op, a, b ) )
+
+  def __and__( self, other ):
+    'result.nbits = max(self.nbits, other.nbits)'
+    return self._bitwise( other, operator.and_ )
+
+  def __xor__( self, other ):
+    'result.nbits = max(self.nbits, other.nbits)'
+    return self._bitwise( other, operator.xor )
+
+  def __or__( self, other ):
+    'result.nbits = max(self.nbits, other.nbits)'
+    return self._bitwise( other, operator.or_ )
+
+  def __rand__( self, other ):
+    return self.__and__( other )
+
+  def __rxor__( self, other ):
+    return self.__xor__( other )
+
+  def __ror__( self, other ):
+    return self.__or__( other )
+
+  #----------------------------------------------------------------------------
+  # comparison operators
+  #----------------------------------------------------------------------------
+  # Unlike the other operators, comparisons do not truncate ints: a lane
+  # is always smaller than an int which does not fit in its width.
+
+  def _compare( self, other ):
+    '''Return (a, b) with the planes of both operands extended to a common
+    width, or None for unsupported operands.'''
+    if isinstance( other, (int, long) ) and other < 0:
+      raise ValueError( 'Cannot compare SlicedBits with negative int {}'
+                        .format( other ) )
+    nbits, planes = self._operand( other )
+    if planes is None:
+      return None
+    width = max( self.nbits, len( planes ) )
+    return _extend( self._planes, width ), _extend( planes, width )
+
+  def _compare_real( self, other, op ):
+    '''Return a SlicedBits(1) with op( lane, other ) for every lane, where
+    other is a non-integer number such as a float, which is compared by
+    value like BitsN does. Return NotImplemented for other operands.'''
+    if _real_operand( other ) is None:
+      return NotImplemented
+    if other < 0:
+      raise ValueError( 'Cannot compare SlicedBits with negative number {}'
+                        .format( other ) )
+    plane = 0
+    for k, uint in enumerate( self.uint() ):
+      if op( uint, other ):
+        plane |= 1 << k
+    return _wrap( 1, self.nlanes, [ plane ] )
+
+  def _equal( self, other ):
+    'Return the plane of lanes where self == other.'
+    a, b = self._compare( other )
+    eq = self._lanes
+    for x, y in zip( a, b ):
+      eq &= ~(x ^ y)
+    return eq
+
+  def _less( self, a, b ):
+    'Return the plane of lanes where a < b: a - b borrows.'
+    return _ripple_sub( a, b, self._lanes )[1]
+
+  def _order( self, other, op, swap, negate ):
+    operands = self._compare( other )
+    if operands is None:
+      return self._compare_real( other, op )
+    a, b  = operands
+    plane = self._less( b, a ) if swap else self._less( a, b )
+    if negate:
+      plane ^= self._lanes
+    return _wrap( 1, self.nlanes, [ plane ] )
+
+  def __eq__( self, other ):
+    'result.nbits = 1'
+    if other is None: return False
+    if self._operand( other )[1] is None:
+      return self._compare_real( other, operator.eq )
+    return _wrap( 1, self.nlanes, [ self._equal( other ) ] )
+
+  def __ne__( self, other ):
+    'result.nbits = 1'
+    if other is None: return True
+    if self._operand( other )[1] is None:
+      return self._compare_real( other, operator.ne )
+    return _wrap( 1, self.nlanes, [ self._equal( other ) ^ self._lanes ] )
+
+  def __lt__( self, other ):
+    'result.nbits = 1'
+    return self._order( other, operator.lt, swap=False, negate=False )
+
+  def __le__( self, other ):
+    'result.nbits = 1'
+    return self._order( other, operator.le, swap=True, negate=True )
+
+  def __gt__( self, other ):
+    'result.nbits = 1'
+    return self._order( other, operator.gt, swap=True, negate=False )
+
+  def __ge__( self, other ):
+    'result.nbits = 1'
+    return self._order( other, operator.ge, swap=False, negate=True )
+
+#------------------------------------------------------------------------------
+# reduce_and
+#------------------------------------------------------------------------------
+def reduce_and( sliced ):
+  'Return a SlicedBits(1) with the anded value of the bits of each lane.'
+  return _wrap( 1, sliced.nlanes, [ reduce( operator.and_, sliced._planes ) ] )
+
+#------------------------------------------------------------------------------
+# reduce_or
+#------------------------------------------------------------------------------
+def reduce_or( sliced ):
+  'Return a SlicedBits(1) with the or-ed value of the bits of each lane.'
+  return _wrap( 1, sliced.nlanes, [ reduce( operator.or_, sliced._planes ) ] )
+
+#------------------------------------------------------------------------------
+# reduce_xor
+#------------------------------------------------------------------------------
+def reduce_xor( sliced ):
+  'Return a SlicedBits(1) with the xored value of the bits of each lane.'
+  return _wrap( 1, sliced.nlanes, [ reduce( operator.xor, sliced._planes ) ] )
+
+#------------------------------------------------------------------------------
+# _wrap
+#------------------------------------------------------------------------------
+def _wrap( nbits, nlanes, planes ):
+  '''Return a SlicedBits around a list of planes, which must hold nbits
+  planes with no bits set beyond nlanes.'''
+  sliced = object.__new__( SlicedBits )
+  sliced._set_shape( nbits, nlanes )
+  sliced._planes = planes
+  return sliced
+
+#------------------------------------------------------------------------------
+# _check
+#------------------------------------------------------------------------------
+def _check( nbits, value, trunc ):
+  'Return value as an unsigned int of nbits, checking that it fits.'
+  if not trunc:
+    _min = -2**(nbits - 1) if nbits > 1 else 0
+    _max = (2**nbits) - 1
+    if not (_min <= value <= _max):
+      raise ValueError(
+        'Value is too big to be represented with Bits({})!\n'
+        '({} bits are needed to represent value = {} in two\'s complement.)'
+        .format( nbits, _get_nbits(value), value )
+      )
+  return value & ((1 << nbits) - 1)
+
+#------------------------------------------------------------------------------
+# _broadcast
+#------------------------------------------------------------------------------
+def _broadcast( nbits, uint, lanes ):
+  'Return the planes holding uint in every lane.'
+  return [ lanes if (uint >> i) & 1 else 0 for i in xrange( nbits ) ]
+
+#------------------------------------------------------------------------------
+# _extend
+#------------------------------------------------------------------------------
+def _extend( planes, nbits ):
+  'Return planes zero-extended or truncated to nbits planes.'
+  return list( planes[:nbits] ) + [ 0 ] * (nbits - len( planes ))
+
+#------------------------------------------------------------------------------
+# _ripple_add
+#------------------------------------------------------------------------------
+def _ripple_add( a, b, carry ):
+  '''Add two equal-width lists of planes with a ripple-carry adder. Return
+  the sum planes and the carry-out plane.'''
+  out = []
+  for x, y in zip( a, b ):
+    p      = x ^ y
+    out.append( p ^ carry )
+    carry  = (x & y) | (carry & p)
+  return out, carry
+
+#------------------------------------------------------------------------------
+# _ripple_sub
+#------------------------------------------------------------------------------
+def _ripple_sub( a, b, lanes ):
+  '''Subtract two equal-width lists of planes as a + ~b + 1. Return the
+  difference planes and the borrow plane, set in lanes where a < b.'''
+  out, carry = _ripple_add( a, [ y ^ lanes for y in b ], lanes )
+  return out, carry ^ lanes
+
+#------------------------------------------------------------------------------
+# _shift_amount
+#------------------------------------------------------------------------------
+def _shift_amount( other ):
+  'Return a constant shift amount, rejecting negative ones like ints do.'
+  n = int( other )
+  if n < 0:
+    raise ValueError( 'negative shift count' )
+  return n
@@ -0,0 +1,200 @@
+#=======================================================================
+# bitslice_test.py
+#=======================================================================
+# Tests for the SlicedBits class.
+
+import operator
+import random
+
+import pytest
+
+from bits     import Bits
+from bits     import reduce_and as bits_reduce_and
+from bits     import reduce_or  as bits_reduce_or
+from bits     import reduce_xor as bits_reduce_xor
+from bitslice import (
+  SlicedBits,
+  reduce_and,
+  reduce_or,
+  reduce_xor,
+)
+
+#-----------------------------------------------------------------------
+# helpers
+#-----------------------------------------------------------------------
+
+def random_values( nbits, n, seed=0 ):
+  rng = random.Random( seed )
+  return [ rng.randint( 0, 2**nbits - 1 ) for _ in xrange( n ) ]
+
+def check_sliced( sliced, expected ):
+  'Check a SlicedBits matches a list of BitsN objects bit for bit.'
+  assert len( sliced ) == len( expected )
+  for x, y in zip( sliced.to_values(), expected ):
+    assert x.nbits == y.nbits
+    assert x.uint() == y.uint()
+
+#-----------------------------------------------------------------------
+# test_constructor
+#-----------------------------------------------------------------------
+def test_constructor():
+
+  a = SlicedBits( 4, 3 )
+  assert a.nbits == 4
+  assert a.nlanes == 3
+  assert a.uint() == [ 0, 0, 0 ]
+
+  a = SlicedBits( 4, 3, -2 )
+  assert a.uint() == [ 14, 14, 14 ]
+  assert a.planes() == [ 0b000, 0b111, 0b111, 0b111 ]
+
+  with pytest.raises( ValueError ):
+    SlicedBits( 4, 3, 16 )
+  assert SlicedBits( 4, 3, 16, trunc=True ).uint() == [ 0, 0, 0 ]
+
+#-----------------------------------------------------------------------
+# test_from_values
+#-----------------------------------------------------------------------
+def test_from_values():
+
+  a = SlicedBits.from_values( 4, [ 2, 15, -1, Bits(4)(-8) ] )
+  assert a.uint() == [ 2, 15, 15, 8 ]
+  assert a.planes() == [ 0b0110, 0b0111, 0b0110, 0b1110 ]
+  assert a.lane( 3 ) == Bits(4)(8)
+  assert repr( a ) == 'SlicedBits( 4, [0x2, 0xf, 0xf, 0x8] )'
+
+  values = [ Bits(13)(v) for v in random_values( 13, 100 ) ]
+  check_sliced( SlicedBits.from_values( 13, values ), values )
+
+  assert SlicedBits.from_values( 4, [] ).uint() == []
+
+  with pytest.raises( ValueError ):
+    SlicedBits.from_values( 4, [ 1, 16 ] )
+  with pytest.raises( IndexError ):
+    a.lane( 4 )
+  with pytest.raises( ValueError ):
+    bool( a )
+
+#-----------------------------------------------------------------------
+# test_slice
+#-----------------------------------------------------------------------
+def test_slice():
+
+  values = [ Bits(8)(v) for v in random_values( 8, 40 ) ]
+  a = SlicedBits.from_values( 8, values )
+
+  check_sliced( a[2:6], [ x[2:6] for x in values ] )
+  check_sliced( a[7],   [ x[7]   for x in values ] )
+  check_sliced( a[:],   values )
+
+  a[0:4] = 0b1001
+  a[7]   = Bits(1)(1)
+  for x in values:
+    x[0:4] = 0b1001
+    x[7]   = 1
+  check_sliced( a, values )
+
+  with pytest.raises( IndexError ):
+    a[4:9]
+  with pytest.raises( IndexError ):
+    a[8]
+  with pytest.raises( ValueError ):
+    a[0:2] = SlicedBits( 3, 40 )
+
+#-----------------------------------------------------------------------
+# test_arith
+#-----------------------------------------------------------------------
+@pytest.mark.parametrize( 'nbits, mbits', [ (1, 1), (4, 4), (5, 9), (12, 3) ] )
+def test_arith( nbits, mbits ):
+
+  xs = [ Bits(nbits)(v) for v in random_values( nbits, 64, seed=1 ) ]
+  ys = [ Bits(mbits)(v) for v in random_values( mbits, 64, seed=2 ) ]
+  a  = SlicedBits.from_values( nbits, xs )
+  b  = SlicedBits.from_values( mbits, ys )
+  k  = random_values( nbits, 1, seed=3 )[0]
+
+  check_sliced( a + b, [ x + y for x, y in zip( xs, ys ) ] )
+  check_sliced( a - b, [ x - y for x, y in zip( xs, ys ) ] )
+  check_sliced( a + k, [ x + k for x in xs ] )
+  check_sliced( a - k, [ x - k for x in xs ] )
+  check_sliced( k - a, [ k - x for x in xs ] )
+  check_sliced( a + ys[0], [ x + ys[0] for x in xs ] )
+  check_sliced( ys[0] - a, [ ys[0] - x for x in xs ] )
+
+  # Negative ints wrap into the width of the SlicedBits, as in BitsN
+  # arithmetic
+
+  for k in [ -1, -3, -2**nbits - 1 ]:
+    check_sliced( a + k, [ x + k for x in xs ] )
+    check_sliced( a - k, [ x - k for x in xs ] )
+    check_sliced( k - a, [ k - x for x in xs ] )
+
+#-----------------------------------------------------------------------
+# test_bitwise
+#-----------------------------------------------------------------------
+@pytest.mark.parametrize( 'nbits, mbits', [ (1, 1), (8, 8), (5, 9) ] )
+def test_bitwise( nbits, mbits ):
+
+  xs = [ Bits(nbits)(v) for v in random_values( nbits, 64, seed=1 ) ]
+  ys = [ Bits(mbits)(v) for v in random_values( mbits, 64, seed=2 ) ]
+  a  = SlicedBits.from_values( nbits, xs )
+  b  = SlicedBits.from_values( mbits, ys )
+
+  for op in [ operator.and_, operator.or_, operator.xor ]:
+    check_sliced( op( a, b ), [ op( x, y ) for x, y in zip( xs, ys ) ] )
+    check_sliced( op( a, 6 ), [ op( x, 6 ) for x in xs ] )
+    check_sliced( op( 6, a ), [ op( 6, x ) for x in xs ] )
+
+  check_sliced( ~a, [ ~x for x in xs ] )
+
+  for n in [ 0, 1, 3, nbits, nbits + 2 ]:
+    check_sliced( a << n, [ x << n for x in xs ] )
+    check_sliced( a >> n, [ x >> n for x in xs ] )
+
+#-----------------------------------------------------------------------
+# test_compare
+#-----------------------------------------------------------------------
+@pytest.mark.parametrize( 'nbits, mbits', [ (1, 1), (4, 4), (6, 3) ] )
+def test_compare( nbits, mbits ):
+
+  # Use few distinct values so that equal lanes are common
+  xs = [ Bits(nbits)(v % 5) for v in random_values( nbits, 64, seed=1 ) ]
+  ys = [ Bits(mbits)(v % 5) for v in random_values( mbits, 64, seed=2 ) ]
+  a  = SlicedBits.from_values( nbits, xs )
+  b  = SlicedBits.from_values( mbits, ys )
+
+  ops = [ operator.eq, operator.ne, operator.lt,
+          operator.le, operator.gt, operator.ge ]
+
+  for op in ops:
+    check_sliced( op( a, b ), [ op( x, y ) for x, y in zip( xs, ys ) ] )
+    for k in [ 0, 1, 3, 2**nbits + 1 ]:
+      check_sliced( op( a, k ), [ op( x, k ) for x in xs ] )
+
+    # Floats are compared by value, like BitsN
+    for f in [ 0.0, 1.0, 1.5, 3.0, 2.0**nbits + 0.5 ]:
+      check_sliced( op( a, f ), [ op( x, f ) for x in xs ] )
+      check_sliced( op( f, a ), [ op( f, x ) for x in xs ] )
+
+  assert ( a == None ) is False
+  assert ( a != None ) is True
+
+  with pytest.raises( ValueError ):
+    a == SlicedBits( nbits, 3 )
+  with pytest.raises( ValueError ):
+    a < -1
+  with pytest.raises( ValueError ):
+    a < -0.5
+
+#-----------------------------------------------------------------------
+# test_reduce
+#-----------------------------------------------------------------------
+@pytest.mark.parametrize( 'nbits', [ 1, 2, 7 ] )
+def test_reduce( nbits ):
+
+  xs = [ Bits(nbits)(v) for v in range( 2**nbits ) ]
+  a  = SlicedBits.from_values( nbits, xs )
+
+  check_sliced( reduce_and( a ), [ bits_reduce_and( x ) for x in xs ] )
+  check_sliced( reduce_or( a ),  [ bits_reduce_or( x )  for x in xs ] )
+  check_sliced( reduce_xor( a ), [ bits_reduce_xor( x ) for x in xs ] )
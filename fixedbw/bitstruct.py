@@ -0,0 +1,329 @@
+#==============================================================================
+# bitstruct.py
+#==============================================================================
+# Bits values with named bit fields.
+
+import keyword
+
+import bits
+from bits import Bits, BitsN, _get_nbits
+
+#------------------------------------------------------------------------------
+# BitStruct
+#------------------------------------------------------------------------------
+class BitStruct( type ):
+  '''A metaclass constructor which returns Bits classes with named fields.
+
+  Fields are given as (name, nbits) or (name, nbits, offset) tuples.
+  Fields without an offset start right above the previous field, and
+  the first one at bit 0, so a layout can be listed from its least
+  significant field upwards. The width of the struct defaults to the
+  top of its highest field.
+
+  > Inst = BitStruct( 'Inst', [ ( 'opcode', 7 ), ( 'rd', 5 ),
+  >                             ( 'funct3', 3 ), ( 'rs1', 5 ),
+  >                             ( 'imm', 12 ) ] )
+  > x = Inst.pack( opcode=0x13, rd=1, rs1=2, imm=5 )
+  > x.rd                       # Bits( 5, 0x01 )
+  > x.imm = 7                  # same as x[20:32] = 7
+  > x & 0xfff                  # structs are 32-bit Bits values
+
+  Fields are read and written through properties with precomputed
+  shifts and masks instead of the generic slice path of __getitem__.
+  pack() and unpack() are generated for each layout with every shift
+  and mask inlined, and pack_list(), unpack_list(), pack_array() and
+  unpack_array() convert whole sequences of records at once.
+
+  Like Bits(), BitStruct() returns the same class when called again with
+  the same name, fields and width, which lets structs be pickled.
+  '''
+
+  # Struct classes keyed by ( name, layout, nbits ), so that unpickled
+  # structs of the same layout share one class
+  __cache__ = {}
+
+  #----------------------------------------------------------------------------
+  # constructor
+  #----------------------------------------------------------------------------
+  def __new__( cls, name, fields, nbits = None ):
+    'Return a BitsN subclass with the given named fields.'
+
+    layout = _layout( fields )
+    top    = max( stop for _, _, stop in layout )
+    nbits  = top if nbits is None else int( nbits )
+
+    key = ( name, layout, nbits )
+    try:
+      return BitStruct.__cache__[ key ]
+    except KeyError:
+      pass
+
+    if nbits < top:
+      raise ValueError( 'Field {!r} does not fit in {} bits'.format(
+        [ n for n, _, stop in layout if stop > nbits ][0], nbits ) )
+
+    # Share the class attributes (and the result type tables) of the
+    # plain Bits(nbits) class. Structs do not derive from it so that they
+    # never inherit the patched constructors of interned widths.
+
+    base = Bits( nbits )
+    namespace = dict( ( attr, getattr( base, attr ) ) for attr in _BASE_ATTRS )
+    namespace.update( {
+      '__slots__': (),
+      'fields'   : tuple( n for n, _, _ in layout ),
+      'layout'   : layout,
+    } )
+
+    pack, unpack = _generate( name, layout )
+    namespace[ 'pack'  ]        = classmethod( pack )
+    namespace[ '_unpack_uint' ] = staticmethod( unpack )
+
+    for field, start, stop in layout:
+      if field in namespace or hasattr( BitsN, field ) \
+          or hasattr( _StructMethods, field ):
+        raise ValueError( 'Field name {!r} is reserved'.format( field ) )
+      namespace[ field ] = _field_property( field, start, stop )
+
+    new_class = type( name, ( _StructMethods, BitsN ), namespace )
+    BitStruct.__cache__[ key ] = new_class
+    return new_class
+
+_BASE_ATTRS = [
+  'nbits', '_max', '_min', '_mask', '_hchars', '_ochars',
+  '_add_types', '_mul_types', '_mod_types', '_bitwise_types',
+]
+
+#------------------------------------------------------------------------------
+# _StructMethods
+#------------------------------------------------------------------------------
+class _StructMethods( object ):
+  'Methods shared by the classes returned by BitStruct().'
+
+  __slots__ = ()
+
+  def unpack( self ):
+    'Return the value of every field as a tuple of Bits, in field order.'
+    return self._unpack_uint( self._uint )
+
+  def __repr__( self ):
+    return '{}( {} )'.format( self.__class__.__name__, ', '.join(
+      '{}={}'.format( name, getattr( self, name ).hex() )
+      for name in self.fields ) )
+
+  def __reduce__( self ):
+    # Struct classes are created at run time and cannot be looked up by
+    # name, so pickle the layout and rebuild the class from it
+    return _unpickle_struct, ( self.__class__.__name__, self.layout,
+                               self.nbits, self._uint )
+
+  #----------------------------------------------------------------------------
+  # bulk conversions
+  #----------------------------------------------------------------------------
+
+  @classmethod
+  def pack_list( cls, records ):
+    '''Return a list of structs packed from a sequence of records, each
+    a tuple of field values in field order or a dict keyed by name.'''
+    pack = cls.pack
+    return [ pack( **r ) if isinstance( r, dict ) else pack( *r )
+             for r in records ]
+
+  @classmethod
+  def unpack_list( cls, values ):
+    '''Return a list of field tuples unpacked from a sequence of structs,
+    Bits objects of the same width or ints.'''
+    unpack = cls._unpack_uint
+    return [ unpack( cls._payload( x ) ) for x in values ]
+
+  @classmethod
+  def pack_array( cls, columns, trunc = False ):
+    '''Return a BitsArray of structs packed from columns of field values,
+    given as a dict keyed by name or as a sequence in field order. Each
+    column is a sequence, NumPy array or BitsArray with one value per
+    struct. Missing fields are zero.
+
+    If trunc = True, truncate field values which are too big to fit. If
+    trunc = False (default), throw an error if any value does not fit.'''
+
+    from bits_array import BitsArray
+
+    if isinstance( columns, dict ):
+      unknown = set( columns ) - set( cls.fields )
+      if unknown:
+        raise ValueError( 'Unknown fields {} for {}'.format(
+          ', '.join( sorted( unknown ) ), cls.__name__ ) )
+      items = [ ( f, columns[ f ] ) for f in cls.fields if f in columns ]
+    else:
+      if len( columns ) != len( cls.fields ):
+        raise ValueError( 'Got {} columns for the {} fields of {}'.format(
+          len( columns ), len( cls.fields ), cls.__name__ ) )
+      items = zip( cls.fields, columns )
+
+    if not items:
+      raise ValueError( 'pack_array() needs at least one column' )
+
+    bounds = dict( ( f, ( start, stop ) ) for f, start, stop in cls.layout )
+    arrays = [ ( f, BitsArray.from_values( stop - start, values, trunc ) )
+               for f, values in items for start, stop in [ bounds[ f ] ] ]
+
+    result = BitsArray( cls.nbits, arrays[0][1].shape )
+    for f, array in arrays:
+      start, stop = bounds[ f ]
+      result[ start:stop ] = array
+    return result
+
+  @classmethod
+  def unpack_array( cls, array ):
+    '''Return a tuple with a BitsArray of values for every field, in field
+    order, unpacked from a BitsArray (or sequence) of structs.'''
+
+    from bits_array import BitsArray
+
+    if not isinstance( array, BitsArray ):
+      array = BitsArray.from_values( cls.nbits, array )
+    elif array.nbits != cls.nbits:
+      raise ValueError( 'Cannot unpack a BitsArray({}) as {} ({} bits)'
+                        .format( array.nbits, cls.__name__, cls.nbits ) )
+
+    return tuple( array[ start:stop ] for _, start, stop in cls.layout )
+
+  @classmethod
+  def _payload( cls, value ):
+    'Return the unsigned value of a struct, a Bits object or an int.'
+    if isinstance( value, BitsN ):
+      if value.nbits != cls.nbits:
+        raise ValueError( 'Cannot unpack a Bits({}) as {} ({} bits)'
+                          .format( value.nbits, cls.__name__, cls.nbits ) )
+      return value._uint
+    return cls( value )._uint
+
+#------------------------------------------------------------------------------
+# _layout
+#------------------------------------------------------------------------------
+def _unpickle_struct( name, layout, nbits, uint ):
+  'Rebuild a struct pickled by _StructMethods.__reduce__().'
+  cls = BitStruct( name, [ ( field, stop - start, start )
+                           for field, start, stop in layout ], nbits )
+  return bits._new_bits( cls, uint )
+
+def _layout( fields ):
+  'Return a tuple of (name, start, stop) for a list of field declarations.'
+
+  layout = []
+  offset = 0
+
+  for field in fields:
+    if len( field ) == 2:
+      name, nbits = field
+    else:
+      name, nbits, offset = field
+
+    name, nbits, offset = str( name ), int( nbits ), int( offset )
+
+    if not _is_identifier( name ) or name.startswith( '_' ):
+      raise ValueError( 'Invalid field name {!r}'.format( name ) )
+    if nbits < 1 or offset < 0:
+      raise ValueError( 'Invalid width or offset for field {!r}'
+                        .format( name ) )
+
+    start, stop = offset, offset + nbits
+    for other, other_start, other_stop in layout:
+      if other == name:
+        raise ValueError( 'Duplicate field {!r}'.format( name ) )
+      if start < other_stop and other_start < stop:
+        raise ValueError( 'Field {!r} [{}:{}] overlaps field {!r} [{}:{}]'
+                          .format( name, start, stop,
+                                   other, other_start, other_stop ) )
+
+    layout.append( ( name, start, stop ) )
+    offset = stop
+
+  if not layout:
+    raise ValueError( 'A BitStruct needs at least one field' )
+
+  return tuple( layout )
+
+def _is_identifier( name ):
+  return ( name and not keyword.iskeyword( name )
+           and ( name[0].isalpha() or name[0] == '_' )
+           and name.replace( '_', 'a' ).isalnum() )
+
+#------------------------------------------------------------------------------
+# _field_property
+#------------------------------------------------------------------------------
+def _field_property( name, start, stop ):
+  'Return a property reading and writing bits [start:stop] of a struct.'
+
+  nbits      = stop - start
+  field_type = Bits( nbits )
+  lo, ones   = _field_range( nbits )
+  clear      = ~(ones << start)
+
+  def get( self ):
+    return bits._new_bits( field_type, (self._uint >> start) & ones )
+
+  # Writes accept the same values as pack()
+  def set( self, value ):
+    value = int( value )
+    if not lo <= value <= ones:
+      raise _field_error( name, nbits, value )
+    self._uint = (self._uint & clear) | ((value & ones) << start)
+
+  return property( get, set, doc='Bits [{}:{}]'.format( start, stop ) )
+
+def _field_range( nbits ):
+  '''Return the (lo, hi) range of ints accepted by a field of nbits:
+  anything which fits in two's complement, or 0 and 1 for a single bit
+  like Bits(1).'''
+  lo = -2**(nbits - 1) if nbits > 1 else 0
+  return lo, (1 << nbits) - 1
+
+def _field_error( name, nbits, value ):
+  'Return the error raised when value does not fit in a field.'
+  return ValueError(
+    'Value is too big to fit in field {} ({} bits)!\n'
+    '({} bits are needed to represent value = {} in two\'s complement.)'
+    .format( name, nbits, _get_nbits( value ), value )
+  )
+
+#------------------------------------------------------------------------------
+# _generate
+#------------------------------------------------------------------------------
+def _generate( name, layout ):
+  '''Return the pack(cls, ...) and unpack(uint) functions of a layout,
+  generated with every shift, mask and range inlined.'''
+
+  namespace = { '_bits': bits, '_field_error': _field_error }
+
+  params = ', '.join( '{} = 0'.format( f ) for f, _, _ in layout )
+  lines  = [ 'def pack( _cls, {} ):'.format( params ) ]
+  parts  = []
+
+  for f, start, stop in layout:
+    nbits  = stop - start
+    lo, hi = _field_range( nbits )
+    lines.append( '  {} = int( {} )'.format( f, f ) )
+    lines.append( '  if not {} <= {} <= {}:'.format( lo, f, hi ) )
+    lines.append( '    raise _field_error( {!r}, {}, {} )'
+                  .format( f, nbits, f ) )
+    code = '({} & 0x{:x})'.format( f, hi )
+    parts.append( '({} << {})'.format( code, start ) if start else code )
+
+  lines.append( '  return _bits._new_bits( _cls, {} )'
+                .format( ' | '.join( parts ) ) )
+  lines.append( '' )
+
+  lines.append( 'def unpack( uint ):' )
+  lines.append( '  new = _bits._new_bits' )
+  values = []
+  for i, ( f, start, stop ) in enumerate( layout ):
+    namespace[ '_T{}'.format( i ) ] = Bits( stop - start )
+    shifted = '(uint >> {})'.format( start ) if start else 'uint'
+    values.append( 'new( _T{}, {} & 0x{:x} )'.format(
+      i, shifted, (1 << (stop - start)) - 1 ) )
+  lines.append( '  return ( {}, )'.format( ', '.join( values ) ) )
+  lines.append( '' )
+
+  source = '\n'.join( lines )
+  exec compile( source, '<bitstruct {}>'.format( name ), 'exec' ) in namespace
+  return namespace[ 'pack' ], namespace[ 'unpack' ]
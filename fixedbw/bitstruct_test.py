@@ -0,0 +1,232 @@
+#=======================================================================
+# bitstruct_test.py
+#=======================================================================
+# Tests for the BitStruct classes.
+
+import numpy as np
+import pytest
+
+from bits       import Bits, enable_interning, disable_interning
+from bits_array import BitsArray
+from bitstruct  import BitStruct
+
+Inst = BitStruct( 'Inst', [ ( 'opcode', 7 ), ( 'rd', 5 ), ( 'funct3', 3 ),
+                            ( 'rs1', 5 ), ( 'imm', 12 ) ] )
+
+#-----------------------------------------------------------------------
+# test_layout
+#-----------------------------------------------------------------------
+def test_layout():
+
+  assert Inst.nbits  == 32
+  assert Inst.fields == ( 'opcode', 'rd', 'funct3', 'rs1', 'imm' )
+  assert Inst.layout == ( ( 'opcode', 0, 7 ), ( 'rd', 7, 12 ),
+                          ( 'funct3', 12, 15 ), ( 'rs1', 15, 20 ),
+                          ( 'imm', 20, 32 ) )
+
+  # Explicit offsets, gaps and a wider total width
+
+  Header = BitStruct( 'Header', [ ( 'flags', 4, 60 ), ( 'length', 16 ),
+                                  ( 'kind', 4, 8 ) ], nbits=80 )
+  assert Header.nbits  == 80
+  assert Header.layout == ( ( 'flags', 60, 64 ), ( 'length', 64, 80 ),
+                            ( 'kind', 8, 12 ) )
+
+  with pytest.raises( ValueError ):
+    BitStruct( 'X', [ ( 'a', 4 ), ( 'b', 4, 2 ) ] )      # overlap
+  with pytest.raises( ValueError ):
+    BitStruct( 'X', [ ( 'a', 4 ), ( 'a', 4 ) ] )         # duplicate
+  with pytest.raises( ValueError ):
+    BitStruct( 'X', [ ( 'a', 4 ), ( 'b', 4 ) ], nbits=6 )
+  with pytest.raises( ValueError ):
+    BitStruct( 'X', [ ( 'uint', 4 ) ] )                  # reserved
+  with pytest.raises( ValueError ):
+    BitStruct( 'X', [ ( 'pack', 4 ) ] )
+  with pytest.raises( ValueError ):
+    BitStruct( 'X', [ ( '_a', 4 ) ] )
+  with pytest.raises( ValueError ):
+    BitStruct( 'X', [ ( 'a b', 4 ) ] )
+  with pytest.raises( ValueError ):
+    BitStruct( 'X', [ ( 'a', 0 ) ] )
+  with pytest.raises( ValueError ):
+    BitStruct( 'X', [] )
+
+#-----------------------------------------------------------------------
+# test_fields
+#-----------------------------------------------------------------------
+def test_fields():
+
+  x = Inst( 0x00510093 )    # addi x1, x2, 5
+
+  assert isinstance( x, Inst )
+  assert x.opcode == 0x13 and isinstance( x.opcode, Bits(7) )
+  assert x.rd     == 1    and isinstance( x.rd,     Bits(5) )
+  assert x.funct3 == 0
+  assert x.rs1    == 2
+  assert x.imm    == 5    and isinstance( x.imm,    Bits(12) )
+
+  for name, start, stop in Inst.layout:
+    assert getattr( x, name ) == x[ start:stop ]
+
+  x.imm = -1
+  assert x.imm == 0xfff
+  assert x.uint() == 0xfff10093
+  x.rd = Bits(5)(7)
+  assert x.rd == 7 and x.opcode == 0x13
+
+  with pytest.raises( ValueError ):
+    x.rd = 32
+  with pytest.raises( ValueError ):
+    x.funct3 = -5
+
+  # Structs are Bits values of their width
+
+  assert x == 0xfff10393
+  assert isinstance( x + Bits(32)(1), Bits(33) )
+  assert isinstance( ~x, Inst )
+  assert repr( Inst( 0x00510093 ) ) == \
+         'Inst( opcode=0x13, rd=0x01, funct3=0x0, rs1=0x02, imm=0x005 )'
+
+#-----------------------------------------------------------------------
+# test_pack_unpack
+#-----------------------------------------------------------------------
+def test_pack_unpack():
+
+  x = Inst.pack( opcode=0x13, rd=1, rs1=2, imm=5 )
+  assert isinstance( x, Inst )
+  assert x.uint() == 0x00510093
+  assert Inst.pack( 0x13, 1, 0, 2, 5 ) == x
+  assert Inst.pack( imm=-1 ).uint() == 0xfff00000
+
+  assert x.unpack() == ( 0x13, 1, 0, 2, 5 )
+  assert [ type( v ) for v in x.unpack() ] == \
+         [ Bits(7), Bits(5), Bits(3), Bits(5), Bits(12) ]
+
+  with pytest.raises( ValueError ):
+    Inst.pack( rd=32 )
+  with pytest.raises( ValueError ):
+    Inst.pack( imm=-2049 )
+  with pytest.raises( TypeError ):
+    Inst.pack( bogus=1 )
+
+  # Interning does not leak into struct classes
+
+  enable_interning( max_nbits=8 )
+  try:
+    Small = BitStruct( 'Small', [ ( 'lo', 4 ), ( 'hi', 4 ) ] )
+    y = Small.pack( lo=3, hi=4 )
+    y.hi = 5
+    assert type( y ) is Small and y == 0x53
+    assert y.lo is Bits(4)(3)
+  finally:
+    disable_interning()
+
+#-----------------------------------------------------------------------
+# test_field_range
+#-----------------------------------------------------------------------
+def test_field_range():
+
+  # Field writes and pack() accept the same values
+
+  S = BitStruct( 'S', [ ( 'a', 4 ), ( 'b', 1 ) ] )
+
+  for field, good, bad in [ ( 'a', [ -8, -1, 0, 15 ], [ -9, 16 ] ),
+                            ( 'b', [ 0, 1 ],          [ -1, -2, 2 ] ) ]:
+    for value in good:
+      x = S.pack( **{ field: value } )
+      y = S( 0 )
+      setattr( y, field, value )
+      assert x == y
+    for value in bad:
+      with pytest.raises( ValueError ):
+        S.pack( **{ field: value } )
+      with pytest.raises( ValueError ):
+        setattr( S( 0 ), field, value )
+
+  assert S.pack( a=-8 ).a == 8 and S.pack( a=-1 ).a == 15
+
+#-----------------------------------------------------------------------
+# test_bulk
+#-----------------------------------------------------------------------
+def test_bulk():
+
+  records = [ ( 0x13, 1, 0, 2, 5 ), ( 0x33, 3, 7, 4, -1 ),
+              dict( opcode=0x03, imm=8 ) ]
+
+  words = Inst.pack_list( records )
+  assert [ type( w ) for w in words ] == [ Inst ] * 3
+  assert words == [ Inst.pack( *records[0] ), Inst.pack( *records[1] ),
+                    Inst.pack( **records[2] ) ]
+
+  fields = Inst.unpack_list( words )
+  assert fields == [ w.unpack() for w in words ]
+  assert Inst.unpack_list( [ w.uint() for w in words ] ) == fields
+  assert Inst.unpack_list( [ Bits(32)( words[0] ) ] ) == fields[:1]
+  with pytest.raises( ValueError ):
+    Inst.unpack_list( [ Bits(16)( 0 ) ] )
+
+  # Arrays, from columns in field order or by name
+
+  columns = zip( *records[:2] )
+  array   = Inst.pack_array( columns )
+  assert isinstance( array, BitsArray ) and array.nbits == 32
+  assert array.tolist() == [ w.uint() for w in words[:2] ]
+
+  named = Inst.pack_array( { 'opcode': np.array( [ 0x13, 0x03 ] ),
+                             'imm'   : [ 5, 8 ] } )
+  assert named.tolist() == [ Inst.pack( opcode=0x13, imm=5 ).uint(),
+                             words[2].uint() ]
+
+  unpacked = Inst.unpack_array( array )
+  assert [ a.nbits for a in unpacked ] == [ 7, 5, 3, 5, 12 ]
+  assert zip( *[ a.tolist() for a in unpacked ] ) == \
+         [ tuple( v.uint() for v in f ) for f in fields[:2] ]
+  assert [ a.tolist() for a in Inst.unpack_array( array.tolist() ) ] == \
+         [ a.tolist() for a in unpacked ]
+
+  with pytest.raises( ValueError ):
+    Inst.pack_array( { 'rd': [ 32 ] } )
+  assert Inst.pack_array( { 'rd': [ 33 ] }, trunc=True ).tolist() == [ 1 << 7 ]
+  with pytest.raises( ValueError ):
+    Inst.pack_array( { 'bogus': [ 1 ] } )
+  with pytest.raises( ValueError ):
+    Inst.pack_array( columns[:2] )
+  with pytest.raises( ValueError ):
+    Inst.unpack_array( BitsArray( 16, 2 ) )
+
+  # Wide structs are packed into WideBitsArrays
+
+  Wide = BitStruct( 'Wide', [ ( 'lo', 60 ), ( 'mid', 40 ), ( 'hi', 28 ) ] )
+  values = [ ( 1, 2, 3 ), ( 2**60 - 1, 0, 2**28 - 1 ) ]
+  array  = Wide.pack_array( zip( *values ) )
+  assert array.nbits == 128
+  assert array.tolist() == [ w.uint() for w in Wide.pack_list( values ) ]
+  assert zip( *[ a.tolist() for a in Wide.unpack_array( array ) ] ) == values
+
+#-----------------------------------------------------------------------
+# test_pickle
+#-----------------------------------------------------------------------
+def test_pickle():
+
+  import copy
+  import pickle
+
+  Inst = BitStruct( 'Inst', [ ( 'opcode', 7 ), ( 'rd', 5 ),
+                              ( 'imm', 12, 20 ) ] )
+  x    = Inst.pack( opcode=0x13, rd=1, imm=5 )
+
+  # The same layout returns the same class, so structs unpickle to it
+
+  assert BitStruct( 'Inst', [ ( 'opcode', 7 ), ( 'rd', 5 ),
+                              ( 'imm', 12, 20 ) ] ) is Inst
+  assert BitStruct( 'Inst', [ ( 'opcode', 7 ), ( 'rd', 5 ) ] ) is not Inst
+
+  for protocol in range( pickle.HIGHEST_PROTOCOL + 1 ):
+    y = pickle.loads( pickle.dumps( x, protocol ) )
+    assert type( y ) is Inst and y == x
+    assert ( y.opcode, y.rd, y.imm ) == ( 0x13, 1, 5 )
+
+  # Copies keep the class too
+
+  z = copy.copy( x )
+  assert type( z ) is Inst and z == x and z is not x
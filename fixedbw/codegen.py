@@ -0,0 +1,309 @@
+#==============================================================================
+# codegen.py
+#==============================================================================
+# Compile functions over Bits values into specialized functions over ints.
+
+import __builtin__
+import inspect
+import re
+
+import bits
+from bits import Bits, BitsN
+from expr import Graph, Expr, topological_order
+
+#------------------------------------------------------------------------------
+# compile
+#------------------------------------------------------------------------------
+def compile( fn, arg_widths ):
+  '''Return a version of fn specialized for arguments of the given widths.
+
+  fn is traced once with symbolic Bits arguments (see expr.py), which
+  infers the width of every intermediate value with the BitsN rules.
+  The recorded operations are then emitted as a new Python function
+  over the raw unsigned payloads, with masks and shifts inlined, which
+  only creates Bits objects for its results.
+
+  > def mac( a, b, c ):
+  >   return a * b + c
+  > fast_mac = compile( mac, [ 8, 8, 16 ] )
+  > fast_mac( Bits(8)(3), Bits(8)(4), Bits(16)(5) )   # Bits( 17, 0x00011 )
+
+  fn may apply the BitsN operators, slicing and the bits.py functions
+  to its arguments, and may return a Bits value or a tuple or list of
+  them. It cannot branch on or convert the values of its arguments.
+  The compiled function takes Bits objects of the declared widths, or
+  ints which fit in them. The generated source is available as .source
+  and the underlying function over unsigned ints as .raw.
+  '''
+
+  widths = [ int( n ) for n in arg_widths ]
+  names  = _arg_names( fn, len( widths ) )
+
+  graph  = Graph()
+  inputs = [ graph.var( name, n ) for name, n in zip( names, widths ) ]
+  result = fn( *inputs )
+
+  source, namespace = _Generator( graph, inputs, result ).generate()
+
+  filename = '<compiled {}>'.format( getattr( fn, '__name__', 'function' ) )
+  exec __builtin__.compile( source, filename, 'exec' ) in namespace
+
+  compiled = namespace[ 'compiled' ]
+  compiled.raw    = namespace[ 'raw' ]
+  compiled.source = source
+  compiled.graph  = graph
+  compiled.__name__ = getattr( fn, '__name__', compiled.__name__ )
+  compiled.__doc__  = getattr( fn, '__doc__', None )
+  return compiled
+
+#------------------------------------------------------------------------------
+# _Generator
+#------------------------------------------------------------------------------
+class _Generator( object ):
+  'Emit the source of the raw and compiled functions for a traced graph.'
+
+  def __init__( self, graph, inputs, result ):
+    self.graph     = graph
+    self.inputs    = inputs
+    self.namespace = { '_bits': bits, '_arg': _arg, '_fit': _fit,
+                       '_sext_fit': _sext_fit }
+    self.codes     = {}
+
+    # Constant Bits outputs are returned as fresh objects like any other
+    # result, so they go through the graph as constant nodes
+    def output( x ):
+      return graph.const( x ) if isinstance( x, BitsN ) else x
+
+    if isinstance( result, (tuple, list) ):
+      self.outputs = [ output( x ) for x in result ]
+      self.sequence = type( result )
+    else:
+      self.outputs  = [ output( result ) ]
+      self.sequence = None
+
+  def generate( self ):
+
+    args  = ', '.join( x.param for x in self.inputs )
+    lines = [ 'def raw( {} ):'.format( args ) ]
+
+    for node in topological_order( self.outputs ):
+      code = self.emit( node )
+
+      # Names and literals (inputs, constants, no-op extensions) are used
+      # directly instead of being copied into a temporary
+      if _simple.match( code ):
+        self.codes[ node.index ] = code
+      else:
+        temp = '_t{}'.format( node.index )
+        lines.append( '  {} = {}'.format( temp, code ) )
+        self.codes[ node.index ] = temp
+
+    results = [ self.operand( x ) for x in self.outputs ]
+    lines.append( '  return {}'.format( self.pack( results ) ) )
+    lines.append( '' )
+
+    # The compiled function converts its arguments, calls raw() and wraps
+    # the unsigned results into Bits objects of the inferred widths
+
+    lines.append( 'def compiled( {} ):'.format( args ) )
+    for i, x in enumerate( self.inputs ):
+      cls = self.constant( '_C{}'.format( i ), Bits( x.nbits ) )
+      lines.append( '  {0} = {0}._uint if {0}.__class__ is {1} else '
+                    '_arg( {0}, {2} )'.format( x.param, cls, x.nbits ) )
+
+    temps = [ '_r{}'.format( i ) for i in range( len( self.outputs ) ) ]
+    lines.append( '  {} = raw( {} )'.format( self.pack( temps ), args ) )
+
+    wrapped = []
+    for i, ( x, temp ) in enumerate( zip( self.outputs, temps ) ):
+      if isinstance( x, Expr ):
+        cls = self.constant( '_R{}'.format( i ), Bits( x.nbits ) )
+        wrapped.append( '_bits._new_bits( {}, {} )'.format( cls, temp ) )
+      else:
+        wrapped.append( temp )
+    lines.append( '  return {}'.format( self.pack( wrapped, self.sequence ) ) )
+
+    return '\n'.join( lines ) + '\n', self.namespace
+
+  #----------------------------------------------------------------------------
+  # helpers
+  #----------------------------------------------------------------------------
+
+  def constant( self, name, value ):
+    'Bind value to name in the namespace of the generated code.'
+    self.namespace[ name ] = value
+    return name
+
+  def operand( self, x ):
+    'Return the code for an operand: a node, an int or another constant.'
+    if isinstance( x, Expr ):
+      return self.codes[ x.index ]
+    if isinstance( x, ( int, long ) ):
+      return repr( int( x ) )
+    return self.constant( '_k{}'.format( len( self.namespace ) ), x )
+
+  def pack( self, codes, sequence = tuple ):
+    'Return the code for a single value, or a tuple or list of values.'
+    if self.sequence is None:
+      return codes[0]
+    if sequence is list:
+      return '[ {} ]'.format( ', '.join( codes ) )
+    return '( {}, )'.format( ', '.join( codes ) )
+
+  #----------------------------------------------------------------------------
+  # emit
+  #----------------------------------------------------------------------------
+
+  def emit( self, node ):
+    'Return the code computing the unsigned value of node.'
+
+    op = node.op
+    if op == 'var':
+      return node.param
+    if op == 'const':
+      return _hex( node.param.uint() )
+
+    args  = node.args
+    codes = [ self.operand( x ) for x in args ]
+    ones  = (1 << node.nbits) - 1
+    mask  = _hex( ones )
+    sized = all( isinstance( x, Expr ) for x in args )
+
+    if op == 'invert':
+      return '{} ^ {}'.format( codes[0], mask )
+
+    # Sums and products of sized operands always fit in the result width
+
+    if op in _ARITH:
+      code = '{} {} {}'.format( codes[0], _ARITH[ op ], codes[1] )
+      if sized and op != 'sub':
+        return code
+      return '({}) & {}'.format( code, mask )
+
+    # Quotients and remainders of unsigned operands never grow, but
+    # negative unsized ints can make them negative
+
+    if op in _DIVIDE:
+      code = '{} {} {}'.format( codes[0], _DIVIDE[ op ], codes[1] )
+      if sized or args[1] > 0:
+        return code
+      return '({}) & {}'.format( code, mask )
+
+    # Unsized ints are truncated to the width of the sized operand
+
+    if op in _BITWISE:
+      if not sized:
+        codes = [ c if isinstance( x, Expr ) else _hex( x & ones )
+                  for x, c in zip( args, codes ) ]
+      return '{} {} {}'.format( codes[0], _BITWISE[ op ], codes[1] )
+
+    if op in _COMPARE:
+      return '(1 if {} {} {} else 0)'.format( codes[0], _COMPARE[ op ],
+                                              codes[1] )
+
+    if op == 'lshift':
+      amount = _constant_value( args[1] )
+      if amount is None:
+        return '(({0} << {1}) & {2} if {1} < {3} else 0)'.format(
+          codes[0], codes[1], mask, node.nbits )
+      if amount >= node.nbits:
+        return '0'
+      return '({} << {}) & {}'.format( codes[0], amount, mask )
+
+    if op == 'rshift':
+      return '{} >> {}'.format( codes[0], codes[1] )
+
+    if op == 'slice':
+      start, stop = node.param
+      if start == 0:
+        return '{} & {}'.format( codes[0], mask )
+      if stop == args[0].nbits:
+        return '{} >> {}'.format( codes[0], start )
+      return '({} >> {}) & {}'.format( codes[0], start, mask )
+
+    if op == 'concat':
+      parts = []
+      begin = node.nbits
+      for x, code in zip( args, codes ):
+        begin -= x.nbits
+        parts.append( '({} << {})'.format( code, begin ) if begin else code )
+      return ' | '.join( parts )
+
+    if op == 'zext':
+      if node.nbits >= args[0].nbits:
+        return codes[0]
+      return '_fit( {}, {} )'.format( codes[0], node.nbits )
+
+    if op == 'sext':
+      nbits = args[0].nbits
+      if node.nbits == nbits:
+        return codes[0]
+      if node.nbits < nbits:
+        return '_sext_fit( {}, {}, {} )'.format( codes[0], nbits, node.nbits )
+      ext  = ((1 << node.nbits) - 1) ^ ((1 << nbits) - 1)
+      return '({0} | {1} if {0} & {2} else {0})'.format(
+        codes[0], _hex( ext ), _hex( 1 << (nbits - 1) ) )
+
+    if op == 'reduce_and':
+      return '(1 if {} == {} else 0)'.format(
+        codes[0], _hex( (1 << args[0].nbits) - 1 ) )
+    if op == 'reduce_or':
+      return '(1 if {} else 0)'.format( codes[0] )
+    if op == 'reduce_xor':
+      return "bin( {} ).count( '1' ) & 1".format( codes[0] )
+
+    raise ValueError( 'Cannot compile {} nodes'.format( op ) )
+
+_ARITH   = { 'add': '+', 'sub': '-', 'mul': '*' }
+_DIVIDE  = { 'div': '//', 'mod': '%' }
+_BITWISE = { 'and': '&', 'or': '|', 'xor': '^' }
+_COMPARE = { 'eq': '==', 'ne': '!=', 'lt': '<', 'le': '<=', 'gt': '>',
+             'ge': '>=' }
+
+#------------------------------------------------------------------------------
+# helpers
+#------------------------------------------------------------------------------
+
+def _hex( value ):
+  return '0x{:x}'.format( value )
+
+_simple = re.compile( r'^\w+$' )
+
+def _constant_value( x ):
+  'Return the value of an int or constant node, or None for other nodes.'
+  if isinstance( x, Expr ):
+    return x.param.uint() if x.op == 'const' else None
+  return x
+
+def _arg_names( fn, nargs ):
+  'Return names for the arguments of the generated functions.'
+  try:
+    names = inspect.getargspec( fn ).args
+  except TypeError:
+    names = []
+  if len( names ) != nargs or any( n.startswith( '_' ) for n in names ):
+    names = [ '_a{}'.format( i ) for i in range( nargs ) ]
+  return names
+
+#------------------------------------------------------------------------------
+# runtime helpers
+#------------------------------------------------------------------------------
+# Called by the generated code on its slow paths.
+
+def _arg( value, nbits ):
+  'Return the unsigned payload of an argument which is not a Bits(nbits).'
+  if isinstance( value, BitsN ):
+    raise ValueError( 'Expected a Bits({}) argument, got {!r}'
+                      .format( nbits, value ) )
+  return Bits( nbits )( value ).uint()
+
+def _fit( uint, nbits ):
+  'Return uint if it fits in nbits, as zext() does when narrowing.'
+  if uint >> nbits:
+    raise bits._value_error( nbits, uint )
+  return uint
+
+def _sext_fit( uint, nbits, new_width ):
+  'Sign-extend a Bits(nbits) value into a narrower width, as sext() does.'
+  value = uint - (1 << nbits) if uint >> (nbits - 1) else uint
+  return Bits( new_width )( value ).uint()
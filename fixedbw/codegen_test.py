@@ -0,0 +1,263 @@
+#=======================================================================
+# codegen_test.py
+#=======================================================================
+# Tests for compiling Bits functions with codegen.compile().
+
+import random
+
+import pytest
+
+from bits    import Bits, concat, zext, sext
+from bits    import reduce_and, reduce_or, reduce_xor
+from codegen import compile
+from expr    import Graph
+
+#-----------------------------------------------------------------------
+# helpers
+#-----------------------------------------------------------------------
+
+def random_args( widths, n, seed=0 ):
+  rng = random.Random( seed )
+  for _ in xrange( n ):
+    yield [ Bits( w )( rng.randint( 0, 2**w - 1 ) ) for w in widths ]
+
+def check_compiled( fn, widths, n=200 ):
+  'Check fn and its compiled version agree bit for bit.'
+  compiled = compile( fn, widths )
+  for args in random_args( widths, n ):
+    expected = fn( *args )
+    result   = compiled( *args )
+    if not isinstance( expected, (tuple, list) ):
+      expected, result = [ expected ], [ result ]
+    assert len( result ) == len( expected )
+    for x, y in zip( result, expected ):
+      assert x.nbits == y.nbits
+      assert x.uint() == y.uint()
+  return compiled
+
+#-----------------------------------------------------------------------
+# test_widths
+#-----------------------------------------------------------------------
+def test_widths():
+
+  g = Graph()
+  x = g.var( 'x', 8 )
+  y = g.var( 'y', 4 )
+
+  assert (x + y).nbits == 9
+  assert (x - 3).nbits == 8
+  assert (x * y).nbits == 12
+  assert (x * 3).nbits == 16
+  assert (y / x).nbits == 4
+  assert (x % y).nbits == 4
+  assert (x & y).nbits == 8
+  assert (x << y).nbits == 8
+  assert (x < y).nbits == 1
+  assert x[2:5].nbits == 3
+  assert concat( x, y ).nbits == 12
+  assert zext( y, 16 ).nbits == 16
+  assert reduce_or( x ).nbits == 1
+
+#-----------------------------------------------------------------------
+# test_shared_nodes
+#-----------------------------------------------------------------------
+def test_shared_nodes():
+
+  g = Graph()
+  x = g.var( 'x', 8 )
+  y = g.var( 'y', 8 )
+
+  assert (x + y) is (x + y)
+  assert (x + y) is not (y + x)
+  assert (x + Bits(8)(1)) is (x + Bits(8)(1))
+  assert g.cse_hits == 3
+  assert g.var( 'x', 8 ) is x
+
+  with pytest.raises( ValueError ):
+    g.var( 'x', 4 )
+  with pytest.raises( ValueError ):
+    x + Graph().var( 'z', 8 )
+
+#-----------------------------------------------------------------------
+# test_arith
+#-----------------------------------------------------------------------
+def test_arith():
+
+  check_compiled( lambda a, b: a + b, [ 8, 5 ] )
+  check_compiled( lambda a, b: a - b, [ 8, 5 ] )
+  check_compiled( lambda a, b: b - a, [ 8, 5 ] )
+  check_compiled( lambda a, b: a * b, [ 8, 5 ] )
+  check_compiled( lambda a, b: a / (b | 1), [ 8, 5 ] )
+  check_compiled( lambda a, b: a % (b | 1), [ 8, 5 ] )
+  check_compiled( lambda a: a + 300, [ 8 ] )
+  check_compiled( lambda a: a - 300, [ 8 ] )
+  check_compiled( lambda a: 7 - a, [ 8 ] )
+  check_compiled( lambda a: a * 300, [ 8 ] )
+  check_compiled( lambda a: a / 7, [ 8 ] )
+  check_compiled( lambda a: a % -7, [ 8 ] )
+  check_compiled( lambda a: Bits(12)(0xabc) / (a | 1), [ 8 ] )
+  check_compiled( lambda a: ~a, [ 8 ] )
+
+  with pytest.raises( ZeroDivisionError ):
+    compile( lambda a, b: a / b, [ 8, 8 ] )( Bits(8)(1), Bits(8)(0) )
+
+#-----------------------------------------------------------------------
+# test_bitwise
+#-----------------------------------------------------------------------
+def test_bitwise():
+
+  check_compiled( lambda a, b: a & b, [ 8, 12 ] )
+  check_compiled( lambda a, b: a | b, [ 8, 12 ] )
+  check_compiled( lambda a, b: a ^ b, [ 8, 12 ] )
+  check_compiled( lambda a: a & 0x1f0, [ 8 ] )
+  check_compiled( lambda a: 0x1f0 | a, [ 8 ] )
+  check_compiled( lambda a: a ^ 0x1ff, [ 8 ] )
+
+#-----------------------------------------------------------------------
+# test_shift
+#-----------------------------------------------------------------------
+def test_shift():
+
+  check_compiled( lambda a, b: a << b, [ 8, 4 ] )
+  check_compiled( lambda a, b: a >> b, [ 8, 4 ] )
+  check_compiled( lambda a: a << 3, [ 8 ] )
+  check_compiled( lambda a: a << 9, [ 8 ] )
+  check_compiled( lambda a: a >> Bits(4)(3), [ 8 ] )
+  check_compiled( lambda a: Bits(8)(0x5a) << a, [ 3 ] )
+
+#-----------------------------------------------------------------------
+# test_inplace
+#-----------------------------------------------------------------------
+def accumulate( acc, x ):
+  acc  = acc[:]      # a copy, so that the arguments are not modified
+  acc += x
+  acc <<= 3
+  acc *= x
+  return acc
+
+def test_inplace():
+
+  # Augmented assignments keep the width of their left operand, as they
+  # do for Bits objects
+
+  compiled = compile( accumulate, [ 8, 8 ] )
+  result   = compiled( Bits(8)( 0xfe ), Bits(8)( 0x06 ) )
+  assert result.nbits == 8 and result.uint() == 0xc0
+
+  check_compiled( accumulate, [ 8, 8 ] )
+  check_compiled( accumulate, [ 4, 9 ] )
+
+  for fn in [ lambda a, b: a.__iadd__( b ), lambda a, b: a.__isub__( b ),
+              lambda a, b: a.__imul__( b ), lambda a, b: a.__imod__( b | 1 ),
+              lambda a, b: a.__idiv__( b | 1 ), lambda a, b: a.__iand__( b ),
+              lambda a, b: a.__ior__( b ), lambda a, b: a.__ixor__( b ),
+              lambda a, b: a.__ilshift__( b ), lambda a, b: a.__irshift__( b ),
+              lambda a, b: a[:].__iand__( -2 ), lambda a, b: a[:].__iadd__( 300 ) ]:
+    check_compiled( lambda a, b: fn( a[:], b ), [ 8, 5 ] )
+    check_compiled( lambda a, b: fn( a[:], b ), [ 5, 8 ] )
+
+#-----------------------------------------------------------------------
+# test_compare
+#-----------------------------------------------------------------------
+def test_compare():
+
+  for fn in [ lambda a, b: a == b, lambda a, b: a != b,
+              lambda a, b: a <  b, lambda a, b: a <= b,
+              lambda a, b: a >  b, lambda a, b: a >= b ]:
+    check_compiled( fn, [ 2, 3 ] )
+
+  check_compiled( lambda a: a < 300, [ 8 ] )
+  check_compiled( lambda a: 3 < a, [ 2 ] )
+  check_compiled( lambda a: Bits(4)(3) >= a, [ 2 ] )
+
+#-----------------------------------------------------------------------
+# test_slice
+#-----------------------------------------------------------------------
+def test_slice():
+
+  check_compiled( lambda a: ( a[0], a[7], a[2:5], a[:4], a[4:], a[:] ),
+                  [ 8 ] )
+  check_compiled( lambda a, b: concat( a, b[1:3], Bits(4)(9) ), [ 8, 5 ] )
+
+  with pytest.raises( IndexError ):
+    compile( lambda a: a[8], [ 8 ] )
+  with pytest.raises( TypeError ):
+    compile( lambda a, b: a[b], [ 8, 3 ] )
+
+#-----------------------------------------------------------------------
+# test_extend
+#-----------------------------------------------------------------------
+def test_extend():
+
+  check_compiled( lambda a: ( zext( a, 12 ), sext( a, 12 ),
+                              zext( a, 8 ), sext( a, 8 ) ), [ 8 ] )
+
+  # Narrowing checks the value fits, like the interpreted functions
+
+  narrow_zext = compile( lambda a: zext( a, 4 ), [ 8 ] )
+  narrow_sext = compile( lambda a: sext( a, 4 ), [ 8 ] )
+
+  assert narrow_zext( Bits(8)(0x0e) ) == Bits(4)(0xe)
+  assert narrow_sext( Bits(8)(0xfe) ) == Bits(4)(0xe)
+  with pytest.raises( ValueError ):
+    narrow_zext( Bits(8)(0xfe) )
+  with pytest.raises( ValueError ):
+    narrow_sext( Bits(8)(0x10) )
+
+#-----------------------------------------------------------------------
+# test_reduce
+#-----------------------------------------------------------------------
+def test_reduce():
+
+  check_compiled( lambda a: ( reduce_and( a ), reduce_or( a ),
+                              reduce_xor( a ) ), [ 3 ] )
+
+#-----------------------------------------------------------------------
+# test_model
+#-----------------------------------------------------------------------
+def test_model():
+
+  def mac( a, b, c ):
+    'Multiply-accumulate with saturation flag.'
+    p = a * b
+    s = p + c
+    return s[0:16], s[16] | reduce_or( p[15:] ), s == p + c
+
+  compiled = check_compiled( mac, [ 8, 8, 16 ] )
+  assert compiled.__name__ == 'mac'
+  assert compiled.__doc__ == mac.__doc__
+  assert compiled.source.count( ' + ' ) == 1
+
+  raw = compiled.raw( 3, 4, 5 )
+  assert raw == ( 17, 0, 1 )
+
+#-----------------------------------------------------------------------
+# test_arguments
+#-----------------------------------------------------------------------
+def test_arguments():
+
+  add = compile( lambda a, b: a + b, [ 8, 8 ] )
+
+  assert add( 3, -1 ) == Bits(9)(258)
+  with pytest.raises( ValueError ):
+    add( 256, 0 )
+  with pytest.raises( ValueError ):
+    add( Bits(4)(3), 0 )
+
+  # Constant and unsized results are returned as they are
+
+  const = compile( lambda a: [ Bits(4)(3), 7, a ], [ 8 ] )
+  r = const( Bits(8)(1) )
+  assert isinstance( r, list )
+  assert r[0] == Bits(4)(3) and r[0].nbits == 4
+  assert r[1] == 7
+
+  # Traced functions cannot depend on the values of their arguments
+
+  def branch( a ):
+    return a + 1 if a > 3 else a
+
+  with pytest.raises( TypeError ):
+    compile( branch, [ 8 ] )
+  with pytest.raises( TypeError ):
+    compile( lambda a: Bits(8)(a), [ 8 ] )
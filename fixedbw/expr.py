@@ -0,0 +1,600 @@
+#==============================================================================
+# expr.py
+#==============================================================================
+# Symbolic fixed-bitwidth expressions.
+#
+# An Expr stands for a Bits value which is not known yet. Applying the
+# BitsN operators and the bits.py functions to Exprs records each
+# operation as a node of a Graph instead of computing it, and infers the
+# width of every node with the same rules as the corresponding BitsN
+# operator. Graphs are hash-consed, so repeating an operation on the same
+# operands returns the node built the first time.
+
+import operator
+
+import bits
+from bits import Bits, BitsN, _add_nbits, _mul_nbits, _int_types
+
+#------------------------------------------------------------------------------
+# Graph
+#------------------------------------------------------------------------------
+class Graph( object ):
+  '''A DAG of Expr nodes.
+
+  > g = Graph()
+  > x = g.var( 'x', 8 )
+  > y = g.var( 'y', 8 )
+  > s = x + y                 # Expr of Bits(9)
+  > s is (x + y)              # True: nodes are shared
+
+  Nodes are numbered in creation order, which is always a topological
+  order since operands are created before the nodes which use them.
+  Operations whose operands are all constants are folded into a new
+  constant node as they are built, unless fold = False.
+  '''
+
+  def __init__( self, fold = True ):
+    self._nodes   = {}
+    self._inputs  = {}
+    self.fold     = fold
+
+    # Number of operations which reused an existing node, and which were
+    # folded into constants
+    self.cse_hits = 0
+    self.folded   = 0
+
+  def __len__( self ):
+    return len( self._nodes )
+
+  def var( self, name, nbits ):
+    'Return the input node called name, creating it if needed.'
+    nbits = int( nbits )
+    if name in self._inputs:
+      node = self._inputs[ name ]
+      if node.nbits != nbits:
+        raise ValueError( 'Input {} is already declared as Bits({})'
+                          .format( name, node.nbits ) )
+      return node
+    node = self._node( 'var', (), name, nbits )
+    self._inputs[ name ] = node
+    return node
+
+  def const( self, value ):
+    'Return the constant node for a Bits value.'
+    if not isinstance( value, BitsN ):
+      raise TypeError( 'Constant nodes need a sized Bits value, got {!r}'
+                       .format( value ) )
+    return self._node( 'const', (), value, value.nbits )
+
+  def inputs( self ):
+    'Return the input nodes, in creation order.'
+    return sorted( self._inputs.values(), key=lambda node: node.index )
+
+  def _node( self, op, args, param, nbits ):
+    'Return the node for op applied to args, reusing an existing one.'
+
+    key = ( op, _param_key( param ), tuple( _arg_key( a ) for a in args ) )
+    try:
+      node = self._nodes[ key ]
+      if args:
+        self.cse_hits += 1
+      return node
+    except KeyError:
+      node = Expr( self, op, args, param, nbits, len( self._nodes ) )
+      self._nodes[ key ] = node
+      return node
+
+  def _apply( self, op, args, param = None ):
+    '''Return the node for op applied to args, which are Exprs, Bits
+    constants or ints. Bits constants are turned into constant nodes.'''
+    args = tuple( self.const( a ) if isinstance( a, BitsN ) else a
+                  for a in args )
+    for a in args:
+      if isinstance( a, Expr ) and a.graph is not self:
+        raise ValueError( 'Cannot combine expressions from different graphs' )
+
+    nbits = _infer_nbits( op, args, param )
+
+    # Compute operations on constants right away with the BitsN operators
+    if self.fold and all( a.op == 'const' for a in args
+                          if isinstance( a, Expr ) ):
+      values = [ a.param if isinstance( a, Expr ) else a for a in args ]
+      self.folded += 1
+      return self.const( _OPS[ op ]( values, param ) )
+
+    return self._node( op, args, param, nbits )
+
+  def _evaluate( self, outputs, inputs ):
+    'Return the values of outputs for the given input values.'
+    return evaluate( outputs, inputs )
+
+#------------------------------------------------------------------------------
+# Expr
+#------------------------------------------------------------------------------
+class Expr( object ):
+  '''A node of a Graph: op applied to args.
+
+  args holds the operand nodes, and ints for unsized operands. param
+  holds the input name for 'var' nodes, the Bits value for 'const'
+  nodes, (start, stop) for 'slice' nodes and the new width for 'zext'
+  and 'sext' nodes.
+  '''
+
+  __slots__ = ( 'graph', 'op', 'args', 'param', 'nbits', 'index' )
+
+  def __init__( self, graph, op, args, param, nbits, index ):
+    self.graph = graph
+    self.op    = op
+    self.args  = args
+    self.param = param
+    self.nbits = nbits
+    self.index = index
+
+  def __repr__( self ):
+    if self.op == 'var':
+      return 'Expr( {}, {} )'.format( self.nbits, self.param )
+    if self.op == 'const':
+      return 'Expr( {}, {} )'.format( self.nbits, self.param.hex() )
+    return 'Expr( {}, {}#{} )'.format( self.nbits, self.op, self.index )
+
+  # Expressions have no value yet, so they cannot drive Python control
+  # flow or be converted to ints.
+
+  def __nonzero__( self ):
+    raise TypeError( 'The value of a Bits expression is not known while it '
+                     'is being built, so it cannot be used as a condition' )
+
+  def __int__( self ):
+    raise TypeError( 'The value of a Bits expression is not known while it '
+                     'is being built, so it cannot be converted to an int' )
+
+  __long__ = __int__
+
+  def eval( self, **inputs ):
+    '''Return the value of the expression for input values given by name,
+    as Bits objects, ints or BitsArrays.'''
+    return self.graph._evaluate( [ self ], inputs )[0]
+
+  #----------------------------------------------------------------------------
+  # bit slicing
+  #----------------------------------------------------------------------------
+
+  def __getitem__( self, addr ):
+    'Read a subset of bits using slice notation.'
+
+    if isinstance( addr, slice ):
+
+      if addr.step:
+        raise IndexError(
+          'Bits slicing using steps [start:stop:step] is not supported'
+        )
+
+      start = 0          if addr.start is None else int( addr.start )
+      stop  = self.nbits if addr.stop  is None else int( addr.stop  )
+
+      if not (start < stop):
+        raise IndexError('Bits slicing start index is not less than stop index'
+                         '[start={}:stop={}]'.format(start, stop) )
+      if not (0 <= start < stop <= self.nbits):
+        raise IndexError('Bits slice indices [{}:{}] out of range [0 - {}]'
+                         .format(start, stop, self.nbits) )
+
+      if start == 0 and stop == self.nbits:
+        return self
+
+    else:
+
+      start = int( addr )
+      stop  = start + 1
+
+      if not (0 <= start < self.nbits):
+        raise IndexError('Bits index [{}] out of range [0 - {})'
+                         .format(start, self.nbits) )
+
+    return self.graph._apply( 'slice', ( self, ), ( start, stop ) )
+
+  def __setitem__( self, addr, value ):
+    raise TypeError( 'Bits expressions cannot be modified in place; build '
+                     'the new value with concat() instead' )
+
+  #----------------------------------------------------------------------------
+  # operators
+  #----------------------------------------------------------------------------
+  # Each operator accepts Exprs, Bits constants and ints, and records the
+  # operation with the operands in the order they were written.
+
+  def _binary( self, op, other, reflected = False ):
+    if not isinstance( other, (Expr, BitsN) + _int_types ):
+      return NotImplemented
+    args = ( other, self ) if reflected else ( self, other )
+    return self.graph._apply( op, args )
+
+  def __invert__( self ):
+    'result.nbits = self.nbits'
+    return self.graph._apply( 'invert', ( self, ) )
+
+  def __add__( self, other ):
+    'result.nbits = max( self.nbits, other.nbits ) + 1'
+    return self._binary( 'add', other )
+
+  def __sub__( self, other ):
+    'result.nbits = max( self.nbits, other.nbits ) + 1'
+    return self._binary( 'sub', other )
+
+  def __mul__( self, other ):
+    'result.nbits = self.nbits + other.nbits'
+    return self._binary( 'mul', other )
+
+  def __div__( self, other ):
+    'result.nbits = self.nbits'
+    return self._binary( 'div', other )
+
+  def __floordiv__( self, other ):
+    'result.nbits = self.nbits'
+    return self._binary( 'div', other )
+
+  def __mod__( self, other ):
+    'result.nbits = min( self.nbits, other.nbits )'
+    return self._binary( 'mod', other )
+
+  def __radd__( self, other ):
+    return self._binary( 'add', other, reflected=True )
+
+  def __rsub__( self, other ):
+    return self._binary( 'sub', other, reflected=True )
+
+  def __rmul__( self, other ):
+    return self._binary( 'mul', other, reflected=True )
+
+  def __rdiv__( self, other ):
+    return self._sized_left( 'div', other )
+
+  def __rfloordiv__( self, other ):
+    return self._sized_left( 'div', other )
+
+  def __rmod__( self, other ):
+    return self._sized_left( 'mod', other )
+
+  def __lshift__( self, other ):
+    'result.nbits = self.nbits'
+    return self._binary( 'lshift', other )
+
+  def __rshift__( self, other ):
+    'result.nbits = self.nbits'
+    return self._binary( 'rshift', other )
+
+  def __rlshift__( self, other ):
+    return self._sized_left( 'lshift', other )
+
+  def __rrshift__( self, other ):
+    return self._sized_left( 'rshift', other )
+
+  def _sized_left( self, op, other ):
+    'Reflected operators which need the width of their left operand.'
+    if isinstance( other, BitsN ):
+      return self._binary( op, other, reflected=True )
+    raise TypeError( 'Unspecified width of left operator.' )
+
+  def _bitwise( self, op, other, reflected = False ):
+    if isinstance( other, _int_types ):
+      assert other >= 0
+    return self._binary( op, other, reflected )
+
+  def __and__( self, other ):
+    'result.nbits = max( self.nbits, other.nbits )'
+    return self._bitwise( 'and', other )
+
+  def __xor__( self, other ):
+    'result.nbits = max( self.nbits, other.nbits )'
+    return self._bitwise( 'xor', other )
+
+  def __or__( self, other ):
+    'result.nbits = max( self.nbits, other.nbits )'
+    return self._bitwise( 'or', other )
+
+  def __rand__( self, other ):
+    return self._bitwise( 'and', other, reflected=True )
+
+  def __rxor__( self, other ):
+    return self._bitwise( 'xor', other, reflected=True )
+
+  def __ror__( self, other ):
+    return self._bitwise( 'or', other, reflected=True )
+
+  #----------------------------------------------------------------------------
+  # in-place operators
+  #----------------------------------------------------------------------------
+  # Augmented assignments keep the width of self and wrap around, like the
+  # BitsN in-place operators, so they record the operation followed by a
+  # truncation (or zero extension) of its result to self.nbits. Nodes are
+  # never modified: augmented assignment binds the new node in place of
+  # self.
+
+  def _inplace( self, result ):
+    if result is NotImplemented or result.nbits == self.nbits:
+      return result
+    if result.nbits > self.nbits:
+      return result[ 0:self.nbits ]
+    return result._zext( self.nbits )
+
+  def _inplace_bitwise( self, op, other ):
+    # Negative ints wrap into the width of self, as in BitsN
+    if isinstance( other, _int_types ) and other < 0:
+      other &= (1 << self.nbits) - 1
+    return self._inplace( self._bitwise( op, other ) )
+
+  def __iadd__( self, other ):
+    'result.nbits = self.nbits'
+    return self._inplace( self.__add__( other ) )
+
+  def __isub__( self, other ):
+    'result.nbits = self.nbits'
+    return self._inplace( self.__sub__( other ) )
+
+  def __imul__( self, other ):
+    'result.nbits = self.nbits'
+    return self._inplace( self.__mul__( other ) )
+
+  def __idiv__( self, other ):
+    'result.nbits = self.nbits'
+    return self._inplace( self.__div__( other ) )
+
+  def __ifloordiv__( self, other ):
+    'result.nbits = self.nbits'
+    return self._inplace( self.__floordiv__( other ) )
+
+  def __imod__( self, other ):
+    'result.nbits = self.nbits'
+    return self._inplace( self.__mod__( other ) )
+
+  def __ilshift__( self, other ):
+    'result.nbits = self.nbits'
+    return self._inplace( self.__lshift__( other ) )
+
+  def __irshift__( self, other ):
+    'result.nbits = self.nbits'
+    return self._inplace( self.__rshift__( other ) )
+
+  def __iand__( self, other ):
+    'result.nbits = self.nbits'
+    return self._inplace_bitwise( 'and', other )
+
+  def __ixor__( self, other ):
+    'result.nbits = self.nbits'
+    return self._inplace_bitwise( 'xor', other )
+
+  def __ior__( self, other ):
+    'result.nbits = self.nbits'
+    return self._inplace_bitwise( 'or', other )
+
+  #----------------------------------------------------------------------------
+  # comparison operators
+  #----------------------------------------------------------------------------
+
+  def _compare( self, op, other ):
+    if isinstance( other, _int_types ):
+      assert other >= 0
+    return self._binary( op, other )
+
+  def __eq__( self, other ):
+    'result.nbits = 1'
+    if other is None: return False
+    return self._compare( 'eq', other )
+
+  def __ne__( self, other ):
+    'result.nbits = 1'
+    if other is None: return True
+    return self._compare( 'ne', other )
+
+  def __lt__( self, other ):
+    'result.nbits = 1'
+    return self._compare( 'lt', other )
+
+  def __le__( self, other ):
+    'result.nbits = 1'
+    return self._compare( 'le', other )
+
+  def __gt__( self, other ):
+    'result.nbits = 1'
+    return self._compare( 'gt', other )
+
+  def __ge__( self, other ):
+    'result.nbits = 1'
+    return self._compare( 'ge', other )
+
+  # Nodes are shared and compared with == symbolically, so hash them by
+  # identity like any other object
+  __hash__ = object.__hash__
+
+  #----------------------------------------------------------------------------
+  # bits.py functions
+  #----------------------------------------------------------------------------
+
+  def _concat( self, objects ):
+    for x in objects:
+      if not isinstance( x, (Expr, BitsN) ):
+        raise TypeError( 'Cannot concatenate {!r}'.format( x ) )
+    return self.graph._apply( 'concat', objects )
+
+  def _zext( self, new_width ):
+    return self.graph._apply( 'zext', ( self, ), int( new_width ) )
+
+  def _sext( self, new_width ):
+    return self.graph._apply( 'sext', ( self, ), int( new_width ) )
+
+  def _reduce( self, op ):
+    return self.graph._apply( _REDUCE_OPS[ op ], ( self, ) )
+
+_REDUCE_OPS = {
+  operator.and_: 'reduce_and',
+  operator.or_ : 'reduce_or',
+  operator.xor : 'reduce_xor',
+}
+
+#------------------------------------------------------------------------------
+# width inference
+#------------------------------------------------------------------------------
+# Result widths of every op, following the BitsN operators. Binary ops
+# with an unsized int operand take the width of their sized operand.
+
+def _sized( rule ):
+  def nbits( args, param ):
+    a, b = args
+    if isinstance( a, _int_types ): return b.nbits
+    if isinstance( b, _int_types ): return a.nbits
+    return rule( a.nbits, b.nbits )
+  return nbits
+
+def _mul( args, param ):
+  a, b = args
+  if isinstance( b, _int_types ): return 2 * a.nbits
+  if isinstance( a, _int_types ): return 2 * b.nbits
+  return _mul_nbits( a.nbits, b.nbits )
+
+_NBITS = {
+  'invert'    : lambda args, param: args[0].nbits,
+  'add'       : _sized( _add_nbits ),
+  'sub'       : _sized( _add_nbits ),
+  'mul'       : _mul,
+  'div'       : lambda args, param: args[0].nbits,
+  'mod'       : _sized( min ),
+  'and'       : _sized( max ),
+  'or'        : _sized( max ),
+  'xor'       : _sized( max ),
+  'lshift'    : lambda args, param: args[0].nbits,
+  'rshift'    : lambda args, param: args[0].nbits,
+  'slice'     : lambda args, param: param[1] - param[0],
+  'concat'    : lambda args, param: sum( a.nbits for a in args ),
+  'zext'      : lambda args, param: param,
+  'sext'      : lambda args, param: param,
+}
+
+COMPARE_OPS = ( 'eq', 'ne', 'lt', 'le', 'gt', 'ge' )
+REDUCE_OPS  = ( 'reduce_and', 'reduce_or', 'reduce_xor' )
+
+for _op in COMPARE_OPS + REDUCE_OPS:
+  _NBITS[ _op ] = lambda args, param: 1
+del _op
+
+def _infer_nbits( op, args, param ):
+  'Return the width of the result of op.'
+  if op in ( 'div', 'mod', 'lshift', 'rshift' ) and \
+     isinstance( args[0], _int_types ):
+    raise TypeError( 'Unspecified width of left operator.' )
+  return _NBITS[ op ]( args, param )
+
+#------------------------------------------------------------------------------
+# _param_key / _arg_key
+#------------------------------------------------------------------------------
+# Keys used to hash-cons nodes. Operand nodes are keyed by identity, since
+# Expr.__eq__ builds a comparison node instead of comparing nodes.
+
+def _param_key( param ):
+  if isinstance( param, BitsN ):
+    return ( param.nbits, param.uint() )
+  return param
+
+def _arg_key( arg ):
+  if isinstance( arg, Expr ):
+    return arg.index
+  return ( 'int', arg )
+
+#------------------------------------------------------------------------------
+# evaluation
+#------------------------------------------------------------------------------
+# Each op is evaluated by applying the corresponding BitsN operator or
+# bits.py function to the values of its operands, so results are exactly
+# those of the eager code. Since BitsArray implements the same operators,
+# inputs may also be BitsArrays, which evaluates a whole batch at once.
+
+def _binary_op( fn ):
+  return lambda values, param: fn( *values )
+
+def _module( values ):
+  'Return the module implementing concat(), zext() etc. for values.'
+  for value in values:
+    if not isinstance( value, (BitsN,) + _int_types ):
+      import bits_array
+      return bits_array
+  return bits
+
+_OPS = {
+  'invert'    : lambda values, param: ~values[0],
+  'slice'     : lambda values, param: values[0][ param[0]:param[1] ],
+  'concat'    : lambda values, param: _module( values ).concat( *values ),
+  'zext'      : lambda values, param: _module( values ).zext( values[0], param ),
+  'sext'      : lambda values, param: _module( values ).sext( values[0], param ),
+}
+
+for _op, _fn in [ ( 'add', operator.add ), ( 'sub', operator.sub ),
+                  ( 'mul', operator.mul ), ( 'div', operator.floordiv ),
+                  ( 'mod', operator.mod ), ( 'and', operator.and_ ),
+                  ( 'or', operator.or_ ), ( 'xor', operator.xor ),
+                  ( 'lshift', operator.lshift ), ( 'rshift', operator.rshift ),
+                  ( 'eq', operator.eq ), ( 'ne', operator.ne ),
+                  ( 'lt', operator.lt ), ( 'le', operator.le ),
+                  ( 'gt', operator.gt ), ( 'ge', operator.ge ) ]:
+  _OPS[ _op ] = _binary_op( _fn )
+
+del _op, _fn
+
+_OPS.update( {
+  'reduce_and': lambda values, param: _module( values ).reduce_and( values[0] ),
+  'reduce_or' : lambda values, param: _module( values ).reduce_or( values[0] ),
+  'reduce_xor': lambda values, param: _module( values ).reduce_xor( values[0] ),
+} )
+
+def evaluate( outputs, inputs, cache = None ):
+  '''Return the list of values of the output nodes.
+
+  inputs maps input names to Bits objects, ints or BitsArrays. Only the
+  nodes the outputs depend on are evaluated, each of them once. If a
+  cache dict is given, it maps node indices to values already computed,
+  and receives the values computed by this call.'''
+
+  values = {} if cache is None else cache
+
+  for node in topological_order( outputs, values ):
+
+    if node.op == 'var':
+      value = _input_value( node, inputs )
+    elif node.op == 'const':
+      value = node.param
+    else:
+      args  = [ values[ a.index ] if isinstance( a, Expr ) else a
+                for a in node.args ]
+      value = _OPS[ node.op ]( args, node.param )
+
+    values[ node.index ] = value
+
+  return [ values[ x.index ] if isinstance( x, Expr ) else x
+           for x in outputs ]
+
+def _input_value( node, inputs ):
+  'Return the value of an input node, checking its width.'
+  try:
+    value = inputs[ node.param ]
+  except KeyError:
+    raise KeyError( 'No value given for input {}'.format( node.param ) )
+  if isinstance( value, _int_types ):
+    return Bits( node.nbits )( value )
+  if getattr( value, 'nbits', None ) != node.nbits:
+    raise ValueError( 'Input {} needs a Bits({}) value, got {!r}'
+                      .format( node.param, node.nbits, value ) )
+  return value
+
+#------------------------------------------------------------------------------
+# topological_order
+#------------------------------------------------------------------------------
+def topological_order( outputs, known = () ):
+  '''Return the nodes which outputs depend on, operands before their
+  users. Nodes whose indices are in known, and the nodes they depend on,
+  are left out.'''
+  nodes = {}
+  stack = [ x for x in outputs if isinstance( x, Expr ) ]
+  while stack:
+    node = stack.pop()
+    if node.index not in nodes and node.index not in known:
+      nodes[ node.index ] = node
+      stack.extend( a for a in node.args if isinstance( a, Expr ) )
+  return [ nodes[ i ] for i in sorted( nodes ) ]
@@ -0,0 +1,430 @@
+#==============================================================================
+# fixedpoint.py
+#==============================================================================
+# Bit-accurate signed fixed-point values.
+#
+# FixedPoint(I, F) values are two's complement numbers with I integer bits
+# (including the sign bit) and F fractional bits, like ap_fixed<I+F, I>.
+# Arithmetic results grow so that they are always exact, following the
+# ap_fixed rules in bitwidth_inference_comparison.rst:
+#
+#   i + j, i - j   I = max(i.I, j.I) + 1      F = max(i.F, j.F)
+#   i * j          I = i.I + j.I              F = i.F + j.F
+#   -i             I = i.I + 1                F = i.F
+#
+# Quantization and overflow modes only apply when a value is converted
+# into a FixedPoint type, by its constructor.
+
+import fractions
+import math
+import numbers
+import operator
+
+import bits
+from bits import Bits, BitsN
+
+# Quantization modes, named after the ap_fixed AP_* modes:
+#
+#   trn          truncate towards minus infinity (default)
+#   trn_zero     truncate towards zero
+#   rnd          round to nearest, ties towards plus infinity
+#   rnd_zero     round to nearest, ties towards zero
+#   rnd_inf      round to nearest, ties away from zero
+#   rnd_min_inf  round to nearest, ties towards minus infinity
+#   rnd_conv     round to nearest, ties to even
+#
+# Overflow modes:
+#
+#   wrap         keep the low bits (default)
+#   sat          saturate to the largest or smallest value
+#   sat_zero     set values which overflow to zero
+#   sat_sym      saturate symmetrically, to plus or minus the largest value
+
+QUANTIZATION_MODES = ( 'trn', 'trn_zero', 'rnd', 'rnd_zero', 'rnd_inf',
+                       'rnd_min_inf', 'rnd_conv' )
+OVERFLOW_MODES     = ( 'wrap', 'sat', 'sat_zero', 'sat_sym' )
+
+#------------------------------------------------------------------------------
+# FixedPoint
+#------------------------------------------------------------------------------
+class FixedPoint( type ):
+  '''A metaclass constructor which returns fixed-point **classes**.
+
+  Like Bits( nbits ), FixedPoint( I, F ) returns a cached class, which is
+  then instantiated from an int, a float or another FixedPoint value. The
+  value is quantized and checked for overflow with the modes of the
+  class.
+
+  > Q4_4 = FixedPoint( 4, 4 )                   # ap_fixed<8,4>
+  > x = Q4_4( 1.3 )                             # 1.25 (truncated)
+  > y = FixedPoint( 4, 4, 'rnd', 'sat' )( 9.0 ) # 7.9375 (saturated)
+  > z = x * y                                   # a FixedPoint( 8, 8 )
+  > float( z )                                  # 9.921875
+  '''
+
+  __cache__ = {}
+
+  #----------------------------------------------------------------------------
+  # constructor
+  #----------------------------------------------------------------------------
+  def __new__( cls, I, F, quant = 'trn', overflow = 'wrap' ):
+    'Return a new FixedPointN class with I integer and F fractional bits.'
+
+    I, F = int( I ), int( F )
+
+    try:
+      return FixedPoint.__cache__[ ( I, F, quant, overflow ) ]
+    except KeyError:
+
+      if I + F < 1:
+        raise ValueError( 'FixedPoint( {}, {} ) has no bits'.format( I, F ) )
+      if quant not in QUANTIZATION_MODES:
+        raise ValueError( 'Unknown quantization mode {!r}'.format( quant ) )
+      if overflow not in OVERFLOW_MODES:
+        raise ValueError( 'Unknown overflow mode {!r}'.format( overflow ) )
+
+      nbits = I + F
+      name  = 'FixedPoint{}_{}'.format( I, F ).replace( '-', 'm' )
+      if ( quant, overflow ) != ( 'trn', 'wrap' ):
+        name += '_{}_{}'.format( quant, overflow )
+
+      new_class = type( name, (FixedPointN,),
+                        {'__slots__': (),
+                         'I'        : I,
+                         'F'        : F,
+                         'nbits'    : nbits,
+                         'quant'    : quant,
+                         'overflow' : overflow,
+                         '_min'     : -(1 << (nbits - 1)),
+                         '_max'     : (1 << (nbits - 1)) - 1,
+                         '_mask'    : (1 << nbits) - 1,
+                        } )
+      FixedPoint.__cache__[ ( I, F, quant, overflow ) ] = new_class
+      return new_class
+
+#------------------------------------------------------------------------------
+# FixedPointN
+#------------------------------------------------------------------------------
+class FixedPointN( object ):
+  'Base class for templated FixedPoint objects.'
+
+  # Instances only store their raw value: the signed integer which is
+  # the value scaled by 2**F
+  __slots__ = ( '_raw', )
+
+  # Class attributes initialized by FixedPoint() factory
+  I        = None
+  F        = None
+  nbits    = None
+  quant    = None
+  overflow = None
+  _min     = None
+  _max     = None
+  _mask    = None
+
+  #----------------------------------------------------------------------------
+  # initializer
+  #----------------------------------------------------------------------------
+  def __init__( self, value = 0 ):
+    '''Initialize from an int, a float or a FixedPoint value, quantized
+    and checked for overflow with the modes of the class. Bits values
+    are taken as unsigned integers.'''
+
+    if self.nbits is None:
+      raise TypeError( 'FixedPointN cannot be instantiated directly! '
+                       'Use FixedPoint(I, F) instead.' )
+
+    n, s = _scaled( value, self.F )
+    q    = _quantize( n, s, self.quant, _select )
+    self._raw = _overflow( q, self.nbits, self.overflow, _select )
+
+  @classmethod
+  def from_raw( cls, raw ):
+    '''Create a value from its raw two's complement payload, given as a
+    signed or unsigned integer which fits in nbits.'''
+    raw = int( raw )
+    if not (cls._min <= raw <= cls._mask):
+      raise bits._value_error( cls.nbits, raw )
+    return _new_fixed( cls, _wrap( raw, cls.nbits ) )
+
+  #----------------------------------------------------------------------------
+  # conversions
+  #----------------------------------------------------------------------------
+
+  def raw( self ):
+    'Return the raw value, the signed integer value * 2**F.'
+    return self._raw
+
+  def uint( self ):
+    'Return the two\'s complement payload as an unsigned integer.'
+    return self._raw & self._mask
+
+  def to_bits( self ):
+    'Return the two\'s complement payload as a Bits(nbits) object.'
+    return bits._new_bits( Bits( self.nbits ), self._raw & self._mask )
+
+  def __float__( self ):
+    return math.ldexp( self._raw, -self.F )
+
+  def __int__( self ):
+    'Type conversion to an int, truncating towards zero like int(float).'
+    if self.F <= 0:
+      return self._raw << -self.F
+    return -(-self._raw >> self.F) if self._raw < 0 else self._raw >> self.F
+
+  def __nonzero__( self ):
+    return self._raw != 0
+
+  def __hash__( self ):
+    # Equal values hash alike in every format, and like the int or float
+    # they are equal to
+    if self.F <= 0:
+      return hash( self._raw << -self.F )
+    return hash( fractions.Fraction( self._raw, 1 << self.F ) )
+
+  #----------------------------------------------------------------------------
+  # print methods
+  #----------------------------------------------------------------------------
+
+  def __repr__( self ):
+    return 'FixedPoint( {}, {}, {} )'.format( self.I, self.F, self.hex() )
+
+  def __str__( self ):
+    return repr( float( self ) )
+
+  def hex( self ):
+    return '0x{:0{}x}'.format( self._raw & self._mask, (self.nbits - 1) / 4 + 1 )
+
+  #----------------------------------------------------------------------------
+  # arithmetic operators
+  #----------------------------------------------------------------------------
+  # Results are exact: they grow by the ap_fixed rules and are created
+  # without quantization or overflow checks. Bits(n) operands are taken
+  # as FixedPoint( n + 1, 0 ) values, and ints as FixedPoint(
+  # value.bit_length() + 1, 0 ) values.
+
+  def __neg__( self ):
+    'result.I = self.I + 1'
+    return _new_fixed( FixedPoint( self.I + 1, self.F ), -self._raw )
+
+  def __pos__( self ):
+    return self
+
+  def __abs__( self ):
+    return -self if self._raw < 0 else _new_fixed(
+      FixedPoint( self.I + 1, self.F ), self._raw )
+
+  def __add__( self, other ):
+    'result.I = max( self.I, other.I ) + 1, result.F = max( self.F, other.F )'
+    other = _operand( other )
+    if other is None: return NotImplemented
+    F = max( self.F, other.F )
+    return _new_fixed( FixedPoint( max( self.I, other.I ) + 1, F ),
+                       (self._raw << (F - self.F)) + (other._raw << (F - other.F)) )
+
+  def __sub__( self, other ):
+    'result.I = max( self.I, other.I ) + 1, result.F = max( self.F, other.F )'
+    other = _operand( other )
+    if other is None: return NotImplemented
+    F = max( self.F, other.F )
+    return _new_fixed( FixedPoint( max( self.I, other.I ) + 1, F ),
+                       (self._raw << (F - self.F)) - (other._raw << (F - other.F)) )
+
+  def __mul__( self, other ):
+    'result.I = self.I + other.I, result.F = self.F + other.F'
+    other = _operand( other )
+    if other is None: return NotImplemented
+    return _new_fixed( FixedPoint( self.I + other.I, self.F + other.F ),
+                       self._raw * other._raw )
+
+  def __radd__( self, other ):
+    return self.__add__( other )
+
+  def __rsub__( self, other ):
+    other = _operand( other )
+    if other is None: return NotImplemented
+    return other.__sub__( self )
+
+  def __rmul__( self, other ):
+    return self.__mul__( other )
+
+  #----------------------------------------------------------------------------
+  # shift operators
+  #----------------------------------------------------------------------------
+  # Shifts keep the type and move the bits within it, like ap_fixed:
+  # bits shifted out on either side are lost.
+
+  def __lshift__( self, other ):
+    'result.I = self.I, result.F = self.F'
+    return _new_fixed( self.__class__, _wrap( self._raw << int( other ),
+                                              self.nbits ) )
+
+  def __rshift__( self, other ):
+    'result.I = self.I, result.F = self.F'
+    return _new_fixed( self.__class__, self._raw >> int( other ) )
+
+  #----------------------------------------------------------------------------
+  # comparison operators
+  #----------------------------------------------------------------------------
+  # Values of any formats, and floats, are compared exactly, and the
+  # result is a Bits1.
+
+  def _compare( self, other, op ):
+    if _nonfinite( other ):
+      return bits._new_bits( bits._Bits1, int( op( 0.0, other ) ) )
+    operand = _compare_operand( other )
+    if operand is None: return NotImplemented
+    _, F, raw = operand
+    rF = max( self.F, F )
+    return bits._new_bits( bits._Bits1, int( op( self._raw << (rF - self.F),
+                                                  raw << (rF - F) ) ) )
+
+  def __eq__( self, other ):
+    return self._compare( other, operator.eq )
+
+  def __ne__( self, other ):
+    return self._compare( other, operator.ne )
+
+  def __lt__( self, other ):
+    return self._compare( other, operator.lt )
+
+  def __le__( self, other ):
+    return self._compare( other, operator.le )
+
+  def __gt__( self, other ):
+    return self._compare( other, operator.gt )
+
+  def __ge__( self, other ):
+    return self._compare( other, operator.ge )
+
+#------------------------------------------------------------------------------
+# helpers
+#------------------------------------------------------------------------------
+
+def _new_fixed( cls, raw ):
+  'Return a new cls instance holding raw, which must already fit in cls.'
+  value = object.__new__( cls )
+  value._raw = raw
+  return value
+
+def _operand( other ):
+  '''Return other as a FixedPoint value, taking Bits and integers as
+  FixedPoint( I, 0 ) values with a sign bit above their width or
+  magnitude, or None if other is neither.'''
+  if isinstance( other, FixedPointN ):
+    return other
+  if isinstance( other, BitsN ):
+    # The width of the Bits type, not of its value, so that result types
+    # do not depend on the data
+    return _new_fixed( FixedPoint( other.nbits + 1, 0 ), other._uint )
+  if not isinstance( other, numbers.Integral ):
+    return None
+  other = int( other )
+  return _new_fixed( FixedPoint( other.bit_length() + 1, 0 ), other )
+
+def _compare_operand( other ):
+  '''Return ( I, F, raw ) with the exact value of a FixedPoint, Bits, int
+  or finite float operand of a comparison, or None if other is none of
+  them.'''
+  if isinstance( other, float ):
+    n, d = other.as_integer_ratio()
+    F    = d.bit_length() - 1
+    return n.bit_length() + 1 - F, F, n
+  other = _operand( other )
+  if other is None: return None
+  return other.I, other.F, other._raw
+
+def _nonfinite( other ):
+  '''Return whether other is an infinite or NaN float, which every
+  FixedPoint value compares against like zero.'''
+  return isinstance( other, float ) and \
+         ( math.isinf( other ) or math.isnan( other ) )
+
+def _scaled( value, F ):
+  '''Return ( n, s ) such that value * 2**F == n / 2**s exactly, with
+  s >= 0 unless value is an integer.'''
+
+  if isinstance( value, FixedPointN ):
+    return value._raw, value.F - F
+  if isinstance( value, BitsN ):
+    return value.uint(), -F
+  if isinstance( value, numbers.Integral ):
+    return int( value ), -F
+
+  value = float( value )
+  if math.isnan( value ) or math.isinf( value ):
+    raise ValueError( 'Cannot convert {} to a FixedPoint value'.format( value ) )
+
+  # Floats are dyadic rationals, so they convert exactly
+  numerator, denominator = value.as_integer_ratio()
+  return numerator, denominator.bit_length() - 1 - F
+
+def _select( condition, if_true, if_false ):
+  'Scalar version of numpy.where, used to share code with the arrays.'
+  return if_true if condition else if_false
+
+#------------------------------------------------------------------------------
+# quantization and overflow
+#------------------------------------------------------------------------------
+# These functions are shared by FixedPoint values and FixedPointArrays:
+# they only use arithmetic and comparison operators, and take the where
+# function (_select or numpy.where) which picks between values.
+
+def _quantize( n, s, mode, where ):
+  'Return n / 2**s rounded to an integer with a quantization mode.'
+  if s <= 0:
+    return n << -s
+  floor = n >> s
+  return _round( floor, n - (floor << s), 1 << (s - 1), mode, where )
+
+def _round( floor, rem, half, mode, where ):
+  '''Return floor + 1 or floor, for a value floor + rem / (2 * half)
+  with 0 <= rem < 2 * half, as rounded with a quantization mode. The
+  value is negative exactly when floor is.'''
+
+  if mode == 'trn':
+    return floor
+
+  if mode == 'trn_zero':
+    return floor + where( (floor < 0) & (rem != 0), 1, 0 )
+
+  if mode == 'rnd':
+    return floor + where( rem >= half, 1, 0 )
+
+  if mode == 'rnd_min_inf':
+    return floor + where( rem > half, 1, 0 )
+
+  tie = rem == half
+
+  if mode == 'rnd_zero':
+    return floor + where( (rem > half) | (tie & (floor < 0)), 1, 0 )
+
+  if mode == 'rnd_inf':
+    return floor + where( (rem > half) | (tie & (floor >= 0)), 1, 0 )
+
+  if mode == 'rnd_conv':
+    return floor + where( (rem > half) | (tie & ((floor & 1) == 1)), 1, 0 )
+
+  raise ValueError( 'Unknown quantization mode {!r}'.format( mode ) )
+
+def _overflow( q, nbits, mode, where ):
+  'Return q fitted into a signed nbits value with an overflow mode.'
+
+  lo = -(1 << (nbits - 1))
+  hi = (1 << (nbits - 1)) - 1
+
+  if mode == 'wrap':
+    return _wrap( q, nbits )
+  if mode == 'sat':
+    return where( q > hi, hi, where( q < lo, lo, q ) )
+  if mode == 'sat_zero':
+    return where( (q > hi) | (q < lo), 0, q )
+  if mode == 'sat_sym':
+    return where( q > hi, hi, where( q < lo, -hi, q ) )
+
+  raise ValueError( 'Unknown overflow mode {!r}'.format( mode ) )
+
+def _wrap( q, nbits ):
+  'Return the signed value of the low nbits bits of q.'
+  offset = 1 << (nbits - 1)
+  return ((q + offset) & ((1 << nbits) - 1)) - offset
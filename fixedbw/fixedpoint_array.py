@@ -0,0 +1,372 @@
+#==============================================================================
+# fixedpoint_array.py
+#==============================================================================
+# NumPy-backed arrays of fixed-point values.
+
+import operator
+
+import numpy as np
+
+import fixedpoint
+from fixedpoint import FixedPoint, FixedPointN, _quantize, _round, \
+                       _overflow, _wrap
+from bits       import _get_nbits
+from bits_array import BitsArray, _wrap as _wrap_bits
+
+# Raw values of up to _INT_NBITS bits are stored as int64, which leaves
+# headroom for the carries and roundings of conversions. Wider values are
+# stored as object arrays of Python ints.
+
+_INT_NBITS = 62
+
+#------------------------------------------------------------------------------
+# FixedPointArray
+#------------------------------------------------------------------------------
+class FixedPointArray( object ):
+  '''An array of values which all share a single FixedPoint(I, F) format.
+
+  Elements are stored as their raw signed integers (the value * 2**F).
+  Operators apply to every element at once and follow the same width
+  rules as the corresponding FixedPointN operators, so a golden model
+  written for scalars runs unchanged on whole sample buffers.
+
+  > x = FixedPointArray.from_values( 1, 15, samples, 'rnd', 'sat' )
+  > c = FixedPointArray.from_values( 1, 15, coefficients )
+  > y = x * c                         # FixedPoint( 2, 30 ) products
+  > z = y.cast( 1, 15, 'rnd', 'sat' ) # back to Q1.15
+  > z.float()                         # float64 NumPy array
+  '''
+
+  # Stop NumPy from broadcasting its own ufuncs over FixedPointArray
+  # operands, so that expressions like np.int64(1) + a use our reflected
+  # operators.
+  __array_ufunc__ = None
+
+  # Arrays are mutable, so they cannot be hashed
+  __hash__ = None
+
+  #----------------------------------------------------------------------------
+  # constructors
+  #----------------------------------------------------------------------------
+  def __init__( self, I, F, shape, value = 0, quant = 'trn',
+                overflow = 'wrap' ):
+    '''Create an array of the given shape with every element set to value,
+    which is converted with the quantization and overflow modes.'''
+    self._set_type( FixedPoint( I, F, quant, overflow ) )
+    raw = self.fixed_type( value )._raw
+    self._data = np.full( shape, raw, dtype=_storage( self.nbits ) )
+
+  @classmethod
+  def from_values( cls, I, F, values, quant = 'trn', overflow = 'wrap' ):
+    '''Create an array from a FixedPointArray, a NumPy float or integer
+    array, or a (nested) sequence of floats, ints or FixedPoint values,
+    converted with the quantization and overflow modes.'''
+    fixed_type = FixedPoint( I, F, quant, overflow )
+    return _new_array( fixed_type, _convert( values, fixed_type ) )
+
+  def _set_type( self, fixed_type ):
+    'Initialize the format attributes shared with FixedPointN.'
+    self.fixed_type = fixed_type
+    self.I          = fixed_type.I
+    self.F          = fixed_type.F
+    self.nbits      = fixed_type.nbits
+    self.quant      = fixed_type.quant
+    self.overflow   = fixed_type.overflow
+
+  def cast( self, I, F, quant = 'trn', overflow = 'wrap' ):
+    'Return the values converted to another format.'
+    return FixedPointArray.from_values( I, F, self, quant, overflow )
+
+  #----------------------------------------------------------------------------
+  # array properties
+  #----------------------------------------------------------------------------
+
+  @property
+  def shape( self ):
+    return self._data.shape
+
+  @property
+  def size( self ):
+    return self._data.size
+
+  def __len__( self ):
+    return len( self._data )
+
+  def __iter__( self ):
+    for i in xrange( len( self ) ):
+      yield self[ i ]
+
+  def __copy__( self ):
+    return _new_array( self.fixed_type, self._data.copy() )
+
+  def copy( self ):
+    'Return a copy of the array.'
+    return self.__copy__()
+
+  #----------------------------------------------------------------------------
+  # element access
+  #----------------------------------------------------------------------------
+
+  def __getitem__( self, idx ):
+    '''Return a single element as a FixedPointN object, or a
+    FixedPointArray view if idx selects more than one element.'''
+    value = self._data[ idx ]
+    if isinstance( value, np.ndarray ):
+      return _new_array( self.fixed_type, value )
+    return fixedpoint._new_fixed( self.fixed_type, int( value ) )
+
+  def __setitem__( self, idx, value ):
+    '''Write one or more elements using NumPy indexing, converting values
+    with the quantization and overflow modes.'''
+    if isinstance( value, FixedPointN ) or np.isscalar( value ):
+      self._data[ idx ] = self.fixed_type( value )._raw
+    else:
+      self._data[ idx ] = _convert( value, self.fixed_type )
+
+  #----------------------------------------------------------------------------
+  # type conversion
+  #----------------------------------------------------------------------------
+
+  def raw( self ):
+    '''Return the raw values (the values * 2**F) as an int64 NumPy array,
+    or an object array for formats wider than 62 bits.'''
+    return self._data.copy()
+
+  def float( self ):
+    'Return the values as a float64 NumPy array.'
+    return np.ldexp( self._data.astype( np.float64 ), -self.F )
+
+  def tolist( self ):
+    'Return the elements as a (nested) list of FixedPointN objects.'
+    return _to_fixed( self.fixed_type, self._data.tolist() )
+
+  def to_bits( self ):
+    'Return the two\'s complement payloads as a BitsArray.'
+    return BitsArray.from_values( self.nbits, self._data, trunc = True )
+
+  def __nonzero__( self ):
+    raise ValueError( 'The truth value of a FixedPointArray is ambiguous. '
+                      'Use a.raw().any() or a.raw().all()' )
+
+  #----------------------------------------------------------------------------
+  # print methods
+  #----------------------------------------------------------------------------
+
+  def __repr__( self ):
+    return 'FixedPointArray( {}, {}, {} )'.format( self.I, self.F,
+      np.array2string( self.float(), separator=', ' ) )
+
+  #----------------------------------------------------------------------------
+  # arithmetic operators
+  #----------------------------------------------------------------------------
+  # Results are exact, follow the FixedPointN width rules and use the
+  # default quantization and overflow modes.
+
+  def _operand( self, other ):
+    'Return ( I, F, raw ) for an array, FixedPoint or int operand, or None.'
+    if isinstance( other, FixedPointArray ):
+      return other.I, other.F, other._data
+    other = fixedpoint._operand( other )
+    if other is None:
+      return None
+    return other.I, other.F, other._raw
+
+  def _add( self, other, op, reflected = False ):
+    'result.I = max( self.I, other.I ) + 1, result.F = max( self.F, other.F )'
+    operand = self._operand( other )
+    if operand is None:
+      return NotImplemented
+    I, F, data = operand
+    rF    = max( self.F, F )
+    rtype = FixedPoint( max( self.I, I ) + 1, rF )
+    dtype = _storage( rtype.nbits )
+    a     = _align( self._data, rF - self.F, dtype )
+    b     = _align( data,       rF - F,      dtype )
+    return _new_array( rtype, op( b, a ) if reflected else op( a, b ) )
+
+  def __neg__( self ):
+    'result.I = self.I + 1'
+    rtype = FixedPoint( self.I + 1, self.F )
+    return _new_array( rtype, -_align( self._data, 0, _storage( rtype.nbits ) ) )
+
+  def __pos__( self ):
+    return self
+
+  def __add__( self, other ):
+    return self._add( other, operator.add )
+
+  def __sub__( self, other ):
+    return self._add( other, operator.sub )
+
+  def __mul__( self, other ):
+    'result.I = self.I + other.I, result.F = self.F + other.F'
+    operand = self._operand( other )
+    if operand is None:
+      return NotImplemented
+    I, F, data = operand
+    rtype = FixedPoint( self.I + I, self.F + F )
+    dtype = _storage( rtype.nbits )
+    return _new_array( rtype, _align( self._data, 0, dtype ) *
+                              _align( data,       0, dtype ) )
+
+  def __radd__( self, other ):
+    return self._add( other, operator.add, reflected = True )
+
+  def __rsub__( self, other ):
+    return self._add( other, operator.sub, reflected = True )
+
+  def __rmul__( self, other ):
+    return self.__mul__( other )
+
+  #----------------------------------------------------------------------------
+  # shift operators
+  #----------------------------------------------------------------------------
+  # Shifts keep the format and move the bits of every element within it.
+
+  def __lshift__( self, other ):
+    'result.I = self.I, result.F = self.F'
+    amount = min( int( other ), self.nbits )
+    return _new_array( self.fixed_type, _wrap( self._data << amount,
+                                               self.nbits ) )
+
+  def __rshift__( self, other ):
+    'result.I = self.I, result.F = self.F'
+    amount = min( int( other ), self.nbits )
+    return _new_array( self.fixed_type, self._data >> amount )
+
+  #----------------------------------------------------------------------------
+  # comparison operators
+  #----------------------------------------------------------------------------
+  # Values of any formats, and floats, are compared exactly, and the
+  # result is a BitsArray of width 1.
+
+  def _compare( self, other, op ):
+    if fixedpoint._nonfinite( other ):
+      with np.errstate( invalid = 'ignore' ):
+        result = op( np.zeros( self._data.shape ), other )
+      return _wrap_bits( 1, np.asarray( result ).astype( np.uint8 ) )
+    if isinstance( other, FixedPointArray ):
+      operand = other.I, other.F, other._data
+    else:
+      operand = fixedpoint._compare_operand( other )
+    if operand is None:
+      return NotImplemented
+    I, F, data = operand
+    rF    = max( self.F, F )
+    dtype = _storage( max( self.I, I ) + rF )
+    a     = _align( self._data, rF - self.F, dtype )
+    b     = _align( data,       rF - F,      dtype )
+    return _wrap_bits( 1, np.asarray( op( a, b ) ).astype( np.uint8 ) )
+
+  def __eq__( self, other ):
+    return self._compare( other, operator.eq )
+
+  def __ne__( self, other ):
+    return self._compare( other, operator.ne )
+
+  def __lt__( self, other ):
+    return self._compare( other, operator.lt )
+
+  def __le__( self, other ):
+    return self._compare( other, operator.le )
+
+  def __gt__( self, other ):
+    return self._compare( other, operator.gt )
+
+  def __ge__( self, other ):
+    return self._compare( other, operator.ge )
+
+#------------------------------------------------------------------------------
+# helpers
+#------------------------------------------------------------------------------
+
+def _storage( nbits ):
+  'Return the NumPy dtype which stores raw values of nbits bits.'
+  return np.int64 if nbits <= _INT_NBITS else object
+
+def _new_array( fixed_type, data ):
+  '''Return a FixedPointArray around raw data, which must already fit in
+  fixed_type and be in its storage format.'''
+  array = object.__new__( FixedPointArray )
+  array._set_type( fixed_type )
+  array._data = data
+  return array
+
+def _align( data, shift, dtype ):
+  'Return an array or Python int of raw values in dtype, shifted left.'
+  if isinstance( data, np.ndarray ):
+    if data.dtype != dtype:
+      data = data.astype( dtype )
+  elif dtype is not object:
+    data = np.int64( data )
+  return data << shift if shift else data
+
+def _to_fixed( fixed_type, values ):
+  'Convert a (nested) list of raw values into FixedPointN objects.'
+  if isinstance( values, list ):
+    return [ _to_fixed( fixed_type, v ) for v in values ]
+  return fixedpoint._new_fixed( fixed_type, int( values ) )
+
+#------------------------------------------------------------------------------
+# _convert
+#------------------------------------------------------------------------------
+def _convert( values, fixed_type ):
+  '''Convert values into raw values of fixed_type, quantized and checked
+  for overflow with its modes, in its storage format.'''
+
+  F, nbits = fixed_type.F, fixed_type.nbits
+  quant, overflow = fixed_type.quant, fixed_type.overflow
+
+  if isinstance( values, FixedPointArray ):
+    n, s, n_nbits = values._data, values.F - F, values.nbits
+  else:
+    if not isinstance( values, np.ndarray ):
+      values = np.array( values )
+    if values.dtype.kind == 'b':
+      values = values.astype( np.int64 )
+
+    if values.dtype.kind in 'ui':
+      n, s    = values, -F
+      n_nbits = 1
+      if values.size:
+        n_nbits = max( _get_nbits( int( values.min() ) ),
+                       _get_nbits( int( values.max() ) ) ) + 1
+
+    elif values.dtype.kind == 'f' and values.size:
+      return _convert_floats( values, fixed_type )
+
+    else:
+      # Python ints, FixedPoint and Bits objects, and mixtures of them
+      data = [ fixed_type( v )._raw for v in values.flat ]
+      return np.array( data, dtype=_storage( nbits ) ).reshape( values.shape )
+
+  # Integer arithmetic in int64 if the intermediate values provably fit,
+  # otherwise in Python ints
+  dtype = _storage( max( n_nbits + max( 0, -s ), nbits ) + 1 )
+  q = _quantize( _align( n, 0, dtype ), s, quant, np.where )
+  return np.asarray( _overflow( q, nbits, overflow, np.where ) ) \
+           .astype( _storage( nbits ) )
+
+def _convert_floats( values, fixed_type ):
+  'Convert a NumPy float array into raw values of fixed_type.'
+
+  F, nbits = fixed_type.F, fixed_type.nbits
+  values   = values.astype( np.float64 )
+
+  if not np.isfinite( values ).all():
+    raise ValueError( 'Cannot convert NaN or infinite values to FixedPoint' )
+
+  # Scaling by a power of two, floor and the remainder are all exact, so
+  # quantization is exact as long as the integer parts fit in int64
+  scaled = np.ldexp( values, F )
+  if np.abs( scaled ).max() >= 2.0**_INT_NBITS:
+    data = [ fixed_type( v )._raw for v in values.flat ]
+    return np.array( data, dtype=_storage( nbits ) ).reshape( values.shape )
+
+  floor = np.floor( scaled )
+  q     = _round( floor.astype( np.int64 ), scaled - floor, 0.5,
+                  fixed_type.quant, np.where )
+  if nbits > _INT_NBITS:
+    q = q.astype( object )
+  return np.asarray( _overflow( q, nbits, fixed_type.overflow, np.where ) ) \
+           .astype( _storage( nbits ) )
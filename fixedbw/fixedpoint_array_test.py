@@ -0,0 +1,141 @@
+#=======================================================================
+# fixedpoint_array_test.py
+#=======================================================================
+# Tests for the FixedPointArray class.
+
+import random
+
+import pytest
+
+np = pytest.importorskip( 'numpy' )
+
+from bits             import Bits
+from bits_array       import BitsArray
+from fixedpoint       import FixedPoint, QUANTIZATION_MODES, OVERFLOW_MODES
+from fixedpoint_array import FixedPointArray
+
+FORMATS = [ ( 4, 4 ), ( 1, 15 ), ( 6, -2 ), ( -2, 8 ), ( 40, 40 ) ]
+
+def random_floats( n, seed=0 ):
+  rng = random.Random( seed )
+  return [ rng.uniform( -20, 20 ) for _ in xrange( n ) ] + \
+         [ k / 16.0 for k in xrange( -300, 300, 3 ) ]
+
+def check_array( array, I, F, expected ):
+  'Check a FixedPointArray matches a list of FixedPointN objects.'
+  assert ( array.I, array.F ) == ( I, F )
+  assert array.raw().tolist() == [ x.raw() for x in expected ]
+
+#-----------------------------------------------------------------------
+# test_from_values
+#-----------------------------------------------------------------------
+@pytest.mark.parametrize( 'I, F', FORMATS )
+@pytest.mark.parametrize( 'quant', QUANTIZATION_MODES )
+@pytest.mark.parametrize( 'overflow', OVERFLOW_MODES )
+def test_from_values( I, F, quant, overflow ):
+
+  Q      = FixedPoint( I, F, quant, overflow )
+  floats = random_floats( 100 )
+  ints   = [ int( v * 10 ) for v in floats ]
+
+  for values in [ floats, np.array( floats ), np.array( floats, np.float32 ),
+                  ints, np.array( ints ), np.array( ints, np.int16 ) ]:
+    array = FixedPointArray.from_values( I, F, values, quant, overflow )
+    check_array( array, I, F, [ Q( v ) for v in values ] )
+
+  # Conversions between formats
+
+  source = FixedPointArray.from_values( 8, 8, floats )
+  check_array( source.cast( I, F, quant, overflow ), I, F,
+               [ Q( x ) for x in source.tolist() ] )
+
+#-----------------------------------------------------------------------
+# test_constructor
+#-----------------------------------------------------------------------
+def test_constructor():
+
+  a = FixedPointArray( 4, 4, ( 2, 3 ), 1.3 )
+  assert a.shape == ( 2, 3 ) and a.size == 6 and len( a ) == 2
+  assert ( a.float() == 1.25 ).all()
+  assert a.raw().dtype == np.int64
+  assert FixedPointArray( 40, 40, 3, -1.5 ).raw().dtype == object
+
+  a = FixedPointArray( 3, 0, 4, 100, overflow='sat' )
+  assert a.float().tolist() == [ 3.0 ] * 4
+
+  with pytest.raises( ValueError ):
+    FixedPointArray.from_values( 4, 4, [ 1.0, float( 'inf' ) ] )
+
+  # Huge floats fall back to exact per-element conversion
+
+  a = FixedPointArray.from_values( 80, 0, [ 2.0**70, -3.0 ] )
+  assert a.raw().tolist() == [ 2**70, -3 ]
+
+#-----------------------------------------------------------------------
+# test_elements
+#-----------------------------------------------------------------------
+def test_elements():
+
+  a = FixedPointArray.from_values( 4, 4, [ 1.5, -2.25, 7.9 ] )
+  Q = FixedPoint( 4, 4 )
+
+  assert a[1] == Q( -2.25 ) and type( a[1] ) is Q
+  assert a.tolist() == [ Q( 1.5 ), Q( -2.25 ), Q( 7.875 ) ]
+  assert list( a ) == a.tolist()
+
+  view = a[ 0:2 ]
+  view[0] = 3.3
+  assert float( a[0] ) == 3.25
+  a[ 1: ] = [ 0.5, 100 ]
+  assert a.float().tolist() == [ 3.25, 0.5, 4.0 ]
+
+  bits = a.to_bits()
+  assert isinstance( bits, BitsArray ) and bits.nbits == 8
+  assert bits.tolist() == [ x.uint() for x in a ]
+  assert repr( a ) == 'FixedPointArray( 4, 4, [3.25, 0.5 , 4.  ] )'
+
+#-----------------------------------------------------------------------
+# test_arith
+#-----------------------------------------------------------------------
+@pytest.mark.parametrize( 'fmt_a, fmt_b', [
+  ( ( 4, 4 ), ( 2, 6 ) ), ( ( 1, 15 ), ( 1, 15 ) ), ( ( 20, 20 ), ( 12, 12 ) ),
+  ( ( 40, 40 ), ( 4, 4 ) ),
+])
+def test_arith( fmt_a, fmt_b ):
+
+  a = FixedPointArray.from_values( fmt_a[0], fmt_a[1], random_floats( 50, 1 ) )
+  b = FixedPointArray.from_values( fmt_b[0], fmt_b[1], random_floats( 50, 2 ) )
+  x, y = a.tolist(), b.tolist()
+  s = FixedPoint( 3, 2 )( -1.75 )
+
+  for result, expected in [
+    ( a + b,  [ i + j for i, j in zip( x, y ) ] ),
+    ( a - b,  [ i - j for i, j in zip( x, y ) ] ),
+    ( a * b,  [ i * j for i, j in zip( x, y ) ] ),
+    ( -a,     [ -i for i in x ] ),
+    ( a + s,  [ i + s for i in x ] ),
+    ( s - a,  [ s - i for i in x ] ),
+    ( a * 3,  [ i * 3 for i in x ] ),
+    ( a + Bits(8)( 1 ), [ i + Bits(8)( 1 ) for i in x ] ),
+    ( 5 - b,  [ 5 - j for j in y ] ),
+    ( a << 3, [ i << 3 for i in x ] ),
+    ( b >> 2, [ j >> 2 for j in y ] ),
+  ]:
+    check_array( result, expected[0].I, expected[0].F, expected )
+
+  for op in [ 'eq', 'ne', 'lt', 'le', 'gt', 'ge' ]:
+    method = '__{}__'.format( op )
+    result = getattr( a, method )( b )
+    assert isinstance( result, BitsArray ) and result.nbits == 1
+    assert result.tolist() == [ getattr( i, method )( j )
+                                for i, j in zip( x, y ) ]
+
+  assert ( s < a ).tolist() == [ s < i for i in x ]
+
+  for k in [ 0.5, -1.1, 1e20, float( 'inf' ), float( 'nan' ) ]:
+    assert ( a < k ).tolist() == [ i < k for i in x ]
+    assert ( a == k ).tolist() == [ i == k for i in x ]
+    assert ( k >= a ).tolist() == [ k >= i for i in x ]
+
+  with pytest.raises( TypeError ):
+    a + 1.5
@@ -0,0 +1,167 @@
+#=======================================================================
+# fixedpoint_test.py
+#=======================================================================
+# Tests for the FixedPoint classes.
+
+from fractions import Fraction
+
+import pytest
+
+from bits       import Bits
+from fixedpoint import FixedPoint, FixedPointN, QUANTIZATION_MODES, \
+                       OVERFLOW_MODES
+
+#-----------------------------------------------------------------------
+# test_factory
+#-----------------------------------------------------------------------
+def test_factory():
+
+  Q4_4 = FixedPoint( 4, 4 )
+  assert Q4_4 is FixedPoint( 4, 4, 'trn', 'wrap' )
+  assert Q4_4 is not FixedPoint( 4, 4, 'rnd', 'sat' )
+  assert ( Q4_4.I, Q4_4.F, Q4_4.nbits ) == ( 4, 4, 8 )
+  assert issubclass( Q4_4, FixedPointN )
+
+  # Negative I or F move the binary point outside the word
+  assert float( FixedPoint( 6, -2 )( 13 ) ) == 12.0
+  assert float( FixedPoint( -2, 6 )( 0.1 ) ) == 0.09375
+
+  with pytest.raises( ValueError ):
+    FixedPoint( 2, -2 )
+  with pytest.raises( ValueError ):
+    FixedPoint( 4, 4, 'round' )
+  with pytest.raises( ValueError ):
+    FixedPoint( 4, 4, 'trn', 'saturate' )
+  with pytest.raises( TypeError ):
+    FixedPointN( 1 )
+  with pytest.raises( ValueError ):
+    FixedPoint( 4, 4 )( float( 'nan' ) )
+
+#-----------------------------------------------------------------------
+# test_quantization
+#-----------------------------------------------------------------------
+VALUES = [ 1.25, -1.25, 1.75, -1.75, 0.75, -0.75, 1.1, -1.1 ]
+
+@pytest.mark.parametrize( 'mode, expected', [
+  ( 'trn',         [ 1.0, -1.5, 1.5, -2.0, 0.5, -1.0, 1.0, -1.5 ] ),
+  ( 'trn_zero',    [ 1.0, -1.0, 1.5, -1.5, 0.5, -0.5, 1.0, -1.0 ] ),
+  ( 'rnd',         [ 1.5, -1.0, 2.0, -1.5, 1.0, -0.5, 1.0, -1.0 ] ),
+  ( 'rnd_zero',    [ 1.0, -1.0, 1.5, -1.5, 0.5, -0.5, 1.0, -1.0 ] ),
+  ( 'rnd_inf',     [ 1.5, -1.5, 2.0, -2.0, 1.0, -1.0, 1.0, -1.0 ] ),
+  ( 'rnd_min_inf', [ 1.0, -1.5, 1.5, -2.0, 0.5, -1.0, 1.0, -1.0 ] ),
+  ( 'rnd_conv',    [ 1.0, -1.0, 2.0, -2.0, 1.0, -1.0, 1.0, -1.0 ] ),
+])
+def test_quantization( mode, expected ):
+  Q = FixedPoint( 4, 1, mode )
+  assert [ float( Q( v ) ) for v in VALUES ] == expected
+  assert [ float( Q( Fraction( v ) ) ) for v in VALUES ] == expected
+
+#-----------------------------------------------------------------------
+# test_overflow
+#-----------------------------------------------------------------------
+@pytest.mark.parametrize( 'mode, expected', [
+  ( 'wrap',     [ -3, 3, -4, 3, 0 ] ),
+  ( 'sat',      [  3, -4, -4, 3, 3 ] ),
+  ( 'sat_zero', [  0, 0, -4, 3, 0 ] ),
+  ( 'sat_sym',  [  3, -3, -4, 3, 3 ] ),
+])
+def test_overflow( mode, expected ):
+  Q = FixedPoint( 3, 0, 'trn', mode )
+  assert [ int( Q( v ) ) for v in [ 5, -5, -4, 3.5, 1000 ] ] == expected
+
+#-----------------------------------------------------------------------
+# test_conversions
+#-----------------------------------------------------------------------
+def test_conversions():
+
+  Q4_4 = FixedPoint( 4, 4 )
+  x = Q4_4( -1.3 )
+
+  assert float( x ) == -1.3125
+  assert x.raw() == -21
+  assert x.uint() == 0xeb
+  assert x.to_bits() == 0xeb and isinstance( x.to_bits(), Bits(8) )
+  assert int( x ) == -1 and int( Q4_4( 2.9 ) ) == 2
+  assert repr( x ) == 'FixedPoint( 4, 4, 0xeb )'
+  assert str( x ) == '-1.3125'
+
+  assert Q4_4.from_raw( 0xeb ).raw() == -21
+  assert Q4_4.from_raw( -21 ).raw() == -21
+  with pytest.raises( ValueError ):
+    Q4_4.from_raw( 0x100 )
+
+  # Conversions between formats quantize and saturate the exact value
+
+  assert float( FixedPoint( 2, 2, 'rnd', 'sat' )( x ) ) == -1.25
+  assert float( FixedPoint( 2, 1, 'rnd', 'sat' )( Q4_4( 7.5 ) ) ) == 1.5
+  assert float( Q4_4( Bits(4)( 0xf ) ) ) == -1.0
+
+#-----------------------------------------------------------------------
+# test_arith
+#-----------------------------------------------------------------------
+def test_arith():
+
+  x = FixedPoint( 4, 4 )( 7.9375 )
+  y = FixedPoint( 2, 6 )( -2.0 )
+
+  # Results grow by the ap_fixed rules and are exact
+
+  for result, I, F, value in [
+    ( x + y,  5, 6,   5.9375 ),
+    ( x - y,  5, 6,   9.9375 ),
+    ( y - x,  5, 6,  -9.9375 ),
+    ( x * y,  6, 10, -15.875 ),
+    ( -y,     3, 6,   2.0 ),
+    ( abs(y), 3, 6,   2.0 ),
+    ( x + 3,  5, 4,  10.9375 ),
+    ( 3 - x,  5, 4,  -4.9375 ),
+    ( x * -4, 8, 4, -31.75 ),
+    ( x + Bits(8)( 3 ),   10, 4,  10.9375 ),
+    ( x + Bits(8)( 200 ), 10, 4, 207.9375 ),
+    ( x * Bits(2)( 3 ),    7, 4,  23.8125 ),
+  ]:
+    assert ( result.I, result.F ) == ( I, F )
+    assert float( result ) == value
+
+  # Shifts keep the format
+
+  assert float( x << 1 ) == -0.125
+  assert float( y >> 1 ) == -1.0
+  assert type( x >> 3 ) is type( x )
+
+  with pytest.raises( TypeError ):
+    x + 1.5
+
+#-----------------------------------------------------------------------
+# test_compare
+#-----------------------------------------------------------------------
+def test_compare():
+
+  x = FixedPoint( 4, 4 )( 1.5 )
+  y = FixedPoint( 2, 6 )( 1.5 )
+
+  assert x == y and not ( x != y )
+  assert x < FixedPoint( 8, 8 )( 1.50390625 )
+  assert x > 1 and x >= 1 and x <= 2 and not ( x < 1 )
+  assert type( x == y ) is Bits(1)
+  assert hash( x ) != hash( FixedPoint( 4, 4 )( -1.5 ) )
+
+  # Floats are compared exactly
+
+  assert ( x < 1.0 ) == 0 and ( x > 2.0 ) == 0 and ( x == 1.5 ) == 1
+  assert ( x > 1.0 ) == 1 and ( x <= 1.5 ) == 1 and ( x != 1.5 ) == 0
+  assert ( 1.0 < x ) == 1 and ( 2.0 <= x ) == 0
+  assert ( FixedPoint( -2, 6 )( 0.1 ) < 0.1 ) == 1
+  assert ( FixedPoint( 1, 60 )( 0.1 ) == 0.1 ) == 1
+  assert ( FixedPoint( 8, 0 )( 100 ) == 1e20 ) == 0
+  assert ( FixedPoint( 8, 0 )( 100 ) == 100.0 ) == 1
+  assert ( x < float( 'inf' ) ) == 1 and ( x > float( '-inf' ) ) == 1
+  assert ( x == float( 'nan' ) ) == 0 and ( x != float( 'nan' ) ) == 1
+  assert ( x < float( 'nan' ) ) == 0 and ( x >= float( 'nan' ) ) == 0
+
+  # Equal values hash alike in any format, and like ints and floats
+
+  z = FixedPoint( 12, -2 )( 8 )
+  assert hash( x ) == hash( y ) == hash( 1.5 )
+  assert hash( FixedPoint( 8, 4 )( 8 ) ) == hash( z ) == hash( 8 )
+  assert len( set( [ x, y, 1.5 ] ) ) == 1
@@ -0,0 +1,230 @@
+#==============================================================================
+# instrument.py
+#==============================================================================
+# Opt-in profiling of the operations performed on Bits objects.
+#
+# Profiling is built on sys.setprofile() rather than on wrappers around
+# the BitsN methods, so that it also sees module functions imported by
+# name (from bits import concat), and so that it costs nothing at all
+# while disabled: no profile function is installed and the BitsN code is
+# left untouched. While enabled, every Python function call goes through
+# the profile function, so absolute timings are inflated; use them to
+# compare operations against each other.
+
+import sys
+import timeit
+
+import bits
+from bits import Bits, BitsN
+
+#------------------------------------------------------------------------------
+# enable_profiling
+#------------------------------------------------------------------------------
+def enable_profiling():
+  '''Start counting the operations performed on Bits objects in the
+  current thread. Counters keep accumulating across enable/disable
+  cycles until reset_profiling() is called.
+
+  > enable_profiling()
+  > run_simulation()
+  > disable_profiling()
+  > print profiling_report()
+  '''
+  global _previous
+  if sys.getprofile() is not _profile:
+    _previous = sys.getprofile()
+    _stack[:] = []
+    sys.setprofile( _profile )
+
+#------------------------------------------------------------------------------
+# disable_profiling
+#------------------------------------------------------------------------------
+def disable_profiling():
+  'Stop counting, restoring any profile function installed before.'
+  global _previous
+  if sys.getprofile() is _profile:
+    sys.setprofile( _previous )
+  _previous = None
+
+#------------------------------------------------------------------------------
+# reset_profiling
+#------------------------------------------------------------------------------
+def reset_profiling():
+  'Clear all counters.'
+  _calls.clear()
+  _instances.clear()
+  _range_errors.clear()
+  _classes[0] = 0
+
+#------------------------------------------------------------------------------
+# profiling_snapshot
+#------------------------------------------------------------------------------
+def profiling_snapshot():
+  '''Return the counters as a dict:
+
+    operations      list of dicts with the op name, the operand widths
+                    (None for int operands), the number of calls and
+                    their cumulative time in seconds
+    instances       number of Bits objects created, per width
+    classes_created number of new BitsN classes made by Bits()
+    range_errors    number of values rejected by range checks, per width
+  '''
+  return {
+    'operations': [ { 'op': op, 'widths': widths,
+                      'calls': count, 'time': time }
+                    for ( op, widths ), ( count, time ) in _calls.items() ],
+    'instances'      : dict( _instances ),
+    'classes_created': _classes[0],
+    'range_errors'   : dict( _range_errors ),
+  }
+
+#------------------------------------------------------------------------------
+# profiling_report
+#------------------------------------------------------------------------------
+def profiling_report( sort = 'time', limit = 20 ):
+  '''Return a printable report of the counters, with the operations
+  sorted by cumulative time (sort = 'time') or call count
+  (sort = 'calls'), and at most limit of them listed.'''
+
+  snapshot   = profiling_snapshot()
+  operations = sorted( snapshot[ 'operations' ], key=lambda x: x[ sort ],
+                       reverse=True )
+
+  lines = [ '{:<32} {:>10} {:>12} {:>10}'.format(
+              'operation', 'calls', 'time (ms)', 'us/call' ) ]
+  for x in operations[ :limit ]:
+    widths = ', '.join( 'int' if n is None else str( n )
+                        for n in x[ 'widths' ] )
+    lines.append( '{:<32} {:>10} {:>12.3f} {:>10.3f}'.format(
+      '{}({})'.format( x[ 'op' ], widths ), x[ 'calls' ],
+      x[ 'time' ] * 1e3, x[ 'time' ] / x[ 'calls' ] * 1e6 ) )
+
+  lines.append( '' )
+  lines.append( 'instances created: {}'.format( ', '.join(
+    'Bits({}) x {}'.format( n, c )
+    for n, c in sorted( snapshot[ 'instances' ].items() ) ) or 'none' ) )
+  lines.append( 'classes created: {}'.format( snapshot[ 'classes_created' ] ) )
+  lines.append( 'range errors: {}'.format( ', '.join(
+    'Bits({}) x {}'.format( n, c )
+    for n, c in sorted( snapshot[ 'range_errors' ].items() ) ) or 'none' ) )
+
+  return '\n'.join( lines )
+
+#------------------------------------------------------------------------------
+# counters
+#------------------------------------------------------------------------------
+
+_calls        = {}    # (op, widths) -> [ calls, cumulative seconds ]
+_instances    = {}    # nbits -> instances created
+_range_errors = {}    # nbits -> values rejected
+_classes      = [ 0 ] # classes created by Bits()
+
+_stack        = []    # (frame, key, start time) of pending calls
+_previous     = None  # profile function replaced by enable_profiling()
+
+_timer        = timeit.default_timer
+
+#------------------------------------------------------------------------------
+# operand widths
+#------------------------------------------------------------------------------
+# Each profiled function maps to a function which returns the operand
+# widths of a call from the locals of its frame.
+
+def _width( x ):
+  return x.nbits if isinstance( x, BitsN ) else None
+
+def _unary( f ):
+  return ( f[ 'self' ].nbits, )
+
+def _binary( f ):
+  return ( f[ 'self' ].nbits, _width( f[ 'other' ] ) )
+
+def _extend( f ):
+  return ( _width( f[ 'bits' ] ), f[ 'new_width' ] )
+
+def _reduce( f ):
+  return ( _width( f[ 'bits' ] ), )
+
+def _concat( f ):
+  return tuple( _width( x ) for x in f[ 'bits_objects' ] )
+
+_UNARY_METHODS = [
+  '__getitem__', '__setitem__', '__invert__', 'uint', 'int', 'bin', 'oct',
+  'hex', '__str__', 'set_value',
+]
+
+_BINARY_METHODS = [
+  '__add__', '__sub__', '__mul__', '__div__', '__floordiv__', '__mod__',
+  '__radd__', '__rsub__', '__rmul__', '__lshift__', '__rshift__',
+  '__and__', '__xor__', '__or__', '__rand__', '__rxor__', '__ror__',
+  '__eq__', '__ne__', '__lt__', '__le__', '__gt__', '__ge__',
+  '__iadd__', '__isub__', '__imul__', '__idiv__', '__ifloordiv__', '__imod__',
+  '__ilshift__', '__irshift__', '__iand__', '__ixor__', '__ior__', 'add_into',
+]
+
+_FUNCTIONS = [
+  ( 'concat', _concat ), ( 'zext', _extend ), ( 'sext', _extend ),
+  ( 'reduce_and', _reduce ), ( 'reduce_or', _reduce ),
+  ( 'reduce_xor', _reduce ),
+]
+
+def _op_name( name ):
+  return name.strip( '_' )
+
+_OPS = {}
+for _name in _UNARY_METHODS:
+  _OPS[ getattr( BitsN, _name ).__func__.__code__ ] = ( _op_name( _name ),
+                                                        _unary )
+for _name in _BINARY_METHODS:
+  _OPS[ getattr( BitsN, _name ).__func__.__code__ ] = ( _op_name( _name ),
+                                                        _binary )
+for _name, _widths in _FUNCTIONS:
+  _OPS[ getattr( bits, _name ).__code__ ] = ( _name, _widths )
+del _name, _widths
+
+# Functions which create instances and classes or reject values
+
+_INIT_CODE        = BitsN.__init__.__func__.__code__
+_NEW_BITS_CODE    = bits._new_bits_fresh.__code__
+_FACTORY_CODE     = Bits.__new__.__code__
+_VALUE_ERROR_CODE = bits._value_error.__code__
+
+#------------------------------------------------------------------------------
+# _profile
+#------------------------------------------------------------------------------
+def _profile( frame, event, arg ):
+
+  if event == 'call':
+    code = frame.f_code
+    op   = _OPS.get( code )
+
+    if op is not None:
+      name, widths = op
+      try:
+        key = ( name, widths( frame.f_locals ) )
+      except (AttributeError, KeyError):
+        key = ( name, () )
+      _stack.append( ( frame, key, _timer() ) )
+
+    elif code is _INIT_CODE:
+      _count( _instances, frame.f_locals[ 'self' ].nbits )
+    elif code is _NEW_BITS_CODE:
+      _count( _instances, frame.f_locals[ 'cls' ].nbits )
+    elif code is _FACTORY_CODE:
+      _stack.append( ( frame, None, len( Bits.__cache__ ) ) )
+    elif code is _VALUE_ERROR_CODE:
+      _count( _range_errors, frame.f_locals[ 'nbits' ] )
+
+  elif event == 'return' and _stack and _stack[-1][0] is frame:
+    _, key, start = _stack.pop()
+    if key is None:
+      _classes[0] += len( Bits.__cache__ ) - start
+    else:
+      entry = _calls.get( key )
+      if entry is None:
+        entry = _calls[ key ] = [ 0, 0.0 ]
+      entry[0] += 1
+      entry[1] += _timer() - start
+
+def _count( counters, key ):
+  counters[ key ] = counters.get( key, 0 ) + 1
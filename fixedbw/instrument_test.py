@@ -0,0 +1,133 @@
+#=======================================================================
+# instrument_test.py
+#=======================================================================
+# Tests for profiling Bits operations.
+
+import sys
+
+import pytest
+
+from bits       import Bits, concat, zext, reduce_or
+from bits       import enable_interning, disable_interning
+from instrument import (
+  enable_profiling,
+  disable_profiling,
+  reset_profiling,
+  profiling_snapshot,
+  profiling_report,
+)
+
+#-----------------------------------------------------------------------
+# helpers
+#-----------------------------------------------------------------------
+
+def calls( snapshot, op, widths ):
+  for x in snapshot['operations']:
+    if x['op'] == op and x['widths'] == widths:
+      return x['calls']
+  return 0
+
+@pytest.fixture
+def profiling():
+  reset_profiling()
+  enable_profiling()
+  yield
+  disable_profiling()
+  reset_profiling()
+
+#-----------------------------------------------------------------------
+# test_operations
+#-----------------------------------------------------------------------
+def test_operations( profiling ):
+
+  a = Bits(8)(3)
+  b = Bits(4)(2)
+
+  for _ in range( 5 ):
+    a + b
+  a + 1
+  a < b
+  a[0:4]
+  concat( a, b )
+  zext( b, 8 )
+  reduce_or( b )
+
+  disable_profiling()
+  snapshot = profiling_snapshot()
+
+  assert calls( snapshot, 'add', (8, 4) ) == 5
+  assert calls( snapshot, 'add', (8, None) ) == 1
+  assert calls( snapshot, 'lt', (8, 4) ) == 1
+  assert calls( snapshot, 'getitem', (8,) ) == 1
+  assert calls( snapshot, 'concat', (8, 4) ) == 1
+  assert calls( snapshot, 'zext', (4, 8) ) == 1
+  assert calls( snapshot, 'reduce_or', (4,) ) == 1
+
+  for x in snapshot['operations']:
+    assert x['time'] >= 0
+
+  # The operations above all created new Bits objects
+
+  assert snapshot['instances'][9] == 5
+  assert snapshot['instances'][12] >= 1
+
+  report = profiling_report( sort='calls' )
+  assert report.splitlines()[1].startswith( 'add(8, 4)' )
+  assert 'Bits(9) x 5' in report
+
+#-----------------------------------------------------------------------
+# test_classes_and_errors
+#-----------------------------------------------------------------------
+def test_classes_and_errors( profiling ):
+
+  Bits(8)
+  Bits(777)
+  with pytest.raises( ValueError ):
+    Bits(4)(16)
+  with pytest.raises( ValueError ):
+    Bits(4)(-9)
+  assert profiling_snapshot()['classes_created'] == 1
+
+  # Slice and bit assignments count against the width being written
+
+  x = Bits(8)( 0 )
+  with pytest.raises( ValueError ):
+    x[0:3] = 8
+  with pytest.raises( ValueError ):
+    x[:] = 256
+  with pytest.raises( ValueError ):
+    x[5] = 2
+
+  # So do the constructors of interned widths
+
+  enable_interning( 2 )
+  try:
+    with pytest.raises( ValueError ):
+      Bits(2)( 4 )
+  finally:
+    disable_interning()
+
+  disable_profiling()
+  snapshot = profiling_snapshot()
+
+  assert snapshot['range_errors'] == { 1: 1, 2: 1, 3: 1, 4: 2, 8: 1 }
+
+#-----------------------------------------------------------------------
+# test_disable
+#-----------------------------------------------------------------------
+def test_disable():
+
+  previous = sys.getprofile()
+
+  reset_profiling()
+  enable_profiling()
+  Bits(8)(1) + Bits(8)(2)
+  disable_profiling()
+
+  # Nothing is installed or counted while disabled
+  assert sys.getprofile() is previous
+  Bits(8)(1) + Bits(8)(2)
+  assert calls( profiling_snapshot(), 'add', (8, 8) ) == 1
+
+  reset_profiling()
+  assert profiling_snapshot()['operations'] == []
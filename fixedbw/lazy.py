@@ -0,0 +1,65 @@
+#==============================================================================
+# lazy.py
+#==============================================================================
+# Lazy evaluation of fixed-bitwidth models.
+
+from expr import Graph, evaluate
+
+#------------------------------------------------------------------------------
+# LazyGraph
+#------------------------------------------------------------------------------
+class LazyGraph( Graph ):
+  '''A Graph whose inputs are bound to values and evaluated on demand.
+
+  Binding a Bits object (or a BitsArray) returns an expression which
+  stands for it. Applying BitsN operators and bits.py functions to these
+  expressions builds a graph instead of computing values: repeated
+  subexpressions are shared, operations on constants are folded, and
+  widths are inferred with the BitsN rules. Nothing is computed until a
+  value is demanded with value() or Expr.eval(). Computed values are
+  cached, so later demands only evaluate nodes not computed yet, until
+  an input is bound to a new value.
+
+  > g = LazyGraph()
+  > a = g.bind( 'a', Bits(8)(3) )
+  > b = g.bind( 'b', Bits(8)(4) )
+  > c = (a + b) * (a + b)        # a + b is built and computed only once
+  > g.value( c )                 # Bits( 18, 0x00031 )
+  > g.bind( 'a', BitsArray.from_values( 8, range(100) ) )
+  > c.eval()                     # BitsArray of 100 results
+  '''
+
+  def __init__( self, fold = True ):
+    Graph.__init__( self, fold )
+    self._bindings = {}
+    self._cache    = {}
+
+    # Number of nodes computed so far
+    self.evaluated = 0
+
+  def bind( self, name, value ):
+    '''Bind the input called name to a Bits object or a BitsArray, and
+    return its expression. Rebinding an input must keep its width.'''
+    node = self.var( name, value.nbits )
+    self._bindings[ name ] = value
+    self._cache.clear()
+    return node
+
+  def value( self, *outputs ):
+    '''Return the value of an expression, or a list of values for several
+    expressions, using the bound input values.'''
+    values = self._evaluate( outputs, {} )
+    return values[0] if len( outputs ) == 1 else values
+
+  def _evaluate( self, outputs, inputs ):
+
+    # Values given explicitly do not go through the cache
+    if inputs:
+      bindings = dict( self._bindings )
+      bindings.update( inputs )
+      return evaluate( outputs, bindings )
+
+    computed = len( self._cache )
+    values   = evaluate( outputs, self._bindings, self._cache )
+    self.evaluated += len( self._cache ) - computed
+    return values
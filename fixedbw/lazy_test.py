@@ -0,0 +1,177 @@
+#=======================================================================
+# lazy_test.py
+#=======================================================================
+# Tests for the LazyGraph class.
+
+import pytest
+
+from bits import Bits, concat, zext, sext, reduce_xor
+from expr import Graph
+from lazy import LazyGraph
+
+#-----------------------------------------------------------------------
+# test_scalar
+#-----------------------------------------------------------------------
+def test_scalar():
+
+  g = LazyGraph()
+  a = g.bind( 'a', Bits(8)(3) )
+  b = g.bind( 'b', Bits(8)(4) )
+  c = (a + b) * (a + b)
+
+  assert g.evaluated == 0
+  assert c.nbits == 18
+
+  value = g.value( c )
+  assert value.nbits == 18
+  assert value == 49
+
+  # a, b, a + b and the product are each computed once
+  assert g.evaluated == 4
+
+  # Later demands reuse cached values
+  d, e = g.value( a + b, c + 1 )
+  assert d == 7 and d.nbits == 9
+  assert e == 50
+  assert g.evaluated == 5
+
+  # Rebinding an input invalidates the cache
+  g.bind( 'a', Bits(8)(5) )
+  assert c.eval() == 81
+  with pytest.raises( ValueError ):
+    g.bind( 'a', Bits(4)(5) )
+
+  # Explicit input values override the bound ones
+  assert c.eval( a=Bits(8)(1) ) == 25
+  assert c.eval( a=1, b=1 ) == 4
+  assert c.eval() == 81
+
+#-----------------------------------------------------------------------
+# test_inplace
+#-----------------------------------------------------------------------
+def test_inplace():
+
+  g   = LazyGraph()
+  acc = g.bind( 'acc', Bits(8)( 0xfe ) )
+  x   = g.bind( 'x', Bits(8)( 0x06 ) )
+  a   = acc
+
+  # Augmented assignments keep the width of acc, and bind a new node
+  # without changing the one they started from
+
+  acc += x
+  assert acc.nbits == 8 and g.value( acc ) == 0x04
+  acc <<= 3
+  assert acc.nbits == 8 and g.value( acc ) == 0x20
+  acc *= x
+  assert acc.nbits == 8 and g.value( acc ) == 0xc0
+  assert a is not acc and g.value( a ) == 0xfe
+
+  b = Bits(8)( 0xfe )
+  b += Bits(8)( 0x06 )
+  b <<= 3
+  b *= Bits(8)( 0x06 )
+  assert g.value( acc ).nbits == b.nbits and g.value( acc ) == b
+
+#-----------------------------------------------------------------------
+# test_shared_subexpressions
+#-----------------------------------------------------------------------
+def test_shared_subexpressions():
+
+  g = LazyGraph()
+  x = g.bind( 'x', Bits(16)(0x1234) )
+  y = g.bind( 'y', Bits(16)(0x00ff) )
+
+  outputs = [ ((x ^ y) + (x & y))[i:i+4] for i in range( 0, 16, 4 ) ]
+
+  # x ^ y, x & y and their sum are built once and shared by all slices
+  assert g.cse_hits == 9
+  assert len( g ) == 2 + 3 + 4
+
+  expected = [ ((Bits(16)(0x1234) ^ 0xff) + (Bits(16)(0x1234) & 0xff))[i:i+4]
+               for i in range( 0, 16, 4 ) ]
+  assert g.value( *outputs ) == expected
+  assert g.evaluated == len( g )
+
+#-----------------------------------------------------------------------
+# test_constant_folding
+#-----------------------------------------------------------------------
+def test_constant_folding():
+
+  g = Graph()
+  x = g.var( 'x', 8 )
+  k = g.const( Bits(8)(3) )
+
+  # Operations on constants only become constant nodes
+
+  y = (k + Bits(8)(4)) * k
+  assert y.op == 'const'
+  assert y.param == 21 and y.nbits == 17
+  assert reduce_xor( k ).param == 0
+  assert concat( k, k ).param == 0x0303
+  assert g.folded == 4
+
+  z = x + y
+  assert z.op == 'add'
+  assert z.eval( x=10 ) == 31
+
+  # Folding can be turned off
+
+  g = Graph( fold=False )
+  k = g.const( Bits(8)(3) )
+  assert (k + 1).op == 'add'
+  assert (k + 1).eval() == 4
+
+#-----------------------------------------------------------------------
+# test_functions
+#-----------------------------------------------------------------------
+def test_functions():
+
+  g = Graph()
+  x = g.var( 'x', 8 )
+  y = g.var( 'y', 4 )
+
+  outputs = [ concat( x, y ), zext( y, 12 ), sext( x, 12 ), x[7], x[2:6],
+              x << y, x >> 2, x / (y | 1), x % (y | 1), ~x, x - y,
+              x >= y, x != 3 ]
+
+  for xv in [ 0, 1, 0x7f, 0x80, 0xfe ]:
+    for yv in [ 0, 3, 0xf ]:
+      a, b = Bits(8)(xv), Bits(4)(yv)
+      expected = [ concat( a, b ), zext( b, 12 ), sext( a, 12 ), a[7], a[2:6],
+                   a << b, a >> 2, a / (b | 1), a % (b | 1), ~a, a - b,
+                   a >= b, a != 3 ]
+      values = [ out.eval( x=a, y=b ) for out in outputs ]
+      for value, exp in zip( values, expected ):
+        assert value.nbits == exp.nbits
+        assert value == exp
+
+  with pytest.raises( KeyError ):
+    x.eval()
+  with pytest.raises( ValueError ):
+    x.eval( x=Bits(4)(1) )
+
+#-----------------------------------------------------------------------
+# test_batch
+#-----------------------------------------------------------------------
+def test_batch():
+
+  np = pytest.importorskip( 'numpy' )
+  from bits_array import BitsArray
+
+  g = LazyGraph()
+  a = g.bind( 'a', BitsArray.from_values( 8, range( 256 ) ) )
+  b = g.bind( 'b', Bits(8)(0x5a) )
+
+  s = a + b
+  outputs = [ s, s ^ (a & b), concat( a, s[0:4] ), reduce_xor( s ), s > 300 ]
+  values  = g.value( *outputs )
+
+  for i in range( 256 ):
+    x, y = Bits(8)(i), Bits(8)(0x5a)
+    t    = x + y
+    expected = [ t, t ^ (x & y), concat( x, t[0:4] ), reduce_xor( t ),
+                 t > 300 ]
+    for value, exp in zip( values, expected ):
+      assert value.nbits == exp.nbits
+      assert value.element( i ) == exp
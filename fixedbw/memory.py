@@ -0,0 +1,284 @@
+#==============================================================================
+# memory.py
+#==============================================================================
+# Word-addressable memories of fixed-bitwidth values.
+
+import mmap
+import os
+import struct
+
+import bits
+from bits import Bits, BitsN, _new_bits_fresh
+
+# Words are stored little-endian in the narrowest power-of-two number of
+# bytes which holds them, and words wider than 64 bits as 64-bit limbs.
+# This is the storage format of BitsArray, so blocks of words convert to
+# and from BitsArrays without touching each word. Bits above nbits are
+# ignored when words are read, since a file may hold anything there.
+
+_WORD_FORMATS = { 1: 'B', 2: 'H', 4: 'I', 8: 'Q' }
+_LIMB_MASK    = (1 << 64) - 1
+
+#------------------------------------------------------------------------------
+# BitsMemory
+#------------------------------------------------------------------------------
+class BitsMemory( object ):
+  '''A memory of nwords words of nbits bits each, stored in a contiguous
+  buffer instead of as a list of Bits objects.
+
+  Words are read and written as Bits(nbits) values. With a filename, the
+  memory is backed by a memory-mapped file: existing contents are kept,
+  the file is extended (sparsely, on most filesystems) if it is too
+  small, and the operating system pages words in and out on demand, so
+  memory images larger than RAM can be simulated.
+
+  > mem = BitsMemory( 1024, 32 )
+  > mem[4] = 0xdeadbeef
+  > mem[4]                                 # Bits( 32, 0xdeadbeef )
+  > mem.set_bits( 4, slice( 0, 8 ), 0 )   # same as mem[4][0:8] = 0
+  > mem.copy_block( 8, 0, 16 )             # copy words 0-15 to 8-23
+
+  > image = BitsMemory( 2**30, 64, filename='image.bin' )
+  '''
+
+  def __init__( self, nwords, nbits, filename = None, readonly = False ):
+    '''Create a zero-filled memory, or map nwords words of the given
+    file. If readonly = True, the file must already hold nwords words
+    and any write raises an error.'''
+
+    self.nwords = int( nwords )
+    self.nbits  = int( nbits )
+
+    if self.nwords < 1 or self.nbits < 1:
+      raise ValueError( 'BitsMemory needs a positive size and width '
+                        '(got {} words of {} bits)'
+                        .format( self.nwords, self.nbits ) )
+
+    self._cls  = Bits( self.nbits )
+    self._mask = self._cls._mask
+    self._file = None
+
+    if self.nbits <= 64:
+      self._stride = 1
+      while self._stride * 8 < self.nbits:
+        self._stride *= 2
+      self._word = struct.Struct( '<' + _WORD_FORMATS[ self._stride ] )
+    else:
+      nlimbs = (self.nbits + 63) / 64
+      self._stride = nlimbs * 8
+      self._word = struct.Struct( '<{}Q'.format( nlimbs ) )
+
+    size = self.nwords * self._stride
+
+    if filename is None:
+      if readonly:
+        raise ValueError( 'Only file-backed memories can be read-only' )
+      self._buffer = bytearray( size )
+    else:
+      self._buffer = self._map( filename, size, readonly )
+
+    self.filename = filename
+    self.readonly = readonly
+
+  def _map( self, filename, size, readonly ):
+    'Return a memory map of the first size bytes of the file.'
+
+    if readonly:
+      self._file = open( filename, 'rb' )
+    else:
+      self._file = open( filename, 'r+b' if os.path.exists( filename )
+                                         else 'w+b' )
+
+    try:
+      length = os.fstat( self._file.fileno() ).st_size
+      if length < size:
+        if readonly:
+          raise ValueError( '{} holds {} bytes, {} are needed for {} words'
+                            .format( filename, length, size, self.nwords ) )
+        self._file.truncate( size )
+      access = mmap.ACCESS_READ if readonly else mmap.ACCESS_WRITE
+      return mmap.mmap( self._file.fileno(), size, access=access )
+    except:
+      self._file.close()
+      self._file = None
+      raise
+
+  #----------------------------------------------------------------------------
+  # file handling
+  #----------------------------------------------------------------------------
+
+  def flush( self ):
+    'Write changes of a file-backed memory back to its file.'
+    if self._file is not None and not self.readonly:
+      self._buffer.flush()
+
+  def close( self ):
+    'Flush and unmap a file-backed memory. The memory cannot be used after.'
+    if self._file is not None:
+      self.flush()
+      self._buffer.close()
+      self._file.close()
+      self._file = None
+    self._buffer = None
+
+  def __enter__( self ):
+    return self
+
+  def __exit__( self, *exc_info ):
+    self.close()
+
+  #----------------------------------------------------------------------------
+  # word access
+  #----------------------------------------------------------------------------
+
+  def __len__( self ):
+    return self.nwords
+
+  def __getitem__( self, addr ):
+    'Read the word at addr as a Bits(nbits) value.'
+    return bits._new_bits( self._cls, self._load( self._offset( addr ) ) )
+
+  def __setitem__( self, addr, value ):
+    '''Write a Bits object or an int to the word at addr. The value is
+    checked like the Bits(nbits) constructor checks it.'''
+    self._store( self._offset( addr ), self._payload( value ) )
+
+  def set_bits( self, addr, bit_addr, value ):
+    '''Write a subset of the bits of the word at addr, where bit_addr is a
+    bit index or a slice, with the semantics of Bits.__setitem__.'''
+    offset = self._offset( addr )
+    word   = _new_bits_fresh( self._cls, self._load( offset ) )
+    BitsN.__setitem__( word, bit_addr, value )
+    self._store( offset, word._uint )
+
+  #----------------------------------------------------------------------------
+  # block access
+  #----------------------------------------------------------------------------
+
+  def read_block( self, addr, nwords ):
+    'Return a list of the nwords words starting at addr.'
+    cls = self._cls
+    return [ bits._new_bits( cls, uint )
+             for uint in self._load_block( addr, nwords ) ]
+
+  def write_block( self, addr, values ):
+    'Write a sequence of Bits objects or ints to the words from addr on.'
+    self._store_block( addr, [ self._payload( v ) for v in values ] )
+
+  def copy_block( self, dst, src, nwords ):
+    '''Copy nwords words from address src to address dst with a single
+    buffer copy. The two blocks may overlap.'''
+    src_start, src_stop = self._block( src, nwords )
+    dst_start, dst_stop = self._block( dst, nwords )
+    self._buffer[ dst_start:dst_stop ] = self._buffer[ src_start:src_stop ]
+
+  def to_array( self, addr = 0, nwords = None ):
+    'Return a BitsArray with a copy of nwords words starting at addr.'
+
+    import numpy as np
+    from bits_array import _dtype, _limbs_result, _result
+
+    if nwords is None:
+      nwords = self.nwords - int( addr )
+    start, stop = self._block( addr, nwords )
+
+    if self.nbits <= 64:
+      dtype, shape = _dtype( self.nbits ), ( nwords, )
+    else:
+      dtype, shape = np.uint64, ( nwords, self._stride / 8 )
+
+    stored = np.dtype( dtype ).newbyteorder( '<' )
+    data   = np.frombuffer( self._buffer, dtype=stored, offset=start,
+                            count=(stop - start) / stored.itemsize )
+    data   = data.astype( dtype ).reshape( shape )
+    if self.nbits <= 64:
+      return _result( self.nbits, data )
+    return _limbs_result( self.nbits, data )
+
+  def write_array( self, addr, array ):
+    '''Write the elements of a one-dimensional BitsArray, whose width must
+    not exceed nbits, to the words from addr on.'''
+
+    from bits_array import _convert
+
+    if array.nbits > self.nbits or len( array.shape ) != 1:
+      raise ValueError( 'Cannot write a BitsArray({}) of shape {} to a '
+                        'memory of {}-bit words'
+                        .format( array.nbits, array.shape, self.nbits ) )
+
+    data, _, _ = _convert( array, self.nbits, check = False )
+    data = data.astype( data.dtype.newbyteorder( '<' ) )
+    start, stop = self._block( addr, array.shape[0] )
+    self._buffer[ start:stop ] = data.tostring()
+
+  #----------------------------------------------------------------------------
+  # helpers
+  #----------------------------------------------------------------------------
+
+  def _offset( self, addr ):
+    'Return the byte offset of the word at addr.'
+    addr = int( addr )
+    if not (0 <= addr < self.nwords):
+      raise IndexError( 'BitsMemory address [{}] out of range [0 - {})'
+                        .format( addr, self.nwords ) )
+    return addr * self._stride
+
+  def _block( self, addr, nwords ):
+    'Return the byte range of nwords words starting at addr.'
+    addr, nwords = int( addr ), int( nwords )
+    if not (0 <= addr and 0 <= nwords and addr + nwords <= self.nwords):
+      raise IndexError( 'BitsMemory block [{}:{}] out of range [0 - {})'
+                        .format( addr, addr + nwords, self.nwords ) )
+    return addr * self._stride, (addr + nwords) * self._stride
+
+  def _payload( self, value ):
+    'Return the unsigned value of a word, checked like Bits(nbits) does.'
+    if isinstance( value, self._cls ):
+      return value._uint
+    return self._cls( value )._uint
+
+  def _load( self, offset ):
+    'Return the unsigned value of the word at a byte offset.'
+    if self.nbits <= 64:
+      return self._word.unpack_from( self._buffer, offset )[0] & self._mask
+    uint = 0
+    for limb in reversed( self._word.unpack_from( self._buffer, offset ) ):
+      uint = (uint << 64) | limb
+    return uint & self._mask
+
+  def _store( self, offset, uint ):
+    'Write the unsigned value of a word at a byte offset.'
+    if self.nbits <= 64:
+      self._word.pack_into( self._buffer, offset, uint )
+    else:
+      limbs = [ (uint >> shift) & _LIMB_MASK
+                for shift in xrange( 0, self._stride * 8, 64 ) ]
+      self._word.pack_into( self._buffer, offset, *limbs )
+
+  def _load_block( self, addr, nwords ):
+    'Return the unsigned values of nwords words starting at addr.'
+    start, stop = self._block( addr, nwords )
+    if self.nbits <= 64:
+      uints = struct.unpack_from( self._block_format( nwords ),
+                                  self._buffer, start )
+      if self.nbits == self._stride * 8:
+        return list( uints )
+      mask = self._mask
+      return [ uint & mask for uint in uints ]
+    return [ self._load( offset )
+             for offset in xrange( start, stop, self._stride ) ]
+
+  def _store_block( self, addr, uints ):
+    '''Write unsigned values, which must already fit in nbits, to the words
+    from addr on.'''
+    start, stop = self._block( addr, len( uints ) )
+    if self.nbits <= 64:
+      struct.pack_into( self._block_format( len( uints ) ), self._buffer,
+                        start, *uints )
+    else:
+      for offset, uint in zip( xrange( start, stop, self._stride ), uints ):
+        self._store( offset, uint )
+
+  def _block_format( self, nwords ):
+    'Return the struct format of nwords words of up to 64 bits.'
+    return '<{}{}'.format( nwords, self._word.format[1:] )
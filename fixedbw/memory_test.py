@@ -0,0 +1,165 @@
+#=======================================================================
+# memory_test.py
+#=======================================================================
+# Tests for the BitsMemory class.
+
+import pytest
+
+from bits       import Bits, enable_interning, disable_interning
+from bits_array import BitsArray
+from memory     import BitsMemory
+
+#-----------------------------------------------------------------------
+# test_words
+#-----------------------------------------------------------------------
+@pytest.mark.parametrize( 'nbits', [ 1, 8, 12, 32, 64, 100, 128 ] )
+def test_words( nbits ):
+
+  mem = BitsMemory( 16, nbits )
+  assert len( mem ) == 16
+  assert mem[0] == 0 and isinstance( mem[0], Bits( nbits ) )
+
+  top = (1 << nbits) - 1
+  mem[3]  = top
+  mem[15] = Bits( nbits )( 1 )
+  mem[Bits(4)(4)] = -1 if nbits > 1 else 1
+  assert mem[3] == top and mem[15] == 1 and mem[4] == top
+  assert mem[2] == 0 and mem[5] == 0
+
+  with pytest.raises( ValueError ):
+    mem[0] = top + 1
+  with pytest.raises( IndexError ):
+    mem[16]
+  with pytest.raises( IndexError ):
+    mem[-1] = 0
+  assert [ w.uint() for w in mem ][ 3:6 ] == [ top, top, 0 ]
+
+#-----------------------------------------------------------------------
+# test_set_bits
+#-----------------------------------------------------------------------
+def test_set_bits():
+
+  mem = BitsMemory( 4, 16 )
+  mem[1] = 0x1234
+
+  mem.set_bits( 1, slice( 0, 8 ), 0xff )
+  mem.set_bits( 1, 15, 1 )
+  mem.set_bits( 1, slice( 8, 12 ), -1 )
+  assert mem[1] == 0x9fff
+
+  expected = Bits(16)( 0x9fff )
+  for addr, value in [ ( slice( 0, 4 ), 16 ), ( 3, 2 ), ( slice( 4, 2 ), 0 ),
+                       ( 16, 1 ) ]:
+    with pytest.raises( Exception ) as mem_error:
+      mem.set_bits( 1, addr, value )
+    with pytest.raises( Exception ) as bits_error:
+      expected[ addr ] = value
+    assert mem_error.type is bits_error.type
+
+  assert mem[1] == 0x9fff
+
+  # Sub-word writes go through even while interning is enabled
+
+  enable_interning( max_nbits=8 )
+  try:
+    mem = BitsMemory( 2, 8 )
+    mem.set_bits( 0, slice( 4, 8 ), 3 )
+    assert mem[0] is Bits(8)( 0x30 )
+  finally:
+    disable_interning()
+
+#-----------------------------------------------------------------------
+# test_blocks
+#-----------------------------------------------------------------------
+@pytest.mark.parametrize( 'nbits', [ 8, 24, 64, 130 ] )
+def test_blocks( nbits ):
+
+  mem    = BitsMemory( 32, nbits )
+  values = [ (i * 0x9e3779b97f4a7c15) & ((1 << nbits) - 1) for i in range( 8 ) ]
+
+  mem.write_block( 4, values )
+  assert mem.read_block( 4, 8 ) == values
+  assert mem.read_block( 0, 4 ) == [ 0 ] * 4
+
+  # Overlapping copies behave like memmove
+
+  mem.copy_block( 6, 4, 8 )
+  assert mem.read_block( 4, 10 ) == values[:2] + values
+  mem.copy_block( 0, 6, 8 )
+  assert mem.read_block( 0, 8 ) == values
+
+  with pytest.raises( IndexError ):
+    mem.copy_block( 30, 0, 4 )
+  with pytest.raises( IndexError ):
+    mem.write_block( 30, values )
+  with pytest.raises( ValueError ):
+    mem.write_block( 0, [ 1 << nbits ] )
+
+  # Blocks convert to and from BitsArrays
+
+  array = mem.to_array( 0, 8 )
+  assert isinstance( array, BitsArray ) and array.nbits == nbits
+  assert array.tolist() == values
+  assert mem.to_array().tolist() == mem.read_block( 0, 32 )
+
+  mem.write_array( 20, array )
+  assert mem.read_block( 20, 8 ) == values
+  mem.write_array( 28, BitsArray.from_values( 4, [ 1, 2, 3, 15 ] ) )
+  assert mem.read_block( 28, 4 ) == [ 1, 2, 3, 15 ]
+  with pytest.raises( ValueError ):
+    mem.write_array( 0, BitsArray( nbits + 1, 2 ) )
+
+#-----------------------------------------------------------------------
+# test_file_backed
+#-----------------------------------------------------------------------
+def test_file_backed( tmpdir ):
+
+  path = str( tmpdir.join( 'image.bin' ) )
+
+  with BitsMemory( 1024, 32, filename=path ) as mem:
+    mem[0]    = 0xdeadbeef
+    mem[1023] = 7
+    mem.copy_block( 512, 0, 2 )
+
+  assert tmpdir.join( 'image.bin' ).size() == 4096
+
+  # Contents persist, and existing files are extended but never truncated
+
+  with BitsMemory( 2048, 32, filename=path ) as mem:
+    assert mem[0] == 0xdeadbeef and mem[512] == 0xdeadbeef
+    assert mem[1023] == 7 and mem[2047] == 0
+  assert tmpdir.join( 'image.bin' ).size() == 8192
+
+  with BitsMemory( 16, 32, filename=path ) as mem:
+    mem[1] = 5
+  assert tmpdir.join( 'image.bin' ).size() == 8192
+
+  mem = BitsMemory( 2048, 32, filename=path, readonly=True )
+  assert mem[1] == 5 and mem.to_array( 0, 2 ).tolist() == [ 0xdeadbeef, 5 ]
+  with pytest.raises( TypeError ):
+    mem[0] = 1
+  mem.close()
+
+  with pytest.raises( ValueError ):
+    BitsMemory( 4096, 32, filename=path, readonly=True )
+  with pytest.raises( ValueError ):
+    BitsMemory( 16, 32, readonly=True )
+
+#-----------------------------------------------------------------------
+# test_padding_bits
+#-----------------------------------------------------------------------
+@pytest.mark.parametrize( 'nbits', [ 12, 32, 100 ] )
+def test_padding_bits( tmpdir, nbits ):
+
+  # Bits above nbits in the file are ignored by every read
+
+  path = tmpdir.join( 'ones.bin' )
+  path.write( '\xff' * 4096, mode='wb' )
+  ones = (1 << nbits) - 1
+
+  mem = BitsMemory( 16, nbits, filename=str( path ), readonly=True )
+  assert mem[3] == ones and mem[3].uint() == ones
+  assert ( mem[3] + Bits(1)( 1 ) ).uint() == ones + 1
+  assert [ x.uint() for x in mem.read_block( 0, 4 ) ] == [ ones ] * 4
+  assert mem.to_array( 0, 4 ).uint().tolist() == [ ones ] * 4
+  mem.close()
@@ -0,0 +1,123 @@
+#==============================================================================
+# quantize.py
+#==============================================================================
+# Bulk conversion between floating-point reference data and fixed-width
+# integer values.
+#
+# quantize() maps a float array onto the integers value * scale, rounded
+# and fitted into nbits bits, and returns them as a BitsArray of the two's
+# complement (or unsigned) payloads. dequantize() maps Bits values back to
+# floats. Together they replace per-sample conversions such as
+#
+#   Bits( n )( int( round( x * scale ) ), trunc=True )
+#
+# which quantize( x, n, scale ) reproduces for a whole array at once.
+
+import numpy as np
+
+from bits       import Bits, BitsN
+from bits_array import BitsArray, _WORD_NBITS
+from fixedpoint import QUANTIZATION_MODES, _round
+
+# Rounding modes are the FixedPoint quantization modes, of which the
+# commonly used ones are:
+#
+#   trn       truncate towards minus infinity
+#   rnd_conv  round to nearest, ties to even
+#   rnd_inf   round to nearest, ties away from zero, like round()
+#
+# Overflow modes:
+#
+#   wrap      keep the low nbits bits, like Bits( n )( value, trunc=True )
+#   sat       saturate to the smallest or largest value
+
+ROUNDING_MODES = QUANTIZATION_MODES
+OVERFLOW_MODES = ( 'wrap', 'sat' )
+
+# Integer parts below 2**_INT_NBITS are rounded in int64
+_INT_NBITS = 62
+
+#------------------------------------------------------------------------------
+# quantize
+#------------------------------------------------------------------------------
+def quantize( values, nbits, scale = 1.0, rounding = 'rnd_inf',
+              overflow = 'wrap', signed = True ):
+  '''Quantize floats into nbits-bit values of value * scale.
+
+  values may be a float, a NumPy array or a (nested) sequence of floats.
+  Returns ( result, noverflow ), where result is a BitsArray of the same
+  shape (or a BitsN for a single float) and noverflow is the number of
+  samples which did not fit in nbits bits before the overflow mode was
+  applied. Signed values range over [-2**(nbits-1), 2**(nbits-1)) and are
+  stored as their two's complement payloads; unsigned values range over
+  [0, 2**nbits).
+
+  > samples, noverflow = quantize( reference, 16, 2**15, 'rnd_conv', 'sat' )
+  > floats = dequantize( samples, 2**15 )
+  '''
+
+  nbits = int( nbits )
+  if nbits < 1:
+    raise ValueError( 'Quantized width must be positive (got {})'
+                      .format( nbits ) )
+  if rounding not in ROUNDING_MODES:
+    raise ValueError( 'Unknown rounding mode {!r}'.format( rounding ) )
+  if overflow not in OVERFLOW_MODES:
+    raise ValueError( 'Unknown overflow mode {!r}'.format( overflow ) )
+
+  scaled = np.asarray( values, dtype=np.float64 ) * scale
+  if not np.isfinite( scaled ).all():
+    raise ValueError( 'Cannot quantize NaN or infinite values' )
+
+  # Rounding works on the integer part and the remainder, which are both
+  # exact. The integer parts are int64 when they provably fit and Python
+  # ints otherwise.
+  floor = np.floor( scaled )
+  if scaled.size and np.abs( floor ).max() >= 2.0**_INT_NBITS:
+    ints = np.array( [ int( v ) for v in floor.flat ], dtype=object )
+    ints = ints.reshape( floor.shape )
+  else:
+    ints = floor.astype( np.int64 )
+  q = np.asarray( _round( ints, scaled - floor, 0.5, rounding, np.where ),
+                  dtype=ints.dtype )
+
+  # Bounds beyond the int64 range are compared against Python ints
+  if nbits >= _INT_NBITS and q.dtype != object:
+    q = q.astype( object )
+  lo, hi = ( -(1 << (nbits - 1)), (1 << (nbits - 1)) - 1 ) if signed \
+           else ( 0, (1 << nbits) - 1 )
+  overflowed = ( q < lo ) | ( q > hi )
+  noverflow  = int( np.count_nonzero( overflowed ) )
+
+  if overflow == 'sat' and noverflow:
+    q = np.where( q < lo, lo, np.where( q > hi, hi, q ) )
+
+  if q.ndim == 0:
+    return Bits( nbits )( int( q ), trunc = True ), noverflow
+
+  # Payloads are the low nbits bits, which BitsArray.from_values() keeps
+  # when truncating
+  if q.dtype == object and nbits <= _WORD_NBITS:
+    q = np.array( [ int( v ) & ((1 << nbits) - 1) for v in q.flat ],
+                  dtype=np.uint64 ).reshape( q.shape )
+  return BitsArray.from_values( nbits, q, trunc = True ), noverflow
+
+#------------------------------------------------------------------------------
+# dequantize
+#------------------------------------------------------------------------------
+def dequantize( values, scale = 1.0, signed = True ):
+  '''Return the floats value / scale for a BitsArray, a BitsN or a
+  (nested) sequence of Bits objects, taking values as two's complement
+  if signed. Returns a float64 NumPy array, or a float for a BitsN.'''
+
+  if isinstance( values, BitsN ):
+    return ( values.int() if signed else values.uint() ) / float( scale )
+
+  if isinstance( values, BitsArray ):
+    data = values.int() if signed else values.uint()
+  else:
+    objects = np.array( values, dtype=object )
+    data    = np.array( [ v.int() if signed else v.uint()
+                          for v in objects.flat ], dtype=object )
+    data    = data.reshape( objects.shape )
+  return data.astype( np.float64 ) / scale
@@ -0,0 +1,101 @@
+#=======================================================================
+# quantize_test.py
+#=======================================================================
+# Tests for the bulk quantize and dequantize routines.
+
+import random
+
+import pytest
+
+np = pytest.importorskip( 'numpy' )
+
+from bits       import Bits
+from bits_array import BitsArray
+from fixedpoint import FixedPoint
+from quantize   import quantize, dequantize, ROUNDING_MODES
+
+def random_floats( n, seed=0 ):
+  rng = random.Random( seed )
+  return [ rng.uniform( -1.5, 1.5 ) for _ in xrange( n ) ] + \
+         [ k / 8.0 for k in xrange( -20, 20 ) ]
+
+#-----------------------------------------------------------------------
+# test_quantize
+#-----------------------------------------------------------------------
+@pytest.mark.parametrize( 'nbits', [ 4, 16, 64, 100 ] )
+def test_quantize( nbits ):
+
+  values = random_floats( 200 )
+  scale  = 2.0**(nbits - 2)
+
+  # The defaults match the usual per-sample conversion
+
+  result, noverflow = quantize( np.array( values ), nbits, scale )
+  assert isinstance( result, BitsArray ) and result.nbits == nbits
+  assert result.tolist() == [ Bits( nbits )( int( round( x * scale ) ),
+                                             trunc=True ) for x in values ]
+  assert noverflow == sum( 1 for x in values
+                           if not -2 <= round( x * scale ) / scale < 2 )
+
+  # Rounding modes agree with the FixedPoint quantization modes
+
+  for rounding in ROUNDING_MODES:
+    Q = FixedPoint( 2, nbits - 2, rounding, 'sat' )
+    result, _ = quantize( values, nbits, scale, rounding, 'sat' )
+    assert result.tolist() == [ Q( x ).to_bits() for x in values ]
+
+#-----------------------------------------------------------------------
+# test_overflow
+#-----------------------------------------------------------------------
+def test_overflow():
+
+  values = [ -300.0, -129.0, -128.4, 0.5, 127.4, 127.5, 255.0, 1e30 ]
+
+  result, noverflow = quantize( values, 8, overflow='sat' )
+  assert [ v.int() for v in result ] == [ -128, -128, -128, 1, 127, 127,
+                                          127, 127 ]
+  assert noverflow == 5
+
+  result, noverflow = quantize( values, 8, overflow='sat', signed=False )
+  assert result.uint().tolist() == [ 0, 0, 0, 1, 127, 128, 255, 255 ]
+  assert noverflow == 4
+
+  result, noverflow = quantize( values, 8 )
+  assert result.uint().tolist() == [ 0xd4, 0x7f, 0x80, 1, 0x7f, 0x80, 0xff, 0 ]
+  assert noverflow == 5
+
+  with pytest.raises( ValueError ):
+    quantize( [ 1.0, float( 'nan' ) ], 8 )
+  with pytest.raises( ValueError ):
+    quantize( [ 1.0 ], 8, rounding='nearest' )
+  with pytest.raises( ValueError ):
+    quantize( [ 1.0 ], 8, overflow='sat_zero' )
+
+#-----------------------------------------------------------------------
+# test_scalars
+#-----------------------------------------------------------------------
+def test_scalars():
+
+  assert quantize( 0.3, 8, 16 ) == ( Bits(8)( 5 ), 0 )
+  assert quantize( -2.5, 4, rounding='rnd_conv' ) == ( Bits(4)( 0xe ), 0 )
+  assert quantize( 2.0**70, 80 ) == ( Bits(80)( 2**70 ), 0 )
+
+  result, _ = quantize( [ [ 0.25, -0.5 ], [ 1.0, 0.0 ] ], 4, 4 )
+  assert result.shape == ( 2, 2 )
+
+#-----------------------------------------------------------------------
+# test_dequantize
+#-----------------------------------------------------------------------
+@pytest.mark.parametrize( 'nbits', [ 8, 64, 100 ] )
+def test_dequantize( nbits ):
+
+  values = [ k / 8.0 for k in xrange( -16, 16 ) ]
+  result, _ = quantize( values, nbits, 8 )
+
+  assert dequantize( result, 8 ).tolist() == values
+  assert dequantize( result.tolist(), 8 ).tolist() == values
+  assert dequantize( result.tolist()[0], 8 ) == -2.0
+
+  unsigned = dequantize( result, 8, signed=False )
+  assert unsigned[-1] == values[-1]
+  assert unsigned[0] == ( 2**nbits - 16 ) / 8.0
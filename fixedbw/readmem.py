@@ -0,0 +1,240 @@
+#==============================================================================
+# readmem.py
+#==============================================================================
+# Load and dump memory images in the text formats of Verilog's $readmemh,
+# $readmemb, $writememh and $writememb.
+#
+# Images are read in chunks of whole lines and converted one run of
+# consecutive words at a time, so loading costs at most one int() per
+# word and bounded memory however large the image is. Images can be loaded into
+# a BitsMemory or into a list of Bits objects.
+
+import binascii
+import re
+import struct
+
+import bits
+from bits import Bits
+from memory import BitsMemory
+
+# Bytes of text read at a time, and words formatted at a time
+_CHUNK_SIZE  = 1 << 20
+_CHUNK_WORDS = 1 << 14
+
+#------------------------------------------------------------------------------
+# readmemh
+#------------------------------------------------------------------------------
+def readmemh( source, memory, start = 0 ):
+  '''Load a hex memory image into memory, which is a BitsMemory or a list
+  of Bits objects of the same width. source is a filename or an open
+  file. Words are written from address start, or from the address given
+  by the last @address directive (always in hex). Comments (// and /* */)
+  and _ separators are ignored. Return the number of words loaded.
+
+  > mem = BitsMemory( 1 << 20, 32 )
+  > readmemh( 'program.hex', mem )
+  '''
+  return _readmem( source, memory, start, 16 )
+
+#------------------------------------------------------------------------------
+# readmemb
+#------------------------------------------------------------------------------
+def readmemb( source, memory, start = 0 ):
+  'Load a binary memory image into memory, like readmemh() does.'
+  return _readmem( source, memory, start, 2 )
+
+#------------------------------------------------------------------------------
+# writememh
+#------------------------------------------------------------------------------
+def writememh( dest, memory, start = 0, stop = None ):
+  '''Write words [start:stop] of memory (a BitsMemory or a list of Bits
+  objects) to a hex memory image, one word per line, formatted like
+  Bits.hex() without the prefix. An @address directive is written first
+  unless start is 0. dest is a filename or an open file.'''
+  _writemem( dest, memory, start, stop, '{{:0{}x}}', 4 )
+
+#------------------------------------------------------------------------------
+# writememb
+#------------------------------------------------------------------------------
+def writememb( dest, memory, start = 0, stop = None ):
+  'Write words of memory to a binary memory image, like Bits.bin() does.'
+  _writemem( dest, memory, start, stop, '{{:0{}b}}', 1 )
+
+#------------------------------------------------------------------------------
+# _readmem
+#------------------------------------------------------------------------------
+def _readmem( source, memory, start, base ):
+
+  nbits = _nbits( memory )
+  store = _store_function( memory, nbits )
+  addr  = int( start )
+  count = 0
+
+  with _open( source, 'r' ) as f:
+    for text in _chunks( f, base ):
+
+      # Words between @address directives are converted and stored as
+      # one run
+      pieces = _ADDRESSES.split( text ) if '@' in text else [ text ]
+      for i, piece in enumerate( pieces ):
+        if i % 2:
+          addr = _parse_address( piece )
+        else:
+          run    = piece.split()
+          count += _store_run( store, addr, run, base, nbits )
+          addr  += len( run )
+
+  return count
+
+_COMMENTS    = re.compile( r'//[^\n]*|/\*.*?\*/', re.S )
+_ADDRESSES   = re.compile( r'@(\S*)' )
+_INVALID     = { 16: re.compile( r'[^0-9a-fA-F\s]' ),
+                 2 : re.compile( r'[^01\s]' ) }
+_HEX_FORMATS = { 2: 'B', 4: 'H', 8: 'I', 16: 'Q' }
+
+def _chunks( f, base ):
+  'Yield the text of successive chunks of whole lines, without comments.'
+
+  carry = ''
+  while True:
+    block = f.read( _CHUNK_SIZE )
+    text  = carry + block
+    carry = ''
+
+    # The last partial line continues in the next chunk
+    if block:
+      end = text.rfind( '\n' ) + 1
+      text, carry = text[ :end ], text[ end: ]
+    elif not text:
+      return
+
+    if '/' in text:
+      text = _COMMENTS.sub( ' ', text )
+      # A block comment which is still open continues in the next chunk
+      begin = text.find( '/*' )
+      if begin >= 0:
+        if not block:
+          raise ValueError( 'Unterminated /* comment in memory image' )
+        text, carry = text[ :begin ], text[ begin: ] + carry
+
+    if '_' in text:
+      text = text.replace( '_', '' )
+
+    # Check the digits of a whole chunk at once, since int() also accepts
+    # signs and prefixes; addresses are checked as they are parsed
+    words = _ADDRESSES.sub( ' ', text ) if '@' in text else text
+    bad   = _INVALID[ base ].search( words )
+    if bad:
+      begin = max( words.rfind( c, 0, bad.start() ) for c in ' \t\r\n' ) + 1
+      raise ValueError( 'Invalid {} word {!r} in memory image'.format(
+        'hex' if base == 16 else 'binary', words[ begin: ].split()[0] ) )
+
+    yield text
+
+    if not block:
+      return
+
+def _parse_address( token ):
+  'Return the address of an @address directive, given without the @.'
+  if not token or _INVALID[ 16 ].search( token ):
+    raise ValueError( 'Invalid address @{} in memory image'.format( token ) )
+  return int( token, 16 )
+
+def _store_run( store, addr, run, base, nbits ):
+  'Convert and store a run of words starting at addr.'
+
+  if not run:
+    return 0
+
+  # Hex words which all have the digits of a whole machine word are
+  # converted in bulk, otherwise each word goes through int()
+  ndigits = len( run[0] )
+  if base == 16 and ndigits in _HEX_FORMATS \
+      and len( set( map( len, run ) ) ) == 1:
+    values = list( struct.unpack(
+      '>{}{}'.format( len( run ), _HEX_FORMATS[ ndigits ] ),
+      binascii.unhexlify( ''.join( run ) ) ) )
+  else:
+    values = [ int( token, base ) for token in run ]
+
+  if max( values ) >> nbits:
+    raise bits._value_error( nbits, max( values ) )
+
+  store( addr, values )
+  return len( values )
+
+def _store_function( memory, nbits ):
+  'Return a function storing a list of unsigned words into memory.'
+
+  if isinstance( memory, BitsMemory ):
+    return memory._store_block
+
+  cls = Bits( nbits )
+
+  def store( addr, uints ):
+    if not (0 <= addr and addr + len( uints ) <= len( memory )):
+      raise IndexError( 'Memory image block [{}:{}] out of range [0 - {})'
+                        .format( addr, addr + len( uints ), len( memory ) ) )
+    new_bits = bits._new_bits
+    memory[ addr:addr + len( uints ) ] = [ new_bits( cls, v ) for v in uints ]
+
+  return store
+
+#------------------------------------------------------------------------------
+# _writemem
+#------------------------------------------------------------------------------
+def _writemem( dest, memory, start, stop, spec, digit_nbits ):
+
+  nbits = _nbits( memory )
+  start = int( start )
+  stop  = len( memory ) if stop is None else int( stop )
+
+  if not (0 <= start <= stop <= len( memory )):
+    raise IndexError( 'Memory image block [{}:{}] out of range [0 - {})'
+                      .format( start, stop, len( memory ) ) )
+
+  # Zero-padded to the same number of digits as Bits.hex() and Bits.bin()
+  line = spec.format( (nbits - 1) / digit_nbits + 1 ) + '\n'
+
+  with _open( dest, 'w' ) as f:
+    if start:
+      f.write( '@{:x}\n'.format( start ) )
+    for addr in xrange( start, stop, _CHUNK_WORDS ):
+      uints = _load( memory, addr, min( _CHUNK_WORDS, stop - addr ) )
+      f.write( ( line * len( uints ) ).format( *uints ) )
+
+def _load( memory, addr, nwords ):
+  'Return the unsigned values of nwords words of memory from addr on.'
+  if isinstance( memory, BitsMemory ):
+    return memory._load_block( addr, nwords )
+  return [ int( x ) for x in memory[ addr:addr + nwords ] ]
+
+#------------------------------------------------------------------------------
+# helpers
+#------------------------------------------------------------------------------
+
+def _nbits( memory ):
+  'Return the word width of a BitsMemory or a list of Bits objects.'
+  if isinstance( memory, BitsMemory ):
+    return memory.nbits
+  if not len( memory ):
+    raise ValueError( 'Cannot infer the word width of an empty list' )
+  return memory[0].nbits
+
+class _open( object ):
+  'Open a filename, or use an already open file without closing it.'
+
+  def __init__( self, target, mode ):
+    self.target = target
+    self.mode   = mode
+    self.file   = None
+
+  def __enter__( self ):
+    if isinstance( self.target, basestring ):
+      self.file = open( self.target, self.mode )
+      return self.file
+    return self.target
+
+  def __exit__( self, *exc_info ):
+    if self.file is not None:
+      self.file.close()
@@ -0,0 +1,127 @@
+#=======================================================================
+# readmem_test.py
+#=======================================================================
+# Tests for the memory image loaders and dumpers.
+
+from StringIO import StringIO
+
+import pytest
+
+import readmem
+from bits    import Bits
+from memory  import BitsMemory
+from readmem import readmemh, readmemb, writememh, writememb
+
+IMAGE = '''\
+// boot code
+00000013 0000_0093
+@10 deadbeef  /* a comment
+spanning lines */ cafe
+@4
+ffffffff // trailing comment
+'''
+
+#-----------------------------------------------------------------------
+# test_readmemh
+#-----------------------------------------------------------------------
+@pytest.mark.parametrize( 'target', [ 'memory', 'list' ] )
+def test_readmemh( target ):
+
+  if target == 'memory':
+    mem = BitsMemory( 32, 32 )
+  else:
+    mem = [ Bits(32)( 0 ) ] * 32
+
+  assert readmemh( StringIO( IMAGE ), mem ) == 5
+
+  words = [ mem[i] for i in range( 32 ) ]
+  assert words[0:2]   == [ 0x13, 0x93 ]
+  assert words[16:18] == [ 0xdeadbeef, 0xcafe ]
+  assert words[4]     == 0xffffffff
+  assert all( isinstance( w, Bits(32) ) for w in words )
+  assert sum( 1 for w in words if w != 0 ) == 5
+
+  assert readmemh( StringIO( '1 2 3' ), mem, start=29 ) == 3
+  assert [ mem[i] for i in range( 29, 32 ) ] == [ 1, 2, 3 ]
+
+  with pytest.raises( IndexError ):
+    readmemh( StringIO( '1 2 3' ), mem, start=30 )
+  with pytest.raises( IndexError ):
+    readmemh( StringIO( '@20 1' ), mem )
+  with pytest.raises( ValueError ):
+    readmemh( StringIO( '1ffffffff' ), mem )
+
+  for bad in [ 'xxxxxxxx', '-1', '0x12', '12 4g', '@zz 1', '/* 1' ]:
+    with pytest.raises( ValueError ):
+      readmemh( StringIO( bad ), mem )
+
+#-----------------------------------------------------------------------
+# test_readmemb
+#-----------------------------------------------------------------------
+def test_readmemb():
+
+  mem = BitsMemory( 16, 4 )
+  assert readmemb( StringIO( '1010 0_1_1_1\n@a 1111 // @b\n' ), mem ) == 3
+  assert mem.read_block( 0, 2 ) == [ 0b1010, 0b0111 ]
+  assert mem[10] == 0b1111
+
+  for bad in [ '0b11', '12', '10000' ]:
+    with pytest.raises( ValueError ):
+      readmemb( StringIO( bad ), mem )
+
+#-----------------------------------------------------------------------
+# test_chunks
+#-----------------------------------------------------------------------
+def test_chunks( monkeypatch ):
+
+  # Tiny chunks split runs and block comments across chunk boundaries
+
+  monkeypatch.setattr( readmem, '_CHUNK_SIZE', 8 )
+  monkeypatch.setattr( readmem, '_CHUNK_WORDS', 3 )
+
+  mem = BitsMemory( 32, 32 )
+  assert readmemh( StringIO( IMAGE * 2 ), mem ) == 10
+  assert mem[5] == 0x13 and mem[6] == 0x93 and mem[17] == 0xcafe
+
+  out = StringIO()
+  writememh( out, mem )
+  again = BitsMemory( 32, 32 )
+  readmemh( StringIO( out.getvalue() ), again )
+  assert again.read_block( 0, 32 ) == mem.read_block( 0, 32 )
+
+#-----------------------------------------------------------------------
+# test_writemem
+#-----------------------------------------------------------------------
+@pytest.mark.parametrize( 'nbits', [ 1, 7, 32, 100 ] )
+def test_writemem( nbits, tmpdir ):
+
+  values = [ (i * 0x9e3779b97f4a7c15) & ((1 << nbits) - 1) for i in range( 20 ) ]
+  mem    = BitsMemory( 20, nbits )
+  mem.write_block( 0, values )
+  words  = mem.read_block( 0, 20 )
+
+  out = StringIO()
+  writememh( out, mem )
+  assert out.getvalue().splitlines() == [ w.hex()[2:] for w in words ]
+
+  out = StringIO()
+  writememb( out, words, start=5, stop=8 )
+  assert out.getvalue().splitlines() == \
+         [ '@5' ] + [ w.bin()[2:] for w in words[5:8] ]
+
+  with pytest.raises( IndexError ):
+    writememh( StringIO(), mem, start=4, stop=21 )
+
+  # Round trips through files, into lists and memories
+
+  path = str( tmpdir.join( 'image.hex' ) )
+  writememh( path, mem, start=3 )
+  copy = [ Bits( nbits )( 0 ) ] * 20
+  assert readmemh( path, copy ) == 17
+  assert copy[3:] == words[3:] and copy[:3] == [ 0 ] * 3
+
+  path = str( tmpdir.join( 'image.bin' ) )
+  writememb( path, words )
+  copy = BitsMemory( 20, nbits )
+  assert readmemb( path, copy ) == 20
+  assert copy.read_block( 0, 20 ) == words
@@ -0,0 +1,512 @@
+#==============================================================================
+# sbits.py
+#==============================================================================
+# Fixed-bitwidth signed integers.
+#
+# SBits(nbits) values store their signed two's complement value directly,
+# so reading it, comparing, shifting and dividing never go through the
+# unsigned payload. Widths follow the ap_int column of
+# bitwidth_inference_comparison.rst, including its narrower_is_signed
+# rule for operations which mix signed and unsigned operands:
+#
+#   i + j, i - j  max( L(i), L(j) ) + 1 + narrower_is_signed( i, j )
+#   i * j         L(i) + L(j)
+#   i / j         L(i) + is_signed( j )
+#   i % j         min( L(i), L(j) ) if both are signed, L(j) + 1 if only
+#                 i is signed, min( L(i), L(j) ) + 1 if only j is signed
+#   i & | ^ j     max( L(i), L(j) ), signed only if both operands are
+#
+# Results are signed when either operand is. As with Bits, operations
+# with unsized ints keep the type of the SBits operand and wrap.
+#
+# SBitsN is deliberately not a subclass of BitsN and does not implement
+# __index__, so the BitsN operators return NotImplemented for SBits
+# operands and Python hands mixed operations to the SBits reflected
+# operators, at no cost to the Bits fast paths.
+
+import operator
+
+import bits
+from bits import Bits, BitsN, _int_types, _index, _real_operand, \
+                 _shift_operand, concat, reduce_and, reduce_or, reduce_xor
+
+#------------------------------------------------------------------------------
+# SBits
+#------------------------------------------------------------------------------
+class SBits( type ):
+  '''A metaclass constructor which returns signed fixed-bitwidth
+  **classes**.
+
+  > x = SBits(8)( -5 )          # 8-bit -5
+  > y = x >> 1                  # arithmetic shift: -3
+  > z = x * Bits(4)( 3 )        # SBits(12) -15
+  > x < 0                       # Bits( 1, 0x1 )
+  > SBits(8)( Bits(8)( 0xff ), trunc=True )    # reinterpret: -1
+  '''
+
+  __cache__ = {}
+
+  #----------------------------------------------------------------------------
+  # constructor
+  #----------------------------------------------------------------------------
+  def __new__( cls, nbits ):
+    'Return a new SBitsN class where N = nbits.'
+
+    nbits = int( nbits )
+
+    try:
+      return SBits.__cache__[ nbits ]
+    except KeyError:
+      if nbits < 1:
+        raise ValueError( 'SBits width must be positive (got {})'
+                          .format( nbits ) )
+      new_class = type( 'SBits{}'.format( nbits ),
+                        (SBitsN,),
+                        {'__slots__': (),
+                         'nbits'  : nbits,
+                         '_max'   : (1 << (nbits - 1)) - 1,
+                         '_min'   : -(1 << (nbits - 1)),
+                         '_mask'  : (1 << nbits) - 1,
+                         '_sign'  : 1 << (nbits - 1),
+                         '_bits'  : Bits( nbits ),
+                         # result types of binary ops, keyed by other.nbits
+                         # for signed and unsigned other operands
+                         '_add_types' : _SignedTypes( nbits, _add_nbits ),
+                         '_uadd_types': _SignedTypes( nbits, _uadd_nbits ),
+                         '_mul_types' : _SignedTypes( nbits, _mul_nbits ),
+                        } )
+      SBits.__cache__[ nbits ] = new_class
+      return new_class
+
+#------------------------------------------------------------------------------
+# _SignedTypes
+#------------------------------------------------------------------------------
+class _SignedTypes( dict ):
+  '''Table mapping other.nbits to the SBitsN class returned by a binary
+  operator, filled in on first use like the BitsN result type tables.'''
+
+  def __init__( self, nbits, rule ):
+    self.nbits = nbits
+    self.rule  = rule
+
+  def __missing__( self, other_nbits ):
+    result_type = SBits( self.rule( self.nbits, other_nbits ) )
+    self[ other_nbits ] = result_type
+    return result_type
+
+def _narrower_is_signed( signed_nbits, unsigned_nbits ):
+  '''narrower_is_signed() for a signed and an unsigned operand. With equal
+  widths the unsigned operand needs one more bit as a signed value, so
+  the signed operand counts as the narrower one.'''
+  return int( signed_nbits <= unsigned_nbits )
+
+def _add_nbits( nbits, other_nbits ):
+  return max( nbits, other_nbits ) + 1
+
+def _uadd_nbits( nbits, other_nbits ):
+  return max( nbits, other_nbits ) + 1 + _narrower_is_signed( nbits,
+                                                              other_nbits )
+
+def _mul_nbits( nbits, other_nbits ):
+  return nbits + other_nbits
+
+#------------------------------------------------------------------------------
+# SBitsN
+#------------------------------------------------------------------------------
+class SBitsN( object ):
+  'Base class for templated SBits objects.'
+
+  # Instances only store their signed value
+  __slots__ = ( '_int', )
+
+  # Class attributes initialized by SBits() factory
+  nbits       = None
+  _max        = None
+  _min        = None
+  _mask       = None
+  _sign       = None
+  _bits       = None
+  _add_types  = None
+  _uadd_types = None
+  _mul_types  = None
+
+  #----------------------------------------------------------------------------
+  # initializer
+  #----------------------------------------------------------------------------
+  def __init__( self, value = 0, trunc = False ):
+    '''Initialize the value of a newly created SBits object.
+
+    If trunc = True, keep the low nbits bits of value as a two's
+    complement number, which also reinterprets the payload of a Bits
+    value. If trunc = False (default), throw an error if the value is
+    outside the signed range of nbits bits.'''
+
+    if self.nbits is None:
+      raise TypeError(
+        'SBitsN cannot be instantiated directly! Use SBits(N) instead.'
+      )
+
+    value = int( value )
+
+    if not (self._min <= value <= self._max):
+      if not trunc:
+        raise ValueError(
+          'Value is out of range for SBits({})!\n'
+          '({} bits are needed to represent value = {} in two\'s complement.)'
+          .format( self.nbits, bits._get_nbits( value ), value )
+        )
+      value = ((value + self._sign) & self._mask) - self._sign
+
+    self._int = value
+
+  #----------------------------------------------------------------------------
+  # type conversion
+  #----------------------------------------------------------------------------
+
+  def __int__( self ):
+    'Type conversion to a (signed) int.'
+    return self._int
+
+  def __long__( self ):
+    return long( self._int )
+
+  def int( self ):
+    'Return the signed integer value.'
+    return self._int
+
+  def uint( self ):
+    'Return the two\'s complement payload as an unsigned integer.'
+    return self._int & self._mask
+
+  def to_bits( self ):
+    'Return the two\'s complement payload as a Bits(nbits) object.'
+    return bits._new_bits( self._bits, self._int & self._mask )
+
+  def bit_length( self ):
+    return ( self._int & self._mask ).bit_length()
+
+  def __nonzero__( self ):
+    return self._int != 0
+
+  def __reduce__( self ):
+    'Pickle as the width and the signed value, like BitsN.__reduce__().'
+    return _unpickle_sbits, ( self.nbits, self._int )
+
+  #----------------------------------------------------------------------------
+  # print methods
+  #----------------------------------------------------------------------------
+
+  def __repr__( self ):
+    return 'SBits( {}, {} )'.format( self.nbits, self.hex() )
+
+  def __str__( self ):
+    return self.to_bits().__str__()
+
+  def bin( self ):
+    return self.to_bits().bin()
+
+  def oct( self ):
+    return self.to_bits().oct()
+
+  def hex( self ):
+    return self.to_bits().hex()
+
+  #----------------------------------------------------------------------------
+  # bit access
+  #----------------------------------------------------------------------------
+  # Bits and slices of signed values are unsigned, like Verilog
+  # part-selects, and are read and written through the payload.
+
+  def __getitem__( self, addr ):
+    'Read a subset of bits as a Bits object using slice notation.'
+    return self.to_bits()[ addr ]
+
+  def __setitem__( self, addr, value ):
+    'Write a subset of bits using slice notation.'
+    payload = bits._new_bits_fresh( self._bits, self._int & self._mask )
+    BitsN.__setitem__( payload, addr, value )
+    self._int = ((payload._uint + self._sign) & self._mask) - self._sign
+
+  #----------------------------------------------------------------------------
+  # arithmetic operators
+  #----------------------------------------------------------------------------
+  # Operations with SBits and Bits operands are exact in the result type.
+  # Unsized ints (and other integer types) wrap into the type of self.
+
+  def __neg__( self ):
+    'result.nbits = self.nbits + 1'
+    return _new_sbits( SBits( self.nbits + 1 ), -self._int )
+
+  def __pos__( self ):
+    return self
+
+  def __abs__( self ):
+    'result.nbits = self.nbits + 1'
+    return _new_sbits( SBits( self.nbits + 1 ), abs( self._int ) )
+
+  def __invert__( self ):
+    'result.nbits = self.nbits'
+    return _new_sbits( self.__class__, ~self._int )
+
+  def __add__( self, other ):
+    'result.nbits = max( self.nbits, other.nbits ) + 1 + narrower_is_signed'
+    if isinstance( other, SBitsN ):
+      return _new_sbits( self._add_types[ other.nbits ], self._int + other._int )
+    if isinstance( other, BitsN ):
+      return _new_sbits( self._uadd_types[ other.nbits ],
+                         self._int + other._uint )
+    other = _int_operand( other )
+    if other is None: return NotImplemented
+    return _new_sbits( self.__class__, self._wrap( self._int + other ) )
+
+  def __sub__( self, other ):
+    'result.nbits = max( self.nbits, other.nbits ) + 1 + narrower_is_signed'
+    if isinstance( other, SBitsN ):
+      return _new_sbits( self._add_types[ other.nbits ], self._int - other._int )
+    if isinstance( other, BitsN ):
+      return _new_sbits( self._uadd_types[ other.nbits ],
+                         self._int - other._uint )
+    other = _int_operand( other )
+    if other is None: return NotImplemented
+    return _new_sbits( self.__class__, self._wrap( self._int - other ) )
+
+  def __mul__( self, other ):
+    'result.nbits = self.nbits + other.nbits'
+    if isinstance( other, SBitsN ):
+      return _new_sbits( self._mul_types[ other.nbits ], self._int * other._int )
+    if isinstance( other, BitsN ):
+      return _new_sbits( self._mul_types[ other.nbits ], self._int * other._uint )
+    other = _int_operand( other )
+    if other is None: return NotImplemented
+    return _new_sbits( self.__class__, self._wrap( self._int * other ) )
+
+  def __div__( self, other ):
+    'result.nbits = self.nbits + is_signed( other ), rounding towards zero'
+    if isinstance( other, SBitsN ):
+      return _new_sbits( SBits( self.nbits + 1 ), _div( self._int, other._int ) )
+    if isinstance( other, BitsN ):
+      return _new_sbits( self.__class__, _div( self._int, other._uint ) )
+    other = _int_operand( other )
+    if other is None: return NotImplemented
+    return _new_sbits( self.__class__, self._wrap( _div( self._int, other ) ) )
+
+  def __floordiv__( self, other ):
+    return self.__div__( other )
+
+  def __truediv__( self, other ):
+    return self.__div__( other )
+
+  def __mod__( self, other ):
+    'result.nbits = min( self.nbits, other.nbits ), or other.nbits + 1'
+    if isinstance( other, SBitsN ):
+      return _new_sbits( SBits( min( self.nbits, other.nbits ) ),
+                         _mod( self._int, other._int ) )
+    if isinstance( other, BitsN ):
+      return _new_sbits( SBits( other.nbits + 1 ),
+                         _mod( self._int, other._uint ) )
+    other = _int_operand( other )
+    if other is None: return NotImplemented
+    return _new_sbits( self.__class__, self._wrap( _mod( self._int, other ) ) )
+
+  def __radd__( self, other ):
+    return self.__add__( other )
+
+  def __rsub__( self, other ):
+    if isinstance( other, BitsN ):
+      return _new_sbits( self._uadd_types[ other.nbits ],
+                         other._uint - self._int )
+    other = _int_operand( other )
+    if other is None: return NotImplemented
+    return _new_sbits( self.__class__, self._wrap( other - self._int ) )
+
+  def __rmul__( self, other ):
+    return self.__mul__( other )
+
+  def __rdiv__( self, other ):
+    'result.nbits = other.nbits + 1'
+    if not isinstance( other, BitsN ):
+      return NotImplemented
+    return _new_sbits( SBits( other.nbits + 1 ), _div( other._uint, self._int ) )
+
+  def __rfloordiv__( self, other ):
+    return self.__rdiv__( other )
+
+  def __rtruediv__( self, other ):
+    return self.__rdiv__( other )
+
+  def __rmod__( self, other ):
+    'result.nbits = min( self.nbits, other.nbits ) + 1'
+    if not isinstance( other, BitsN ):
+      return NotImplemented
+    return _new_sbits( SBits( min( self.nbits, other.nbits ) + 1 ),
+                       _mod( other._uint, self._int ) )
+
+  def _wrap( self, value ):
+    'Return value wrapped into the signed range of self.'
+    return ((value + self._sign) & self._mask) - self._sign
+
+  #----------------------------------------------------------------------------
+  # shift operators
+  #----------------------------------------------------------------------------
+
+  def __lshift__( self, other ):
+    'result.nbits = self.nbits'
+    other = _shift_operand( other )
+    if other is None: return NotImplemented
+    if other >= self.nbits: return _new_sbits( self.__class__, 0 )
+    return _new_sbits( self.__class__, self._wrap( self._int << other ) )
+
+  def __rshift__( self, other ):
+    'Arithmetic shift right. result.nbits = self.nbits'
+    other = _shift_operand( other )
+    if other is None: return NotImplemented
+    return _new_sbits( self.__class__, self._int >> other )
+
+  #----------------------------------------------------------------------------
+  # bitwise operators
+  #----------------------------------------------------------------------------
+  # Signed operands are sign-extended to the result width.
+
+  def _bitwise( self, other, op ):
+    if isinstance( other, SBitsN ):
+      return _new_sbits( SBits( max( self.nbits, other.nbits ) ),
+                         op( self._int, other._int ) )
+    if isinstance( other, BitsN ):
+      result_type = Bits( max( self.nbits, other.nbits ) )
+      return bits._new_bits( result_type,
+                             op( self._int, other._uint ) & result_type._mask )
+    other = _int_operand( other )
+    if other is None: return NotImplemented
+    return _new_sbits( self.__class__, self._wrap( op( self._int, other ) ) )
+
+  def __and__( self, other ):
+    'result.nbits = max( self.nbits, other.nbits )'
+    return self._bitwise( other, operator.and_ )
+
+  def __xor__( self, other ):
+    'result.nbits = max( self.nbits, other.nbits )'
+    return self._bitwise( other, operator.xor )
+
+  def __or__( self, other ):
+    'result.nbits = max( self.nbits, other.nbits )'
+    return self._bitwise( other, operator.or_ )
+
+  def __rand__( self, other ):
+    return self.__and__( other )
+
+  def __rxor__( self, other ):
+    return self.__xor__( other )
+
+  def __ror__( self, other ):
+    return self.__or__( other )
+
+  #----------------------------------------------------------------------------
+  # comparison operators
+  #----------------------------------------------------------------------------
+  # Comparisons are between signed values: Bits operands count as their
+  # unsigned value, and ints and other numbers such as floats as
+  # themselves.
+
+  def __eq__( self, other ):
+    'result.nbits = 1'
+    if other is None: return False
+    other = _compare_operand( other )
+    if other is None: return NotImplemented
+    return bits._new_bits( bits._Bits1, int( self._int == other ) )
+
+  def __ne__( self, other ):
+    'result.nbits = 1'
+    if other is None: return True
+    other = _compare_operand( other )
+    if other is None: return NotImplemented
+    return bits._new_bits( bits._Bits1, int( self._int != other ) )
+
+  def __lt__( self, other ):
+    'result.nbits = 1'
+    other = _compare_operand( other )
+    if other is None: return NotImplemented
+    return bits._new_bits( bits._Bits1, int( self._int < other ) )
+
+  def __le__( self, other ):
+    'result.nbits = 1'
+    other = _compare_operand( other )
+    if other is None: return NotImplemented
+    return bits._new_bits( bits._Bits1, int( self._int <= other ) )
+
+  def __gt__( self, other ):
+    'result.nbits = 1'
+    other = _compare_operand( other )
+    if other is None: return NotImplemented
+    return bits._new_bits( bits._Bits1, int( self._int > other ) )
+
+  def __ge__( self, other ):
+    'result.nbits = 1'
+    other = _compare_operand( other )
+    if other is None: return NotImplemented
+    return bits._new_bits( bits._Bits1, int( self._int >= other ) )
+
+  #----------------------------------------------------------------------------
+  # concat, extension and reductions
+  #----------------------------------------------------------------------------
+  # These implement concat(), zext(), sext() and the reductions of bits.py
+  # for SBits values, which take part through their payloads.
+
+  def _concat( self, objects ):
+    return concat( *[ x.to_bits() if isinstance( x, SBitsN ) else x
+                      for x in objects ] )
+
+  def _zext( self, new_width ):
+    'Zero extension'
+    return SBits( new_width )( self._int & self._mask )
+
+  def _sext( self, new_width ):
+    'Sign extension'
+    return SBits( new_width )( self._int )
+
+  def _reduce( self, op ):
+    return _REDUCTIONS[ op ]( self.to_bits() )
+
+_REDUCTIONS = {
+  operator.and_: reduce_and,
+  operator.or_ : reduce_or,
+  operator.xor : reduce_xor,
+}
+
+#------------------------------------------------------------------------------
+# helpers
+#------------------------------------------------------------------------------
+
+def _new_sbits( cls, value ):
+  'Return a new cls instance holding value, which must already fit in cls.'
+  sbits = object.__new__( cls )
+  sbits._int = value
+  return sbits
+
+def _unpickle_sbits( nbits, value ):
+  'Rebuild an SBits object pickled by SBitsN.__reduce__().'
+  return _new_sbits( SBits( nbits ), value )
+
+def _int_operand( other ):
+  'Return other as an int, or None if other is not an integer.'
+  if isinstance( other, _int_types ):
+    return other
+  return _index( other )
+
+def _compare_operand( other ):
+  '''Return the value to compare an SBits object against, or None if
+  other is not a Bits object or a number.'''
+  if isinstance( other, SBitsN ):
+    return other._int
+  if isinstance( other, BitsN ):
+    return other._uint
+  value = _int_operand( other )
+  return _real_operand( other ) if value is None else value
+
+def _div( a, b ):
+  'Signed division rounding towards zero, like C and Verilog.'
+  q = abs( a ) // abs( b )
+  return -q if (a < 0) != (b < 0) else q
+
+def _mod( a, b ):
+  'Remainder of _div(), which has the sign of the dividend.'
+  return a - b * _div( a, b )
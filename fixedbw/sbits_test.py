@@ -0,0 +1,187 @@
+#=======================================================================
+# sbits_test.py
+#=======================================================================
+# Tests for the SBits signed classes.
+
+import itertools
+
+import pytest
+
+from bits  import Bits, concat, zext, sext, reduce_or, reduce_xor
+from sbits import SBits, SBitsN
+
+def signed_values( nbits ):
+  return range( -2**(nbits - 1), 2**(nbits - 1) )
+
+def unsigned_values( nbits ):
+  return range( 2**nbits )
+
+def check( result, cls, value ):
+  assert type( result ) is cls
+  assert result.int() == value
+
+#-----------------------------------------------------------------------
+# test_constructor
+#-----------------------------------------------------------------------
+def test_constructor():
+
+  assert SBits(8) is SBits( Bits(4)( 8 ) )
+  assert SBits(8)( -128 ).int() == -128
+  assert SBits(8)( 127 ).uint() == 127
+  assert SBits(8)( -1 ).uint() == 0xff
+  assert SBits(8)( 0xff, trunc=True ).int() == -1
+  assert SBits(8)( Bits(8)( 0x80 ), trunc=True ).int() == -128
+  assert SBits(8)( -1 ).to_bits() == Bits(8)( 0xff )
+
+  assert repr( SBits(8)( -2 ) ) == 'SBits( 8, 0xfe )'
+  assert str( SBits(8)( -2 ) ) == 'fe'
+  assert SBits(4)( -3 ).bin() == '0b1101'
+  assert int( SBits(4)( -3 ) ) == -3
+
+  with pytest.raises( ValueError ):
+    SBits(8)( 128 )
+  with pytest.raises( ValueError ):
+    SBits(8)( -129 )
+  with pytest.raises( ValueError ):
+    SBits(0)
+  with pytest.raises( TypeError ):
+    SBitsN( 1 )
+
+#-----------------------------------------------------------------------
+# test_bits
+#-----------------------------------------------------------------------
+def test_bits():
+
+  x = SBits(8)( -2 )
+  assert x[0] == 0 and x[7] == 1
+  assert x[4:8] == Bits(4)( 0xf ) and type( x[4:8] ) is Bits(4)
+
+  x[0] = 1
+  assert x.int() == -1
+  x[4:8] = 0b0111
+  assert x.int() == 0x7f
+  x[:] = 0x80
+  assert x.int() == -128
+
+  assert concat( Bits(4)( 1 ), SBits(4)( -1 ) ) == Bits(8)( 0x1f )
+  assert concat( SBits(4)( -1 ), Bits(4)( 1 ) ) == Bits(8)( 0xf1 )
+  assert sext( SBits(4)( -3 ), 8 ).int() == -3
+  assert zext( SBits(4)( -3 ), 8 ).int() == 13
+  assert reduce_or( SBits(4)( 0 ) ) == 0
+  assert reduce_xor( SBits(4)( -1 ) ) == 0
+
+#-----------------------------------------------------------------------
+# test_int
+#-----------------------------------------------------------------------
+def test_int():
+
+  # BitsN.int() and sext() agree with the signed values
+  for nbits in [ 1, 4, 8, 70 ]:
+    for value in [ -2**(nbits - 1), -1, 0, 2**(nbits - 1) - 1 ]:
+      payload = Bits( nbits )( value, trunc=True )
+      assert payload.int() == value
+      assert sext( payload, nbits + 3 ).int() == value
+      assert SBits( nbits )( value, trunc=True ).int() == value
+
+#-----------------------------------------------------------------------
+# test_arith
+#-----------------------------------------------------------------------
+@pytest.mark.parametrize( 'n, m', [ ( 3, 3 ), ( 2, 4 ), ( 4, 2 ) ] )
+def test_arith( n, m ):
+
+  for a, b in itertools.product( signed_values( n ), signed_values( m ) ):
+    x, y = SBits( n )( a ), SBits( m )( b )
+    check( x + y, SBits( max( n, m ) + 1 ), a + b )
+    check( x - y, SBits( max( n, m ) + 1 ), a - b )
+    check( x * y, SBits( n + m ), a * b )
+    if b:
+      q = abs( a ) // abs( b ) * ( -1 if (a < 0) != (b < 0) else 1 )
+      check( x / y, SBits( n + 1 ), q )
+      check( x % y, SBits( min( n, m ) ), a - b * q )
+    check( x & y, SBits( max( n, m ) ), a & b )
+    check( x | y, SBits( max( n, m ) ), a | b )
+    check( x ^ y, SBits( max( n, m ) ), a ^ b )
+
+  # Mixed signed and unsigned operands are signed, with one more bit
+  # when the signed operand is not wider (narrower_is_signed)
+
+  for a, b in itertools.product( signed_values( n ), unsigned_values( m ) ):
+    x, y  = SBits( n )( a ), Bits( m )( b )
+    width = max( n, m ) + 1 + int( n <= m )
+    check( x + y, SBits( width ), a + b )
+    check( y + x, SBits( width ), a + b )
+    check( x - y, SBits( width ), a - b )
+    check( y - x, SBits( width ), b - a )
+    check( x * y, SBits( n + m ), a * b )
+    check( y * x, SBits( n + m ), a * b )
+    if b:
+      q = -( -a // b ) if a < 0 else a // b
+      check( x / y, SBits( n ), q )
+      check( x % y, SBits( m + 1 ), a - b * q )
+    if a:
+      q = -( b // -a ) if a < 0 else b // a
+      check( y / x, SBits( m + 1 ), q )
+      check( y % x, SBits( min( n, m ) + 1 ), b - a * q )
+    assert ( x & y ) == ( a & b ) & ( 2**max( n, m ) - 1 )
+    assert type( y | x ) is Bits( max( n, m ) )
+
+  # Unsized ints wrap into the type of the SBits operand
+
+  x = SBits(4)( 7 )
+  check( x + 1, SBits(4), -8 )
+  check( 1 - x, SBits(4), -6 )
+  check( x * -2, SBits(4), 2 )
+  check( x / -2, SBits(4), -3 )
+  check( -x, SBits(5), -7 )
+  check( abs( SBits(4)( -8 ) ), SBits(5), 8 )
+  check( ~x, SBits(4), -8 )
+
+  with pytest.raises( TypeError ):
+    x + 1.5
+
+#-----------------------------------------------------------------------
+# test_shift
+#-----------------------------------------------------------------------
+def test_shift():
+
+  x = SBits(8)( -100 )
+  check( x >> 2, SBits(8), -25 )
+  check( x >> 20, SBits(8), -1 )
+  check( SBits(8)( 100 ) >> 3, SBits(8), 12 )
+  check( x << 1, SBits(8), 56 )
+  check( x << Bits(4)( 8 ), SBits(8), 0 )
+
+#-----------------------------------------------------------------------
+# test_compare
+#-----------------------------------------------------------------------
+def test_compare():
+
+  x = SBits(8)( -1 )
+  y = Bits(8)( 0xff )
+
+  assert x < 0 and x == -1 and x != 0xff
+  assert x < y and y > x and not ( y == x ) and y != x
+  assert x < SBits(4)( 0 ) and x >= SBits(16)( -1 )
+  assert type( x < 0 ) is Bits(1)
+  assert x != None and not ( x == None )
+
+  # Floats are compared by value
+
+  z = SBits(8)( -5 )
+  assert ( z == -5.0 ) == 1 and ( z != -5.0 ) == 0
+  assert ( z < -4.5 ) == 1 and ( z > -4.5 ) == 0
+  assert ( -5.5 < z ) == 1 and ( z >= 0.0 ) == 0
+
+#-----------------------------------------------------------------------
+# test_pickle
+#-----------------------------------------------------------------------
+def test_pickle():
+
+  import pickle
+
+  for protocol in range( pickle.HIGHEST_PROTOCOL + 1 ):
+    for x in [ SBits(1)( -1 ), SBits(8)( -3 ), SBits(100)( 2**90 ) ]:
+      data = pickle.dumps( x, protocol )
+      y    = pickle.loads( data )
+      assert type( y ) is type( x ) and y == x and y.int() == x.int()
+      assert 'SBits8' not in data
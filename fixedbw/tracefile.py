@@ -0,0 +1,333 @@
+#==============================================================================
+# tracefile.py
+#==============================================================================
+# A compact binary trace format for sequences of fixed-width values.
+#
+# A trace file starts with a header declaring the name and width of each
+# signal, followed by one fixed-size record per sample: a little-endian
+# uint64 timestamp and the payload of every signal. Payloads use the
+# storage format of BitsArray (the narrowest little-endian machine word
+# which holds the width, or 64-bit limbs for wider values), so readers
+# memory-map the records as a NumPy structured array and hand out views
+# of it without parsing or copying anything.
+#
+#   offset  size  contents
+#   0       8     magic 'FXBWTRC\0'
+#   8       4     format version (1)
+#   12      4     number of signals
+#   16      ...   per signal: width (uint32), name length (uint32), name
+#   ...           padding to a multiple of 8 bytes, then the records
+
+import os
+import struct
+
+import numpy as np
+
+import bits
+from bits import Bits, BitsN
+from bits_array import BitsArray, _wrap, _convert, _dtype, _nlimbs, \
+                       _WORD_NBITS
+
+_MAGIC   = 'FXBWTRC\0'
+_VERSION = 1
+
+# Number of samples buffered by TraceWriter.append()
+_BUFFER_SAMPLES = 1 << 16
+
+#------------------------------------------------------------------------------
+# TraceWriter
+#------------------------------------------------------------------------------
+class TraceWriter( object ):
+  '''Write samples of a fixed set of signals to a binary trace file.
+
+  > with TraceWriter( 'trace.bin', [ ( 'pc', 32 ), ( 'valid', 1 ) ] ) as w:
+  >   for cycle in range( ncycles ):
+  >     w.append( cycle, [ pc, valid ] )
+  >   w.append_many( times, [ pcs, valids ] )   # BitsArrays or sequences
+
+  Samples appended one at a time are buffered and written out in large
+  blocks. Timestamps are non-negative ints which must not decrease.
+  '''
+
+  def __init__( self, filename, signals ):
+    'Create filename for the given list of (name, nbits) signals.'
+
+    self.signals = _check_signals( signals )
+    self._dtype  = _record_dtype( self.signals )
+    self._file   = open( filename, 'wb' )
+    self._file.write( _header( self.signals ) )
+
+    self._times   = []
+    self._columns = [ [] for _ in self.signals ]
+    self._classes = [ Bits( nbits ) for _, nbits in self.signals ]
+    self._last    = 0
+
+  #----------------------------------------------------------------------------
+  # appending
+  #----------------------------------------------------------------------------
+
+  def append( self, time, values ):
+    '''Append one sample: the values of every signal, as a sequence in
+    signal order or a dict keyed by name, of Bits objects or ints.'''
+
+    if isinstance( values, dict ):
+      values = [ values[ name ] for name, _ in self.signals ]
+    if len( values ) != len( self.signals ):
+      raise ValueError( 'Got {} values for {} signals'
+                        .format( len( values ), len( self.signals ) ) )
+
+    if time < self._last:
+      raise ValueError( 'Timestamp {} is earlier than {}'
+                        .format( time, self._last ) )
+
+    # Check every value before touching the columns, so that a rejected
+    # sample leaves them all the same length
+    uints = [ value._uint if value.__class__ is cls
+              else _payload( cls, value )._uint
+              for cls, value in zip( self._classes, values ) ]
+    for column, uint in zip( self._columns, uints ):
+      column.append( uint )
+
+    self._times.append( time )
+    self._last = time
+
+    if len( self._times ) >= _BUFFER_SAMPLES:
+      self._write_buffer()
+
+  def append_many( self, times, columns ):
+    '''Append a block of samples: an array or sequence of timestamps, and
+    for every signal a BitsArray (of at most the signal width), NumPy
+    array or sequence with one value per timestamp.'''
+
+    self._write_buffer()
+
+    times = np.asarray( times, dtype=np.int64 )
+    if times.ndim != 1 or len( columns ) != len( self.signals ):
+      raise ValueError( 'Expected a one-dimensional array of timestamps and '
+                        '{} columns'.format( len( self.signals ) ) )
+    if len( times ) == 0:
+      return
+    if times[0] < self._last or ( np.diff( times ) < 0 ).any():
+      raise ValueError( 'Timestamps must not decrease' )
+
+    data = np.empty( len( times ), dtype=self._dtype )
+    data[ 'time' ] = times
+    for i, ( ( _, nbits ), values ) in enumerate( zip( self.signals,
+                                                       columns ) ):
+      if not isinstance( values, BitsArray ) or values.nbits > nbits:
+        values = BitsArray.from_values( nbits, values )
+      if values.shape != times.shape:
+        raise ValueError( 'Column {} has shape {}, expected {}'
+                          .format( i, values.shape, times.shape ) )
+      data[ 's{}'.format( i ) ] = _convert( values, nbits, check = False )[0]
+
+    self._file.write( data.tobytes() )
+    self._last = int( times[-1] )
+
+  def _write_buffer( self ):
+    'Write out the samples buffered by append().'
+
+    if not self._times:
+      return
+
+    data = np.empty( len( self._times ), dtype=self._dtype )
+    data[ 'time' ] = self._times
+    for i, ( ( _, nbits ), column ) in enumerate( zip( self.signals,
+                                                       self._columns ) ):
+      data[ 's{}'.format( i ) ] = _convert( column, nbits, check = False )[0]
+    self._file.write( data.tobytes() )
+
+    self._times   = []
+    self._columns = [ [] for _ in self.signals ]
+
+  #----------------------------------------------------------------------------
+  # file handling
+  #----------------------------------------------------------------------------
+
+  def flush( self ):
+    'Write out all buffered samples.'
+    self._write_buffer()
+    self._file.flush()
+
+  def close( self ):
+    'Write out all buffered samples and close the file.'
+    if not self._file.closed:
+      self.flush()
+      self._file.close()
+
+  def __enter__( self ):
+    return self
+
+  def __exit__( self, *exc_info ):
+    self.close()
+
+#------------------------------------------------------------------------------
+# TraceReader
+#------------------------------------------------------------------------------
+class TraceReader( object ):
+  '''Random access to the samples of a binary trace file.
+
+  The records are memory-mapped, so opening a trace costs nothing however
+  long it is, and arrays of timestamps or signal values are views of the
+  file rather than copies.
+
+  > trace = TraceReader( 'trace.bin' )
+  > len( trace )                       # number of samples
+  > trace[10]                          # ( time, ( Bits(32), Bits(1) ) )
+  > trace.value( 'pc', 10 )            # Bits( 32, ... )
+  > start, stop = trace.window( 1000, 2000 )
+  > pcs = trace.array( 'pc', start, stop )    # BitsArray view
+  '''
+
+  def __init__( self, filename ):
+
+    with open( filename, 'rb' ) as f:
+      self.signals, offset = _read_header( f )
+      size = os.fstat( f.fileno() ).st_size
+
+    self.filename = filename
+    self._dtype   = _record_dtype( self.signals )
+    self._index   = dict( ( name, i )
+                          for i, ( name, _ ) in enumerate( self.signals ) )
+    self._classes = [ Bits( nbits ) for _, nbits in self.signals ]
+
+    # A sample which is still being written is ignored
+    nsamples = (size - offset) // self._dtype.itemsize
+    if nsamples:
+      self._data = np.memmap( filename, dtype=self._dtype, mode='r',
+                              offset=offset, shape=( nsamples, ) )
+    else:
+      self._data = np.zeros( 0, dtype=self._dtype )
+
+  def __len__( self ):
+    return len( self._data )
+
+  #----------------------------------------------------------------------------
+  # samples
+  #----------------------------------------------------------------------------
+
+  def __getitem__( self, index ):
+    'Return ( time, values ) for one sample, with values in signal order.'
+    record = self._data[ index ]
+    return ( int( record[0] ),
+             tuple( _to_bits( cls, record[ i + 1 ] )
+                    for i, cls in enumerate( self._classes ) ) )
+
+  def value( self, name, index ):
+    'Return the value of one signal in one sample as a Bits object.'
+    i = self._signal( name )
+    return _to_bits( self._classes[ i ],
+                     self._data[ 's{}'.format( i ) ][ index ] )
+
+  def time( self, index ):
+    'Return the timestamp of one sample.'
+    return int( self._data[ 'time' ][ index ] )
+
+  #----------------------------------------------------------------------------
+  # windows and arrays
+  #----------------------------------------------------------------------------
+
+  def window( self, start_time, stop_time ):
+    '''Return the ( start, stop ) range of the samples whose timestamps
+    lie in [start_time, stop_time), found by binary search.'''
+    times = self._data[ 'time' ]
+    return ( int( np.searchsorted( times, start_time, 'left' ) ),
+             int( np.searchsorted( times, stop_time,  'left' ) ) )
+
+  def times( self, start = 0, stop = None ):
+    'Return a read-only NumPy view of the timestamps of samples [start:stop].'
+    return self._data[ 'time' ][ start:stop ]
+
+  def array( self, name, start = 0, stop = None ):
+    '''Return a read-only BitsArray view of the values of one signal in
+    samples [start:stop].'''
+    i = self._signal( name )
+    return _wrap( self.signals[ i ][1],
+                  self._data[ 's{}'.format( i ) ][ start:stop ] )
+
+  def _signal( self, name ):
+    try:
+      return self._index[ name ]
+    except KeyError:
+      raise KeyError( 'No signal {!r} in {}'.format( name, self.filename ) )
+
+#------------------------------------------------------------------------------
+# header
+#------------------------------------------------------------------------------
+
+def _check_signals( signals ):
+  'Return signals as a list of ( name, nbits ), checking both.'
+  result = []
+  for name, nbits in signals:
+    name, nbits = str( name ), int( nbits )
+    if nbits < 1:
+      raise ValueError( 'Signal {!r} must have a positive width'
+                        .format( name ) )
+    if name in [ n for n, _ in result ]:
+      raise ValueError( 'Duplicate signal {!r}'.format( name ) )
+    result.append( ( name, nbits ) )
+  return result
+
+def _header( signals ):
+  'Return the header of a trace of the given signals.'
+  parts = [ _MAGIC, struct.pack( '<II', _VERSION, len( signals ) ) ]
+  for name, nbits in signals:
+    parts.append( struct.pack( '<II', nbits, len( name ) ) + name )
+  header = ''.join( parts )
+  return header + '\0' * ( -len( header ) % 8 )
+
+def _read_header( f ):
+  'Return the signals of a trace file and the offset of its records.'
+
+  def read( size ):
+    data = f.read( size )
+    if len( data ) != size:
+      raise ValueError( '{} is not a trace file'.format( f.name ) )
+    return data
+
+  if read( len( _MAGIC ) ) != _MAGIC:
+    raise ValueError( '{} is not a trace file'.format( f.name ) )
+  version, nsignals = struct.unpack( '<II', read( 8 ) )
+  if version != _VERSION:
+    raise ValueError( '{} uses trace format version {}, expected {}'
+                      .format( f.name, version, _VERSION ) )
+
+  signals = []
+  for _ in xrange( nsignals ):
+    nbits, length = struct.unpack( '<II', read( 8 ) )
+    signals.append( ( read( length ), nbits ) )
+
+  offset = f.tell()
+  return signals, offset + ( -offset % 8 )
+
+def _record_dtype( signals ):
+  'Return the NumPy dtype of one record of a trace of the given signals.'
+  fields = [ ( 'time', '<u8' ) ]
+  for i, ( _, nbits ) in enumerate( signals ):
+    if nbits <= _WORD_NBITS:
+      field = np.dtype( _dtype( nbits ) ).newbyteorder( '<' )
+    else:
+      field = ( '<u8', ( _nlimbs( nbits ), ) )
+    fields.append( ( 's{}'.format( i ), field ) )
+  return np.dtype( fields )
+
+#------------------------------------------------------------------------------
+# helpers
+#------------------------------------------------------------------------------
+
+def _payload( cls, value ):
+  'Return a Bits object for a sample, checked like cls does.'
+  if isinstance( value, BitsN ) and value.nbits != cls.nbits:
+    raise ValueError( 'Expected a Bits({}) value, got {!r}'
+                      .format( cls.nbits, value ) )
+  return cls( value )
+
+def _to_bits( cls, stored ):
+  'Return a Bits object for a stored word or array of limbs.'
+  if isinstance( stored, np.ndarray ):
+    uint = 0
+    for limb in reversed( stored.tolist() ):
+      uint = (uint << 64) | limb
+  else:
+    uint = int( stored )
+  return bits._new_bits( cls, uint )
@@ -0,0 +1,153 @@
+#=======================================================================
+# tracefile_test.py
+#=======================================================================
+# Tests for the binary trace format.
+
+import numpy as np
+import pytest
+
+import tracefile
+from bits       import Bits
+from bits_array import BitsArray
+from tracefile  import TraceWriter, TraceReader
+
+SIGNALS = [ ( 'valid', 1 ), ( 'data', 12 ), ( 'addr', 64 ), ( 'line', 130 ) ]
+
+def sample_values( i ):
+  return [ i & 1, (i * 37) & 0xfff, (i * 0x9e3779b97f4a7c15) & (2**64 - 1),
+           (i << 120) | i ]
+
+#-----------------------------------------------------------------------
+# test_round_trip
+#-----------------------------------------------------------------------
+def test_round_trip( tmpdir, monkeypatch ):
+
+  monkeypatch.setattr( tracefile, '_BUFFER_SAMPLES', 7 )
+
+  path = str( tmpdir.join( 'trace.bin' ) )
+  with TraceWriter( path, SIGNALS ) as w:
+    for i in range( 20 ):
+      values = sample_values( i )
+      if i % 3 == 0:
+        values = dict( zip( [ n for n, _ in SIGNALS ], values ) )
+      elif i % 3 == 1:
+        values = [ Bits( n )( v ) for ( _, n ), v in zip( SIGNALS, values ) ]
+      w.append( 10 * i, values )
+
+  trace = TraceReader( path )
+  assert trace.signals == SIGNALS
+  assert len( trace ) == 20
+
+  time, values = trace[5]
+  assert time == 50
+  assert values == tuple( sample_values( 5 ) )
+  assert [ type( v ) for v in values ] == [ Bits( n ) for _, n in SIGNALS ]
+
+  assert trace.value( 'line', 19 ) == sample_values( 19 )[3]
+  assert trace.value( 'data', -1 ) == sample_values( 19 )[1]
+  assert trace.time( 3 ) == 30
+  with pytest.raises( KeyError ):
+    trace.value( 'bogus', 0 )
+
+  # Arrays are views of the mapped file
+
+  times = trace.times()
+  assert times.tolist() == range( 0, 200, 10 )
+  for i, ( name, nbits ) in enumerate( SIGNALS ):
+    array = trace.array( name )
+    assert isinstance( array, BitsArray ) and array.nbits == nbits
+    assert array.tolist() == [ sample_values( j )[i] for j in range( 20 ) ]
+    assert not array._data.flags.owndata
+
+  with pytest.raises( ValueError ):
+    trace.array( 'data' )[0:4] = 0
+
+#-----------------------------------------------------------------------
+# test_windows
+#-----------------------------------------------------------------------
+def test_windows( tmpdir ):
+
+  path = str( tmpdir.join( 'trace.bin' ) )
+  with TraceWriter( path, [ ( 'x', 8 ) ] ) as w:
+    w.append_many( [ 0, 5, 5, 10, 20 ], [ range( 5 ) ] )
+    w.append( 20, [ 5 ] )
+    w.append_many( np.arange( 30, 60, 10 ),
+                   [ BitsArray.from_values( 4, [ 6, 7, 8 ] ) ] )
+
+  trace = TraceReader( path )
+  assert len( trace ) == 9
+  assert trace.window( 5, 20 ) == ( 1, 4 )
+  assert trace.window( 20, 21 ) == ( 4, 6 )
+  assert trace.window( 100, 200 ) == ( 9, 9 )
+
+  start, stop = trace.window( 5, 40 )
+  assert trace.array( 'x', start, stop ).tolist() == range( 1, 7 )
+  assert trace.times( start, stop ).tolist() == [ 5, 5, 10, 20, 20, 30 ]
+
+#-----------------------------------------------------------------------
+# test_errors
+#-----------------------------------------------------------------------
+def test_errors( tmpdir ):
+
+  path = str( tmpdir.join( 'trace.bin' ) )
+  w = TraceWriter( path, [ ( 'x', 4 ) ] )
+  w.append( 3, [ 1 ] )
+
+  with pytest.raises( ValueError ):
+    w.append( 2, [ 1 ] )
+  with pytest.raises( ValueError ):
+    w.append( 4, [ 16 ] )
+  with pytest.raises( ValueError ):
+    w.append( 4, [ Bits(8)( 1 ) ] )
+  with pytest.raises( ValueError ):
+    w.append( 4, [ 1, 2 ] )
+  with pytest.raises( ValueError ):
+    w.append_many( [ 4, 3 ], [ [ 1, 2 ] ] )
+  with pytest.raises( ValueError ):
+    w.append_many( [ 1 ], [ [ 1 ] ] )
+  with pytest.raises( ValueError ):
+    w.append_many( [ 4, 5 ], [ [ 1 ] ] )
+  with pytest.raises( ValueError ):
+    w.append_many( [ 4 ], [ BitsArray.from_values( 8, [ 16 ] ) ] )
+  w.close()
+
+  assert len( TraceReader( path ) ) == 1
+
+  with pytest.raises( ValueError ):
+    TraceWriter( path, [ ( 'x', 4 ), ( 'x', 2 ) ] )
+  with pytest.raises( ValueError ):
+    TraceWriter( path, [ ( 'x', 0 ) ] )
+
+  # Empty traces, truncated records and other files
+
+  TraceWriter( path, [ ( 'x', 4 ) ] ).close()
+  assert len( TraceReader( path ) ) == 0
+
+  with TraceWriter( path, [ ( 'x', 32 ) ] ) as w:
+    w.append( 0, [ 1 ] )
+  with open( path, 'ab' ) as f:
+    f.write( 'abc' )
+  assert len( TraceReader( path ) ) == 1
+
+  tmpdir.join( 'other.bin' ).write( 'not a trace' )
+  with pytest.raises( ValueError ):
+    TraceReader( str( tmpdir.join( 'other.bin' ) ) )
+
+#-----------------------------------------------------------------------
+# test_rejected_sample
+#-----------------------------------------------------------------------
+def test_rejected_sample( tmpdir ):
+
+  # A sample rejected for a later value leaves the writer unchanged
+
+  path = str( tmpdir.join( 'trace.bin' ) )
+  with TraceWriter( path, [ ( 'a', 8 ), ( 'b', 4 ) ] ) as w:
+    w.append( 0, [ 1, 2 ] )
+    with pytest.raises( ValueError ):
+      w.append( 1, [ 3, 99 ] )
+    w.append( 2, [ 4, 5 ] )
+
+  trace = TraceReader( path )
+  assert trace.times().tolist() == [ 0, 2 ]
+  assert trace.array( 'a' ).tolist() == [ 1, 4 ]
+  assert trace.array( 'b' ).tolist() == [ 2, 5 ]
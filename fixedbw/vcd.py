@@ -0,0 +1,242 @@
+#==============================================================================
+# vcd.py
+#==============================================================================
+# Write traces of Bits signals as value change dumps (VCD).
+
+import time as _time
+
+from bits import Bits, BitsN
+
+# Number of lines buffered before they are written out in one block
+_BUFFER_LINES = 1 << 14
+
+#------------------------------------------------------------------------------
+# VcdWriter
+#------------------------------------------------------------------------------
+class VcdWriter( object ):
+  '''Stream samples of Bits signals into a VCD file.
+
+  Signals are declared with declare(), or implicitly by the first call
+  to sample(), which writes the header. Each sample gives the values of
+  some signals at a timestamp; only values which changed since the last
+  sample are written, formatted straight from their integer payloads,
+  and output is buffered into large blocks. Signals are placed in a
+  module scope called scope, and names containing dots into nested
+  scopes within it.
+
+  > with VcdWriter( 'trace.vcd', timescale='1ns' ) as vcd:
+  >   for cycle in range( ncycles ):
+  >     step()
+  >     vcd.sample( cycle, { 'pc': pc, 'alu.out': out, 'valid': valid } )
+  '''
+
+  def __init__( self, dest, timescale = '1ns', scope = 'top' ):
+    '''Write to dest, a filename or an open file which is flushed but
+    not closed by close().'''
+
+    if isinstance( dest, basestring ):
+      self._file  = open( dest, 'w' )
+      self._owned = True
+    else:
+      self._file  = dest
+      self._owned = False
+
+    self.timescale = timescale
+    self.scope     = scope
+
+    self._signals  = {}    # name -> _Signal, in declaration order below
+    self._order    = []
+    self._buffer   = []
+    self._time     = None  # last timestamp written
+    self._started  = False
+
+  #----------------------------------------------------------------------------
+  # declaration
+  #----------------------------------------------------------------------------
+
+  def declare( self, name, nbits ):
+    'Declare a signal of the given width. Must precede the first sample.'
+
+    if self._started:
+      raise ValueError( 'Cannot declare signal {!r} after the first sample'
+                        .format( name ) )
+    if name in self._signals:
+      raise ValueError( 'Signal {!r} is already declared'.format( name ) )
+
+    signal = _Signal( name, int( nbits ), _identifier( len( self._order ) ) )
+    self._signals[ name ] = signal
+    self._order.append( signal )
+
+  #----------------------------------------------------------------------------
+  # sampling
+  #----------------------------------------------------------------------------
+
+  def sample( self, time, values ):
+    '''Record the values of signals at a timestamp, given as a dict
+    mapping signal names to Bits objects or ints. Timestamps must not
+    decrease; several samples may share one timestamp.'''
+
+    if not self._started:
+      for name, value in sorted( values.items() ):
+        if name not in self._signals:
+          self.declare( name, _width( name, value ) )
+      self._start( time, values )
+      return
+
+    if time < self._time:
+      raise ValueError( 'Timestamp {} is earlier than {}'
+                        .format( time, self._time ) )
+
+    # Compute every payload before changing any signal, so that a rejected
+    # sample leaves the writer as it was
+    signals = self._signals
+    changed = []
+
+    for name, value in values.iteritems():
+      try:
+        signal = signals[ name ]
+      except KeyError:
+        raise ValueError( 'Signal {!r} was not declared'.format( name ) )
+
+      if isinstance( value, BitsN ) and value.nbits == signal.nbits:
+        uint = value._uint
+      else:
+        uint = signal.payload( value )
+
+      if uint != signal.last:
+        changed.append( ( signal, uint ) )
+
+    if changed:
+      buffer = self._buffer
+      if time != self._time:
+        self._time = time
+        buffer.append( '#{}\n'.format( time ) )
+      for signal, uint in changed:
+        signal.last = uint
+        buffer.append( signal.format( uint ) )
+      if len( buffer ) >= _BUFFER_LINES:
+        self._write()
+
+  def _start( self, time, values ):
+    'Write the header and the initial value of every signal.'
+
+    self._started = True
+    self._time    = time
+
+    lines = [
+      '$date {} $end\n'.format( _time.strftime( '%Y-%m-%d %H:%M:%S' ) ),
+      '$timescale {} $end\n'.format( self.timescale ),
+    ]
+
+    # Signals are grouped by scope, and scopes are opened and closed as
+    # the sorted names move through the hierarchy
+    scope = []
+    for signal in sorted( self._order, key=lambda s: s.path ):
+      path = ( self.scope, ) + signal.path[ :-1 ]
+      common = 0
+      while common < min( len( scope ), len( path ) ) \
+          and scope[ common ] == path[ common ]:
+        common += 1
+      lines.extend( '$upscope $end\n' for _ in scope[ common: ] )
+      lines.extend( '$scope module {} $end\n'.format( s )
+                    for s in path[ common: ] )
+      scope = path
+      lines.append( '$var wire {} {} {} $end\n'.format(
+        signal.nbits, signal.ident, signal.path[-1] ) )
+    lines.extend( '$upscope $end\n' for _ in scope )
+
+    lines.append( '$enddefinitions $end\n' )
+    lines.append( '#{}\n'.format( time ) )
+    lines.append( '$dumpvars\n' )
+
+    for signal in self._order:
+      if signal.name in values:
+        signal.last = signal.payload( values[ signal.name ] )
+        lines.append( signal.format( signal.last ) )
+      else:
+        lines.append( signal.unknown )
+    lines.append( '$end\n' )
+
+    self._buffer.extend( lines )
+
+  #----------------------------------------------------------------------------
+  # output
+  #----------------------------------------------------------------------------
+
+  def _write( self ):
+    self._file.write( ''.join( self._buffer ) )
+    self._buffer = []
+
+  def flush( self ):
+    'Write out all buffered samples.'
+    self._write()
+    self._file.flush()
+
+  def close( self ):
+    'Write out all buffered samples and close the file.'
+    if self._file is not None:
+      self.flush()
+      if self._owned:
+        self._file.close()
+      self._file = None
+
+  def __enter__( self ):
+    return self
+
+  def __exit__( self, *exc_info ):
+    self.close()
+
+#------------------------------------------------------------------------------
+# _Signal
+#------------------------------------------------------------------------------
+class _Signal( object ):
+  'A declared signal with its identifier code and last written value.'
+
+  __slots__ = ( 'name', 'path', 'nbits', 'ident', 'last', 'format',
+                'unknown', '_cls' )
+
+  def __init__( self, name, nbits, ident ):
+    self.name  = name
+    self.path  = tuple( name.split( '.' ) )
+    self.nbits = nbits
+    self.ident = ident
+    self.last  = None
+    self._cls  = Bits( nbits )
+
+    # Value changes are formatted straight from the unsigned payload
+    if nbits == 1:
+      self.format  = ( '0{}\n'.format( ident ), '1{}\n'.format( ident ) ) \
+                     .__getitem__
+      self.unknown = 'x{}\n'.format( ident )
+    else:
+      escaped      = ident.replace( '{', '{{' ).replace( '}', '}}' )
+      self.format  = ( 'b{:b} ' + escaped + '\n' ).format
+      self.unknown = 'bx {}\n'.format( ident )
+
+  def payload( self, value ):
+    'Return the unsigned value of a sample, checked like Bits(nbits) does.'
+    if isinstance( value, BitsN ) and value.nbits != self.nbits:
+      raise ValueError( 'Signal {!r} is {} bits wide, got {!r}'
+                        .format( self.name, self.nbits, value ) )
+    return self._cls( value )._uint
+
+#------------------------------------------------------------------------------
+# helpers
+#------------------------------------------------------------------------------
+
+def _identifier( index ):
+  'Return the VCD identifier code of the signal with the given index.'
+  chars = []
+  while True:
+    index, digit = divmod( index, 94 )
+    chars.append( chr( 33 + digit ) )
+    if not index:
+      return ''.join( chars )
+    index -= 1
+
+def _width( name, value ):
+  'Return the width of the first sample of an undeclared signal.'
+  if not isinstance( value, BitsN ):
+    raise ValueError( 'Declare signal {!r} before sampling it as an int'
+                      .format( name ) )
+  return value.nbits
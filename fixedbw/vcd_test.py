@@ -0,0 +1,160 @@
+#=======================================================================
+# vcd_test.py
+#=======================================================================
+# Tests for the VCD writer.
+
+from StringIO import StringIO
+
+import pytest
+
+import vcd
+from bits import Bits
+from vcd  import VcdWriter
+
+#-----------------------------------------------------------------------
+# helpers
+#-----------------------------------------------------------------------
+
+def body( text ):
+  'Return the lines after the header of a VCD file.'
+  return text.split( '$enddefinitions $end\n' )[1].splitlines()
+
+#-----------------------------------------------------------------------
+# test_header
+#-----------------------------------------------------------------------
+def test_header():
+
+  out = StringIO()
+  w   = VcdWriter( out, timescale='10ps', scope='tb' )
+  w.declare( 'core.alu.out', 8 )
+  w.declare( 'core.pc', 32 )
+  w.declare( 'clk', 1 )
+  w.declare( 'core.alu.zero', 1 )
+  w.sample( 0, { 'clk': Bits(1)(0), 'core.pc': Bits(32)(4) } )
+  w.close()
+
+  header = out.getvalue().split( '$enddefinitions' )[0].splitlines()
+  assert header[1] == '$timescale 10ps $end'
+  assert header[2:] == [
+    '$scope module tb $end',
+    '$var wire 1 # clk $end',
+    '$scope module core $end',
+    '$scope module alu $end',
+    '$var wire 8 ! out $end',
+    '$var wire 1 $ zero $end',
+    '$upscope $end',
+    '$var wire 32 " pc $end',
+    '$upscope $end',
+    '$upscope $end',
+  ]
+  assert body( out.getvalue() ) == [
+    '#0', '$dumpvars', 'bx !', 'b100 "', '0#', 'x$', '$end' ]
+
+#-----------------------------------------------------------------------
+# test_changes
+#-----------------------------------------------------------------------
+def test_changes():
+
+  out = StringIO()
+  with VcdWriter( out ) as w:
+    w.sample( 0, { 'a': Bits(4)(3), 'b': Bits(1)(0) } )
+    w.sample( 1, { 'a': Bits(4)(3), 'b': Bits(1)(0) } )   # no change
+    w.sample( 2, { 'a': Bits(4)(5) } )
+    w.sample( 2, { 'b': 1 } )                             # same time
+    w.sample( 3, { 'a': -1, 'b': Bits(1)(1) } )
+    w.sample( 5, { 'b': Bits(1)(0) } )
+
+    with pytest.raises( ValueError ):
+      w.sample( 4, { 'b': Bits(1)(1) } )
+    with pytest.raises( ValueError ):
+      w.sample( 6, { 'c': Bits(1)(1) } )
+    with pytest.raises( ValueError ):
+      w.sample( 6, { 'a': Bits(8)(1) } )
+    with pytest.raises( ValueError ):
+      w.sample( 6, { 'a': 16 } )
+    with pytest.raises( ValueError ):
+      w.declare( 'c', 1 )
+
+  assert body( out.getvalue() ) == [
+    '#0', '$dumpvars', 'b11 !', '0"', '$end',
+    '#2', 'b101 !', '1"',
+    '#3', 'b1111 !',
+    '#5', '0"',
+  ]
+
+  # Rejected samples do not change the writer
+
+  out = StringIO()
+  with VcdWriter( out ) as w:
+    w.sample( 10, { 'a': Bits(3)(0), 'b': Bits(1)(0) } )
+    with pytest.raises( ValueError ):
+      w.sample( 5, { 'a': 7 } )
+    with pytest.raises( ValueError ):
+      w.sample( 15, { 'a': 7, 'b': 2 } )
+    w.sample( 20, { 'a': 7, 'b': 1 } )
+
+  assert body( out.getvalue() )[-3:] == [ '#20', 'b111 !', '1"' ]
+
+  # Undeclared signals sampled as ints cannot be sized
+
+  with pytest.raises( ValueError ):
+    VcdWriter( StringIO() ).sample( 0, { 'a': 3 } )
+
+#-----------------------------------------------------------------------
+# test_buffering
+#-----------------------------------------------------------------------
+class RecordingFile( object ):
+  'A file which records every write.'
+
+  def __init__( self ):
+    self.writes = []
+
+  def write( self, text ):
+    self.writes.append( text )
+
+  def flush( self ):
+    pass
+
+def test_buffering( monkeypatch, tmpdir ):
+
+  monkeypatch.setattr( vcd, '_BUFFER_LINES', 16 )
+
+  out = RecordingFile()
+  w   = VcdWriter( out )
+  for t in range( 100 ):
+    w.sample( t, { 'count': Bits(8)( t ), 'even': Bits(1)( 1 - t % 2 ) } )
+
+  # Full blocks were written out before closing, each in a single write
+  assert 10 < len( out.writes ) < 30
+  w.close()
+
+  lines = body( ''.join( out.writes ) )
+  assert len( lines ) == 5 + 99 * 3
+  assert lines[-3:] == [ '#99', 'b{:b} !'.format( 99 ), '0"' ]
+
+  # Files opened by name are closed by close()
+
+  path = str( tmpdir.join( 'trace.vcd' ) )
+  with VcdWriter( path ) as w:
+    w.sample( 0, { 'a': Bits(2)( 1 ) } )
+  assert body( tmpdir.join( 'trace.vcd' ).read() )[2] == 'b1 !'
+  assert w._file is None
+
+#-----------------------------------------------------------------------
+# test_identifiers
+#-----------------------------------------------------------------------
+def test_identifiers():
+
+  idents = [ vcd._identifier( i ) for i in range( 94 * 95 ) ]
+  assert len( set( idents ) ) == len( idents )
+  assert idents[0] == '!' and idents[93] == '~' and idents[94] == '!!'
+  assert all( 33 <= ord( c ) <= 126 for i in idents for c in i )
+
+  # Identifiers with braces still format correctly
+
+  out = StringIO()
+  with VcdWriter( out ) as w:
+    for i in range( 100 ):
+      w.declare( 's{}'.format( i ), 2 )
+    w.sample( 0, dict( ( 's{}'.format( i ), 2 ) for i in range( 100 ) ) )
+  assert 'b10 {' in out.getvalue() and 'b10 }' in out.getvalue()